@@ -18,7 +18,7 @@ class ContractTemplateAdmin(admin.ModelAdmin):
 
 from django.http import HttpResponse
 from django.template.loader import get_template
-from xhtml2pdf import pisa
+from core.services.pdf import create_pdf
 
 def generate_pdf(modeladmin, request, queryset):
     for contract in queryset:
@@ -36,7 +36,7 @@ def generate_pdf(modeladmin, request, queryset):
         template = get_template(template_path)
         html = template.render(context)
         
-        pisa_status = pisa.CreatePDF(html, dest=response)
+        pisa_status = create_pdf(html, dest=response)
         
         if pisa_status.err:
             return HttpResponse('We had some errors <pre>' + html + '</pre>')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from comercial.models import Contract
+
+
+class Command(BaseCommand):
+    help = 'Reclassifica a situação de reajuste dos contratos (executar diariamente)'
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        self.stdout.write(f'Classificando reajustes para {today.strftime("%d/%m/%Y")}')
+
+        # Contratos antigos sem data de reajuste recebem o primeiro aniversário
+        missing = list(Contract.objects.filter(next_readjustment_date__isnull=True).only('id', 'start_date'))
+        for contract in missing:
+            contract.next_readjustment_date = Contract.first_readjustment_date(contract.start_date)
+        Contract.objects.bulk_update(missing, ['next_readjustment_date'], batch_size=500)
+
+        for bucket, date_filter in Contract.readjustment_bucket_filters(today).items():
+            updated = Contract.objects.filter(date_filter).exclude(readjustment_bucket=bucket).update(
+                readjustment_bucket=bucket
+            )
+            self.stdout.write(f'{bucket}: {updated} contratos reclassificados')
+
+        self.stdout.write(self.style.SUCCESS('Classificação concluída.'))
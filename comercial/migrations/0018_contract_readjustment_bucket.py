@@ -0,0 +1,50 @@
+# Generated by Django 5.1.5 on 2026-10-19 15:31
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_readjustment_state(apps, schema_editor):
+    Contract = apps.get_model('comercial', 'Contract')
+    today = timezone.now().date()
+    contracts = list(Contract.objects.only('id', 'start_date', 'next_readjustment_date'))
+    for contract in contracts:
+        if not contract.next_readjustment_date and contract.start_date:
+            try:
+                contract.next_readjustment_date = contract.start_date.replace(year=contract.start_date.year + 1)
+            except ValueError:
+                contract.next_readjustment_date = contract.start_date + timedelta(days=365)
+        if contract.next_readjustment_date:
+            days = (contract.next_readjustment_date - today).days
+            contract.readjustment_bucket = 'vencido' if days < 0 else 'no_prazo' if days <= 30 else 'em_dia'
+    Contract.objects.bulk_update(contracts, ['next_readjustment_date', 'readjustment_bucket'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comercial', '0017_seed_maintenance_services'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='readjustment_bucket',
+            field=models.CharField(choices=[('vencido', 'Atrasado'), ('no_prazo', 'No Prazo'), ('em_dia', 'Em dia')], default='em_dia', max_length=10, verbose_name='Situação do Reajuste'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['status', 'readjustment_bucket', 'next_readjustment_date'], name='contract_readj_bucket_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['status', 'next_readjustment_date'], name='contract_next_readj_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['billing_group', 'status'], name='contract_group_status_idx'),
+        ),
+        migrations.RunPython(fill_readjustment_state, migrations.RunPython.noop),
+    ]
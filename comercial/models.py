@@ -3,6 +3,7 @@ from ckeditor.fields import RichTextField
 from core.models import Person
 from django.contrib.auth.models import User
 from django.utils import timezone
+from datetime import timedelta
 import uuid
 
 class BaseModel(models.Model):
@@ -79,9 +80,19 @@ class Contract(BaseModel):
     value = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Ativo', verbose_name="Status")
     
+    READJUSTMENT_BUCKET_CHOICES = (
+        ('vencido', 'Atrasado'),
+        ('no_prazo', 'No Prazo'),
+        ('em_dia', 'Em dia'),
+    )
+    READJUSTMENT_WARNING_DAYS = 30
+
     start_date = models.DateField(verbose_name="Data de Início")
     end_date = models.DateField(null=True, blank=True, verbose_name="Data de Término")
     next_readjustment_date = models.DateField(null=True, blank=True, verbose_name="Próximo Reajuste")
+    # Mantido no save() e reclassificado pelo comando classificar_reajustes; as telas
+    # calculam a situação pela data (readjustment_bucket_filters), sem depender do comando
+    readjustment_bucket = models.CharField(max_length=10, choices=READJUSTMENT_BUCKET_CHOICES, default='em_dia', verbose_name="Situação do Reajuste")
 
     # Maintenance Services (checklist)
     maintenance_services = models.ManyToManyField(
@@ -95,12 +106,51 @@ class Contract(BaseModel):
     signed_at = models.DateTimeField(null=True, blank=True, verbose_name="Assinado em")
     signed_ip = models.GenericIPAddressField(null=True, blank=True, verbose_name="IP da Assinatura")
 
+    @staticmethod
+    def first_readjustment_date(start_date):
+        try:
+            return start_date.replace(year=start_date.year + 1)
+        except ValueError:  # February 29th
+            return start_date + timedelta(days=365)
+
+    @classmethod
+    def readjustment_bucket_for(cls, next_readjustment_date, today=None):
+        days = (next_readjustment_date - (today or timezone.now().date())).days
+        if days < 0:
+            return 'vencido'
+        if days <= cls.READJUSTMENT_WARNING_DAYS:
+            return 'no_prazo'
+        return 'em_dia'
+
+    @classmethod
+    def readjustment_bucket_filters(cls, today=None):
+        """{situação: Q} pela data do próximo reajuste, para filtrar e contar no banco."""
+        today = today or timezone.now().date()
+        warning_limit = today + timedelta(days=cls.READJUSTMENT_WARNING_DAYS)
+        return {
+            'vencido': models.Q(next_readjustment_date__lt=today),
+            'no_prazo': models.Q(next_readjustment_date__range=(today, warning_limit)),
+            'em_dia': models.Q(next_readjustment_date__gt=warning_limit) | models.Q(next_readjustment_date__isnull=True),
+        }
+
+    def save(self, *args, **kwargs):
+        if not self.next_readjustment_date and self.start_date:
+            self.next_readjustment_date = self.first_readjustment_date(self.start_date)
+        if self.next_readjustment_date:
+            self.readjustment_bucket = self.readjustment_bucket_for(self.next_readjustment_date)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Contrato {self.id} - {self.client.name}"
 
     class Meta:
         verbose_name = "Contrato"
         verbose_name_plural = "Contratos"
+        indexes = [
+            models.Index(fields=['status', 'readjustment_bucket', 'next_readjustment_date'], name='contract_readj_bucket_idx'),
+            models.Index(fields=['status', 'next_readjustment_date'], name='contract_next_readj_idx'),
+            models.Index(fields=['billing_group', 'status'], name='contract_group_status_idx'),
+        ]
 
 class Service(BaseModel):
     name = models.CharField(max_length=255, verbose_name="Nome do Serviço")
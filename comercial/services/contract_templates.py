@@ -0,0 +1,152 @@
+"""
+Motor de substituição de variáveis dos modelos de contrato.
+
+O conteúdo de cada ContractTemplate é dividido uma única vez em uma lista
+de tokens (texto literal / variável já resolvida para uma chave), guardada
+em cache por (id, updated_at). A renderização percorre a lista uma vez,
+consultando uma tabela de valores montada para o contrato, em tempo linear
+no tamanho do documento.
+"""
+import re
+import threading
+
+from django.utils.formats import date_format
+
+PLACEHOLDER_RE = re.compile(r'{{.*?}}')
+
+# Regras na ordem de prioridade: a primeira que casar com a variável inteira define a chave.
+# Os padrões tolerantes (acentos, espaços, entidades HTML do editor) vêm depois dos exatos.
+PLACEHOLDER_RULES = [(re.compile(pattern, re.IGNORECASE), key) for pattern, key in [
+    (r'{{cliente_nome}}', 'client_name'),
+    (r'{{NOME_CLIENTE}}', 'client_name'),
+    (r'{{CNPJ_CPF_CLIENTE}}', 'client_document'),
+    (r'{{.*?NOME.*?S.*?NDICO.*?OU.*?RESPONS.*?VEL.*?}}', 'responsible_name'),
+    (r'{{.*?NOME.*?RESPONSAVEL.*?}}', 'responsible_name'),
+    (r'{{.*?CPF.*?}}', 'responsible_cpf'),
+    (r'{{ENDERECO_CLIENTE}}', 'client_address'),
+    (r'{{EMAIL_CLIENTE}}', 'client_email'),
+    (r'{{TELEFONE_CLIENTE}}', 'client_phone'),
+    (r'{{valor}}', 'value'),
+    (r'{{VALOR.*?MENSAL(.*?DO.*?CONTRATO)?}}', 'value'),
+    (r'{{DIA.*?VENCIMENTO}}', 'due_day'),
+    (r'{{.*?DATA.*?INICIO.*?}}', 'start_date'),
+    (r'{{.*?DIA.*?}}', 'start_day'),
+    (r'{{.*?M[ÊE]S.*?POR.*?EXTENSO.*?}}', 'start_month_name'),
+    (r'{{.*?ANO.*?}}', 'start_year'),
+    (r'{{DATA_ASSINATURA}}', 'signed_date'),
+    (r'{{ITENS[_\s]CONTRATADOS}}', 'maintenance_services'),
+]]
+
+
+def _resolve_key(placeholder):
+    for pattern, key in PLACEHOLDER_RULES:
+        if pattern.fullmatch(placeholder):
+            return key
+    return None
+
+
+def tokenize(content):
+    """
+    Divide o conteúdo em tokens: str para texto literal e (chave,) para variáveis.
+    Variáveis desconhecidas permanecem como texto.
+    """
+    content = content or ''
+    tokens = []
+    position = 0
+    for match in PLACEHOLDER_RE.finditer(content):
+        key = _resolve_key(match.group(0))
+        if key is None:
+            continue
+        if match.start() > position:
+            tokens.append(content[position:match.start()])
+        tokens.append((key,))
+        position = match.end()
+    if position < len(content):
+        tokens.append(content[position:])
+    return tokens
+
+
+_token_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_template_tokens(template):
+    """Tokens do ContractTemplate, tokenizados apenas quando o modelo muda."""
+    key = (template.pk, template.updated_at)
+    cached = _token_cache.get(template.pk)
+    if cached is None or cached[0] != key:
+        cached = (key, tokenize(template.content))
+        with _cache_lock:
+            _token_cache[template.pk] = cached
+    return cached[1]
+
+
+def format_document(doc):
+    doc = doc or ''
+    if len(doc) == 14:  # CNPJ
+        return f"{doc[:2]}.{doc[2:5]}.{doc[5:8]}/{doc[8:12]}-{doc[12:]}"
+    if len(doc) == 11:  # CPF
+        return f"{doc[:3]}.{doc[3:6]}.{doc[6:9]}-{doc[9:]}"
+    return doc
+
+
+def _client_address(client):
+    parts = [client.address, client.number, client.neighborhood, client.city, client.state]
+    address_parts = [part for part in parts if part]
+    if client.zip_code:
+        address_parts.append(f"CEP: {client.zip_code}")
+    return ", ".join(address_parts)
+
+
+def _maintenance_services_html(contract):
+    services = list(contract.maintenance_services.all())
+    if not services:
+        return ''
+    return "<ul>" + "".join(f"<li>{s.name}</li>" for s in services) + "</ul>"
+
+
+def build_values(contract, keys):
+    """Tabela de valores do contrato, calculando apenas as chaves usadas no modelo."""
+    client = contract.client
+    start = contract.start_date
+    resolvers = {
+        'client_name': lambda: client.name,
+        'client_document': lambda: format_document(client.document),
+        'responsible_name': lambda: client.responsible_name or '',
+        'responsible_cpf': lambda: client.responsible_cpf or '',
+        'client_address': lambda: _client_address(client),
+        'client_email': lambda: client.email or '',
+        'client_phone': lambda: client.phone or '',
+        'value': lambda: f"{contract.value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
+        'due_day': lambda: str(contract.due_day),
+        'start_date': lambda: date_format(start, "d/m/Y") if start else '',
+        'start_day': lambda: str(start.day) if start else '',
+        'start_month_name': lambda: date_format(start, "F").lower() if start else '',
+        'start_year': lambda: str(start.year) if start else '',
+        'signed_date': lambda: date_format(contract.signed_at, "d/m/Y") if contract.signed_at else '__________________',
+        'maintenance_services': lambda: _maintenance_services_html(contract),
+    }
+    return {key: str(resolvers[key]()) for key in keys}
+
+
+def render_tokens(tokens, contract):
+    values = build_values(contract, {token[0] for token in tokens if isinstance(token, tuple)})
+    return ''.join(token if isinstance(token, str) else values[token[0]] for token in tokens)
+
+
+def render_contract(contract):
+    """Conteúdo do modelo do contrato com as variáveis substituídas."""
+    return render_tokens(get_template_tokens(contract.template), contract)
+
+
+def render_contracts(contracts):
+    """
+    Renderização em lote (ex.: reemissão após reajuste).
+    Retorna [(contrato, conteúdo)], com cliente, modelo e serviços carregados em poucas queries.
+    """
+    from comercial.models import Contract
+
+    if not hasattr(contracts, 'prefetch_related'):
+        contracts = Contract.objects.filter(pk__in=[getattr(c, 'pk', c) for c in contracts])
+    contracts = contracts.select_related('client', 'template').prefetch_related('maintenance_services')
+    return [(contract, render_contract(contract)) for contract in contracts]
@@ -0,0 +1,194 @@
+"""
+Motor de reajuste de contratos.
+
+Aplica (ou simula) reajustes em lote: por bloco de contratos, um UPDATE
+recalcula unit_price/total_price dos itens no banco, outro recalcula o
+valor do contrato a partir dos itens (subquery) e os logs são criados com
+bulk_create. O snapshot dos itens é gravado em formato compacto
+[[item_id, "unit_price"], ...] para permitir o desfazer.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, Round
+from django.utils import timezone
+
+from comercial.models import Contract, ContractItem, ContractReadjustment, ContractReadjustmentLog
+
+CHUNK_SIZE = 500
+CENTS = Decimal('0.01')
+
+
+def next_anniversary(base_date, today=None):
+    """Próximo aniversário de base_date estritamente depois de hoje."""
+    today = today or timezone.now().date()
+    next_date = base_date
+    while next_date <= today:
+        try:
+            next_date = next_date.replace(year=next_date.year + 1)
+        except ValueError:  # February 29th
+            next_date = next_date + timedelta(days=365)
+    return next_date
+
+
+def _chunks(ids, size=CHUNK_SIZE):
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _item_quantity():
+    # Mesmo critério de ContractItem.save(): quantidade 0/nula conta como 1
+    return Coalesce(NullIf(F('quantity'), 0), 1)
+
+
+def _items_total_subquery():
+    return Subquery(
+        ContractItem.objects.filter(contract=OuterRef('pk'))
+        .values('contract')
+        .annotate(total=Sum('total_price'))
+        .values('total')[:1],
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def _snapshot(contract_ids):
+    snapshot = defaultdict(list)
+    rows = ContractItem.objects.filter(contract_id__in=contract_ids).order_by('id').values_list(
+        'contract_id', 'id', 'unit_price', 'quantity'
+    )
+    for contract_id, item_id, unit_price, quantity in rows:
+        snapshot[contract_id].append((item_id, unit_price, quantity))
+    return snapshot
+
+
+def _compact(items):
+    return [[item_id, str(unit_price)] for item_id, unit_price, _ in items]
+
+
+def preview_readjustment(contract_ids, percentage, readjustment_type='READJUSTMENT'):
+    """
+    Dry-run: calcula os novos valores sem gravar nada.
+    Retorna uma lista de dicts com contract, old_value, new_value e next_readjustment_date.
+    """
+    multiplier = 1 + (Decimal(percentage) / 100)
+    today = timezone.now().date()
+    rows = []
+    for chunk in _chunks(contract_ids):
+        snapshot = _snapshot(chunk)
+        for contract in Contract.objects.filter(id__in=chunk).select_related('client').order_by('client__name'):
+            items = snapshot.get(contract.id, [])
+            if readjustment_type != 'READJUSTMENT':
+                new_value = contract.value
+            elif items:
+                new_value = sum(
+                    (quantity or 1) * (unit_price * multiplier).quantize(CENTS, rounding=ROUND_HALF_UP)
+                    for _, unit_price, quantity in items
+                )
+            else:
+                new_value = (contract.value * multiplier).quantize(CENTS, rounding=ROUND_HALF_UP)
+            rows.append({
+                'contract': contract,
+                'old_value': contract.value,
+                'new_value': new_value,
+                'next_readjustment_date': next_anniversary(contract.next_readjustment_date or contract.start_date, today),
+            })
+    return rows
+
+
+@transaction.atomic
+def apply_readjustment(contract_ids, percentage, user=None, observation='', readjustment_type='READJUSTMENT'):
+    """
+    Aplica o reajuste (ou adiamento) nos contratos informados e retorna o ContractReadjustment criado.
+    """
+    percentage = Decimal(percentage)
+    is_readjustment = readjustment_type == 'READJUSTMENT'
+    readjustment = ContractReadjustment.objects.create(
+        percentage=percentage if is_readjustment else 0,
+        applied_by=user,
+        observation=observation,
+        readjustment_type=readjustment_type,
+        status='APPLIED' if is_readjustment else 'DEFERRED'
+    )
+    multiplier = Value(1 + (percentage / 100), output_field=DecimalField(max_digits=12, decimal_places=6))
+    now = timezone.now()
+    today = now.date()
+
+    for chunk in _chunks(contract_ids):
+        snapshot = _snapshot(chunk)
+        contracts = list(Contract.objects.filter(id__in=chunk).only(
+            'id', 'value', 'start_date', 'next_readjustment_date'
+        ))
+        old_values = {c.id: c.value for c in contracts}
+
+        if is_readjustment:
+            new_unit_price = Round(F('unit_price') * multiplier, 2)
+            ContractItem.objects.filter(contract_id__in=chunk).update(
+                unit_price=new_unit_price,
+                total_price=_item_quantity() * new_unit_price,
+                updated_at=now,
+            )
+            # Contratos sem itens têm o próprio valor reajustado
+            Contract.objects.filter(id__in=chunk).update(
+                value=Coalesce(_items_total_subquery(), Round(F('value') * multiplier, 2)),
+                updated_at=now,  # update() não passa pelo auto_now; a previsão de caixa usa updated_at
+            )
+            new_values = dict(Contract.objects.filter(id__in=chunk).values_list('id', 'value'))
+        else:
+            new_values = old_values
+
+        for contract in contracts:
+            contract.next_readjustment_date = next_anniversary(
+                contract.next_readjustment_date or contract.start_date, today
+            )
+            contract.readjustment_bucket = Contract.readjustment_bucket_for(contract.next_readjustment_date, today)
+            contract.updated_at = now
+        Contract.objects.bulk_update(contracts, ['next_readjustment_date', 'readjustment_bucket', 'updated_at'])
+
+        ContractReadjustmentLog.objects.bulk_create([
+            ContractReadjustmentLog(
+                readjustment=readjustment,
+                contract_id=contract.id,
+                old_value=old_values[contract.id],
+                new_value=new_values[contract.id],
+                items_snapshot=_compact(snapshot.get(contract.id, [])),
+            )
+            for contract in contracts
+        ])
+
+    return readjustment
+
+
+def _snapshot_items(items_snapshot):
+    """Aceita o formato compacto [[id, preço]] e o legado [{'id':..., 'unit_price':...}]."""
+    for entry in items_snapshot or []:
+        if isinstance(entry, dict):
+            yield entry['id'], Decimal(entry['unit_price'])
+        else:
+            yield entry[0], Decimal(entry[1])
+
+
+@transaction.atomic
+def undo_readjustment(readjustment):
+    """Restaura preços dos itens e valores dos contratos a partir dos logs, em lote."""
+    logs = list(readjustment.logs.only('id', 'contract_id', 'old_value', 'items_snapshot'))
+
+    prices = {}
+    for log in logs:
+        prices.update(_snapshot_items(log.items_snapshot))
+
+    now = timezone.now()
+    for chunk in _chunks(prices):
+        items = [ContractItem(id=item_id, unit_price=prices[item_id]) for item_id in chunk]
+        ContractItem.objects.bulk_update(items, ['unit_price'])
+        ContractItem.objects.filter(id__in=chunk).update(total_price=_item_quantity() * F('unit_price'), updated_at=now)
+
+    contracts = [Contract(id=log.contract_id, value=log.old_value, updated_at=now) for log in logs]
+    Contract.objects.bulk_update(contracts, ['value', 'updated_at'], batch_size=CHUNK_SIZE)
+
+    readjustment.status = 'CANCELLED'
+    readjustment.save(update_fields=['status', 'updated_at'])
+    return len(logs)
@@ -1,3 +1,163 @@
+import io
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Person
+from .models import Contract, ContractItem, ContractTemplate, MaintenanceService
+from .services.contract_templates import get_template_tokens, render_contract, render_contracts
+from .services.readjustment import apply_readjustment, preview_readjustment, undo_readjustment
+
+
+class ContractTemplateEngineTest(TestCase):
+    def setUp(self):
+        self.client_person = Person.objects.create(
+            name="Condomínio Teste", document="12345678000199", is_client=True,
+            responsible_name="Maria", responsible_cpf="111.222.333-44",
+        )
+        self.template = ContractTemplate.objects.create(
+            name="Modelo",
+            content=(
+                "<p>{{NOME_CLIENTE}} ({{CNPJ_CPF_CLIENTE}}), síndico {{NOME DO S&Iacute;NDICO OU RESPONS&Aacute;VEL}}"
+                " CPF {{CPF_RESPONSAVEL}}, valor {{VALOR_MENSAL}} dia {{DIA_VENCIMENTO}},"
+                " início {{DIA}} de {{MES_POR_EXTENSO}} de {{ANO}} {{DESCONHECIDA}}</p>{{ITENS_CONTRATADOS}}"
+            ),
+        )
+        self.contract = Contract.objects.create(
+            client=self.client_person, template=self.template, value=Decimal('1500.00'),
+            due_day=10, start_date=date(2025, 3, 5),
+        )
+        self.contract.maintenance_services.add(MaintenanceService.objects.create(name="Bombas"))
+
+    def test_render_contract(self):
+        self.assertEqual(
+            render_contract(self.contract),
+            "<p>Condomínio Teste (12.345.678/0001-99), síndico Maria CPF 111.222.333-44, valor 1.500,00 dia 10,"
+            " início 5 de março de 2025 {{DESCONHECIDA}}</p><ul><li>Bombas</li></ul>"
+        )
+
+    def test_tokens_cached_until_template_changes(self):
+        tokens = get_template_tokens(self.template)
+        self.assertIs(get_template_tokens(self.template), tokens)
+
+        self.template.content = "{{NOME_CLIENTE}}"
+        self.template.save()
+        self.assertEqual(get_template_tokens(self.template), [('client_name',)])
+
+    def test_render_contracts_bulk(self):
+        with self.assertNumQueries(2):
+            (contract, content), = render_contracts(Contract.objects.filter(pk=self.contract.pk))
+        self.assertEqual(contract, self.contract)
+        self.assertIn("<li>Bombas</li>", content)
+
+
+class ContractReadjustmentEngineTest(TestCase):
+    def setUp(self):
+        person = Person.objects.create(name="Cliente", document="11122233344", is_client=True)
+        template = ContractTemplate.objects.create(name="Modelo", content="-")
+        self.contract = Contract.objects.create(
+            client=person, template=template, value=Decimal('300.00'), due_day=10, start_date=date(2024, 1, 15),
+        )
+        self.item = ContractItem.objects.create(
+            contract=self.contract, description="Manutenção", quantity=2, unit_price=Decimal('150.00'),
+        )
+        self.empty_contract = Contract.objects.create(
+            client=person, template=template, value=Decimal('100.00'), due_day=10, start_date=date(2024, 1, 15),
+        )
+        self.ids = [self.contract.id, self.empty_contract.id]
+
+    def test_preview_does_not_write(self):
+        rows = {row['contract'].id: row for row in preview_readjustment(self.ids, Decimal('10'))}
+        self.assertEqual(rows[self.contract.id]['new_value'], Decimal('330.00'))
+        self.assertEqual(rows[self.empty_contract.id]['new_value'], Decimal('110.00'))
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.value, Decimal('300.00'))
+
+    def test_apply_and_undo(self):
+        readjustment = apply_readjustment(self.ids, Decimal('10'), observation="IPCA")
+
+        self.item.refresh_from_db()
+        self.contract.refresh_from_db()
+        self.empty_contract.refresh_from_db()
+        self.assertEqual(self.item.unit_price, Decimal('165.00'))
+        self.assertEqual(self.item.total_price, Decimal('330.00'))
+        self.assertEqual(self.contract.value, Decimal('330.00'))
+        self.assertEqual(self.empty_contract.value, Decimal('110.00'))
+        self.assertGreater(self.contract.next_readjustment_date, date.today())
+        self.assertEqual(readjustment.logs.count(), 2)
+
+        # Reemissão em lote dos contratos reajustados
+        User.objects.create_user(username='gestor', password='password')
+        self.client.login(username='gestor', password='password')
+        response = self.client.get(reverse('comercial:contract_readjustment_reissue', args=[readjustment.pk]))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            self.assertEqual(sorted(archive.namelist()), [f'contrato_{pk}.pdf' for pk in sorted(self.ids)])
+
+        undo_readjustment(readjustment)
+        self.item.refresh_from_db()
+        self.contract.refresh_from_db()
+        self.assertEqual(self.item.unit_price, Decimal('150.00'))
+        self.assertEqual(self.item.total_price, Decimal('300.00'))
+        self.assertEqual(self.contract.value, Decimal('300.00'))
+        self.assertEqual(readjustment.status, 'CANCELLED')
+
+
+class ContractReadjustmentBucketTest(TestCase):
+    def setUp(self):
+        person = Person.objects.create(name="Cliente", document="99988877766", is_client=True)
+        template = ContractTemplate.objects.create(name="Modelo", content="-")
+        today = date.today()
+        self.overdue = Contract.objects.create(
+            client=person, template=template, value=Decimal('100'), due_day=10,
+            start_date=today - timedelta(days=400),
+        )
+        self.upcoming = Contract.objects.create(
+            client=person, template=template, value=Decimal('100'), due_day=10,
+            start_date=today - timedelta(days=350),
+        )
+
+    def test_bucket_maintained_on_save(self):
+        self.assertEqual(self.overdue.readjustment_bucket, 'vencido')
+        self.assertEqual(self.upcoming.readjustment_bucket, 'no_prazo')
+
+    def test_daily_command_reclassifies(self):
+        Contract.objects.filter(pk=self.upcoming.pk).update(
+            next_readjustment_date=date.today() - timedelta(days=1)
+        )
+        call_command('classificar_reajustes', stdout=io.StringIO())
+        self.upcoming.refresh_from_db()
+        self.assertEqual(self.upcoming.readjustment_bucket, 'vencido')
+
+    def test_form_filters_by_bucket(self):
+        User.objects.create_user(username='gestor', password='password')
+        self.client.login(username='gestor', password='password')
+        response = self.client.get(reverse('comercial:contract_readjustment_create'), {'bucket': 'vencido'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c.id for c in response.context['contracts']], [self.overdue.id])
+        self.assertEqual(response.context['bucket_counts'], {'vencido': 1, 'no_prazo': 1, 'em_dia': 0})
+
+        response = self.client.get(reverse('comercial:contract_readjustment_create'), {'search': 'A&B=1'})
+        self.assertContains(response, '?bucket=vencido&search=A%26B%3D1&')
+
+    def test_form_buckets_by_date_and_applies_to_whole_filter(self):
+        User.objects.create_user(username='gestor', password='password')
+        self.client.login(username='gestor', password='password')
+        url = reverse('comercial:contract_readjustment_create')
+        # Venceu depois da última classificação: a coluna ainda diz "no_prazo"
+        Contract.objects.filter(pk=self.upcoming.pk).update(next_readjustment_date=date.today() - timedelta(days=1))
+        response = self.client.get(url, {'bucket': 'vencido'})
+        self.assertEqual({c.id for c in response.context['contracts']}, {self.overdue.id, self.upcoming.id})
+        self.assertEqual(response.context['bucket_counts'], {'vencido': 2, 'no_prazo': 0, 'em_dia': 0})
 
-# Create your tests here.
+        # Sem ids: o reajuste vale para todos os contratos do filtro, de todas as páginas
+        self.client.post(url, {'all_matching': '1', 'bucket': 'vencido', 'percentage': '10',
+                               'observation': 'IPCA', 'readjustment_type': 'READJUSTMENT'})
+        self.assertEqual(
+            sorted(Contract.objects.values_list('value', flat=True)), [Decimal('110.00'), Decimal('110.00')]
+        )
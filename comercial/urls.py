@@ -57,5 +57,6 @@ urlpatterns = [
     # Contract Readjustments
     path('reajustes/', views.contract_readjustment_list, name='contract_readjustment_list'),
     path('reajustes/novo/', views.contract_readjustment_create, name='contract_readjustment_create'),
+    path('reajustes/<int:pk>/reemitir/', views.contract_readjustment_reissue, name='contract_readjustment_reissue'),
     path('reajustes/<int:pk>/desfazer/', views.contract_readjustment_undo, name='contract_readjustment_undo'),
 ]
@@ -1,10 +1,10 @@
 from decimal import Decimal
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError
 from django.views import View
 from django.http import HttpResponseForbidden, HttpResponse, JsonResponse
 from django.template.loader import get_template
-from xhtml2pdf import pisa
+from core.services.pdf import create_pdf
 from datetime import timedelta
 from django.utils import timezone
 from django.core.files.base import ContentFile
@@ -16,14 +16,17 @@ from django.contrib import messages
 import base64
 from .models import (
     Contract, Budget, BudgetProduct, BudgetService, ContractTemplate, 
-    BillingGroup, ContractItem, ContractReadjustment, ContractReadjustmentLog
+    BillingGroup, ContractItem, ContractReadjustment
 )
 from .forms import BillingGroupForm, ContractForm, ContractItemFormSet
 from core.models import Person, Service
+from core.services.email_templates import get_compiled_template, resolve_email_template
+from .services.contract_templates import render_contract, render_contracts, render_tokens, tokenize
+from .services.readjustment import apply_readjustment, preview_readjustment, undo_readjustment
 from estoque.models import Product
 from django.core.management import call_command
 import io
-import re
+import zipfile
 
 class ContractSigningView(View):
     def get(self, request, token):
@@ -72,100 +75,14 @@ class ContractSigningView(View):
 def replace_contract_variables(content, contract):
     """
     Helper function to replace placeholders in contract content with actual data.
+    The contract's own template content is tokenized once and cached (see comercial.services.contract_templates).
     """
-    from django.utils.formats import date_format
-    
-    # Helper for case-insensitive replacement
-    def replace_ignore_case(text, pattern, replacement):
-        return re.sub(pattern, str(replacement), text, flags=re.IGNORECASE)
-
-    # Client Data
-    content = replace_ignore_case(content, r'{{cliente_nome}}', contract.client.name)
-    content = replace_ignore_case(content, r'{{NOME_CLIENTE}}', contract.client.name)
-    
-    doc = contract.client.document or ''
-    # Format CNPJ/CPF
-    if len(doc) == 14: # CNPJ
-        formatted_doc = f"{doc[:2]}.{doc[2:5]}.{doc[5:8]}/{doc[8:12]}-{doc[12:]}"
-    elif len(doc) == 11: # CPF
-        formatted_doc = f"{doc[:3]}.{doc[3:6]}.{doc[6:9]}-{doc[9:]}"
-    else:
-        formatted_doc = doc
-        
-    content = replace_ignore_case(content, r'{{CNPJ_CPF_CLIENTE}}', formatted_doc)
-    
-    resp_name = contract.client.responsible_name or ''
-    
-    # Debug logging
-    import logging
-    logger = logging.getLogger(__name__)
-    # logger.info(f"Replacing variables for contract {contract.id}. Resp Name: {resp_name}")
-    
-    # Robust replacement for responsible name (accents, spaces, underscores, HTML entities)
-    # Matches {{NOME...S...NDICO...OU...RESPONS...VEL}} with any chars in between
-    content = replace_ignore_case(content, r'{{.*?NOME.*?S.*?NDICO.*?OU.*?RESPONS.*?VEL.*?}}', resp_name)
-    content = replace_ignore_case(content, r'{{.*?NOME.*?RESPONSAVEL.*?}}', resp_name)
-    
-    resp_cpf = contract.client.responsible_cpf or ''
-    content = replace_ignore_case(content, r'{{.*?CPF.*?}}', resp_cpf)
-    content = replace_ignore_case(content, r'{{.*?CPF.*?RESPONSAVEL.*?}}', resp_cpf)
-    
-    # Address
-    address_parts = []
-    if contract.client.address: address_parts.append(contract.client.address)
-    if contract.client.number: address_parts.append(contract.client.number)
-    if contract.client.neighborhood: address_parts.append(contract.client.neighborhood)
-    if contract.client.city: address_parts.append(contract.client.city)
-    if contract.client.state: address_parts.append(contract.client.state)
-    if contract.client.zip_code: address_parts.append(f"CEP: {contract.client.zip_code}")
-    
-    full_address = ", ".join(address_parts)
-    content = replace_ignore_case(content, r'{{ENDERECO_CLIENTE}}', full_address)
-
-    content = replace_ignore_case(content, r'{{EMAIL_CLIENTE}}', contract.client.email or '')
-    content = replace_ignore_case(content, r'{{TELEFONE_CLIENTE}}', contract.client.phone or '')
-
-    # Contract Data
-    formatted_value = f"{contract.value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-    content = replace_ignore_case(content, r'{{valor}}', formatted_value)
-    content = replace_ignore_case(content, r'{{VALOR.*?MENSAL(.*?DO.*?CONTRATO)?}}', formatted_value)
-    
-    content = replace_ignore_case(content, r'{{DIA.*?VENCIMENTO}}', str(contract.due_day))
-    
-    if contract.start_date:
-        content = replace_ignore_case(content, r'{{.*?DATA.*?INICIO.*?}}', date_format(contract.start_date, "d/m/Y"))
-        content = replace_ignore_case(content, r'{{.*?DIA.*?}}', str(contract.start_date.day))
-        month_name = date_format(contract.start_date, "F") 
-        content = replace_ignore_case(content, r'{{.*?M[ÊE]S.*?POR.*?EXTENSO.*?}}', month_name.lower())
-        content = replace_ignore_case(content, r'{{.*?ANO.*?}}', str(contract.start_date.year))
-    else:
-        content = replace_ignore_case(content, r'{{.*?DATA.*?INICIO.*?}}', '')
-        content = replace_ignore_case(content, r'{{.*?DIA.*?}}', '')
-        content = replace_ignore_case(content, r'{{.*?M[ÊE]S.*?POR.*?EXTENSO.*?}}', '')
-        content = replace_ignore_case(content, r'{{.*?ANO.*?}}', '')
-
-    # Signature Date
-    if contract.signed_at:
-        content = replace_ignore_case(content, r'{{DATA_ASSINATURA}}', date_format(contract.signed_at, "d/m/Y"))
-    else:
-        # Placeholder for signature date
-        content = replace_ignore_case(content, r'{{DATA_ASSINATURA}}', '__________________')
-
-    # Maintenance Services
-    services_list = contract.maintenance_services.all()
-    if services_list.exists():
-        services_ul = "<ul>"
-        for s in services_list:
-            services_ul += f"<li>{s.name}</li>"
-        services_ul += "</ul>"
-        content = replace_ignore_case(content, r'{{ITENS[_\s]CONTRATADOS}}', services_ul)
-    else:
-        content = replace_ignore_case(content, r'{{ITENS[_\s]CONTRATADOS}}', '')
-
-    return content
+    if content == contract.template.content:
+        return render_contract(contract)
+    return render_tokens(tokenize(content), contract)
 
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Count, Q
 
 @login_required
 def client_list(request):
@@ -499,7 +416,7 @@ def contract_pdf(request, pk):
     template = get_template(template_path)
     html = template.render(context)
     
-    pisa_status = pisa.CreatePDF(html, dest=response)
+    pisa_status = create_pdf(html, dest=response)
     
     if pisa_status.err:
        return HttpResponse('We had some errors <pre>' + html + '</pre>')
@@ -520,15 +437,24 @@ def contract_send_email(request, pk):
     
     # Create PDF in memory
     pdf_file = ContentFile(b'')
-    pisa_status = pisa.CreatePDF(html, dest=pdf_file)
+    pisa_status = create_pdf(html, dest=pdf_file)
     
     if pisa_status.err:
         messages.error(request, 'Erro ao gerar PDF para envio.')
         return redirect('comercial:contract_detail', pk=pk)
         
     # Send Email
-    subject = f'Contrato #{contract.id} - Descartex'
-    body = f"""
+    email_template = resolve_email_template(template_type='CONTRATO')
+    if email_template:
+        subject, body = get_compiled_template(email_template).render({
+            'cliente': contract.client.name,
+            'valor': f"R$ {contract.value}",
+            'contrato': contract.id,
+            'contract': contract,
+        })
+    else:
+        subject = f'Contrato #{contract.id} - Descartex'
+        body = f"""
     Olá {contract.client.name},
     
     Segue em anexo o contrato #{contract.id} assinado.
@@ -544,6 +470,8 @@ def contract_send_email(request, pk):
         [contract.client.email or 'cliente@exemplo.com'], # Recipient (fallback if no email)
         bcc=['vendas@descartex.com.br'] # Copy to sender
     )
+    if email_template:
+        email.content_subtype = "html"
     
     # Get PDF content from the ContentFile
     pdf_content = pdf_file.file.getvalue()
@@ -821,7 +749,7 @@ def budget_pdf(request, pk):
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     template = get_template(template_path)
     html = template.render(context)
-    pisa_status = pisa.CreatePDF(
+    pisa_status = create_pdf(
        html, dest=response)
     if pisa_status.err:
        return HttpResponse('We had some errors <pre>' + html + '</pre>')
@@ -839,15 +767,24 @@ def budget_send_email(request, pk):
     
     # Create PDF in memory
     pdf_file = ContentFile(b'')
-    pisa_status = pisa.CreatePDF(html, dest=pdf_file)
+    pisa_status = create_pdf(html, dest=pdf_file)
     
     if pisa_status.err:
         messages.error(request, 'Erro ao gerar PDF para envio.')
         return redirect('comercial:budget_detail', pk=pk)
         
     # Send Email
-    subject = f'Orçamento #{budget.id:06d} - Descartex'
-    body = f"""
+    email_template = resolve_email_template(template_type='ORCAMENTO')
+    if email_template:
+        subject, body = get_compiled_template(email_template).render({
+            'cliente': budget.client.name,
+            'valor': f"R$ {budget.total_value}",
+            'orcamento': f"{budget.id:06d}",
+            'budget': budget,
+        })
+    else:
+        subject = f'Orçamento #{budget.id:06d} - Descartex'
+        body = f"""
     Olá {budget.client.name},
     
     Segue em anexo o orçamento #{budget.id:06d} conforme solicitado.
@@ -863,6 +800,8 @@ def budget_send_email(request, pk):
         [budget.client.email or 'cliente@exemplo.com'], # Recipient (fallback if no email)
         bcc=['vendas@descartex.com.br'] # Copy to sender
     )
+    if email_template:
+        email.content_subtype = "html"
     
     # Get PDF content from the ContentFile
     pdf_content = pdf_file.file.getvalue()
@@ -1045,11 +984,35 @@ def contract_readjustment_list(request):
     readjustments = ContractReadjustment.objects.all().order_by('-date')
     return render(request, 'comercial/readjustment_list.html', {'readjustments': readjustments})
 
+def _readjustment_contracts(params, today):
+    """
+    Contratos ativos do filtro da tela de reajuste (busca, grupo e situação).
+    A situação vem da data do próximo reajuste, calculada no banco, e não da
+    coluna readjustment_bucket, que só é reclassificada pelo comando diário.
+    Retorna (contratos, contagem por situação).
+    """
+    contracts = Contract.objects.filter(status='Ativo')
+    if params.get('search'):
+        contracts = contracts.filter(client__name__icontains=params['search'])
+    if params.get('billing_group'):
+        contracts = contracts.filter(billing_group_id=params['billing_group'])
+
+    buckets = Contract.readjustment_bucket_filters(today)
+    bucket_counts = contracts.aggregate(**{name: Count('id', filter=q) for name, q in buckets.items()})
+    if params.get('bucket') in buckets:
+        contracts = contracts.filter(buckets[params['bucket']])
+    return contracts, bucket_counts
+
 @login_required
 def contract_readjustment_create(request):
+    today = timezone.now().date()
     if request.method == 'POST':
         percentage = Decimal(request.POST.get('percentage', '0'))
         contract_ids = request.POST.getlist('contracts')
+        if request.POST.get('all_matching'):
+            # Todos os contratos do filtro, não só os da página exibida
+            contracts, _ = _readjustment_contracts(request.POST, today)
+            contract_ids = list(contracts.values_list('id', flat=True))
         observation = request.POST.get('observation', '')
         readjustment_type = request.POST.get('readjustment_type', 'READJUSTMENT')
         
@@ -1061,119 +1024,87 @@ def contract_readjustment_create(request):
             messages.error(request, "Informe um percentual válido para o reajuste.")
             return redirect('comercial:contract_readjustment_create')
 
+        if request.POST.get('preview'):
+            return render(request, 'comercial/readjustment_preview.html', {
+                'rows': preview_readjustment(contract_ids, percentage, readjustment_type),
+                'percentage': percentage,
+                'observation': observation,
+                'readjustment_type': readjustment_type,
+            })
+
         try:
-            with transaction.atomic():
-                readjustment = ContractReadjustment.objects.create(
-                    percentage=percentage if readjustment_type == 'READJUSTMENT' else 0,
-                    applied_by=request.user,
-                    observation=observation,
-                    readjustment_type=readjustment_type,
-                    status='APPLIED' if readjustment_type == 'READJUSTMENT' else 'DEFERRED'
-                )
-                
-                multiplier = 1 + (percentage / 100)
-                contracts_to_update = Contract.objects.filter(id__in=contract_ids)
-                
-                for contract in contracts_to_update:
-                    items_snapshot = []
-                    old_value = contract.value
-                    
-                    if readjustment_type == 'READJUSTMENT':
-                        for item in contract.items.all():
-                            items_snapshot.append({
-                                'id': item.id,
-                                'unit_price': str(item.unit_price)
-                            })
-                            item.unit_price = (item.unit_price * multiplier).quantize(Decimal('0.01'))
-                            item.save()
-                        
-                        new_value = sum(item.total_price for item in contract.items.all())
-                        contract.value = new_value
-                    else:
-                        new_value = old_value
-                        # For deferral, we just log the current state
-                        for item in contract.items.all():
-                            items_snapshot.append({
-                                'id': item.id,
-                                'unit_price': str(item.unit_price)
-                            })
-
-                    # Calculate next readjustment date: 1 year from current next_readjustment_date or start_date
-                    base_date = contract.next_readjustment_date or contract.start_date
-                    # Ensure next anniversary is in the future
-                    next_date = base_date
-                    while next_date <= timezone.now().date():
-                        try:
-                            next_date = next_date.replace(year=next_date.year + 1)
-                        except ValueError: # February 29th
-                            next_date = next_date + timedelta(days=365)
-                    
-                    contract.next_readjustment_date = next_date
-                    contract.save()
-                    
-                    ContractReadjustmentLog.objects.create(
-                        readjustment=readjustment,
-                        contract=contract,
-                        old_value=old_value,
-                        new_value=new_value,
-                        items_snapshot=items_snapshot
-                    )
-                
-                msg = f"Reajuste de {percentage}% aplicado" if readjustment_type == 'READJUSTMENT' else "Reajuste adiado"
-                messages.success(request, f"{msg} com sucesso em {len(contracts_to_update)} contratos.")
-                return redirect('comercial:contract_readjustment_list')
-                
+            apply_readjustment(
+                contract_ids, percentage, user=request.user,
+                observation=observation, readjustment_type=readjustment_type
+            )
+            msg = f"Reajuste de {percentage}% aplicado" if readjustment_type == 'READJUSTMENT' else "Reajuste adiado"
+            messages.success(request, f"{msg} com sucesso em {len(contract_ids)} contratos.")
+            return redirect('comercial:contract_readjustment_list')
         except Exception as e:
             messages.error(request, f"Erro ao processar: {str(e)}")
             return redirect('comercial:contract_readjustment_create')
 
     # GET: Form with filters
-    contracts = Contract.objects.filter(status='Ativo').order_by('client__name')
-    
-    # Simple filters for the form
     search = request.GET.get('search', '')
     billing_group = request.GET.get('billing_group', '')
-    
-    if search:
-        contracts = contracts.filter(client__name__icontains=search)
-    if billing_group:
-        contracts = contracts.filter(billing_group_id=billing_group)
-        
-    # Calculate status for each contract
-    today = timezone.now().date()
-    for contract in contracts:
-        # If next_readjustment_date is null, use start_date + 1 year
-        if not contract.next_readjustment_date:
-            try:
-                contract.next_readjustment_date = contract.start_date.replace(year=contract.start_date.year + 1)
-            except ValueError:
-                contract.next_readjustment_date = contract.start_date + timedelta(days=365)
-        
-        diff = contract.next_readjustment_date - today
-        days = diff.days
-        
-        if days < 0:
-            contract.anniversary_status = 'vencido'
+    bucket = request.GET.get('bucket', '')
+    contracts, bucket_counts = _readjustment_contracts(request.GET, today)
+
+    contracts = contracts.select_related('client', 'billing_group').order_by('client__name')
+    page_obj = Paginator(contracts, 50).get_page(request.GET.get('page'))
+
+    # Rótulos apenas para a página exibida
+    for contract in page_obj:
+        days = (contract.next_readjustment_date - today).days if contract.next_readjustment_date else 0
+        current_bucket = (
+            Contract.readjustment_bucket_for(contract.next_readjustment_date, today)
+            if contract.next_readjustment_date else 'em_dia'
+        )
+        if current_bucket == 'vencido':
             contract.anniversary_label = f"Atrasado ({abs(days)}d)"
             contract.anniversary_class = 'danger'
-        elif days <= 30:
-            contract.anniversary_status = 'no_prazo'
+        elif current_bucket == 'no_prazo':
             contract.anniversary_label = f"No Prazo ({days}d)"
             contract.anniversary_class = 'warning text-dark'
         else:
-            contract.anniversary_status = 'em_dia'
-            contract.anniversary_label = f"Em dia"
+            contract.anniversary_label = "Em dia"
             contract.anniversary_class = 'success'
 
     billing_groups = BillingGroup.objects.all().order_by('name')
     
     return render(request, 'comercial/readjustment_form.html', {
-        'contracts': contracts,
+        'contracts': page_obj,
+        'page_obj': page_obj,
+        'bucket_counts': bucket_counts,
+        'bucket': bucket,
         'billing_groups': billing_groups,
         'search': search,
         'billing_group_id': int(billing_group) if billing_group else None
     })
 
+@login_required
+def contract_readjustment_reissue(request, pk):
+    """Reemissão em lote: PDFs dos contratos do reajuste, com os valores novos, em um ZIP."""
+    readjustment = get_object_or_404(ContractReadjustment, pk=pk)
+    if readjustment.status == 'CANCELLED':
+        messages.warning(request, "Reajuste cancelado: não há contratos a reemitir.")
+        return redirect('comercial:contract_readjustment_list')
+
+    template = get_template('comercial/contract_pdf.html')
+    contracts = Contract.objects.filter(pk__in=readjustment.logs.values('contract_id')).order_by('id')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for contract, content in render_contracts(contracts):
+            pdf = io.BytesIO()
+            if create_pdf(template.render({'contract': contract, 'content': content}), dest=pdf).err:
+                messages.error(request, f"Erro ao gerar o PDF do contrato #{contract.id}.")
+                return redirect('comercial:contract_readjustment_list')
+            archive.writestr(f'contrato_{contract.id}.pdf', pdf.getvalue())
+
+    response = HttpResponse(buffer.getvalue(), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="contratos_reajuste_{readjustment.id}.zip"'
+    return response
+
 @login_required
 def contract_readjustment_undo(request, pk):
     readjustment = get_object_or_404(ContractReadjustment, pk=pk)
@@ -1183,29 +1114,8 @@ def contract_readjustment_undo(request, pk):
         return redirect('comercial:contract_readjustment_list')
         
     try:
-        with transaction.atomic():
-            for log in readjustment.logs.all():
-                contract = log.contract
-                
-                # Restore items from snapshot
-                for item_snap in log.items_snapshot:
-                    item_id = item_snap['id']
-                    old_unit_price = Decimal(item_snap['unit_price'])
-                    
-                    ContractItem.objects.filter(id=item_id).update(unit_price=old_unit_price)
-                    # total_price is updated in save() but filter().update() doesn't call save()
-                    # We need to call save() or update total_price manually
-                    item = ContractItem.objects.get(id=item_id)
-                    item.save() # This updates total_price
-                
-                # Restore contract total
-                contract.value = log.old_value
-                contract.save()
-            
-            readjustment.status = 'CANCELLED'
-            readjustment.save()
-            
-            messages.success(request, "Reajuste desfeito com sucesso!")
+        undo_readjustment(readjustment)
+        messages.success(request, "Reajuste desfeito com sucesso!")
     except Exception as e:
         messages.error(request, f"Erro ao desfazer reajuste: {str(e)}")
         
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Person, Service, CompanySettings
+from .models import Person, Service, CompanySettings, RequestProfile
 
 @admin.register(Person)
 class PersonAdmin(admin.ModelAdmin):
@@ -32,3 +32,9 @@ class ServiceAdmin(admin.ModelAdmin):
 @admin.register(CompanySettings)
 class CompanySettingsAdmin(admin.ModelAdmin):
     list_display = ('name', 'cnpj')
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'view_name', 'is_htmx', 'query_count', 'duplicate_count', 'db_time_ms', 'duration_ms')
+    list_filter = ('is_htmx',)
+    search_fields = ('view_name', 'path')
@@ -0,0 +1,26 @@
+"""
+Context processors do core.
+"""
+from functools import partial
+
+from django.utils.functional import SimpleLazyObject
+
+from .services.permissions import get_snapshot, render_menu
+
+
+def _sidebar_menu(request):
+    return render_menu(get_snapshot(request.user))
+
+
+def navigation(request):
+    """
+    user_access: snapshot de permissões do usuário; sidebar_menu: menu lateral
+    pré-renderizado do perfil. Ambos são resolvidos só se o template os usar
+    (parciais HTMX não pagam nada).
+    """
+    if not hasattr(request, 'user'):
+        return {}
+    return {
+        'user_access': SimpleLazyObject(lambda: get_snapshot(request.user)),
+        'sidebar_menu': partial(_sidebar_menu, request),  # chamado pelo template
+    }
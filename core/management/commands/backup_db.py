@@ -1,17 +1,29 @@
 """
-Management command to backup the database and upload to Google Cloud Storage.
-Usage:
-    python manage.py backup_db               # Backup to GCS
-    python manage.py backup_db --local-only   # Backup locally only
-"""
-import os
-import gzip
-import subprocess
-from datetime import datetime
-from io import BytesIO
+Backup do banco PostgreSQL em fluxo contínuo, local ou no Google Cloud Storage.
 
-from django.core.management.base import BaseCommand, CommandError
+O pg_dump é comprimido e gravado em blocos (memória constante, ver
+core.services.backup); ao final o backup é relido para conferir o checksum.
+Sem GCS_BUCKET_NAME (ou com --local-only) o backup vai para --destino.
+
+Uso:
+    python manage.py backup_db                    # Backup no GCS
+    python manage.py backup_db --local-only       # Backup local (backups/)
+    python manage.py backup_db --local-only --destino /mnt/backups --compressao gzip
+Restauração: python manage.py restore_db <arquivo ou gs://...>
+"""
 from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.services.backup import (
+    EXTENSIONS, BackupError, GCSTarget, LocalTarget, Progress, backup_filename, default_compression,
+    pg_dump_command, pg_environment, stream_backup, verify,
+)
+
+
+def _mb(size):
+    return f'{size / 1024 / 1024:.1f} MB'
 
 
 class Command(BaseCommand):
@@ -23,104 +35,46 @@ class Command(BaseCommand):
             action='store_true',
             help='Only save locally, do not upload to GCS',
         )
+        parser.add_argument('--destino', default=str(settings.BASE_DIR / 'backups'),
+                            help='Diretório do backup local')
+        parser.add_argument('--compressao', choices=EXTENSIONS, default=None,
+                            help='zstd (padrão, se o pacote zstandard estiver instalado) ou gzip')
+        parser.add_argument('--manter', type=int, default=30, help='Quantidade de backups mantidos no destino')
+        parser.add_argument('--sem-verificar', action='store_true', help='Não relê o backup para conferir o checksum')
 
     def handle(self, *args, **options):
-        timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M')
-        filename = f'g7serv_{timestamp}.sql'
-        filename_gz = f'{filename}.gz'
-        
-        # Get database URL from settings
-        db_settings = settings.DATABASES['default']
-        db_name = db_settings['NAME']
-        db_user = db_settings['USER']
-        db_host = db_settings['HOST']
-        db_port = db_settings['PORT']
-        db_password = db_settings.get('PASSWORD', '')
-        
-        self.stdout.write(f'Starting backup of database: {db_name}')
-        
-        # Build pg_dump command
-        env = os.environ.copy()
-        if db_password:
-            env['PGPASSWORD'] = db_password
-        
-        cmd = [
-            'pg_dump',
-            '-h', str(db_host),
-            '-p', str(db_port),
-            '-U', str(db_user),
-            '-d', str(db_name),
-            '--no-owner',
-            '--no-privileges',
-        ]
-        
-        try:
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, env=env, timeout=300
-            )
-            if result.returncode != 0:
-                raise CommandError(f'pg_dump failed: {result.stderr}')
-        except FileNotFoundError:
-            raise CommandError(
-                'pg_dump not found. Install PostgreSQL client tools.'
-            )
-        
-        sql_data = result.stdout.encode('utf-8')
-        self.stdout.write(f'Database dump size: {len(sql_data) / 1024 / 1024:.1f} MB')
-        
-        # Compress with gzip
-        compressed = BytesIO()
-        with gzip.GzipFile(fileobj=compressed, mode='wb') as gz:
-            gz.write(sql_data)
-        compressed_data = compressed.getvalue()
-        self.stdout.write(f'Compressed size: {len(compressed_data) / 1024 / 1024:.1f} MB')
-        
-        # Save locally
-        backup_dir = settings.BASE_DIR / 'backups'
-        backup_dir.mkdir(exist_ok=True)
-        local_path = backup_dir / filename_gz
-        with open(local_path, 'wb') as f:
-            f.write(compressed_data)
-        self.stdout.write(self.style.SUCCESS(f'Local backup saved: {local_path}'))
-        
-        if options['local_only']:
-            return
-        
-        # Upload to GCS
+        if connection.vendor != 'postgresql':
+            raise CommandError('backup_db requer um banco PostgreSQL.')
+
+        compression = options['compressao'] or default_compression()
+        filename = backup_filename(compression, timezone.localtime())
         bucket_name = getattr(settings, 'GS_BUCKET_NAME', None)
-        if not bucket_name:
-            self.stdout.write(self.style.WARNING(
-                'GCS_BUCKET_NAME not set. Skipping cloud upload.'
-            ))
-            return
-        
+        if options['local_only'] or not bucket_name:
+            if not options['local_only']:
+                self.stdout.write(self.style.WARNING('GCS_BUCKET_NAME not set. Saving locally.'))
+            target = LocalTarget(f"{options['destino']}/{filename}")
+        else:
+            target = GCSTarget(bucket_name, filename, getattr(settings, 'GS_CREDENTIALS', None))
+
+        db = settings.DATABASES['default']
+        self.stdout.write(f"Starting backup of database: {db['NAME']} -> {target} ({compression})")
         try:
-            from google.cloud import storage as gcs_storage
-            
-            gcs_creds = getattr(settings, 'GS_CREDENTIALS', None)
-            if gcs_creds:
-                client = gcs_storage.Client(credentials=gcs_creds)
-            else:
-                client = gcs_storage.Client()
-            
-            bucket = client.bucket(bucket_name)
-            blob_name = f'backups/db/{filename_gz}'
-            blob = bucket.blob(blob_name)
-            blob.upload_from_string(compressed_data, content_type='application/gzip')
-            
+            result = stream_backup(pg_dump_command(db), target, compression, env=pg_environment(db),
+                                   progress=Progress(self._report('Dump')))
             self.stdout.write(self.style.SUCCESS(
-                f'Uploaded to GCS: gs://{bucket_name}/{blob_name}'
+                f'Backup salvo: {target} (dump {_mb(result.dump_size)}, comprimido {_mb(result.compressed_size)}, '
+                f'{result.seconds:.1f}s, sha256 {result.sha256[:16]})'
             ))
-            
-            # Clean up old backups (keep last 30)
-            blobs = list(bucket.list_blobs(prefix='backups/db/'))
-            if len(blobs) > 30:
-                blobs.sort(key=lambda b: b.time_created)
-                for old_blob in blobs[:-30]:
-                    old_blob.delete()
-                    self.stdout.write(f'Deleted old backup: {old_blob.name}')
-            
-        except Exception as e:
-            raise CommandError(f'GCS upload failed: {e}')
-        
+            if not options['sem_verificar']:
+                verify(target, compression, progress=Progress(self._report('Verificação')))
+                self.stdout.write(self.style.SUCCESS('Checksum conferido'))
+        except BackupError as exc:
+            raise CommandError(str(exc))
+
+        for name in target.prune(options['manter']):
+            self.stdout.write(f'Deleted old backup: {name}')
+
         self.stdout.write(self.style.SUCCESS('Backup completed successfully!'))
+
+    def _report(self, label):
+        return lambda size, seconds: self.stdout.write(f'{label}: {_mb(size)} em {seconds:.0f}s')
@@ -0,0 +1,98 @@
+"""
+Teste de carga das conexões com o banco: compara a latência (p50/p95) de
+requisições simuladas abrindo uma conexão nova a cada requisição (o antigo
+conn_max_age=0), com conexões persistentes e com o pool nativo (psycopg 3).
+
+Cada requisição simulada segue o ciclo do Django: close_old_connections no
+início e no fim (request_started/request_finished) e --consultas consultas
+no meio. Usa o banco configurado em DATABASE_URL.
+
+Uso:
+    python manage.py benchmark_db_pool
+    python manage.py benchmark_db_pool --requisicoes 500 --concorrencia 8 --consultas 5
+"""
+import copy
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+
+MODES = ('direta', 'persistente', 'pool')
+
+
+def _settings_for(mode):
+    settings_dict = copy.deepcopy(connections[DEFAULT_DB_ALIAS].settings_dict)
+    options = settings_dict.setdefault('OPTIONS', {})
+    pool = options.pop('pool', None)
+    if mode == 'direta':
+        settings_dict['CONN_MAX_AGE'] = 0
+    elif mode == 'persistente':
+        settings_dict['CONN_MAX_AGE'] = 60
+    else:
+        settings_dict['CONN_MAX_AGE'] = 0
+        options['pool'] = pool or True
+    return settings_dict
+
+
+def _simulate(alias, settings_dict, requests, queries):
+    """Requisições sequenciais de uma thread; devolve as latências em ms."""
+    db = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+    latencies = []
+    try:
+        for _ in range(requests):
+            started = time.perf_counter()
+            db.close_if_unusable_or_obsolete()  # request_started
+            with db.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+            db.close_if_unusable_or_obsolete()  # request_finished
+            latencies.append((time.perf_counter() - started) * 1000)
+    finally:
+        db.close()
+    return latencies, db
+
+
+class Command(BaseCommand):
+    help = 'Mede p50/p95 de requisições com conexão direta, persistente e pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=200)
+        parser.add_argument('--concorrencia', type=int, default=4, help='Threads simultâneas (threads do gunicorn)')
+        parser.add_argument('--consultas', type=int, default=3, help='Consultas por requisição')
+        parser.add_argument('--modos', nargs='+', choices=MODES, help='Padrão: todos os disponíveis')
+
+    def handle(self, *args, **options):
+        vendor = connections[DEFAULT_DB_ALIAS].vendor
+        pool_available = vendor == 'postgresql' and find_spec('psycopg_pool') is not None
+        modes = options['modos'] or [mode for mode in MODES if mode != 'pool' or pool_available]
+        if 'pool' in modes and not pool_available:
+            raise CommandError('O pool exige PostgreSQL com psycopg 3 e psycopg_pool instalados.')
+
+        concurrency = max(options['concorrencia'], 1)
+        per_thread = max(options['requisicoes'] // concurrency, 1)
+        self.stdout.write(
+            f'{vendor}: {per_thread * concurrency} requisições, {concurrency} threads, '
+            f'{options["consultas"]} consultas por requisição'
+        )
+        self.stdout.write(f'{"modo":<12} {"p50 ms":>9} {"p95 ms":>9} {"máx ms":>9}')
+
+        for mode in modes:
+            settings_dict = _settings_for(mode)
+            alias = f'benchmark_{mode}'  # o pool do Django é compartilhado por alias
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(
+                    lambda _: _simulate(alias, settings_dict, per_thread, options['consultas']), range(concurrency)
+                ))
+            latencies = [latency for thread_latencies, _ in results for latency in thread_latencies]
+            percentiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+            self.stdout.write(f'{mode:<12} {percentiles[49]:>9.2f} {percentiles[94]:>9.2f} {max(latencies):>9.2f}')
+
+            if mode == 'pool':
+                db = results[0][1]
+                self.stdout.write(f'  pool: {db.pool.get_stats()}')
+                db.close_pool()
@@ -0,0 +1,116 @@
+"""
+Tempo de importação e memória da subida do servidor web.
+
+Carrega a aplicação WSGI e o URLconf em um processo novo com
+`python -X importtime` e mostra o tempo total, o pico de memória (RSS), os
+módulos mais caros e quais pacotes pesados (pandas, xhtml2pdf, signxml...)
+foram carregados na subida, com o módulo do projeto que os importou. Esses
+pacotes devem ser importados dentro das funções que os usam.
+
+Uso:
+    python manage.py importtime
+    python manage.py importtime --limite 30 --pacotes pandas lxml
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+HEAVY_PACKAGES = (
+    'pandas', 'numpy', 'xhtml2pdf', 'reportlab', 'pyhanko', 'signxml', 'lxml',
+    'cryptography', 'zeep', 'openpyxl', 'google',
+)
+
+BOOT_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    'seconds': time.perf_counter() - started,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+
+def parse_importtime(output):
+    """Linhas do -X importtime como (módulo, profundidade, próprio µs, acumulado µs), na ordem impressa."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|', 2)
+        name = name[1:]  # espaço após o separador
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        rows.append((name.strip(), depth, int(own), int(cumulative)))
+    return rows
+
+
+def importers(rows, index):
+    """Módulos que importaram rows[index], do mais próximo ao mais externo (o pai vem depois dos filhos)."""
+    depth = rows[index][1]
+    for name, row_depth, _, _ in rows[index + 1:]:
+        if row_depth < depth:
+            yield name
+            depth = row_depth
+            if depth == 0:
+                return
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de importação e a memória da subida do servidor web (WSGI + URLconf)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=15, help='Quantidade de módulos mais caros listados')
+        parser.add_argument('--pacotes', nargs='+', default=list(HEAVY_PACKAGES),
+                            help='Pacotes pesados que não deveriam ser carregados na subida')
+
+    def handle(self, *args, **options):
+        base_dir = Path(settings.BASE_DIR)
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'erp.settings')}
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+            cwd=base_dir, env=env, capture_output=True, text=True,
+        )
+        if process.returncode != 0:
+            raise CommandError(f'Falha ao carregar a aplicação:\n{process.stderr[-2000:]}')
+
+        summary = json.loads(process.stdout.strip().splitlines()[-1])
+        rows = parse_importtime(process.stderr)
+        project = {path.name for path in base_dir.iterdir() if (path / '__init__.py').exists()}
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Subida: {summary['seconds']:.2f}s, pico de memória {summary['max_rss_kb'] / 1024:.0f} MB, "
+            f"{len(rows)} módulos"
+        ))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nMódulos mais caros (acumulado)'))
+        top_level = [row for row in rows if row[1] == 0]
+        for name, _, _, cumulative in sorted(top_level, key=lambda row: row[3], reverse=True)[:options['limite']]:
+            self.stdout.write(f'  {cumulative / 1000:8.1f} ms  {name}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nPacotes pesados carregados na subida'))
+        heaviest = {}
+        for index, (name, _, _, cumulative) in enumerate(rows):
+            package = name.split('.')[0]
+            if package in options['pacotes'] and cumulative > heaviest.get(package, (None, -1))[1]:
+                heaviest[package] = (index, cumulative)
+        # O submódulo mais caro do pacote (ex.: xhtml2pdf.pisa) é o que foi importado pelo projeto
+        for package, (index, cumulative) in sorted(heaviest.items(), key=lambda item: item[1][1], reverse=True):
+            chain = list(importers(rows, index))
+            source = next((module for module in chain if module.split('.')[0] in project), None)
+            if source:
+                origin = f'importado por {source}'
+            elif chain:
+                origin = f'importado por {chain[-1]} (dependência externa)'
+            else:
+                origin = 'importado no nível superior (importador não identificado pelo -X importtime)'
+            self.stdout.write(self.style.WARNING(f'  {package:<14} {cumulative / 1000:8.1f} ms  {origin}'))
+        if not heaviest:
+            self.stdout.write(self.style.SUCCESS('  Nenhum'))
@@ -7,7 +7,7 @@ from operacional.models import ServiceOrder, ServiceOrderItem
 from comercial.models import Budget, Contract
 from financeiro.models import AccountReceivable, AccountPayable, Transaction
 from faturamento.models import Invoice, NotaEntrada
-from estoque.models import StockMovement, Product
+from estoque.models import StockMovement, StockBalance, Product
 from integracao_cora.models import BoletoCora
 from nfse_nacional.models import NFSe
 
@@ -64,6 +64,7 @@ class Command(BaseCommand):
 
                 self.stdout.write("Apagando Estoque e Zerando Produtos...")
                 StockMovement.objects.all().delete()
+                StockBalance.objects.all().delete()
                 
                 # Reset Product Stock
                 products = Product.objects.all()
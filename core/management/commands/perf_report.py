@@ -0,0 +1,91 @@
+"""
+Resumo dos perfis de requisição (core.RequestProfile): endpoints com mais
+consultas, mais tempo no banco ou mais consultas repetidas, com as consultas
+repetidas e os pontos do código mais frequentes dos piores. Parciais HTMX
+aparecem separados da página inteira.
+
+Uso:
+    python manage.py perf_report
+    python manage.py perf_report --horas 4 --ordenar banco --limite 10
+    python manage.py perf_report --limpar
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max
+from django.utils import timezone
+
+from core.models import RequestProfile
+
+ORDERING = {
+    'consultas': '-avg_queries',
+    'banco': '-avg_db_time',
+    'tempo': '-avg_duration',
+    'repetidas': '-avg_duplicates',
+}
+DETAILED = 5
+SAMPLE = 200
+
+
+class Command(BaseCommand):
+    help = 'Resume os endpoints mais lentos registrados pelo QueryProfilingMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=int, default=24, help='Janela de tempo analisada')
+        parser.add_argument('--ordenar', choices=ORDERING, default='consultas')
+        parser.add_argument('--limite', type=int, default=15)
+        parser.add_argument('--limpar', action='store_true', help='Apaga todos os perfis gravados')
+
+    def handle(self, *args, **options):
+        if options['limpar']:
+            deleted, _ = RequestProfile.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'{deleted} perfis apagados.'))
+            return
+
+        profiles = RequestProfile.objects.filter(created_at__gte=timezone.now() - timedelta(hours=options['horas']))
+        endpoints = list(
+            profiles.values('view_name', 'is_htmx')
+            .annotate(
+                requests=Count('id'),
+                avg_queries=Avg('query_count'),
+                max_queries=Max('query_count'),
+                avg_db_time=Avg('db_time_ms'),
+                avg_duration=Avg('duration_ms'),
+                avg_duplicates=Avg('duplicate_count'),
+            )
+            .order_by(ORDERING[options['ordenar']])[:options['limite']]
+        )
+        if not endpoints:
+            self.stdout.write('Nenhum perfil registrado no período (ative PERF_PROFILING ou use o cabeçalho X-Profile-Queries).')
+            return
+
+        self.stdout.write(
+            f'{"endpoint":<50} {"req":>5} {"consultas":>9} {"máx":>5} {"repetidas":>9} {"banco ms":>9} {"total ms":>9}'
+        )
+        for row in endpoints:
+            self.stdout.write(
+                f'{self._label(row):<50} {row["requests"]:>5} {row["avg_queries"]:>9.1f} {row["max_queries"]:>5} '
+                f'{row["avg_duplicates"]:>9.1f} {row["avg_db_time"]:>9.1f} {row["avg_duration"]:>9.1f}'
+            )
+
+        for row in endpoints[:DETAILED]:
+            self._details(profiles.filter(view_name=row['view_name'], is_htmx=row['is_htmx'])[:SAMPLE], row)
+
+    def _label(self, row):
+        label = row['view_name'] + (' [htmx]' if row['is_htmx'] else '')
+        return label if len(label) <= 50 else '…' + label[-49:]
+
+    def _details(self, profiles, row):
+        duplicates, sites = Counter(), Counter()
+        for duplicate_list, site_list in profiles.values_list('duplicates', 'call_sites'):
+            for item in duplicate_list:
+                duplicates[item['sql']] += item['count']
+            for item in site_list:
+                sites[item['site']] += item['count']
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{self._label(row)}'))
+        for sql, count in duplicates.most_common(3):
+            self.stdout.write(f'  {count:>6}x  {sql[:150]}')
+        for site, count in sites.most_common(3):
+            self.stdout.write(f'  {count:>6}   {site}')
@@ -0,0 +1,167 @@
+"""
+Fase de release do deploy: migrate, collectstatic e seeds, fora da subida do
+servidor web.
+
+Cada etapa calcula uma impressão digital do que aplicaria e é pulada quando
+ela não mudou desde a última execução bem-sucedida:
+    migrate  arquivos de migração de todos os apps (gravada em core.ReleaseStep)
+    static   arquivos encontrados pelos finders do staticfiles (gravada em
+             STATIC_ROOT, junto com o manifest: é o que está na imagem)
+    seed     código dos comandos de seed (gravada em core.ReleaseStep)
+Em PostgreSQL as etapas de banco rodam sob um advisory lock, para que duas
+réplicas subindo juntas não migrem ao mesmo tempo.
+
+Uso:
+    python manage.py release
+    python manage.py release --etapas static    # no build da imagem, sem banco
+    python manage.py release --forcar
+"""
+import hashlib
+import io
+import time
+from contextlib import contextmanager, nullcontext
+from importlib.util import find_spec
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command, get_commands
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+STEPS = ('migrate', 'static', 'seed')
+DB_STEPS = ('migrate', 'seed')
+SEED_COMMANDS = ('seed_importer',)
+STATIC_IGNORE_PATTERNS = ['CVS', '.*', '*~']  # os mesmos do collectstatic
+STATIC_FINGERPRINT_FILE = '.release-fingerprint'
+ADVISORY_LOCK_ID = 7_047_001
+
+
+def _hash_files(paths):
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(path.name.encode())
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def migrations_fingerprint():
+    digest = hashlib.sha256()
+    for app_config in sorted(apps.get_app_configs(), key=lambda config: config.label):
+        migrations_dir = Path(app_config.path) / 'migrations'
+        if migrations_dir.is_dir():
+            digest.update(app_config.label.encode())
+            digest.update(_hash_files(migrations_dir.glob('*.py')).encode())
+    return digest.hexdigest()
+
+
+def static_fingerprint():
+    digest = hashlib.sha256(settings.STORAGES['staticfiles']['BACKEND'].encode())
+    seen = set()
+    for finder in finders.get_finders():
+        for path, storage in finder.list(STATIC_IGNORE_PATTERNS):
+            prefix = getattr(storage, 'prefix', None) or ''
+            name = f'{prefix}/{path}' if prefix else path
+            if name in seen:  # como no collectstatic, vale o primeiro encontrado
+                continue
+            seen.add(name)
+            with storage.open(path) as source:
+                digest.update(name.encode())
+                digest.update(hashlib.sha256(source.read()).digest())
+    return digest.hexdigest()
+
+
+def seed_fingerprint():
+    commands = get_commands()
+    paths = [Path(find_spec(f'{commands[name]}.management.commands.{name}').origin) for name in SEED_COMMANDS]
+    return _hash_files(paths)
+
+
+@contextmanager
+def _advisory_lock():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s)', [ADVISORY_LOCK_ID])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [ADVISORY_LOCK_ID])
+
+
+class Command(BaseCommand):
+    help = 'Executa migrate, collectstatic e seeds apenas quando algo mudou (fase de release do deploy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--etapas', nargs='+', choices=STEPS, default=list(STEPS))
+        parser.add_argument('--forcar', action='store_true', help='Executa as etapas mesmo sem alterações')
+
+    def handle(self, *args, **options):
+        self.force = options['forcar']
+        self.verbosity = options['verbosity']
+        steps = [step for step in STEPS if step in options['etapas']]
+        uses_db = any(step in DB_STEPS for step in steps)
+        lock = _advisory_lock() if uses_db and connection.vendor == 'postgresql' else nullcontext()
+
+        started = time.perf_counter()
+        with lock:
+            for step in steps:
+                getattr(self, f'_step_{step}')()
+        self.stdout.write(self.style.SUCCESS(f'Release concluído em {time.perf_counter() - started:.2f}s'))
+
+    def _run(self, step, fingerprint, stored, action):
+        """Executa action se a impressão digital mudou; devolve a duração ou None se pulou."""
+        if not self.force and fingerprint == stored:
+            self.stdout.write(f'{step}: sem alterações ({fingerprint[:12]}), pulado')
+            return None
+        started = time.perf_counter()
+        action()
+        duration = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'{step}: executado em {duration:.2f}s ({fingerprint[:12]})'))
+        return duration
+
+    def _stored(self, step):
+        from core.models import ReleaseStep
+        try:
+            return ReleaseStep.objects.filter(name=step).values_list('fingerprint', flat=True).first()
+        except DatabaseError:  # banco novo: a tabela ainda não existe
+            return None
+
+    def _record(self, step, fingerprint, duration):
+        from core.models import ReleaseStep
+        ReleaseStep.objects.update_or_create(
+            name=step, defaults={'fingerprint': fingerprint, 'duration_ms': round(duration * 1000, 1)}
+        )
+
+    def _step_migrate(self):
+        fingerprint = migrations_fingerprint()
+        duration = self._run('migrate', fingerprint, self._stored('migrate'),
+                             lambda: call_command('migrate', interactive=False, verbosity=max(self.verbosity - 1, 0)))
+        if duration is not None:
+            self._record('migrate', fingerprint, duration)
+
+    def _step_seed(self):
+        fingerprint = seed_fingerprint()
+
+        def seed():
+            for name in SEED_COMMANDS:
+                call_command(name, stdout=self.stdout if self.verbosity > 1 else io.StringIO())
+
+        duration = self._run('seed', fingerprint, self._stored('seed'), seed)
+        if duration is not None:
+            self._record('seed', fingerprint, duration)
+
+    def _step_static(self):
+        root = Path(settings.STATIC_ROOT)
+        marker = root / STATIC_FINGERPRINT_FILE
+        manifest = getattr(staticfiles_storage, 'manifest_name', None)
+        stored = marker.read_text().strip() if marker.exists() else None
+        if manifest and not (root / manifest).exists():
+            stored = None  # STATIC_ROOT incompleto: coleta de novo
+
+        fingerprint = static_fingerprint()
+        duration = self._run('static', fingerprint, stored,
+                             lambda: call_command('collectstatic', interactive=False, verbosity=0))
+        if duration is not None:
+            marker.write_text(fingerprint)
@@ -0,0 +1,68 @@
+"""
+Restaura um backup gerado por backup_db, em fluxo contínuo até o pg_restore.
+
+Por padrão o backup é relido e conferido (checksum e descompressão) antes
+de tocar no banco; o pg_restore roda com --clean em uma única transação.
+
+Uso:
+    python manage.py restore_db backups/g7serv_2025-01-31_03-00.dump.zst
+    python manage.py restore_db gs://bucket/backups/db/g7serv_2025-01-31_03-00.dump.zst --noinput
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.services.backup import (
+    BackupError, GCSTarget, LocalTarget, Progress, compression_for, pg_environment, pg_restore_command,
+    stream_restore, verify,
+)
+
+
+def _mb(size):
+    return f'{size / 1024 / 1024:.1f} MB'
+
+
+class Command(BaseCommand):
+    help = 'Restaura no banco atual um backup do backup_db (arquivo local ou gs://bucket/objeto)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fonte', help='Caminho do backup local ou gs://bucket/objeto')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive')
+        parser.add_argument('--sem-verificar', action='store_true',
+                            help='Restaura sem conferir o backup antes (o checksum ainda é conferido ao final)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('restore_db requer um banco PostgreSQL.')
+
+        source = options['fonte']
+        if source.startswith('gs://'):
+            bucket_name, _, name = source[len('gs://'):].partition('/')
+            target = GCSTarget(bucket_name, name, getattr(settings, 'GS_CREDENTIALS', None))
+        else:
+            target = LocalTarget(source)
+
+        db = settings.DATABASES['default']
+        if options['interactive']:
+            answer = input(
+                f"O banco '{db['NAME']}' será substituído pelo backup {target}.\n"
+                "Digite 'sim' para continuar: "
+            )
+            if answer.strip().lower() != 'sim':
+                raise CommandError('Restauração cancelada.')
+
+        try:
+            compression = compression_for(target.name)
+            if not options['sem_verificar']:
+                dump_size = verify(target, compression, progress=Progress(self._report('Verificação')))
+                self.stdout.write(self.style.SUCCESS(f'Backup conferido ({_mb(dump_size)} de dump)'))
+            connection.close()  # o pg_restore usa a própria conexão
+            size = stream_restore(pg_restore_command(db), target, compression, env=pg_environment(db),
+                                  progress=Progress(self._report('Restauração')))
+        except BackupError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f'Banco restaurado a partir de {target} ({_mb(size)} lidos)'))
+
+    def _report(self, label):
+        return lambda size, seconds: self.stdout.write(f'{label}: {_mb(size)} em {seconds:.0f}s')
@@ -0,0 +1,39 @@
+"""
+Middlewares do core.
+"""
+import time
+
+from django.conf import settings
+
+from .services.query_profiler import QueryProfiler
+
+PROFILE_HEADER = 'X-Profile-Queries'
+
+
+class QueryProfilingMiddleware:
+    """
+    Perfila as consultas da requisição quando PERF_PROFILING está ligado ou,
+    para usuários staff, quando a requisição traz o cabeçalho X-Profile-Queries.
+    Desligado, o custo é uma verificação de configuração e de cabeçalho.
+    Deve ficar depois de AuthenticationMiddleware e HtmxMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.always = settings.PERF_PROFILING
+
+    def __call__(self, request):
+        requested = PROFILE_HEADER in request.headers and request.user.is_staff
+        if not (self.always or requested):
+            return self.get_response(request)
+
+        profiler = QueryProfiler()
+        started = time.perf_counter()
+        with profiler.capture():
+            response = self.get_response(request)
+        profiler.save(request, response, time.perf_counter() - started)
+
+        if requested:
+            response['X-Query-Count'] = profiler.count
+            response['X-DB-Time-Ms'] = f"{profiler.time * 1000:.1f}"
+        return response
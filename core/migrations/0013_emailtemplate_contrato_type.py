@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-19 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_companysettings_address_companysettings_email_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailtemplate',
+            name='template_type',
+            field=models.CharField(choices=[('BOLETO_NF', 'Boleto + NF'), ('BOLETO', 'Apenas Boleto'), ('FATURA', 'Apenas Fatura'), ('COBRANCA', 'Cobrança'), ('ORCAMENTO', 'Orçamento'), ('CONTRATO', 'Contrato')], default='BOLETO_NF', max_length=20, verbose_name='Tipo de Template'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+import logging
+
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def create_name_trgm_index(apps, schema_editor):
+    """
+    Índice trigram para buscas icontains por nome (Postgres com pg_trgm).
+    O ORM gera UPPER("core_person"."name"::text) LIKE UPPER(%s), por isso a expressão indexada.
+    Em bancos sem a extensão (ou sem permissão para criá-la) a busca continua funcionando sem o índice.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute(
+                'CREATE INDEX IF NOT EXISTS core_person_name_trgm_idx '
+                'ON core_person USING gin (UPPER(name::text) gin_trgm_ops)'
+            )
+    except DatabaseError as exc:
+        logger.warning('Índice core_person_name_trgm_idx não criado (pg_trgm indisponível): %s', exc)
+
+
+def drop_name_trgm_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS core_person_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_emailtemplate_contrato_type'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_name_trgm_index, drop_name_trgm_index),
+    ]
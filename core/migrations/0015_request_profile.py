@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_person_name_trgm_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('view_name', models.CharField(max_length=200, verbose_name='View')),
+                ('is_htmx', models.BooleanField(default=False, verbose_name='Parcial HTMX')),
+                ('htmx_target', models.CharField(blank=True, max_length=200)),
+                ('status_code', models.PositiveSmallIntegerField(null=True)),
+                ('duration_ms', models.FloatField(verbose_name='Tempo total (ms)')),
+                ('query_count', models.PositiveIntegerField(verbose_name='Consultas')),
+                ('db_time_ms', models.FloatField(verbose_name='Tempo no banco (ms)')),
+                ('duplicate_count', models.PositiveIntegerField(default=0, verbose_name='Consultas repetidas')),
+                ('duplicates', models.JSONField(default=list, help_text='Consultas repetidas: [{sql, count, time_ms}]')),
+                ('call_sites', models.JSONField(default=list, help_text='Pontos do código que mais consultam: [{site, count, time_ms}]')),
+            ],
+            options={
+                'verbose_name': 'Perfil de Requisição',
+                'verbose_name_plural': 'Perfis de Requisição',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
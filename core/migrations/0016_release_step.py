@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_request_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReleaseStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Etapa')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Impressão digital')),
+                ('duration_ms', models.FloatField(default=0, verbose_name='Duração (ms)')),
+                ('completed_at', models.DateTimeField(auto_now=True, verbose_name='Concluída em')),
+            ],
+            options={
+                'verbose_name': 'Etapa de Release',
+                'verbose_name_plural': 'Etapas de Release',
+            },
+        ),
+    ]
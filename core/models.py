@@ -139,6 +139,7 @@ class EmailTemplate(BaseModel):
         ('FATURA', 'Apenas Fatura'),
         ('COBRANCA', 'Cobrança'),
         ('ORCAMENTO', 'Orçamento'),
+        ('CONTRATO', 'Contrato'),
     ]
     name = models.CharField(max_length=100, verbose_name="Nome do Template")
     subject = models.CharField(max_length=255, verbose_name="Assunto")
@@ -151,3 +152,41 @@ class EmailTemplate(BaseModel):
     class Meta:
         verbose_name = "Template de E-mail"
         verbose_name_plural = "Templates de E-mail"
+
+class RequestProfile(models.Model):
+    """Perfil de consultas de uma requisição (core.middleware.QueryProfilingMiddleware), em buffer circular."""
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, verbose_name="View")
+    is_htmx = models.BooleanField(default=False, verbose_name="Parcial HTMX")
+    htmx_target = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    duration_ms = models.FloatField(verbose_name="Tempo total (ms)")
+    query_count = models.PositiveIntegerField(verbose_name="Consultas")
+    db_time_ms = models.FloatField(verbose_name="Tempo no banco (ms)")
+    duplicate_count = models.PositiveIntegerField(default=0, verbose_name="Consultas repetidas")
+    duplicates = models.JSONField(default=list, help_text="Consultas repetidas: [{sql, count, time_ms}]")
+    call_sites = models.JSONField(default=list, help_text="Pontos do código que mais consultam: [{site, count, time_ms}]")
+
+    def __str__(self):
+        return f"{self.view_name} ({self.query_count} consultas)"
+
+    class Meta:
+        verbose_name = "Perfil de Requisição"
+        verbose_name_plural = "Perfis de Requisição"
+        ordering = ['-id']
+
+class ReleaseStep(models.Model):
+    """Última execução de cada etapa do `manage.py release`, com a impressão digital do que foi aplicado."""
+    name = models.CharField(max_length=50, unique=True, verbose_name="Etapa")
+    fingerprint = models.CharField(max_length=64, verbose_name="Impressão digital")
+    duration_ms = models.FloatField(default=0, verbose_name="Duração (ms)")
+    completed_at = models.DateTimeField(auto_now=True, verbose_name="Concluída em")
+
+    def __str__(self):
+        return f"{self.name} ({self.fingerprint[:12]})"
+
+    class Meta:
+        verbose_name = "Etapa de Release"
+        verbose_name_plural = "Etapas de Release"
@@ -0,0 +1,358 @@
+"""
+Backup e restauração do banco em fluxo contínuo (memória constante).
+
+O pg_dump (formato custom, sem compressão própria) é lido em blocos de
+CHUNK_SIZE, comprimido em fluxo (zstd quando o pacote zstandard está
+instalado, senão gzip) e escrito direto no destino: um arquivo local ou um
+objeto no Google Cloud Storage, enviado em partes por upload resumível.
+O SHA-256 do arquivo comprimido é calculado durante a escrita e gravado ao
+lado do backup (arquivo .sha256 ou metadado do objeto), para a verificação
+e para a restauração, que faz o caminho inverso até o stdin do pg_restore.
+"""
+import gzip
+import hashlib
+import os
+import subprocess
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from importlib.util import find_spec
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+GCS_CHUNK_SIZE = 8 * CHUNK_SIZE  # múltiplo de 256 KB, exigido pelo upload resumível
+GCS_PREFIX = 'backups/db/'
+FILE_PREFIX = 'g7serv_'
+EXTENSIONS = {'zstd': '.dump.zst', 'gzip': '.dump.gz'}
+ZSTD_LEVEL = 6
+GZIP_LEVEL = 6
+PROGRESS_INTERVAL = 5  # segundos
+
+
+class BackupError(Exception):
+    pass
+
+
+def default_compression():
+    return 'zstd' if find_spec('zstandard') else 'gzip'
+
+
+def compression_for(name):
+    """Compressão a partir do nome do arquivo do backup."""
+    for compression, extension in EXTENSIONS.items():
+        if name.endswith(extension):
+            return compression
+    raise BackupError(f'Extensão de backup desconhecida: {name}')
+
+
+def backup_filename(compression, now):
+    return f"{FILE_PREFIX}{now:%Y-%m-%d_%H-%M}{EXTENSIONS[compression]}"
+
+
+def _compressor(compression, raw):
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1, write_checksum=True).stream_writer(
+            raw, closefd=False)
+    return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL)
+
+
+def _decompressor(compression, raw):
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False, read_across_frames=True)
+    return gzip.GzipFile(fileobj=raw, mode='rb')
+
+
+def _codec_errors(compression):
+    """Exceções de descompressão de um backup corrompido."""
+    if compression == 'zstd':
+        import zstandard
+        return (OSError, EOFError, zstandard.ZstdError)
+    return (OSError, EOFError, zlib.error)
+
+
+class _HashingWriter:
+    """Repassa a escrita ao arquivo de destino contando bytes e calculando o SHA-256."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+
+class _HashingReader:
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readable(self):
+        return True
+
+
+class LocalTarget:
+    """Backup em arquivo local; escrito em .part e renomeado só ao final."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.name = self.path.name
+        self.checksum_path = self.path.with_name(self.path.name + '.sha256')
+
+    def __str__(self):
+        return str(self.path)
+
+    @contextmanager
+    def writer(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_name(self.path.name + '.part')
+        try:
+            with open(partial, 'wb') as raw:
+                yield raw
+            partial.replace(self.path)
+        finally:
+            partial.unlink(missing_ok=True)
+
+    def reader(self):
+        if not self.path.exists():
+            raise BackupError(f'Backup não encontrado: {self.path}')
+        return open(self.path, 'rb')
+
+    def save_checksum(self, sha256):
+        self.checksum_path.write_text(f'{sha256}  {self.name}\n')
+
+    def stored_checksum(self):
+        if not self.checksum_path.exists():
+            return None
+        return self.checksum_path.read_text().split()[0]
+
+    def prune(self, keep):
+        """Remove os backups mais antigos do diretório, mantendo os `keep` mais recentes."""
+        backups = sorted(
+            path for path in self.path.parent.glob(f'{FILE_PREFIX}*')
+            if any(path.name.endswith(extension) for extension in EXTENSIONS.values())
+        )
+        removed = []
+        for path in backups[:-keep] if keep else []:
+            path.unlink()
+            path.with_name(path.name + '.sha256').unlink(missing_ok=True)
+            removed.append(path.name)
+        return removed
+
+
+class GCSTarget:
+    """Backup em objeto do Google Cloud Storage, enviado em partes (upload resumível)."""
+
+    def __init__(self, bucket_name, name, credentials=None):
+        from google.cloud import storage as gcs_storage
+
+        client = gcs_storage.Client(credentials=credentials) if credentials else gcs_storage.Client()
+        self.bucket = client.bucket(bucket_name)
+        self.name = name
+        self.blob = self.bucket.blob(name if name.startswith(GCS_PREFIX) else f'{GCS_PREFIX}{name}')
+
+    def __str__(self):
+        return f'gs://{self.bucket.name}/{self.blob.name}'
+
+    @contextmanager
+    def writer(self):
+        raw = self.blob.open('wb', chunk_size=GCS_CHUNK_SIZE, content_type='application/octet-stream',
+                             ignore_flush=True)
+        yield raw
+        # Só finaliza o upload se o dump terminou; em caso de erro a sessão resumível é abandonada
+        raw.close()
+
+    def reader(self):
+        if not self.blob.exists():
+            raise BackupError(f'Backup não encontrado: {self}')
+        return self.blob.open('rb', chunk_size=GCS_CHUNK_SIZE)
+
+    def save_checksum(self, sha256):
+        self.blob.metadata = {**(self.blob.metadata or {}), 'sha256': sha256}
+        self.blob.patch()
+
+    def stored_checksum(self):
+        self.blob.reload()
+        return (self.blob.metadata or {}).get('sha256')
+
+    def prune(self, keep):
+        blobs = sorted(self.bucket.list_blobs(prefix=GCS_PREFIX), key=lambda blob: blob.time_created)
+        removed = []
+        for blob in blobs[:-keep] if keep else []:
+            blob.delete()
+            removed.append(blob.name)
+        return removed
+
+
+class Progress:
+    """Chama report(bytes, segundos) no máximo a cada PROGRESS_INTERVAL segundos."""
+
+    def __init__(self, report=None, interval=PROGRESS_INTERVAL):
+        self.report = report
+        self.interval = interval
+        self.started = self.last = time.monotonic()
+
+    def update(self, size):
+        now = time.monotonic()
+        if self.report and now - self.last >= self.interval:
+            self.report(size, now - self.started)
+            self.last = now
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+@dataclass
+class BackupResult:
+    target: str
+    dump_size: int
+    compressed_size: int
+    sha256: str
+    seconds: float
+
+
+def _connection_args(db):
+    args = []
+    for flag, key in (('-h', 'HOST'), ('-p', 'PORT'), ('-U', 'USER')):
+        if db.get(key):
+            args += [flag, str(db[key])]
+    return args
+
+
+def pg_environment(db):
+    env = os.environ.copy()
+    if db.get('PASSWORD'):
+        env['PGPASSWORD'] = db['PASSWORD']
+    return env
+
+
+def pg_dump_command(db):
+    # -Z0: a compressão é feita no fluxo (zstd/gzip), não pelo pg_dump
+    return ['pg_dump', '--format=custom', '-Z0', '--no-owner', '--no-privileges', *_connection_args(db), db['NAME']]
+
+
+def pg_restore_command(db):
+    return [
+        'pg_restore', '--clean', '--if-exists', '--no-owner', '--no-privileges', '--single-transaction',
+        *_connection_args(db), '--dbname', db['NAME'],
+    ]
+
+
+def _stderr_tail(stderr):
+    stderr.seek(0)
+    return stderr.read()[-2000:].decode(errors='replace').strip()
+
+
+def _start(command, env, **kwargs):
+    try:
+        return subprocess.Popen(command, env=env, **kwargs)
+    except FileNotFoundError:
+        raise BackupError(f'{command[0]} não encontrado. Instale as ferramentas cliente do PostgreSQL.')
+
+
+def stream_backup(command, target, compression, env=None, progress=None):
+    """Executa o dump e grava em target, comprimido, em blocos; devolve um BackupResult."""
+    progress = progress or Progress()
+    dump_size = 0
+    with tempfile.TemporaryFile() as stderr:
+        process = _start(command, env, stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            with target.writer() as raw:
+                hashing = _HashingWriter(raw)
+                with _compressor(compression, hashing) as compressed:
+                    while chunk := process.stdout.read(CHUNK_SIZE):
+                        compressed.write(chunk)
+                        dump_size += len(chunk)
+                        progress.update(dump_size)
+                if process.wait() != 0:
+                    raise BackupError(f'{command[0]} falhou: {_stderr_tail(stderr)}')
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+    sha256 = hashing.sha256.hexdigest()
+    target.save_checksum(sha256)
+    return BackupResult(str(target), dump_size, hashing.size, sha256, progress.elapsed)
+
+
+def _checked_reader(target):
+    expected = target.stored_checksum()
+    if not expected:
+        raise BackupError(f'Checksum do backup não encontrado: {target}')
+    return expected, _HashingReader(target.reader())
+
+
+def verify(target, compression, progress=None):
+    """Relê o backup, confere o SHA-256 e descomprime tudo (sem gravar). Devolve o tamanho do dump."""
+    progress = progress or Progress()
+    expected, reader = _checked_reader(target)
+    dump_size = 0
+    try:
+        with _decompressor(compression, reader) as decompressed:
+            while chunk := decompressed.read(CHUNK_SIZE):
+                dump_size += len(chunk)
+                progress.update(reader.size)
+    except _codec_errors(compression) as exc:
+        raise BackupError(f'Backup corrompido ({exc}): {target}')
+    finally:
+        reader.raw.close()
+    if reader.sha256.hexdigest() != expected:
+        raise BackupError(f'Checksum não confere: {target}')
+    return dump_size
+
+
+def stream_restore(command, target, compression, env=None, progress=None):
+    """Descomprime o backup em blocos direto no stdin do comando de restauração."""
+    progress = progress or Progress()
+    expected, reader = _checked_reader(target)
+    corrupted = None
+    with tempfile.TemporaryFile() as stderr:
+        process = _start(command, env, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr)
+        try:
+            with _decompressor(compression, reader) as decompressed:
+                while chunk := decompressed.read(CHUNK_SIZE):
+                    process.stdin.write(chunk)
+                    progress.update(reader.size)
+        except BrokenPipeError:
+            pass  # o comando terminou antes: o erro vem do código de saída abaixo
+        except _codec_errors(compression) as exc:
+            process.kill()  # não deixa o pg_restore concluir com o dump truncado
+            corrupted = exc
+        finally:
+            reader.raw.close()
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = process.wait()
+        if corrupted is not None:
+            raise BackupError(f'Backup corrompido ({corrupted}): {target}')
+        if returncode != 0:
+            raise BackupError(f'{command[0]} falhou: {_stderr_tail(stderr)}')
+    if reader.sha256.hexdigest() != expected:
+        raise BackupError(f'Checksum não confere: {target}')
+    return reader.size
@@ -0,0 +1,32 @@
+"""
+Estatísticas das conexões com o banco.
+
+Com o pool nativo do Django (psycopg 3, OPTIONS['pool']) cada processo do
+gunicorn tem o seu pool; pool_stats devolve os números do processo que
+atendeu a chamada (identificado pelo pid). Sem pool, informa o modo de
+conexões persistentes em uso.
+"""
+import os
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def pool_stats(alias=DEFAULT_DB_ALIAS):
+    connection = connections[alias]
+    stats = {
+        'pid': os.getpid(),
+        'vendor': connection.vendor,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+    }
+    pool = getattr(connection, 'pool', None)  # só existe no backend PostgreSQL
+    if pool is None:
+        return {**stats, 'pooling': False}
+    return {
+        **stats,
+        'pooling': True,
+        'min_size': pool.min_size,
+        'max_size': pool.max_size,
+        'max_lifetime': pool.max_lifetime,
+        **pool.get_stats(),
+    }
@@ -0,0 +1,173 @@
+"""
+Motor de renderização de templates de e-mail (core.EmailTemplate).
+
+Cada EmailTemplate é compilado uma única vez por processo, com a chave
+(id, updated_at), em um objeto pronto para renderizar: as tags do usuário
+({cliente}, {valor}...) já convertidas para a sintaxe do Django e, nos tipos
+exibidos dentro do layout de fatura, as tags redundantes e as linhas de
+assinatura (o layout tem a própria) removidas. Os envios de
+fatura, orçamento e contrato compartilham o mesmo objeto compilado.
+"""
+import logging
+import threading
+
+from django.template import Context, Template
+from django.template.base import TextNode
+from django.template.defaultfilters import linebreaksbr
+
+logger = logging.getLogger(__name__)
+
+# Tags aceitas no assunto no formato {tag}
+PLACEHOLDERS = [
+    'cliente', 'valor', 'vencimento', 'fatura', 'link_boleto', 'link_nf',
+    'competence', 'orcamento', 'contrato',
+]
+
+# Tipos renderizados dentro do layout de fatura, que já exibe esses dados no resumo
+INVOICE_LAYOUT_TYPES = ['BOLETO_NF', 'BOLETO', 'FATURA', 'COBRANCA']
+INVOICE_LAYOUT_STRIPPED_TAGS = [
+    '{{cliente}}', '{{vencimento}}', '{{valor}}', '{{link_boleto}}', '{{fatura}}', '{{link_nf}}',
+]
+
+# Termos de encerramento que o layout de fatura já inclui
+REDUNDANT_SIGNATURE_TERMS = [
+    'obrigado', 'atenciosamente', 'equipe g7 serv', 'g7 serv',
+    '81 3019-5654', 'att,', 'grato',
+]
+
+
+def _is_redundant_line(line):
+    line_lower = line.lower().strip()
+    return any(term in line_lower for term in REDUNDANT_SIGNATURE_TERMS) and len(line_lower) <= 50
+
+
+def _strip_signature_lines(text):
+    return '\n'.join(line for line in text.split('\n') if not _is_redundant_line(line)).strip()
+
+
+def _finalize_body(html, strip_signature):
+    html = html.strip()
+    if strip_signature:
+        html = _strip_signature_lines(html)
+    # Converter quebras de linha em <br> se não houver tags HTML detectadas
+    lowered = html.lower()
+    if '<p' not in lowered and '<br' not in lowered:
+        html = linebreaksbr(html)
+    return html
+
+
+def _is_static(template):
+    return all(isinstance(node, TextNode) for node in template.nodelist)
+
+
+class CompiledEmailTemplate:
+    """Forma compilada de um EmailTemplate, reutilizável entre envios."""
+
+    def __init__(self, template):
+        self.key = (template.pk, template.updated_at)
+        self.name = template.name
+        self.template_type = template.template_type
+        # Orçamento e contrato vão sem layout: a assinatura do usuário é o encerramento do e-mail
+        self._strip_signature = template.template_type in INVOICE_LAYOUT_TYPES
+        self._raw_subject = template.subject
+        self._raw_body = template.body
+        self._compile_subject()
+        self._compile_body()
+
+    def _compile_subject(self):
+        subject_text = self._raw_subject
+        for placeholder in PLACEHOLDERS:
+            subject_text = subject_text.replace(f'{{{placeholder}}}', f'{{{{{placeholder}}}}}')
+        try:
+            self._subject = Template(subject_text)
+        except Exception as e:
+            logger.error(f"Erro ao compilar assunto do template '{self.name}': {e}")
+            self._subject = None
+            return
+        self._static_subject = self._subject.render(Context()) if _is_static(self._subject) else None
+
+    def _compile_body(self):
+        # Pré-processar tags do usuário {tag} para {{tag}}
+        body_content = self._raw_body.replace('{', '{{').replace('}', '}}')
+        if self._strip_signature:
+            for tag in INVOICE_LAYOUT_STRIPPED_TAGS:
+                body_content = body_content.replace(tag, '')
+
+            # Linhas sem variáveis já saem limpas da compilação; a limpeza é idempotente,
+            # então só é refeita na renderização quando há variáveis no corpo.
+            body_content = '\n'.join(
+                line for line in body_content.split('\n')
+                if '{{' in line or '{%' in line or not _is_redundant_line(line)
+            )
+        try:
+            self._body = Template(body_content)
+        except Exception as e:
+            logger.error(f"Erro ao compilar corpo do template '{self.name}': {e}")
+            self._body = None
+            self._static_body = linebreaksbr(self._raw_body)
+            return
+        self._static_body = (
+            _finalize_body(self._body.render(Context()), self._strip_signature) if _is_static(self._body) else None
+        )
+
+    def render_subject(self, context_dict):
+        if self._subject is None:
+            # Fallback manual para o assunto se o Template falhar
+            subject = self._raw_subject
+            for k, v in context_dict.items():
+                subject = subject.replace(f'{{{k}}}', str(v))
+            return subject
+        if self._static_subject is not None:
+            return self._static_subject
+        return self._subject.render(Context(context_dict))
+
+    def render_body(self, context_dict):
+        if self._static_body is not None:
+            return self._static_body
+        try:
+            return _finalize_body(self._body.render(Context(context_dict)), self._strip_signature)
+        except Exception as e:
+            logger.error(f"Erro ao renderizar corpo do template '{self.name}': {e}")
+            return linebreaksbr(self._raw_body)
+
+    def render(self, context_dict):
+        """Retorna (assunto, corpo_html) para o contexto informado."""
+        return self.render_subject(context_dict), self.render_body(context_dict)
+
+
+_compiled_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_compiled_template(template):
+    """
+    Retorna o CompiledEmailTemplate do template, compilando apenas quando o
+    template ainda não está em cache ou foi editado (updated_at mudou).
+    """
+    key = (template.pk, template.updated_at)
+    compiled = _compiled_cache.get(template.pk)
+    if compiled is None or compiled.key != key:
+        compiled = CompiledEmailTemplate(template)
+        with _cache_lock:
+            _compiled_cache[template.pk] = compiled
+    return compiled
+
+
+def invalidate_compiled_template(template_id):
+    with _cache_lock:
+        _compiled_cache.pop(template_id, None)
+
+
+def resolve_email_template(template_id=None, template_type='BOLETO_NF'):
+    """
+    Busca o EmailTemplate pelo id; sem id (ou id inexistente), usa o primeiro
+    template do tipo informado.
+    """
+    from core.models import EmailTemplate
+
+    if template_id:
+        try:
+            return EmailTemplate.objects.get(id=template_id)
+        except (EmailTemplate.DoesNotExist, ValueError):
+            pass
+    return EmailTemplate.objects.filter(template_type=template_type).first()
@@ -0,0 +1,13 @@
+"""
+Geração de PDF a partir de HTML (xhtml2pdf).
+
+O xhtml2pdf (com reportlab e pyhanko) leva cerca de meio segundo e dezenas
+de MB para importar; ele é carregado no primeiro PDF gerado pelo processo,
+e não na subida de cada worker.
+"""
+
+
+def create_pdf(src, dest, **kwargs):
+    """pisa.CreatePDF(src, dest=dest, ...); devolve o status do pisa (status.err indica falha)."""
+    from xhtml2pdf import pisa
+    return pisa.CreatePDF(src, dest=dest, **kwargs)
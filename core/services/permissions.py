@@ -0,0 +1,172 @@
+"""
+Snapshot de permissões do usuário e menu lateral pré-renderizado.
+
+get_snapshot resolve uma vez as permissões efetivas e os grupos do usuário
+e guarda o resultado no cache compartilhado, com a chave (versão, usuário).
+A versão é um contador no cache incrementado pelos sinais de core.signals
+sempre que usuários, grupos ou permissões mudam, o que invalida todos os
+snapshots e menus de uma vez. O snapshot também preenche o _perm_cache do
+usuário, de modo que user.has_perm e {{ perms }} não consultam o banco.
+
+O menu lateral (core.utils.MENU_PERMISSIONS) é renderizado uma vez por
+perfil: usuários com o mesmo conjunto de permissões do menu compartilham o
+mesmo fragmento HTML no cache.
+
+Sem cache compartilhado (REDIS_URL), o contador só é incrementado no
+processo que fez a alteração; por isso, nesse caso, snapshots e menus
+expiram em LOCAL_CACHE_TIMEOUT para os demais workers se atualizarem.
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from core.utils import MENU_PERMISSIONS
+
+VERSION_KEY = 'permissions:version'
+CACHE_TIMEOUT = 60 * 60 * 24
+LOCAL_CACHE_TIMEOUT = 60
+
+GROUP_SOCIO_DIRETOR = 'SÓCIO-DIRETOR'
+GROUP_ADMINISTRATIVO = 'Administrativo'
+
+
+def permission_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Valor inicial baseado no relógio: se o contador for descartado do cache,
+        # a nova contagem não reaproveita chaves de snapshots antigos
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _timeout():
+    return LOCAL_CACHE_TIMEOUT if isinstance(caches['default'], LocMemCache) else CACHE_TIMEOUT
+
+
+def bump_permission_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), None)
+
+
+@dataclass(frozen=True)
+class PermissionSnapshot:
+    user_id: int
+    is_active: bool
+    is_superuser: bool
+    permissions: frozenset
+    groups: frozenset
+
+    def has_perm(self, perm):
+        return self.is_active and (self.is_superuser or perm in self.permissions)
+
+    def has_any_perm(self, perms):
+        return any(self.has_perm(perm) for perm in perms)
+
+    def in_group(self, name):
+        return name in self.groups
+
+    @property
+    def is_socio_diretor(self):
+        return self.is_superuser or self.in_group(GROUP_SOCIO_DIRETOR)
+
+    @property
+    def is_administrativo(self):
+        return self.is_superuser or self.in_group(GROUP_ADMINISTRATIVO) or self.has_perm('auth.view_user')
+
+    def menu_role(self):
+        """Chave do perfil para o menu: só as permissões que o menu usa."""
+        relevant = sorted(perm for perm in _menu_perms() if self.has_perm(perm))
+        raw = f"{self.is_superuser}:{','.join(relevant)}"
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+ANONYMOUS = PermissionSnapshot(None, False, False, frozenset(), frozenset())
+
+
+def _build_snapshot(user):
+    return PermissionSnapshot(
+        user_id=user.pk,
+        is_active=user.is_active,
+        is_superuser=user.is_superuser,
+        permissions=frozenset(user.get_all_permissions()),
+        groups=frozenset(user.groups.values_list('name', flat=True)),
+    )
+
+
+def get_snapshot(user):
+    """Snapshot do usuário: memorizado no objeto (requisição) e no cache compartilhado."""
+    if not user.is_authenticated:
+        return ANONYMOUS
+    snapshot = getattr(user, '_permission_snapshot', None)
+    if snapshot is None:
+        key = f'permissions:snapshot:{permission_version()}:{user.pk}'
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = _build_snapshot(user)
+            cache.set(key, snapshot, _timeout())
+        user._permission_snapshot = snapshot
+        if not hasattr(user, '_perm_cache'):
+            # Cache usado pelo ModelBackend (e pelo EmailBackend) em has_perm
+            user._perm_cache = set(snapshot.permissions)
+    return snapshot
+
+
+def _menu_perms():
+    perms = set()
+    for section in MENU_PERMISSIONS:
+        perms.update(_as_list(section.get('perm')))
+        for item in section.get('submenus', []):
+            perms.update(_as_list(item.get('perm')))
+    return perms
+
+
+def _as_list(perm):
+    if not perm:
+        return []
+    return [perm] if isinstance(perm, str) else list(perm)
+
+
+def _visible(entry, snapshot):
+    if entry.get('superuser') and not snapshot.is_superuser:
+        return False
+    perms = _as_list(entry.get('perm'))
+    return not perms or snapshot.has_any_perm(perms)
+
+
+def build_menu(snapshot):
+    """Seções do MENU_PERMISSIONS visíveis para o snapshot, com as URLs resolvidas."""
+    if not snapshot.user_id:
+        return []
+    menu = []
+    for section in MENU_PERMISSIONS:
+        if not _visible(section, snapshot):
+            continue
+        entry = {key: section.get(key) for key in ('name', 'icon', 'id')}
+        if 'url' in section:
+            entry['url'] = reverse(section['url'])
+        else:
+            entry['submenus'] = [
+                {**item, 'url': reverse(item['url'])} if 'url' in item else item
+                for item in section['submenus'] if _visible(item, snapshot)
+            ]
+        menu.append(entry)
+    return menu
+
+
+def render_menu(snapshot):
+    """HTML do menu lateral, renderizado uma vez por perfil e versão de permissões."""
+    key = f'permissions:menu:{permission_version()}:{snapshot.menu_role() if snapshot.user_id else "anon"}'
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string('core/partials/sidebar_menu.html', {'menu': build_menu(snapshot)})
+        cache.set(key, html, _timeout())
+    return mark_safe(html)
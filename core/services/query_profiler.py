@@ -0,0 +1,143 @@
+"""
+Perfil de consultas por requisição (usado por core.middleware.QueryProfilingMiddleware).
+
+Durante a requisição, um execute_wrapper em cada conexão registra cada
+consulta: o SQL normalizado (impressão digital: listas IN colapsadas e
+literais trocados por ?), o tempo e o ponto do código que a disparou (a
+linha do template em renderização ou o primeiro frame do projeto fora das
+bibliotecas). Ao fim, grava um RequestProfile e mantém apenas os
+PERF_PROFILING_MAX_ROWS mais recentes (buffer circular).
+"""
+import logging
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+TOP_ITEMS = 10
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s')
+
+_PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+_THIS_FILE = __file__.rstrip('c')
+_TEMPLATE_BASE = os.path.join('django', 'template', 'base.py')
+
+
+def fingerprint(sql):
+    """SQL sem valores: consultas que só diferem nos parâmetros têm a mesma impressão digital."""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _PLACEHOLDER.sub('?', sql)
+
+
+def call_site(frame):
+    """'template.html:linha' do nó em renderização ou 'arquivo.py:linha (função)' do projeto."""
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if frame.f_code.co_name == 'render_annotated' and filename.endswith(_TEMPLATE_BASE):
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f"{origin.template_name}:{token.lineno}"
+        if filename.startswith(_PROJECT_ROOT) and 'site-packages' not in filename and filename != _THIS_FILE:
+            return f"{os.path.relpath(filename, _PROJECT_ROOT)}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return '?'
+
+
+class QueryProfiler:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.by_fingerprint = defaultdict(lambda: {'count': 0, 'time': 0.0, 'calls': set()})
+        self.by_site = defaultdict(lambda: {'count': 0, 'time': 0.0})
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.time += elapsed
+            entry = self.by_fingerprint[fingerprint(sql)]
+            entry['count'] += 1
+            entry['time'] += elapsed
+            entry['calls'].add(repr(params))
+            site = self.by_site[call_site(sys._getframe(1))]
+            site['count'] += 1
+            site['time'] += elapsed
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def duplicate_count(self):
+        return sum(entry['count'] - 1 for entry in self.by_fingerprint.values())
+
+    def duplicates(self):
+        repeated = [
+            {
+                'sql': sql[:500],
+                'count': entry['count'],
+                'identical': entry['count'] - len(entry['calls']),  # mesmos parâmetros
+                'time_ms': round(entry['time'] * 1000, 2),
+            }
+            for sql, entry in self.by_fingerprint.items() if entry['count'] > 1
+        ]
+        return sorted(repeated, key=lambda item: -item['count'])[:TOP_ITEMS]
+
+    def call_sites(self):
+        sites = [
+            {'site': site, 'count': entry['count'], 'time_ms': round(entry['time'] * 1000, 2)}
+            for site, entry in self.by_site.items()
+        ]
+        return sorted(sites, key=lambda item: -item['count'])[:TOP_ITEMS]
+
+    def save(self, request, response, duration):
+        """Grava o perfil (fora da captura) e descarta os mais antigos do buffer."""
+        from core.models import RequestProfile
+
+        match = getattr(request, 'resolver_match', None)
+        htmx = getattr(request, 'htmx', None)
+        profile = RequestProfile(
+            method=request.method,
+            path=request.path[:500],
+            view_name=(match.view_name if match else '<sem rota>')[:200],
+            is_htmx=bool(htmx),
+            htmx_target=((htmx.target if htmx else None) or '')[:200],
+            status_code=getattr(response, 'status_code', None),
+            duration_ms=round(duration * 1000, 2),
+            query_count=self.count,
+            db_time_ms=round(self.time * 1000, 2),
+            duplicate_count=self.duplicate_count,
+            duplicates=self.duplicates(),
+            call_sites=self.call_sites(),
+        )
+        try:
+            profile.save()
+            RequestProfile.objects.filter(id__lte=profile.id - settings.PERF_PROFILING_MAX_ROWS).delete()
+        except DatabaseError:
+            logger.exception("Falha ao gravar o perfil de %s", profile.path)
+            return None
+        logger.info(
+            "%s %s%s: %d consultas (%d repetidas), %.1f ms no banco, %.1f ms no total",
+            profile.method, profile.view_name, ' [htmx]' if profile.is_htmx else '',
+            profile.query_count, profile.duplicate_count, profile.db_time_ms, profile.duration_ms,
+        )
+        return profile
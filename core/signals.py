@@ -0,0 +1,32 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from .models import EmailTemplate
+from .services.email_templates import invalidate_compiled_template
+from .services.permissions import bump_permission_version
+
+@receiver([post_save, post_delete], sender=EmailTemplate)
+def invalidate_email_template_cache(sender, instance, **kwargs):
+    """
+    Descarta a forma compilada do template ao editar/excluir.
+    Outros processos recompilam sozinhos, pois a chave do cache inclui updated_at.
+    """
+    invalidate_compiled_template(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=Permission)
+def invalidate_permission_snapshots(sender, update_fields=None, **kwargs):
+    """Nova versão de permissões: snapshots e menus em cache deixam de ser usados."""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return  # login não altera permissões
+    bump_permission_version()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_permission_snapshots_m2m(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_permission_version()
@@ -1,3 +1,226 @@
-from django.test import TestCase
+import io
+import shutil
+import subprocess
+import sys
+import tempfile
+from importlib.util import find_spec
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import EmailTemplate, ReleaseStep, RequestProfile
+from .services.backup import BackupError, LocalTarget, stream_backup, stream_restore, verify
+from .services.email_templates import get_compiled_template, _compiled_cache
+from .services.permissions import get_snapshot, render_menu
+from .services.query_profiler import fingerprint
+
+
+class CompiledEmailTemplateTest(TestCase):
+    def setUp(self):
+        self.template = EmailTemplate.objects.create(
+            name="Boleto",
+            subject="Fatura {fatura} - {cliente}",
+            body="Olá {cliente},\nSegue a fatura de {competence}.\nAtenciosamente,\nEquipe G7 Serv",
+            template_type='BOLETO_NF',
+        )
+        self.context = {'cliente': 'ACME', 'fatura': '2025-001', 'competence': '02/2025'}
+
+    def test_render_subject_and_body(self):
+        subject, body = get_compiled_template(self.template).render(self.context)
+        self.assertEqual(subject, "Fatura 2025-001 - ACME")
+        # {cliente} é removido do corpo (o layout já exibe) e a assinatura é limpa
+        self.assertEqual(body, "Olá ,<br>Segue a fatura de 02/2025.")
+
+    def test_compiled_once_per_version(self):
+        compiled = get_compiled_template(self.template)
+        self.assertIs(get_compiled_template(self.template), compiled)
+
+        self.template.subject = "Nova fatura {fatura}"
+        self.template.save()
+        self.assertNotIn(self.template.pk, _compiled_cache)
+        self.assertEqual(get_compiled_template(self.template).render_subject(self.context), "Nova fatura 2025-001")
+
+    def test_budget_template_keeps_tags(self):
+        template = EmailTemplate.objects.create(
+            name="Orçamento", subject="Orçamento {orcamento}",
+            body="Olá {cliente}\nAtenciosamente,\nEquipe G7 Serv", template_type='ORCAMENTO',
+        )
+        subject, body = get_compiled_template(template).render({'cliente': 'ACME', 'orcamento': '000010'})
+        self.assertEqual(subject, "Orçamento 000010")
+        # Sem layout de fatura: tags e assinatura do usuário são mantidas
+        self.assertEqual(body, "Olá ACME<br>Atenciosamente,<br>Equipe G7 Serv")
+
+
+class DatabasePoolTest(TestCase):
+    def test_stats_view_is_staff_only(self):
+        User.objects.create_user(username='usuario', password='password')
+        self.client.login(username='usuario', password='password')
+        self.assertEqual(self.client.get(reverse('core:db_pool_stats')).status_code, 302)
+
+        User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.login(username='admin', password='password')
+        stats = self.client.get(reverse('core:db_pool_stats')).json()
+        self.assertFalse(stats['pooling'])  # SQLite nos testes
+        self.assertEqual(stats['vendor'], 'sqlite')
+
+    def test_benchmark_reports_percentiles(self):
+        out = io.StringIO()
+        call_command('benchmark_db_pool', requisicoes=10, concorrencia=2, consultas=1, stdout=out)
+        self.assertIn('direta', out.getvalue())
+        self.assertIn('persistente', out.getvalue())
+
+
+class QueryProfilingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='password')
+        self.client.login(username='admin', password='password')
+        self.url = reverse('core:user_list')
+
+    def test_fingerprint_ignores_parameters(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = %s LIMIT 21'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s) AND name = %s LIMIT 1'),
+        )
+
+    def test_disabled_without_setting_or_header(self):
+        self.client.get(self.url)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_staff_header_profiles_request(self):
+        response = self.client.get(self.url, headers={'X-Profile-Queries': '1'})
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.view_name, 'core:user_list')
+        self.assertEqual(int(response['X-Query-Count']), profile.query_count)
+        self.assertTrue(profile.call_sites)
+
+        self.user.is_staff = False
+        self.user.save()
+        self.client.get(self.url, headers={'X-Profile-Queries': '1'})
+        self.assertEqual(RequestProfile.objects.count(), 1)
+
+    @override_settings(PERF_PROFILING=True, PERF_PROFILING_MAX_ROWS=2)
+    def test_htmx_partials_reported_separately_in_ring_buffer(self):
+        self.client.get(self.url)
+        self.client.get(self.url, headers={'HX-Request': 'true', 'HX-Target': 'lista'})
+        self.client.get(self.url, headers={'HX-Request': 'true', 'HX-Target': 'lista'})
+        self.assertEqual(RequestProfile.objects.count(), 2)
+        self.assertTrue(all(RequestProfile.objects.values_list('is_htmx', flat=True)))
+
+        out = io.StringIO()
+        call_command('perf_report', stdout=out)
+        self.assertIn('core:user_list [htmx]', out.getvalue())
+
+
+class PermissionSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name='Administrativo')
+        self.group.permissions.add(Permission.objects.get(codename='view_accountpayable'))
+        self.user = User.objects.create_user(username='ana', password='password')
+        self.user.groups.add(self.group)
+
+    def test_snapshot_is_cached_and_invalidated_on_group_change(self):
+        snapshot = get_snapshot(User.objects.get(pk=self.user.pk))
+        self.assertTrue(snapshot.is_administrativo)
+        self.assertTrue(snapshot.has_perm('financeiro.view_accountpayable'))
+
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_snapshot(user), snapshot)
+            self.assertTrue(user.has_perm('financeiro.view_accountpayable'))  # _perm_cache preenchido
+
+        self.group.permissions.add(Permission.objects.get(codename='view_receipt'))
+        self.assertTrue(get_snapshot(User.objects.get(pk=self.user.pk)).has_perm('financeiro.view_receipt'))
+
+    def test_menu_fragment_shared_by_role(self):
+        other = User.objects.create_user(username='bia', password='password')
+        other.groups.add(self.group)
+        html = render_menu(get_snapshot(self.user))
+        self.assertIn(reverse('financeiro:account_payable_list'), html)
+        self.assertNotIn(reverse('financeiro:account_receivable_list'), html)
+        self.assertNotIn('configSubmenu', html)
+        other = User.objects.get(pk=other.pk)
+        with self.assertNumQueries(3):  # só o snapshot de bia; o menu do perfil vem do cache
+            self.assertEqual(render_menu(get_snapshot(other)), html)
+
+        self.client.login(username='ana', password='password')
+        response = self.client.get(reverse('financeiro:dashboard'))
+        self.assertContains(response, reverse('financeiro:account_payable_list'))
+
+
+class ReleaseCommandTest(TestCase):
+    def test_steps_are_skipped_when_fingerprints_match(self):
+        out = io.StringIO()
+        call_command('release', etapas=['migrate', 'seed'], stdout=out)
+        self.assertIn('migrate: executado', out.getvalue())
+        self.assertIn('seed: executado', out.getvalue())
+        self.assertEqual(set(ReleaseStep.objects.values_list('name', flat=True)), {'migrate', 'seed'})
+
+        out = io.StringIO()
+        with self.assertNumQueries(2):  # apenas a leitura das impressões digitais
+            call_command('release', etapas=['migrate', 'seed'], stdout=out)
+        self.assertIn('migrate: sem alterações', out.getvalue())
+        self.assertIn('seed: sem alterações', out.getvalue())
+
+
+class ImportTimeTest(TestCase):
+    def test_boot_does_not_load_heavy_packages(self):
+        out = io.StringIO()
+        call_command('importtime', limite=3, pacotes=['pandas', 'numpy', 'xhtml2pdf', 'reportlab', 'signxml'], stdout=out)
+        self.assertIn('Subida:', out.getvalue())
+        self.assertIn('Nenhum', out.getvalue().split('Pacotes pesados')[1])
+
+
+class StreamingBackupTest(TestCase):
+    """Pipeline do backup_db/restore_db com comandos Python no lugar de pg_dump/pg_restore."""
+
+    DUMP = [sys.executable, '-c', "import sys\nfor i in range(40000): sys.stdout.write(f'linha {i} ' * 8 + '\\n')"]
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.target = LocalTarget(self.tmp / 'g7serv_2025-01-01_03-00.dump.gz')
+
+    def test_backup_verify_and_restore_roundtrip(self):
+        result = stream_backup(self.DUMP, self.target, 'gzip')
+        self.assertGreater(result.dump_size, 2 * 1024 * 1024)
+        self.assertLess(result.compressed_size, result.dump_size / 5)
+        self.assertEqual(self.target.stored_checksum(), result.sha256)
+        self.assertEqual(verify(self.target, 'gzip'), result.dump_size)
+
+        restored = self.tmp / 'restaurado'
+        copy = [sys.executable, '-c', f"import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open({str(restored)!r}, 'wb'))"]
+        stream_restore(copy, self.target, 'gzip')
+        self.assertEqual(restored.read_bytes(), subprocess.run(self.DUMP, capture_output=True, check=True).stdout)
+
+    def test_failed_dump_leaves_no_file_and_corruption_is_detected(self):
+        with self.assertRaisesMessage(BackupError, 'falhou'):
+            stream_backup([sys.executable, '-c', 'import sys; print("x"); sys.exit(3)'], self.target, 'gzip')
+        self.assertEqual(list(self.tmp.iterdir()), [])
+
+        stream_backup(self.DUMP, self.target, 'gzip')
+        data = bytearray(self.target.path.read_bytes())
+        data[len(data) // 2] ^= 0xFF
+        self.target.path.write_bytes(bytes(data))
+        with self.assertRaises(BackupError):
+            verify(self.target, 'gzip')
+
+    @skipUnless(find_spec('zstandard'), 'zstandard não instalado')
+    def test_corrupted_zstd_raises_backup_error(self):
+        target = LocalTarget(self.tmp / 'g7serv_2025-01-01_03-00.dump.zst')
+        restored = self.tmp / 'restaurado'
+        copy = [sys.executable, '-c', f"import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open({str(restored)!r}, 'wb'))"]
+        for position in (0, 0.5):  # descritor do frame e meio dos dados
+            stream_backup(self.DUMP, target, 'zstd')
+            data = bytearray(target.path.read_bytes())
+            data[int(len(data) * position)] ^= 0xFF
+            target.path.write_bytes(bytes(data))
+            with self.assertRaisesMessage(BackupError, 'Backup corrompido'):
+                verify(target, 'zstd')
+            with self.assertRaisesMessage(BackupError, 'Backup corrompido'):
+                stream_restore(copy, target, 'zstd')
@@ -28,6 +28,7 @@ urlpatterns = [
     
     # System Settings
     path('configuracoes/', views.company_settings, name='company_settings'),
+    path('configuracoes/banco/pool/', views.db_pool_stats, name='db_pool_stats'),
     
     # Email Templates
     path('configuracoes/templates-email/', views.email_template_list, name='email_template_list'),
@@ -1,50 +1,90 @@
 
+# Menu lateral (templates/base.html), renderizado por core.services.permissions.
+# Seções: 'perm' (uma permissão ou lista, basta ter uma), 'superuser' e, para
+# links diretos, 'url'; as demais abrem o submenu 'id'. Itens do submenu com
+# 'header' são separadores com título.
 MENU_PERMISSIONS = [
     {
         'name': 'Administrativo',
         'icon': 'bi-building',
+        'id': 'administrativoSubmenu',
         'submenus': [
             {'name': 'Pessoas', 'url': 'comercial:client_list', 'perm': 'core.view_person'},
-            {'name': 'Serviços', 'url': 'comercial:service_list', 'perm': 'comercial.view_service'},
+            {'name': 'Serviços', 'url': 'comercial:service_list', 'perm': 'core.view_service'},
             {'name': 'Produtos', 'url': 'estoque:product_list', 'perm': 'estoque.view_product'},
             {'name': 'Marcas', 'url': 'estoque:brand_list', 'perm': 'estoque.view_brand'},
             {'name': 'Grupo de Produtos', 'url': 'estoque:category_list', 'perm': 'estoque.view_category'},
+            {'name': 'Família e Localização', 'url': 'estoque:cadastros_auxiliares', 'perm': 'estoque.view_productfamily'},
+            {'header': 'Acesso'},
             {'name': 'Usuários', 'url': 'core:user_list', 'perm': 'auth.view_user'},
             {'name': 'Perfis', 'url': 'core:profile_list', 'perm': 'auth.view_group'},
+            {'name': 'Técnicos', 'url': 'core:technician_list', 'perm': 'core.view_technician'},
         ]
     },
     {
         'name': 'Comercial',
         'icon': 'bi-briefcase',
+        'id': 'comercialSubmenu',
+        'perm': ['comercial.view_budget', 'comercial.view_contract'],
         'submenus': [
             {'name': 'Orçamentos', 'url': 'comercial:budget_list', 'perm': 'comercial.view_budget'},
             {'name': 'Contratos', 'url': 'comercial:contract_list', 'perm': 'comercial.view_contract'},
+            {'name': 'Reajuste de Contratos', 'url': 'comercial:contract_readjustment_list', 'perm': 'comercial.view_contract'},
+            {'name': 'Modelos de Contrato', 'url': 'comercial:contract_template_list', 'perm': 'comercial.view_contract'},
+            {'name': 'Grupos de Faturamento', 'url': 'comercial:billing_group_list', 'perm': 'comercial.view_contract'},
             {'name': 'Ações de Vendas', 'url': 'comercial:sales_actions', 'perm': 'comercial.view_budget'},
         ]
     },
     {
         'name': 'Operacional',
         'icon': 'bi-tools',
+        'id': 'operacionalSubmenu',
+        'perm': 'operacional.view_serviceorder',
         'submenus': [
-            {'name': 'Andamento do Operacional', 'url': 'operacional:operational_progress', 'perm': 'operacional.view_serviceorder'}, # Using ServiceOrder for now
-            {'name': 'Ordem de Serviço', 'url': 'operacional:service_order_list', 'perm': 'operacional.view_serviceorder'},
+            {'name': 'Andamento do Operacional', 'url': 'operacional:operational_progress'},
+            {'name': 'Ordem de Serviço', 'url': 'operacional:service_order_list'},
         ]
     },
     {
         'name': 'Faturamento',
         'icon': 'bi-cash-coin',
-        'url': 'faturamento:list',
-        'perm': 'comercial.view_contract', # Assuming billing is related to contracts for now
+        'id': 'faturamentoSubmenu',
+        'perm': 'comercial.view_contract',  # Faturamento segue a permissão de contratos
+        'submenus': [
+            {'name': 'Faturas Geradas', 'url': 'faturamento:list'},
+            {'name': 'Faturamento Avulso', 'url': 'faturamento:standalone_create'},
+            {'name': 'Faturamento de Contratos', 'url': 'faturamento:contract_billing'},
+            {'name': 'Notas de Entrada (XML)', 'url': 'faturamento:nota_entrada_list'},
+        ]
+    },
+    {
+        'name': 'NFS-e Nacional',
+        'icon': 'bi-receipt',
+        'id': 'nfseSubmenu',
+        'perm': 'nfse_nacional.view_nfse',
+        'submenus': [
+            {'name': 'Empresas Emissoras', 'url': 'nfse_nacional:empresa_list'},
+            {'name': 'NFS-e (DPS)', 'url': 'nfse_nacional:nfse_list'},
+            {'name': 'Diagnóstico Conexão', 'url': 'financeiro:diagnostico_nfse_nacional', 'icon': 'bi-heart-pulse', 'css': 'text-warning'},
+        ]
     },
     {
         'name': 'Financeiro',
         'icon': 'bi-currency-dollar',
+        'id': 'financeiroSubmenu',
         'submenus': [
-            {'name': 'Visão Geral', 'url': 'reports:dashboard', 'perm': 'financeiro.view_accountpayable'}, # Using generic financial perm
+            {'name': 'Visão Geral', 'url': 'reports:dashboard', 'perm': 'financeiro.view_accountpayable'},
             {'name': 'Contas a Pagar', 'url': 'financeiro:account_payable_list', 'perm': 'financeiro.view_accountpayable'},
             {'name': 'Contas a Receber', 'url': 'financeiro:account_receivable_list', 'perm': 'financeiro.view_accountreceivable'},
             {'name': 'Recibos', 'url': 'financeiro:receipt_list', 'perm': 'financeiro.view_receipt'},
-            {'name': 'Planejamento Orçamentário', 'url': 'financeiro:budget_plan_list', 'perm': 'financeiro.view_budgetplan'},
+            {'name': 'Categorias Financeiras', 'url': 'financeiro:financial_category_list'},
+            {'name': 'Centros de Resultado', 'url': 'financeiro:cost_center_list'},
+            {'name': 'Painel DRE', 'url': 'financeiro:dre_report', 'icon': 'bi-file-earmark-bar-graph', 'css': 'text-warning fw-bold'},
+            {'name': 'Comissões e Gratificações', 'url': 'financeiro:commission_report', 'icon': 'bi-percent'},
+            {'header': 'Gestão de Caixa'},
+            {'name': 'Contas Bancárias', 'url': 'financeiro:cash_account_list', 'perm': 'financeiro.view_cashaccount'},
+            {'name': 'Extrato / Caixa', 'url': 'financeiro:financial_statement', 'perm': 'financeiro.view_cashaccount'},
+            {'name': 'Previsão de Caixa', 'url': 'financeiro:cash_flow_forecast', 'perm': 'financeiro.view_cashaccount'},
         ]
     },
     {
@@ -53,10 +93,28 @@ MENU_PERMISSIONS = [
         'url': 'estoque:product_list',
         'perm': 'estoque.view_product',
     },
+    {
+        'name': 'Importador IA',
+        'icon': 'bi-cloud-arrow-up',
+        'url': 'importador:index',
+        'perm': 'auth.view_user',
+    },
     {
         'name': 'Relatórios',
         'icon': 'bi-printer',
         'url': 'reports:dashboard',
         'perm': 'auth.view_user', # Placeholder
-    }
+    },
+    {
+        'name': 'Configurações',
+        'icon': 'bi-gear-fill text-primary',
+        'id': 'configSubmenu',
+        'superuser': True,
+        'submenus': [
+            {'name': 'Banco Cora (Boletos)', 'url': 'configuracao_cora'},
+            {'name': 'NFS-e (Configurações Fiscais)', 'url': 'financeiro:fiscal_settings'},
+            {'name': 'Templates de E-mail', 'url': 'core:email_template_list'},
+            {'name': 'Regras de Comissões', 'url': 'financeiro:commission_config_list', 'icon': 'bi-gear'},
+        ]
+    },
 ]
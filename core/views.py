@@ -9,7 +9,8 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.db.models import Q, Sum
+from django.db.models import Count, Max, Q, Sum
+from django.http import JsonResponse
 from django.utils import timezone
 from django.views.generic import TemplateView
 from django.contrib.contenttypes.models import ContentType
@@ -23,6 +24,8 @@ from financeiro.models import AccountPayable
 # Imports locais
 from .models import CompanySettings, Technician
 from .forms import TechnicianForm, CompanySettingsForm
+from .services.db_pool import pool_stats
+from .services.permissions import get_snapshot
 
 @user_passes_test(lambda u: u.is_superuser)
 @login_required
@@ -44,7 +47,7 @@ def company_settings(request):
 
 
 def is_socio_diretor(user):
-    return user.is_superuser or user.groups.filter(name='SÓCIO-DIRETOR').exists()
+    return get_snapshot(user).is_socio_diretor
 
 
 @login_required
@@ -66,7 +69,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context['total_clientes'] = Person.objects.filter(is_client=True).count()
         
         # Financial metrics restricted to Admins/Superusers
-        is_admin = self.request.user.is_superuser or self.request.user.groups.filter(name='Administrativo').exists() or self.request.user.has_perm('auth.view_user')
+        is_admin = get_snapshot(self.request.user).is_administrativo
         
         if is_admin:
             faturamento = Contract.objects.filter(
@@ -260,10 +263,28 @@ def profile_list(request):
     return render(request, 'core/profile_list.html', {'groups': groups})
 
 
+_permissions_mapping_cache = {}
+
+
 def get_permissions_from_mapping():
     """
     Retorna permissões organizadas por app_label com nomes traduzidos.
+    O resultado fica em memória no processo enquanto a tabela de permissões
+    não muda (mesma quantidade e maior id), evitando recarregar e traduzir
+    todas as permissões a cada abertura do formulário de perfil.
     """
+    signature = Permission.objects.aggregate(count=Count('id'), last_id=Max('id'))
+    key = (signature['count'], signature['last_id'])
+    if key not in _permissions_mapping_cache:
+        mapping = _build_permissions_mapping()
+        _permissions_mapping_cache.clear()
+        if mapping:
+            _permissions_mapping_cache[key] = mapping
+        return mapping
+    return _permissions_mapping_cache[key]
+
+
+def _build_permissions_mapping():
     import re
     APP_LABELS_BR = {
         'core': 'Cadastros Base (Pessoas/Serviços)',
@@ -336,6 +357,12 @@ def get_permissions_from_mapping():
         'stock': 'estoque',
     }
 
+    # Ordenamos por tamanho descendente para evitar que 'budget' substitua parte de 'budget product'
+    model_patterns = [
+        (re.compile(rf'\b{re.escape(eng_m)}\b', re.IGNORECASE), pt_m)
+        for eng_m, pt_m in sorted(MODEL_NAMES_BR.items(), key=lambda x: len(x[0]), reverse=True)
+    ]
+
     try:
         permissions = Permission.objects.all().select_related('content_type')
         apps_permissions = {}
@@ -367,13 +394,8 @@ def get_permissions_from_mapping():
                         p_name = pt + p_name[len(eng):]
                         break
                 
-                # 2. Traduz nomes de modelos específicos
-                # Ordenamos por tamanho descendente para evitar que 'budget' substitua parte de 'budget product'
-                sorted_models = sorted(MODEL_NAMES_BR.items(), key=lambda x: len(x[0]), reverse=True)
-                
-                for eng_m, pt_m in sorted_models:
-                    # Usando regex para garantir que substitui termos exatos respeitando limites de palavras
-                    pattern = re.compile(rf'\b{re.escape(eng_m)}\b', re.IGNORECASE)
+                # 2. Traduz nomes de modelos específicos (termos exatos, respeitando limites de palavras)
+                for pattern, pt_m in model_patterns:
                     p_name = pattern.sub(pt_m, p_name)
                 
                 perm.name = p_name
@@ -765,3 +787,9 @@ def email_template_delete(request, pk):
     
     return render(request, 'core/email_template_confirm_delete.html', {'template': template})
 
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def db_pool_stats(request):
+    """Estatísticas do pool de conexões do processo que atendeu a requisição."""
+    return JsonResponse(pool_stats())
@@ -4,6 +4,7 @@ Django settings for erp project.
 
 import os
 import dj_database_url
+from importlib.util import find_spec
 from pathlib import Path
 from urllib.parse import urlparse
 from decouple import config, Csv
@@ -92,8 +93,25 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
+    'core.middleware.QueryProfilingMiddleware',
 ]
 
+# Cache compartilhado entre os workers do gunicorn quando REDIS_URL está definido;
+# sem ele, o cache padrão (LocMem) é local a cada processo.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Perfil de consultas por requisição (core.middleware.QueryProfilingMiddleware).
+# Desligado, staff ainda pode perfilar uma requisição com o cabeçalho X-Profile-Queries.
+PERF_PROFILING = config('PERF_PROFILING', default=False, cast=bool)
+PERF_PROFILING_MAX_ROWS = config('PERF_PROFILING_MAX_ROWS', default=5000, cast=int)
+
 ROOT_URLCONF = 'erp.urls'
 
 TEMPLATES = [
@@ -107,6 +125,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.navigation',
             ],
         },
     },
@@ -127,17 +146,39 @@ if DATABASE_URL:
             "Please fix the DATABASE_URL in Railway Variables to use the correct Postgres host."
         )
     
+    # Conexões reaproveitadas entre requisições. Com psycopg 3 usa o pool nativo
+    # do Django 5.1 (um pool por processo do gunicorn, dimensionado pelas threads
+    # em run-migrations.sh); com psycopg2 cai para conexões persistentes.
+    # Em ambos os casos as conexões são verificadas antes do uso e recicladas
+    # periodicamente, e o keepalive TCP derruba sockets mortos pela rede instável
+    # (a causa dos TCP_AOFAILURE que levaram a conn_max_age=0).
+    DB_POOL_ENABLED = config('DB_POOL_ENABLED', default=True, cast=bool) and find_spec('psycopg_pool') is not None
+
     DATABASES = {
         'default': dj_database_url.parse(
             DATABASE_URL,
-            conn_max_age=0,  # Desativado para evitar TCP_AOFAILURE
+            conn_max_age=0 if DB_POOL_ENABLED else config('DB_CONN_MAX_AGE', default=60, cast=int),
             conn_health_checks=True,
         )
     }
     # Adiciona timeout de conexão para evitar que a app trave se o banco estiver instável
     DATABASES['default']['OPTIONS'] = {
         'connect_timeout': 10,
+        'keepalives': 1,
+        'keepalives_idle': 30,
+        'keepalives_interval': 10,
+        'keepalives_count': 3,
     }
+    if DB_POOL_ENABLED:
+        # conn_health_checks=True faz o Django passar ConnectionPool.check_connection ao pool
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=1, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=config('GUNICORN_THREADS', default=4, cast=int), cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),  # espera máxima por uma conexão livre
+            'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=600, cast=int),
+            'max_idle': config('DB_POOL_MAX_IDLE', default=120, cast=int),
+            'reconnect_timeout': 30,
+        }
 else:
     # Development Fallback to SQLite (Easier for local tests/dev if no Postgres is available)
     DATABASES = {
@@ -313,3 +354,14 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 # Silenciar avisos do CKEditor 4 (LTS/Suporte) para limpar os logs de deploy
 SILENCED_SYSTEM_CHECKS = ['ckeditor.W001']
+
+# Estoque: mantém saldo por (produto, local) além de Product.current_stock
+ESTOQUE_SALDO_POR_LOCAL = config('ESTOQUE_SALDO_POR_LOCAL', default=True, cast=bool)
+
+# Financeiro: meses à frente em que as contas recorrentes são materializadas na criação e pelo
+# comando gerar_recorrencias. 12 meses, como antes das séries, enquanto o comando não estiver
+# agendado em todos os ambientes (DEPLOY_CHECKLIST.md); com o agendamento pode ser reduzido.
+FINANCEIRO_HORIZONTE_RECORRENCIA_MESES = config('FINANCEIRO_HORIZONTE_RECORRENCIA_MESES', default=12, cast=int)
+
+# Agenda dos técnicos: ponto de saída "lat,lng" (vazio: centro das OS do dia)
+AGENDA_BASE_COORDS = config('AGENDA_BASE_COORDS', default='', cast=Csv(float)) or None
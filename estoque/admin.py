@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.db import models
-from .models import Product, StockMovement, ProductFamily, Brand, Category, StockLocation
+from .models import Product, StockMovement, StockBalance, ProductFamily, Brand, Category, StockLocation
+from .services import stock_ledger
 
 class LowStockFilter(admin.SimpleListFilter):
     title = 'Estoque Baixo'
@@ -24,10 +25,23 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(StockMovement)
 class StockMovementAdmin(admin.ModelAdmin):
-    list_display = ('date', 'movement_type', 'product', 'quantity', 'reason')
+    list_display = ('date', 'movement_type', 'product', 'quantity', 'location', 'reason')
     list_filter = ('movement_type', 'date', 'product')
     date_hierarchy = 'date'
 
+    def save_model(self, request, obj, form, change):
+        # Novas movimentações passam pelo razão de estoque para atualizar os saldos
+        if change:
+            super().save_model(request, obj, form, change)
+        else:
+            stock_ledger.post_movements([obj])
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ('product', 'location', 'quantity', 'updated_at')
+    list_filter = ('location',)
+    search_fields = ('product__name', 'product__sku')
+
 @admin.register(ProductFamily)
 class ProductFamilyAdmin(admin.ModelAdmin):
     list_display = ('name',)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from estoque.services.stock_ledger import rebuild_balances
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o estoque atual (e os saldos por local) a partir do histórico de movimentações'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produto', type=int, action='append', dest='products', help='ID do produto (pode repetir)')
+
+    def handle(self, *args, **options):
+        updated = rebuild_balances(options['products'])
+        self.stdout.write(self.style.SUCCESS(f'{updated} produtos recalculados a partir das movimentações.'))
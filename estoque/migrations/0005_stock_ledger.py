@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-19 15:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0004_productfamily_product_allow_negative_stock_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='estoque.stocklocation', verbose_name='Local'),
+        ),
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Saldo')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='estoque.stocklocation', verbose_name='Local')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='estoque.product', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Saldo por Local',
+                'verbose_name_plural': 'Saldos por Local',
+                'constraints': [models.UniqueConstraint(fields=('product', 'location'), name='unique_stock_balance_product_location')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-19 15:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_counted_at(apps, schema_editor):
+    InventoryItem = apps.get_model('estoque', 'InventoryItem')
+    InventoryItem.objects.filter(counted_quantity__isnull=False).update(counted_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0005_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventories', to='estoque.stocklocation', verbose_name='Local (opcional)'),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='counted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Contado em'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['inventory', 'location'], name='inventory_item_location_idx'),
+        ),
+        migrations.RunPython(backfill_counted_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.5 on 2026-10-19 15:40
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+OS_REASON_RE = re.compile(r'^Ordem de Serviço #(\d+) - Conclusão$')
+
+
+def link_service_order_movements(apps, schema_editor):
+    """Vincula as baixas de OS antigas (identificadas pelo texto do motivo) à OS de origem."""
+    StockMovement = apps.get_model('estoque', 'StockMovement')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    content_type, _ = ContentType.objects.get_or_create(app_label='operacional', model='serviceorder')
+
+    linked = set()
+    to_update = []
+    movements = StockMovement.objects.filter(reason__startswith='Ordem de Serviço #').order_by('id')
+    for movement in movements.only('id', 'reason', 'product_id', 'movement_type'):
+        match = OS_REASON_RE.match(movement.reason or '')
+        if not match:
+            continue
+        key = (int(match.group(1)), movement.product_id, movement.movement_type)
+        if key in linked:
+            continue
+        linked.add(key)
+        movement.source_content_type_id = content_type.id
+        movement.source_id = key[0]
+        to_update.append(movement)
+    StockMovement.objects.bulk_update(to_update, ['source_content_type', 'source_id'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('estoque', '0006_inventory_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='source_content_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='contenttypes.contenttype', verbose_name='Tipo de Origem'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='source_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True, verbose_name='ID da Origem'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', 'date'], name='stock_mov_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['source_content_type', 'source_id'], name='stock_movement_source_idx'),
+        ),
+        migrations.RunPython(link_service_order_movements, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='stockmovement',
+            constraint=models.UniqueConstraint(condition=models.Q(('active', True), ('source_id__isnull', False)), fields=('source_content_type', 'source_id', 'product', 'movement_type'), name='unique_stock_movement_source'),
+        ),
+    ]
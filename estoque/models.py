@@ -1,7 +1,7 @@
 from django.db import models
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 
 class BaseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -108,24 +108,54 @@ class StockMovement(BaseModel):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='movements', verbose_name="Produto")
     movement_type = models.CharField(max_length=3, choices=MOVEMENT_TYPES, verbose_name="Tipo de Movimentação")
     quantity = models.IntegerField(verbose_name="Quantidade")
+    location = models.ForeignKey(StockLocation, on_delete=models.SET_NULL, null=True, blank=True, related_name='movements', verbose_name="Local")
     date = models.DateField(auto_now_add=True, verbose_name="Data")
     reason = models.CharField(max_length=255, blank=True, null=True, verbose_name="Motivo")
 
+    # Documento de origem (OS, NF-e de entrada, balanço...). Movimentações estornadas ficam inativas.
+    source_content_type = models.ForeignKey(ContentType, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Tipo de Origem")
+    source_id = models.PositiveBigIntegerField(null=True, blank=True, verbose_name="ID da Origem")
+    source = GenericForeignKey('source_content_type', 'source_id')
+
     def __str__(self):
         return f"{self.get_movement_type_display()} - {self.product.name} ({self.quantity})"
 
+    @property
+    def signed_quantity(self):
+        return self.quantity if self.movement_type == 'IN' else -self.quantity
+
     class Meta:
         verbose_name = "Movimentação de Estoque"
         verbose_name_plural = "Movimentações de Estoque"
+        indexes = [
+            models.Index(fields=['product', 'date'], name='stock_mov_product_date_idx'),
+            models.Index(fields=['source_content_type', 'source_id'], name='stock_movement_source_idx'),
+        ]
+        constraints = [
+            # Idempotência: um documento de origem movimenta cada produto uma vez por tipo
+            models.UniqueConstraint(
+                fields=['source_content_type', 'source_id', 'product', 'movement_type'],
+                condition=models.Q(source_id__isnull=False, active=True),
+                name='unique_stock_movement_source',
+            ),
+        ]
+
+class StockBalance(models.Model):
+    """Saldo por (produto, local), mantido pelo estoque.services.stock_ledger."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='balances', verbose_name="Produto")
+    location = models.ForeignKey(StockLocation, on_delete=models.CASCADE, related_name='balances', verbose_name="Local")
+    quantity = models.IntegerField(default=0, verbose_name="Saldo")
+    updated_at = models.DateTimeField(auto_now=True)
 
-@receiver(post_save, sender=StockMovement)
-def update_stock(sender, instance, created, **kwargs):
-    if created:
-        if instance.movement_type == 'IN':
-            instance.product.current_stock += instance.quantity
-        elif instance.movement_type == 'OUT':
-            instance.product.current_stock -= instance.quantity
-        instance.product.save()
+    def __str__(self):
+        return f"{self.product} @ {self.location}: {self.quantity}"
+
+    class Meta:
+        verbose_name = "Saldo por Local"
+        verbose_name_plural = "Saldos por Local"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'location'], name='unique_stock_balance_product_location'),
+        ]
 
 class Inventory(BaseModel):
     STATUS_CHOICES = (
@@ -137,6 +167,7 @@ class Inventory(BaseModel):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='DRAFT', verbose_name="Status")
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, verbose_name="Responsável")
     description = models.CharField(max_length=255, blank=True, null=True, verbose_name="Descrição")
+    location = models.ForeignKey(StockLocation, on_delete=models.SET_NULL, null=True, blank=True, related_name='inventories', verbose_name="Local (opcional)")
 
     def __str__(self):
         return f"Balanço {self.id} - {self.date}"
@@ -151,6 +182,7 @@ class InventoryItem(BaseModel):
     location = models.ForeignKey(StockLocation, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Localização")
     system_quantity = models.IntegerField(verbose_name="Qtd. Sistema")
     counted_quantity = models.IntegerField(null=True, blank=True, verbose_name="Qtd. Contada")
+    counted_at = models.DateTimeField(null=True, blank=True, verbose_name="Contado em")
 
     def __str__(self):
         return f"{self.product.name} - {self.inventory}"
@@ -158,3 +190,6 @@ class InventoryItem(BaseModel):
     class Meta:
         verbose_name = "Item de Balanço"
         verbose_name_plural = "Itens de Balanço"
+        indexes = [
+            models.Index(fields=['inventory', 'location'], name='inventory_item_location_idx'),
+        ]
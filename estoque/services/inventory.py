@@ -0,0 +1,119 @@
+"""
+Sessões de balanço (inventário) de estoque.
+
+- snapshot_items: fotografa as quantidades do sistema com um único
+  INSERT ... SELECT, sem carregar os produtos em Python. Com saldo por local
+  (ESTOQUE_SALDO_POR_LOCAL) cada StockBalance vira um item, para a contagem de
+  um local ser comparada com o saldo daquele local e não com o total do produto.
+- save_counts: grava contagens parciais (tela ou API JSON) com bulk_update;
+  a contagem pode ser retomada por local (itens ainda sem counted_at).
+- finish_inventory: calcula as diferenças no banco e lança todos os ajustes
+  de uma vez pelo razão de estoque.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from estoque.models import Inventory, InventoryItem, Product, StockBalance
+from estoque.services import stock_ledger
+
+
+def snapshot_items(inventory):
+    """
+    Cria os itens do balanço a partir dos produtos ativos (do local do balanço, se houver).
+    Com saldo por local: um item por (produto, local) do StockBalance; produtos ainda
+    sem nenhum saldo por local entram com current_stock no local padrão.
+    """
+    item_meta = InventoryItem._meta
+    product_table = Product._meta.db_table
+    qn = connection.ops.quote_name
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    values = [now, now, True, inventory.pk]
+
+    columns = ['created_at', 'updated_at', 'active', 'inventory_id', 'product_id', 'location_id', 'system_quantity']
+    sql = f"INSERT INTO {qn(item_meta.db_table)} ({', '.join(qn(c) for c in columns)}) "
+    params = []
+    if stock_ledger.balances_enabled():
+        balance_table = StockBalance._meta.db_table
+        sql += (
+            f"SELECT %s, %s, %s, %s, b.{qn('product_id')}, b.{qn('location_id')}, b.{qn('quantity')} "
+            f"FROM {qn(balance_table)} b INNER JOIN {qn(product_table)} p ON p.{qn('id')} = b.{qn('product_id')} "
+            f"WHERE p.{qn('active')} = %s"
+        )
+        params += [*values, True]
+        if inventory.location_id:
+            sql += f" AND b.{qn('location_id')} = %s"
+            params.append(inventory.location_id)
+        sql += " UNION ALL "
+
+    sql += (
+        f"SELECT %s, %s, %s, %s, p.{qn('id')}, p.{qn('location_id')}, p.{qn('current_stock')} "
+        f"FROM {qn(product_table)} p WHERE p.{qn('active')} = %s"
+    )
+    params += [*values, True]
+    if stock_ledger.balances_enabled():
+        sql += (
+            f" AND NOT EXISTS (SELECT 1 FROM {qn(StockBalance._meta.db_table)} b "
+            f"WHERE b.{qn('product_id')} = p.{qn('id')})"
+        )
+    if inventory.location_id:
+        sql += f" AND p.{qn('location_id')} = %s"
+        params.append(inventory.location_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def save_counts(inventory, counts):
+    """
+    Grava contagens parciais. counts: {item_id: quantidade}; None limpa a contagem.
+    Itens de outros balanços são ignorados. Retorna o número de itens gravados.
+    """
+    if inventory.status != 'DRAFT':
+        raise ValueError("Balanço já concluído.")
+
+    counts = {int(item_id): (None if qty in (None, '') else int(qty)) for item_id, qty in counts.items()}
+    items = list(InventoryItem.objects.filter(inventory=inventory, id__in=counts).only('id'))
+    now = timezone.now()
+    for item in items:
+        item.counted_quantity = counts[item.id]
+        item.counted_at = now if item.counted_quantity is not None else None
+        item.updated_at = now
+    InventoryItem.objects.bulk_update(items, ['counted_quantity', 'counted_at', 'updated_at'], batch_size=500)
+    return len(items)
+
+
+def location_progress(inventory):
+    """Andamento da contagem por local: [{'location_id', 'location__name', 'total', 'counted'}]."""
+    return list(
+        inventory.items.values('location_id', 'location__name')
+        .annotate(total=Count('id'), counted=Count('counted_at'))
+        .order_by('location__name')
+    )
+
+
+@transaction.atomic
+def finish_inventory(inventory):
+    """Conclui o balanço e lança os ajustes. Retorna o número de movimentações geradas."""
+    inventory = Inventory.objects.select_for_update().get(pk=inventory.pk)
+    if inventory.status != 'DRAFT':
+        raise ValueError("Balanço já concluído.")
+
+    diffs = (
+        inventory.items.filter(counted_quantity__isnull=False)
+        .annotate(diff=F('counted_quantity') - F('system_quantity'))
+        .exclude(diff=0)
+        .values_list('product_id', 'location_id', 'diff')
+    )
+    reason = f'Ajuste de Balanço #{inventory.id}'
+    movements = stock_ledger.post_movements([
+        stock_ledger.movement(
+            product_id, 'IN' if diff > 0 else 'OUT', abs(diff), reason=reason, location=location_id, source=inventory
+        )
+        for product_id, location_id, diff in diffs
+    ])
+
+    inventory.status = 'COMPLETED'
+    inventory.save(update_fields=['status', 'updated_at'])
+    return len(movements)
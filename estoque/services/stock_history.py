@@ -0,0 +1,87 @@
+"""
+Histórico de estoque: saldo em uma data, giro no período e valorização.
+
+Os saldos são calculados a partir de Product.current_stock descontando as
+movimentações posteriores à data, em uma única query agregada para todos os
+produtos (índice em (product, date)). Assim produtos com saldo inicial
+digitado no cadastro, sem movimentação de abertura, também ficam corretos.
+Movimentações estornadas continuam no histórico e entram no cálculo.
+"""
+import csv
+from decimal import Decimal
+
+from django.db.models import F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from estoque.models import Product
+from estoque.services.stock_ledger import signed_quantity_expression
+
+
+def _sum(condition, expression=None):
+    return Coalesce(
+        Sum(expression or signed_quantity_expression('movements__'), filter=condition),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def stock_as_of(as_of, products=None):
+    """Produtos anotados com stock_as_of (saldo ao fim do dia as_of)."""
+    products = products if products is not None else Product.objects.all()
+    return products.annotate(
+        moved_after=_sum(Q(movements__date__gt=as_of)),
+    ).annotate(stock_as_of=F('current_stock') - F('moved_after'))
+
+
+def stock_turnover(start, end, products=None):
+    """
+    Giro do período [start, end] para todos os produtos em uma query.
+    Retorna dicts com opening, entries, exits, closing e turnover (saídas / estoque médio).
+    """
+    products = products if products is not None else Product.objects.all()
+    in_period = Q(movements__date__gte=start, movements__date__lte=end)
+    rows = products.annotate(
+        moved_after=_sum(Q(movements__date__gt=end)),
+        entries=_sum(in_period & Q(movements__movement_type='IN'), F('movements__quantity')),
+        exits=_sum(in_period & Q(movements__movement_type='OUT'), F('movements__quantity')),
+    ).values('id', 'sku', 'name', 'current_stock', 'moved_after', 'entries', 'exits').order_by('name')
+
+    result = []
+    for row in rows:
+        closing = row['current_stock'] - row['moved_after']
+        opening = closing - row['entries'] + row['exits']
+        average = Decimal(opening + closing) / 2
+        result.append({
+            'product_id': row['id'],
+            'sku': row['sku'],
+            'name': row['name'],
+            'opening': opening,
+            'entries': row['entries'],
+            'exits': row['exits'],
+            'closing': closing,
+            'turnover': (Decimal(row['exits']) / average).quantize(Decimal('0.01')) if average > 0 else None,
+        })
+    return result
+
+
+def stock_valuation(as_of, products=None):
+    """Linhas do relatório de valorização: saldo na data x preço de custo."""
+    rows = stock_as_of(as_of, products).values('sku', 'name', 'stock_as_of', 'cost_price').order_by('name')
+    for row in rows:
+        row['total'] = row['stock_as_of'] * (row['cost_price'] or Decimal('0'))
+        yield row
+
+
+def write_valuation_csv(output, as_of, products=None):
+    """Exporta a valorização em CSV (separador ';', padrão do Excel em pt-BR)."""
+    writer = csv.writer(output, delimiter=';')
+    writer.writerow(['SKU', 'Produto', f'Saldo em {as_of:%d/%m/%Y}', 'Custo Unitário', 'Valor Total'])
+    grand_total = Decimal('0')
+    for row in stock_valuation(as_of, products):
+        grand_total += row['total']
+        writer.writerow([
+            row['sku'], row['name'], row['stock_as_of'],
+            f"{row['cost_price']:.2f}".replace('.', ','), f"{row['total']:.2f}".replace('.', ','),
+        ])
+    writer.writerow(['', 'TOTAL', '', '', f"{grand_total:.2f}".replace('.', ',')])
+    return grand_total
@@ -0,0 +1,253 @@
+"""
+Razão de estoque.
+
+Ponto único de entrada para movimentar estoque: as movimentações são
+gravadas com bulk_create e o saldo de cada produto é atualizado com um
+único UPDATE ... SET current_stock = current_stock + delta (F()), sem
+ler-modificar-gravar o Product, evitando perda de atualização quando OS e
+notas de entrada movimentam o mesmo produto ao mesmo tempo.
+
+Opcionalmente (settings.ESTOQUE_SALDO_POR_LOCAL) mantém StockBalance por
+(produto, local). Movimentações sem local usam o local padrão do produto;
+sem nenhum dos dois, o saldo fica apenas em Product.current_stock.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from estoque.models import Product, StockBalance, StockMovement
+
+
+def balances_enabled():
+    return getattr(settings, 'ESTOQUE_SALDO_POR_LOCAL', True)
+
+
+def signed_quantity_expression(prefix=''):
+    """
+    Quantidade com sinal (entrada positiva, saída negativa) para agregações no banco.
+    prefix permite agregar a partir de outro modelo (ex.: 'movements__' em Product).
+    """
+    return Case(
+        When(**{f'{prefix}movement_type': 'IN'}, then=F(f'{prefix}quantity')),
+        default=-F(f'{prefix}quantity'),
+        output_field=IntegerField(),
+    )
+
+
+def movement(product, movement_type, quantity, reason='', location=None, source=None):
+    """
+    Monta (sem gravar) uma movimentação para post_movements. product/location: instância ou id.
+    source: documento de origem (OS, nota...), usado para idempotência.
+    """
+    product_kwarg = {'product': product} if isinstance(product, Product) else {'product_id': product}
+    source_kwargs = {}
+    if source is not None:
+        source_kwargs = {
+            'source_content_type': ContentType.objects.get_for_model(source),
+            'source_id': source.pk,
+        }
+    return StockMovement(
+        **product_kwarg,
+        **source_kwargs,
+        movement_type=movement_type,
+        quantity=quantity,
+        reason=reason,
+        location_id=getattr(location, 'pk', location),
+    )
+
+
+def _source_key(m):
+    return (m.source_content_type_id, m.source_id, m.product_id, m.movement_type)
+
+
+def _merge_sourced(movements):
+    """
+    Para movimentações com origem: soma as repetidas no lote (mesmo produto e tipo) e
+    descarta as que a origem já lançou (reprocessamento de sinais, duplo clique).
+    A origem movimenta cada produto uma vez por tipo (unique_stock_movement_source),
+    então repetidas em locais diferentes são recusadas em vez de somadas num só local.
+    """
+    sourced = [m for m in movements if m.source_id is not None and m.active]
+    if not sourced:
+        return movements
+    posted = set(
+        StockMovement.objects.filter(
+            active=True,
+            source_content_type_id__in={m.source_content_type_id for m in sourced},
+            source_id__in={m.source_id for m in sourced},
+        ).values_list('source_content_type_id', 'source_id', 'product_id', 'movement_type')
+    )
+    result = []
+    batch = {}
+    for m in movements:
+        if m.source_id is not None and m.active:
+            key = _source_key(m)
+            if key in posted:
+                continue
+            if key in batch:
+                if batch[key].location_id != m.location_id:
+                    raise ValueError(
+                        f'A origem movimenta o produto {m.product_id} ({m.movement_type}) em locais diferentes.'
+                    )
+                batch[key].quantity += m.quantity
+                continue
+            batch[key] = m
+        result.append(m)
+    return result
+
+
+def _apply_balances(deltas):
+    keys = list(deltas)
+    existing = set(
+        StockBalance.objects.filter(
+            product_id__in={p for p, _ in keys}, location_id__in={l for _, l in keys}
+        ).values_list('product_id', 'location_id')
+    )
+    StockBalance.objects.bulk_create(
+        [StockBalance(product_id=p, location_id=l) for p, l in keys if (p, l) not in existing],
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    for (product_id, location_id), delta in sorted(deltas.items()):
+        StockBalance.objects.filter(product_id=product_id, location_id=location_id).update(
+            quantity=F('quantity') + delta, updated_at=now
+        )
+
+
+@transaction.atomic
+def post_movements(movements):
+    """
+    Grava as movimentações em lote e aplica os saldos.
+    Retorna a lista de movimentações criadas.
+    """
+    passed = movements
+    movements = [m for m in movements if m.quantity]
+    if not movements:
+        return []
+
+    # Local padrão antes de juntar as repetidas, para "sem local" e o padrão serem o mesmo local
+    if balances_enabled():
+        default_locations = dict(
+            Product.objects.filter(pk__in={m.product_id for m in movements}).values_list('id', 'location_id')
+        )
+        for m in movements:
+            if m.location_id is None:
+                m.location_id = default_locations.get(m.product_id)
+
+    movements = _merge_sourced(movements)
+    if not movements:
+        return []
+
+    if any(m.source_id is not None and m.active for m in movements):
+        try:
+            with transaction.atomic():
+                created = StockMovement.objects.bulk_create(movements, batch_size=500)
+        except IntegrityError:
+            # Lançamento concorrente da mesma origem entre a verificação e o INSERT:
+            # o que ele já gravou conta como lançado
+            for m in movements:
+                m.pk = None
+                m._state.adding = True
+            movements = _merge_sourced(movements)
+            if not movements:
+                return []
+            created = StockMovement.objects.bulk_create(movements, batch_size=500)
+    else:
+        created = StockMovement.objects.bulk_create(movements, batch_size=500)
+
+    product_deltas = defaultdict(int)
+    location_deltas = defaultdict(int)
+    for m in movements:
+        product_deltas[m.product_id] += m.signed_quantity
+        if m.location_id is not None:
+            location_deltas[(m.product_id, m.location_id)] += m.signed_quantity
+
+    # Ordem fixa de produtos para não gerar deadlock entre transações concorrentes
+    for product_id, delta in sorted(product_deltas.items()):
+        if delta:
+            Product.objects.filter(pk=product_id).update(current_stock=F('current_stock') + delta)
+
+    if balances_enabled() and location_deltas:
+        _apply_balances(location_deltas)
+
+    # Mantém coerentes as instâncias de Product recebidas (cada uma uma vez, com o
+    # delta total do produto, mesmo que outras movimentações tenham vindo só com o id)
+    instances = {id(m.product): m.product for m in passed if StockMovement.product.is_cached(m)}
+    for product in instances.values():
+        product.current_stock += product_deltas.get(product.pk, 0)
+
+    return created
+
+
+def post_movement(product, movement_type, quantity, reason='', location=None, source=None):
+    """Atalho para uma única movimentação."""
+    created = post_movements([movement(product, movement_type, quantity, reason, location, source)])
+    return created[0] if created else None
+
+
+@transaction.atomic
+def reverse_source(source, reason=''):
+    """
+    Estorna as movimentações ativas do documento de origem com movimentações opostas.
+    Original e estorno ficam inativos, liberando a origem para um novo lançamento
+    (ex.: NF-e estornada e relançada). Retorna as movimentações de estorno.
+    """
+    originals = list(
+        StockMovement.objects.select_for_update().filter(
+            source_content_type=ContentType.objects.get_for_model(source),
+            source_id=source.pk,
+            active=True,
+        )
+    )
+    if not originals:
+        return []
+    StockMovement.objects.filter(pk__in=[m.pk for m in originals]).update(active=False)
+    reversals = [
+        movement(m.product_id, 'OUT' if m.movement_type == 'IN' else 'IN', m.quantity,
+                 reason=reason, location=m.location_id, source=source)
+        for m in originals
+    ]
+    for m in reversals:
+        m.active = False
+    return post_movements(reversals)
+
+
+@transaction.atomic
+def rebuild_balances(product_ids=None):
+    """
+    Recalcula Product.current_stock e StockBalance a partir do histórico de movimentações.
+    Retorna o número de produtos atualizados.
+    """
+    history = StockMovement.objects.filter(product=OuterRef('pk')).values('product')
+    total = history.annotate(total=Sum(signed_quantity_expression())).values('total')[:1]
+
+    products = Product.objects.all()
+    movements = StockMovement.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+        movements = movements.filter(product_id__in=product_ids)
+
+    updated = products.update(
+        current_stock=Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+    )
+
+    if balances_enabled():
+        balances = StockBalance.objects.all()
+        if product_ids is not None:
+            balances = balances.filter(product_id__in=product_ids)
+        balances.delete()
+        rows = (
+            movements.filter(location__isnull=False)
+            .values('product_id', 'location_id')
+            .annotate(total=Sum(signed_quantity_expression()))
+        )
+        StockBalance.objects.bulk_create(
+            [StockBalance(product_id=r['product_id'], location_id=r['location_id'], quantity=r['total']) for r in rows],
+            batch_size=500,
+        )
+    return updated
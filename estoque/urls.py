@@ -9,6 +9,8 @@ urlpatterns = [
     path('produtos/<int:pk>/editar/', views.product_update, name='product_update'),
     path('movimentacoes/', views.movement_list, name='movement_list'),
     path('movimentacoes/nova/', views.movement_create, name='movement_create'),
+    path('historico/', views.stock_history_api, name='stock_history_api'),
+    path('valorizacao/exportar/', views.stock_valuation_export, name='stock_valuation_export'),
     
     # Marcas
     path('marcas/', views.brand_list, name='brand_list'),
@@ -40,4 +42,5 @@ urlpatterns = [
     path('balancos/', views.inventory_list, name='inventory_list'),
     path('balancos/novo/', views.inventory_create, name='inventory_create'),
     path('balancos/<int:pk>/', views.inventory_detail, name='inventory_detail'),
+    path('balancos/<int:pk>/contagens/', views.inventory_counts_api, name='inventory_counts_api'),
 ]
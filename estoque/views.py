@@ -30,9 +30,17 @@ def product_update(request, pk):
     return render(request, 'estoque/product_form.html', {'form': form, 'title': 'Editar Produto'})
 
 from django.contrib import messages
-from .models import Product, StockMovement, Brand, Category, StockLocation, ProductFamily, Inventory, InventoryItem
+from .models import Product, StockMovement, Brand, Category, StockLocation, ProductFamily, Inventory
+from .services import inventory as inventory_service
+from .services import stock_history
+from .services import stock_ledger
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+import json
 
 @login_required
 def product_list(request):
@@ -73,12 +81,7 @@ def movement_create(request):
         
         product = get_object_or_404(Product, pk=product_id)
         
-        StockMovement.objects.create(
-            product=product,
-            movement_type=movement_type,
-            quantity=quantity,
-            reason=reason
-        )
+        stock_ledger.post_movement(product, movement_type, quantity, reason=reason)
         
         messages.success(request, 'Movimentação registrada com sucesso.')
         return redirect('estoque:product_detail', pk=product.id)
@@ -167,70 +170,139 @@ def inventory_list(request):
 @login_required
 def inventory_create(request):
     if request.method == 'POST':
-        inventory = Inventory.objects.create(
-            date=request.POST.get('date'),
-            description=request.POST.get('description'),
-            created_by=request.user
-        )
-        
-        # Populate with all active products
-        products = Product.objects.filter(active=True)
-        for product in products:
-            InventoryItem.objects.create(
-                inventory=inventory,
-                product=product,
-                location=product.location,
-                system_quantity=product.current_stock
+        with transaction.atomic():
+            inventory = Inventory.objects.create(
+                date=request.POST.get('date'),
+                description=request.POST.get('description'),
+                location_id=request.POST.get('location') or None,
+                created_by=request.user
             )
-            
-        messages.success(request, 'Balanço de Estoque iniciado com sucesso.')
+            # Fotografa os produtos ativos (do local escolhido) em um único INSERT ... SELECT
+            total = inventory_service.snapshot_items(inventory)
+
+        messages.success(request, f'Balanço de Estoque iniciado com sucesso ({total} produtos).')
         return redirect('estoque:inventory_detail', pk=inventory.id)
-    return render(request, 'estoque/inventory_form.html')
+    locations = StockLocation.objects.filter(active=True).order_by('name')
+    return render(request, 'estoque/inventory_form.html', {'locations': locations})
+
+def _inventory_items(inventory, params):
+    """Itens do balanço filtrados por local (?location=) e pendentes (?pending=1)."""
+    items = inventory.items.select_related('product', 'location').order_by('product__name')
+    location = params.get('location')
+    if location == 'none':
+        items = items.filter(location__isnull=True)
+    elif location:
+        items = items.filter(location_id=location)
+    if params.get('pending'):
+        items = items.filter(counted_at__isnull=True)
+    return items
 
 @login_required
 def inventory_detail(request, pk):
     inventory = get_object_or_404(Inventory, pk=pk)
-    items = inventory.items.all().select_related('product', 'location').order_by('product__name')
-    
+
     if request.method == 'POST':
         if 'finish_inventory' in request.POST:
-            inventory.status = 'COMPLETED'
-            inventory.save()
-            
-            # Update stock based on counts? 
-            # For now, just mark as completed. 
-            # Ideally we would create StockMovements to adjust stock.
-            # Let's implement stock adjustment logic here.
-            for item in items:
-                if item.counted_quantity is not None:
-                    diff = item.counted_quantity - item.system_quantity
-                    if diff != 0:
-                        StockMovement.objects.create(
-                            product=item.product,
-                            movement_type='IN' if diff > 0 else 'OUT',
-                            quantity=abs(diff),
-                            reason=f'Ajuste de Balanço #{inventory.id}'
-                        )
-            
-            messages.success(request, 'Balanço concluído e estoque ajustado.')
+            try:
+                total = inventory_service.finish_inventory(inventory)
+            except ValueError as e:
+                messages.error(request, str(e))
+                return redirect('estoque:inventory_detail', pk=inventory.id)
+            messages.success(request, f'Balanço concluído e estoque ajustado ({total} ajustes).')
             return redirect('estoque:inventory_list')
-            
-        else:
-            # Saving counts
-            for item in items:
-                count_key = f'count_{item.id}'
-                if count_key in request.POST:
-                    try:
-                        count_val = request.POST.get(count_key)
-                        if count_val:
-                            item.counted_quantity = int(count_val)
-                            item.save()
-                    except ValueError:
-                        pass
-            messages.success(request, 'Contagens salvas com sucesso.')
+
+        # Saving counts (apenas os campos preenchidos da página atual)
+        counts = {}
+        for key, value in request.POST.items():
+            if key.startswith('count_') and value.strip():
+                try:
+                    counts[key[len('count_'):]] = int(value)
+                except ValueError:
+                    pass
+        try:
+            saved = inventory_service.save_counts(inventory, counts)
+        except ValueError as e:
+            messages.error(request, str(e))
             return redirect('estoque:inventory_detail', pk=inventory.id)
-            
-    return render(request, 'estoque/inventory_detail.html', {'inventory': inventory, 'items': items})
+        messages.success(request, f'{saved} contagens salvas com sucesso.')
+        return redirect(request.get_full_path())
+
+    page_obj = Paginator(_inventory_items(inventory, request.GET), 200).get_page(request.GET.get('page'))
+    query = request.GET.copy()
+    query.pop('page', None)
+    return render(request, 'estoque/inventory_detail.html', {
+        'inventory': inventory,
+        'items': page_obj,
+        'page_obj': page_obj,
+        'progress': inventory_service.location_progress(inventory),
+        'selected_location': request.GET.get('location', ''),
+        'pending_only': bool(request.GET.get('pending')),
+        'query_string': query.urlencode(),
+    })
+
+@login_required
+def inventory_counts_api(request, pk):
+    """
+    API JSON de contagem.
+    GET: itens (filtros ?location= e ?pending=1) e andamento por local.
+    POST: {"counts": {"<item_id>": quantidade, ...}} grava contagens parciais.
+    """
+    inventory = get_object_or_404(Inventory, pk=pk)
+
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            saved = inventory_service.save_counts(inventory, data.get('counts') or {})
+        except (ValueError, TypeError, AttributeError) as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        return JsonResponse({
+            'status': 'success',
+            'saved': saved,
+            'progress': inventory_service.location_progress(inventory),
+        })
+
+    items = _inventory_items(inventory, request.GET).values(
+        'id', 'product_id', 'product__name', 'product__sku', 'location_id', 'system_quantity', 'counted_quantity'
+    )
+    return JsonResponse({
+        'status': inventory.status,
+        'items': list(items),
+        'progress': inventory_service.location_progress(inventory),
+    })
+
+
+def _date_param(request, name, default=None):
+    value = parse_date(request.GET.get(name) or '')
+    return value or default or timezone.localdate()
+
+@login_required
+def stock_history_api(request):
+    """
+    API JSON de histórico de estoque.
+    ?date=AAAA-MM-DD: saldo de todos os produtos na data.
+    ?start=...&end=...: giro no período (entradas, saídas, saldos inicial/final).
+    """
+    if request.GET.get('start'):
+        start = _date_param(request, 'start')
+        end = _date_param(request, 'end')
+        rows = stock_history.stock_turnover(start, end)
+        for row in rows:
+            row['turnover'] = str(row['turnover']) if row['turnover'] is not None else None
+        return JsonResponse({'start': start.isoformat(), 'end': end.isoformat(), 'products': rows})
+
+    as_of = _date_param(request, 'date')
+    rows = stock_history.stock_as_of(as_of).values('id', 'sku', 'name', 'stock_as_of').order_by('name')
+    return JsonResponse({'date': as_of.isoformat(), 'products': list(rows)})
+
+@login_required
+def stock_valuation_export(request):
+    """Relatório de valorização do estoque (CSV) na data informada (?date=, padrão hoje)."""
+    as_of = _date_param(request, 'date')
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="valorizacao_estoque_{as_of:%Y%m%d}.csv"'
+    response.write('\ufeff')  # BOM para o Excel reconhecer UTF-8
+    stock_history.write_valuation_csv(response, as_of)
+    return response
 
 
 # ========== Família de Produto ==========
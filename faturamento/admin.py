@@ -1,8 +1,8 @@
 from django.contrib import admin
-from .models import Invoice
+from .models import Invoice, ProdutoFornecedor
 from django.http import HttpResponse
 from django.template.loader import get_template
-from xhtml2pdf import pisa
+from core.services.pdf import create_pdf
 
 def generate_invoice_pdf(modeladmin, request, queryset):
     for invoice in queryset:
@@ -12,7 +12,7 @@ def generate_invoice_pdf(modeladmin, request, queryset):
         response['Content-Disposition'] = f'attachment; filename="fatura_{invoice.number}.pdf"'
         template = get_template(template_path)
         html = template.render(context)
-        pisa_status = pisa.CreatePDF(html, dest=response)
+        pisa_status = create_pdf(html, dest=response)
         if pisa_status.err:
             return HttpResponse('Erro ao gerar PDF')
         return response
@@ -25,3 +25,10 @@ class InvoiceAdmin(admin.ModelAdmin):
     list_filter = ('status', 'issue_date')
     search_fields = ('number', 'billing_group__name')
     actions = [generate_invoice_pdf]
+
+
+@admin.register(ProdutoFornecedor)
+class ProdutoFornecedorAdmin(admin.ModelAdmin):
+    list_display = ('fornecedor', 'codigo', 'ean', 'descricao', 'produto', 'confirmacoes', 'updated_at')
+    search_fields = ('codigo', 'ean', 'descricao', 'fornecedor__name', 'produto__name')
+    raw_id_fields = ('fornecedor', 'produto')
@@ -0,0 +1,58 @@
+import tempfile
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from faturamento.services.nfe_import import importar_lote_nfe
+
+NFE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00"><NFe><infNFe Id="NFe{chave}" versao="4.00">
+<ide><nNF>{numero}</nNF><serie>1</serie><dhEmi>{emissao}T10:00:00-03:00</dhEmi></ide>
+<emit><CNPJ>{cnpj}</CNPJ><xNome>Fornecedor {fornecedor}</xNome><enderEmit><xLgr>Rua A</xLgr><nro>1</nro>
+<xBairro>Centro</xBairro><xMun>Recife</xMun><UF>PE</UF><CEP>50000000</CEP></enderEmit></emit>
+{itens}<total><ICMSTot><vNF>{total}</vNF></ICMSTot></total>
+<cobr><dup><nDup>001</nDup><dVenc>{emissao}</dVenc><vDup>{total}</vDup></dup></cobr>
+</infNFe></NFe></nfeProc>"""
+
+NFE_ITEM = """<det nItem="{n}"><prod><cProd>P{n:04d}</cProd><cEAN>SEM GTIN</cEAN><xProd>Produto {n}</xProd>
+<NCM>85444200</NCM><CFOP>5102</CFOP><uCom>UN</uCom><qCom>2.0000</qCom><vUnCom>5.00</vUnCom><vProd>10.00</vProd>
+</prod></det>"""
+
+
+def gerar_xml(numero, itens=5, fornecedores=20):
+    """XML sintético de NF-e (chave única por número)."""
+    return NFE_XML.format(
+        chave=f'{numero:044d}',
+        numero=numero,
+        emissao=date.today().isoformat(),
+        cnpj=f'{numero % fornecedores:014d}',
+        fornecedor=numero % fornecedores,
+        itens=''.join(NFE_ITEM.format(n=n) for n in range(1, itens + 1)),
+        total=f'{itens * 10:.2f}',
+    ).encode()
+
+
+class Command(BaseCommand):
+    help = 'Mede a importação em lote de NF-e com XMLs sintéticos (nada é gravado)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantidade', type=int, default=1000, help='Quantidade de XMLs (padrão 1000)')
+        parser.add_argument('--itens', type=int, default=5, help='Itens por nota (padrão 5)')
+
+    def handle(self, *args, **options):
+        xmls = [(f'nfe_{n}.xml', gerar_xml(n, options['itens'])) for n in range(1, options['quantidade'] + 1)]
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                with transaction.atomic():
+                    notas, results = importar_lote_nfe(xmls)
+                    elapsed = time.perf_counter() - start
+                    transaction.set_rollback(True)
+
+        self.stdout.write(f'{len(notas)} notas ({len(notas) * options["itens"]} itens) em {elapsed:.2f}s')
+        self.stdout.write(f'{len(xmls) / elapsed:.0f} XMLs/s, {len(queries)} queries')
+        self.stdout.write(self.style.SUCCESS('Benchmark concluído (transação desfeita).'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from faturamento.services.nfe_import import importar_lote_nfe
+
+
+class Command(BaseCommand):
+    help = 'Importa NF-e de compra a partir de arquivos XML, ZIPs ou pastas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Arquivos .xml/.zip ou pastas com XMLs')
+
+    def handle(self, *args, **options):
+        try:
+            notas, results = importar_lote_nfe(options['paths'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for result in results:
+            if result.status == 'importada':
+                self.stdout.write(f"[OK] {result.filename}: nota #{result.nota_id}")
+            elif result.status == 'duplicada':
+                self.stdout.write(self.style.WARNING(f"[DUPLICADA] {result.filename}: {result.chave_acesso}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"[ERRO] {result.filename}: {result.message}"))
+
+        skipped = len(results) - len(notas)
+        self.stdout.write(self.style.SUCCESS(f'{len(notas)} nota(s) importada(s), {skipped} ignorada(s).'))
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.5 on 2026-10-19 15:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def learn_from_launched_notes(apps, schema_editor):
+    """Semeia o de/para com os itens das notas já lançadas (a revisão mais recente prevalece)."""
+    NotaEntradaItem = apps.get_model('faturamento', 'NotaEntradaItem')
+    ProdutoFornecedor = apps.get_model('faturamento', 'ProdutoFornecedor')
+
+    mappings = {}
+    items = (
+        NotaEntradaItem.objects.filter(nota__status='LANCADA', produto__isnull=False)
+        .exclude(cProd__isnull=True).exclude(cProd='')
+        .order_by('nota__data_emissao', 'id')
+        .values_list('nota__fornecedor_id', 'cProd', 'cEAN', 'xProd', 'produto_id')
+    )
+    for supplier_id, code, ean, description, product_id in items.iterator():
+        key = (supplier_id, code)
+        confirmations = mappings[key].confirmacoes + 1 if key in mappings else 1
+        mappings[key] = ProdutoFornecedor(
+            fornecedor_id=supplier_id, codigo=code, ean=ean, descricao=description,
+            produto_id=product_id, confirmacoes=confirmations,
+        )
+    ProdutoFornecedor.objects.bulk_create(mappings.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_person_name_trgm_index'),
+        ('estoque', '0007_movement_source'),
+        ('faturamento', '0013_invoice_complementary_info'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProdutoFornecedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=60, verbose_name='Código no Fornecedor (cProd)')),
+                ('ean', models.CharField(blank=True, max_length=14, null=True, verbose_name='EAN (cEAN)')),
+                ('descricao', models.CharField(blank=True, max_length=255, null=True, verbose_name='Descrição no XML')),
+                ('confirmacoes', models.PositiveIntegerField(default=1, verbose_name='Confirmações')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('fornecedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='produtos_fornecedor', to='core.person', verbose_name='Fornecedor')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codigos_fornecedor', to='estoque.product', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'De/Para de Produto do Fornecedor',
+                'verbose_name_plural': 'De/Para de Produtos dos Fornecedores',
+                'constraints': [models.UniqueConstraint(fields=('fornecedor', 'codigo'), name='unique_produto_fornecedor_codigo')],
+            },
+        ),
+        migrations.RunPython(learn_from_launched_notes, migrations.RunPython.noop),
+    ]
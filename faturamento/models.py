@@ -208,3 +208,26 @@ class NotaEntradaParcela(models.Model):
 
     def __str__(self):
         return f"Parcela {self.numero_parcela} - {self.nota}"
+
+
+class ProdutoFornecedor(models.Model):
+    """De/para do código do produto no fornecedor (cProd/cEAN) para o produto do estoque, aprendido nas revisões de NF-e."""
+    fornecedor = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='produtos_fornecedor', verbose_name="Fornecedor")
+    codigo = models.CharField(max_length=60, verbose_name="Código no Fornecedor (cProd)")
+    ean = models.CharField(max_length=14, blank=True, null=True, verbose_name="EAN (cEAN)")
+    descricao = models.CharField(max_length=255, blank=True, null=True, verbose_name="Descrição no XML")
+    produto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='codigos_fornecedor', verbose_name="Produto")
+    confirmacoes = models.PositiveIntegerField(default=1, verbose_name="Confirmações")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.fornecedor} [{self.codigo}] -> {self.produto}"
+
+    class Meta:
+        verbose_name = "De/Para de Produto do Fornecedor"
+        verbose_name_plural = "De/Para de Produtos dos Fornecedores"
+        constraints = [
+            models.UniqueConstraint(fields=['fornecedor', 'codigo'], name='unique_produto_fornecedor_codigo'),
+        ]
@@ -1,5 +1,5 @@
 from django.template.loader import get_template
-from xhtml2pdf import pisa
+from core.services.pdf import create_pdf
 from django.core.files.base import ContentFile
 from core.models import CompanySettings
 import io
@@ -24,7 +24,7 @@ def generate_invoice_pdf_file(invoice):
         
         # Buffer de memória para o PDF
         result = io.BytesIO()
-        pisa_status = pisa.CreatePDF(html, dest=result)
+        pisa_status = create_pdf(html, dest=result)
         
         if pisa_status.err:
             msg = f"Erro ao gerar PDF para fatura {invoice.number}"
@@ -0,0 +1,194 @@
+"""
+Gravação em lote de faturas e itens.
+
+Fora de um lote, cada InvoiceItem salvo recalcula o total da fatura e cada
+Invoice salva sincroniza o contas a receber (faturamento.signals). Dentro de
+`with invoice_batch() as writer:` esses sinais apenas anotam quais faturas
+foram tocadas; ao sair do bloco os totais são recalculados com uma única
+agregação e os recebíveis são criados/atualizados de uma vez.
+
+    with invoice_batch() as writer:
+        invoice = Invoice.objects.create(...)
+        writer.add_items(invoice, [InvoiceItem(...), ...])
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+_state = threading.local()
+
+
+def current_batch():
+    """Lote ativo na thread atual (ou None)."""
+    stack = getattr(_state, 'stack', None)
+    return stack[-1] if stack else None
+
+
+class InvoiceBatch:
+    def __init__(self):
+        self.invoices = {}        # id -> instância (para manter o amount em memória coerente)
+        self.item_changes = set()  # faturas cujos itens mudaram: total deve ser recalculado
+
+    def touch_invoice(self, invoice):
+        self.invoices.setdefault(invoice.pk, invoice)
+
+    def touch_items(self, invoice):
+        self.touch_invoice(invoice)
+        self.item_changes.add(invoice.pk)
+
+    def add_items(self, invoice, items):
+        """Cria os itens com bulk_create (total_price calculado como em InvoiceItem.save)."""
+        from faturamento.models import InvoiceItem
+
+        for item in items:
+            item.invoice = invoice
+            item.total_price = item.quantity * item.unit_price
+        created = InvoiceItem.objects.bulk_create(items)
+        self.touch_items(invoice)
+        invoice.amount = sum((item.total_price for item in items), Decimal('0'))
+        return created
+
+    def flush(self):
+        """Aplica totais e sincroniza recebíveis das faturas tocadas até aqui."""
+        from faturamento.models import Invoice, InvoiceItem
+
+        if self.item_changes:
+            totals = dict(
+                InvoiceItem.objects.filter(invoice_id__in=self.item_changes)
+                .values('invoice_id').annotate(total=Sum('total_price'))
+                .values_list('invoice_id', 'total')
+            )
+            current = dict(Invoice.objects.filter(pk__in=self.item_changes).values_list('pk', 'amount'))
+            changed = []
+            for invoice_id in self.item_changes:
+                total = totals.get(invoice_id) or Decimal('0')
+                self.invoices[invoice_id].amount = total
+                if current.get(invoice_id) != total:
+                    changed.append(Invoice(pk=invoice_id, amount=total, updated_at=timezone.now()))
+            Invoice.objects.bulk_update(changed, ['amount', 'updated_at'])
+
+        if self.invoices:
+            sync_receivables(self.invoices.keys())
+        self.invoices = {}
+        self.item_changes = set()
+
+
+@contextmanager
+def invoice_batch():
+    """Suspende os sinais de Invoice/InvoiceItem e sincroniza tudo ao sair (em transação)."""
+    batch = InvoiceBatch()
+    if not hasattr(_state, 'stack'):
+        _state.stack = []
+    with transaction.atomic():
+        _state.stack.append(batch)
+        try:
+            yield batch
+        finally:
+            _state.stack.pop()
+        batch.flush()
+
+
+def contract_invoice_items(contract, month=None, year=None):
+    """Itens (não gravados) da fatura de um contrato, para InvoiceBatch.add_items."""
+    from faturamento.models import InvoiceItem
+
+    items = [
+        InvoiceItem(
+            item_type='SERVICE' if item.category != 'COMODATO' else 'RENT',
+            description=item.description,
+            quantity=item.quantity or 1,
+            unit_price=item.unit_price,
+            financial_category_id=item.financial_category_id,
+            notes=f"Categoria: {item.get_category_display()}"
+        )
+        for item in contract.items.all()
+    ]
+    if not items:
+        # Fallback for old single-value contracts
+        items.append(InvoiceItem(
+            item_type='SERVICE',
+            description=f"Serviços de {contract.billing_group.name if contract.billing_group else 'Suporte'}",
+            quantity=1,
+            unit_price=contract.value,
+            notes=f"Competência: {month:02d}/{year}" if month and year else None
+        ))
+    return items
+
+
+def sync_receivables(invoices):
+    """
+    Cria ou atualiza o contas a receber de cada fatura (mesmas regras do sinal
+    sync_account_receivable), em poucas queries para qualquer quantidade de faturas.
+    Aceita instâncias de Invoice já gravadas ou ids.
+    """
+    from faturamento.models import Invoice, InvoiceItem
+    from financeiro.models import AccountReceivable, CategoriaFinanceira
+    from financeiro.services.kpis import mark_stale
+
+    invoices = list(invoices)
+    if invoices and not isinstance(invoices[0], Invoice):
+        invoices = list(Invoice.objects.filter(pk__in=invoices).select_related('client'))
+    if not invoices:
+        return
+    invoice_ids = [invoice.pk for invoice in invoices]
+
+    # Categoria do primeiro item de cada fatura
+    first_categories = {}
+    for invoice_id, category_id in (
+        InvoiceItem.objects.filter(invoice_id__in=invoice_ids).order_by('invoice_id', 'id')
+        .values_list('invoice_id', 'financial_category_id')
+    ):
+        first_categories.setdefault(invoice_id, category_id)
+
+    receivables = {}
+    for receivable in AccountReceivable.objects.filter(invoice_id__in=invoice_ids).order_by('-id'):
+        receivables[receivable.invoice_id] = receivable
+
+    now = timezone.now()
+    default_category = None
+    to_create = []
+    to_update = []
+    for invoice in invoices:
+        description = f"Fatura #{invoice.number}"
+        if invoice.client:
+            description += f" - {invoice.client.name}"
+        payment_method = invoice.get_payment_method_display()
+
+        receivable = receivables.get(invoice.pk)
+        if receivable is None:
+            category_id = first_categories.get(invoice.pk)
+            if category_id is None:
+                if default_category is None:
+                    default_category, _ = CategoriaFinanceira.objects.get_or_create(
+                        nome="Prestação de Serviços",
+                        defaults={'tipo': 'entrada', 'grupo_dre': '1. Receita Bruta', 'ordem_exibicao': 1}
+                    )
+                category_id = default_category.pk
+            to_create.append(AccountReceivable(
+                description=description,
+                client=invoice.client,
+                category_id=category_id,
+                amount=invoice.amount,
+                due_date=invoice.due_date,
+                status='PENDING',
+                invoice=invoice,
+                document_number=invoice.number,
+                payment_method=payment_method,
+            ))
+        else:
+            receivable.amount = invoice.amount
+            receivable.due_date = invoice.due_date
+            receivable.description = description
+            receivable.payment_method = payment_method
+            receivable.updated_at = now
+            to_update.append(receivable)
+
+    AccountReceivable.objects.bulk_create(to_create, batch_size=500)
+    AccountReceivable.objects.bulk_update(
+        to_update, ['amount', 'due_date', 'description', 'payment_method', 'updated_at'], batch_size=500
+    )
+    transaction.on_commit(mark_stale)
@@ -1,195 +1,371 @@
-import xml.etree.ElementTree as ET
+"""
+Importação de NF-e de compra (notas de entrada).
+
+Cada XML é lido em streaming com lxml.etree.iterparse (elementos liberados
+após o uso), e a importação trabalha em lote: duplicidade de chave_acesso em
+uma única consulta IN, fornecedores e produtos resolvidos por índices em
+dicionário (CNPJ, cEAN, cProd e o de/para de cada fornecedor, ver
+produto_fornecedor) carregados uma vez, e notas, itens e parcelas
+gravados com bulk_create. Cada nota é validada ao ser lida: um XML
+incompleto, com valores inválidos ou um ZIP corrompido vira erro só daquele
+arquivo. O XML original é copiado para um arquivo temporário do lote (a
+memória não cresce com o lote) e só vai para o storage depois do commit.
+processar_xml_nfe continua disponível para um único arquivo e usa o mesmo
+caminho.
+"""
+import io
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import partial
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
+from lxml import etree
+
 from core.models import Person
-from estoque.models import Product, Brand, Category  # Assuming these exist
+from estoque.models import Product
 from faturamento.models import NotaEntrada, NotaEntradaItem, NotaEntradaParcela
+from faturamento.services.produto_fornecedor import carregar_indices
+
+SEM_GTIN = 'SEM GTIN'
+
+
+@dataclass
+class NFeFileResult:
+    filename: str
+    status: str  # 'importada', 'duplicada' ou 'erro'
+    chave_acesso: str = ''
+    nota_id: int = None
+    message: str = ''
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def _children(element):
+    """{nome_local: texto} dos filhos diretos."""
+    return {_local(child.tag): (child.text or '').strip() for child in element}
+
+
+def ler_nfe(source):
+    """
+    Lê um XML de NF-e (caminho, arquivo ou bytes) em streaming.
+    Retorna um dict com os dados da nota, emitente, itens e duplicatas.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    nfe = {'itens': [], 'duplicatas': [], 'emitente': {}, 'endereco': {}}
+    for _, element in etree.iterparse(source, events=('end',), huge_tree=True):
+        tag = _local(element.tag)
+        if tag == 'infNFe':
+            nfe['chave_acesso'] = element.get('Id', '')[3:]  # Remove 'NFe' prefix
+        elif tag == 'ide':
+            ide = _children(element)
+            nfe['numero_nota'] = ide.get('nNF')
+            nfe['serie'] = ide.get('serie')
+            nfe['data_emissao'] = datetime.fromisoformat(ide.get('dhEmi') or ide.get('dEmi')).date()
+        elif tag == 'enderEmit':
+            nfe['endereco'] = _children(element)
+            continue  # os irmãos (CNPJ, xNome) ainda serão lidos no fim de <emit>
+        elif tag == 'emit':
+            nfe['emitente'] = _children(element)
+        elif tag == 'prod':
+            nfe['itens'].append(_children(element))
+        elif tag == 'dup':
+            nfe['duplicatas'].append(_children(element))
+        elif tag == 'ICMSTot':
+            nfe['valor_total'] = _children(element).get('vNF')
+        elif tag != 'det':
+            continue
+        # Libera da árvore os elementos já processados (itens anteriores inclusive)
+        element.clear()
+        if tag == 'det':
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+    if not nfe.get('chave_acesso'):
+        raise ValueError("XML não contém uma NF-e (infNFe não encontrado).")
+    return nfe
 
-def processar_xml_nfe(xml_file):
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-    
-    # Namespaces usually exist in NFe, we need to handle them or ignore them
-    # NFe namespace: {http://www.portalfiscal.inf.br/nfe}
-    ns = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
-    
-    # 1. Parse Emission Info
-    infNFe = root.find('.//nfe:infNFe', ns)
-    if infNFe is None:
-         # Try without namespace if failed (sometimes XMLs are stripped)
-         ns = {}
-         infNFe = root.find('.//infNFe')
-    
-    ide = infNFe.find('nfe:ide', ns)
-    emit = infNFe.find('nfe:emit', ns)
-    total = infNFe.find('nfe:total/nfe:ICMSTot', ns)
-    
-    chave_acesso = infNFe.attrib.get('Id', '')[3:] # Remove 'NFe' prefix
-
-    # 1a. Check for Duplicates
-    if NotaEntrada.objects.filter(chave_acesso=chave_acesso).exists():
-        raise ValueError(f"Nota Fiscal com chave {chave_acesso} já foi importada.")
-
-    numero_nota = ide.find('nfe:nNF', ns).text
-    serie = ide.find('nfe:serie', ns).text
-    data_emissao_str = ide.find('nfe:dhEmi', ns).text
-    # Parse date (ISO format usually: 2023-10-25T14:30:00-03:00)
-    data_emissao = datetime.fromisoformat(data_emissao_str).date()
-    
-    valor_total = total.find('nfe:vNF', ns).text
-    
-    # 2. Find or Create Supplier
-    cnpj_emit = emit.find('nfe:CNPJ', ns).text
-    razao_social = emit.find('nfe:xNome', ns).text
-    nome_fantasia = emit.find('nfe:xFant', ns).text if emit.find('nfe:xFant', ns) is not None else razao_social
-    
-    # Address info
-    enderEmit = emit.find('nfe:enderEmit', ns)
-    logradouro = enderEmit.find('nfe:xLgr', ns).text
-    numero = enderEmit.find('nfe:nro', ns).text
-    bairro = enderEmit.find('nfe:xBairro', ns).text
-    municipio = enderEmit.find('nfe:xMun', ns).text
-    uf = enderEmit.find('nfe:UF', ns).text
-    cep = enderEmit.find('nfe:CEP', ns).text
-    
-    supplier, created = Person.objects.get_or_create(
-        document=cnpj_emit,
-        defaults={
-            'name': razao_social,
-            'fantasy_name': nome_fantasia,
-            'person_type': 'PJ',
-            'is_supplier': True,
-            'address': logradouro,
-            'number': numero,
-            'neighborhood': bairro,
-            'city': municipio,
-            'state': uf,
-            'zip_code': cep
-        }
-    )
-    
-    if not supplier.is_supplier:
-        supplier.is_supplier = True
-        supplier.save()
-
-    # 3. Create NotaEntrada
-    nota = NotaEntrada.objects.create(
-        fornecedor=supplier,
-        chave_acesso=chave_acesso,
-        numero_nota=numero_nota,
-        serie=serie,
-        data_emissao=data_emissao,
-        valor_total=valor_total,
-        arquivo_xml=xml_file,
-        status='IMPORTADA'
-    )
-    
-    # 3a. Extract and Create Parcelas
-    duplicatas = extract_duplicatas(xml_file)
-    if duplicatas:
-        for dup in duplicatas:
-            NotaEntradaParcela.objects.create(
-                nota=nota,
-                numero_parcela=dup['number'],
-                data_vencimento=dup['due_date'],
-                valor=dup['amount']
-            )
-    else:
-        # If no duplicates, assume single parcel (create one for review)
-        NotaEntradaParcela.objects.create(
-            nota=nota,
-            numero_parcela='001',
-            data_vencimento=data_emissao, # Default to issue date or today
-            valor=valor_total,
-            forma_pagamento='OUTROS' # Default
-        )
 
-    # 4. Process Items
-    dets = infNFe.findall('nfe:det', ns)
-    for det in dets:
-        prod = det.find('nfe:prod', ns)
-        imposto = det.find('nfe:imposto', ns)
-        
-        cProd = prod.find('nfe:cProd', ns).text
-        cEAN = prod.find('nfe:cEAN', ns).text
-        xProd = prod.find('nfe:xProd', ns).text
-        NCM = prod.find('nfe:NCM', ns).text
-        CFOP = prod.find('nfe:CFOP', ns).text
-        uCom = prod.find('nfe:uCom', ns).text
-        qCom = prod.find('nfe:qCom', ns).text
-        vUnCom = prod.find('nfe:vUnCom', ns).text
-        vProd = prod.find('nfe:vProd', ns).text
-        
-        # Try to find product by EAN or SKU
-        produto = None
-        if cEAN and cEAN != 'SEM GTIN' and cEAN.strip():
-            produto = Product.objects.filter(sku=cEAN).first()
-            
-        if not produto and cProd:
-            produto = Product.objects.filter(sku=cProd).first()
-            
-        # Just store the XML data in the item
-            
-        NotaEntradaItem.objects.create(
-            nota=nota,
-            produto=produto, # Can be None now
-            quantidade=qCom,
-            valor_unitario=vUnCom,
-            valor_total=vProd,
-            cfop=CFOP,
-            xProd=xProd[:255],
-            cProd=cProd[:60],
-            cEAN=cEAN[:14] if cEAN else None
-        )
-        
-    return nota
-    
 def extract_duplicatas(xml_file):
-    # Pass just path if it's a field file, handled by ET.parse?
-    # ET.parse accepts file path or file-like object. 
-    # If xml_file is a FieldFile, use .path or .open()
+    """Duplicatas (nDup, vencimento, valor) do XML."""
+    if hasattr(xml_file, 'path'):
+        xml_file = xml_file.path
+    elif hasattr(xml_file, 'seek'):
+        xml_file.seek(0)
+    return [_duplicata(dup) for dup in ler_nfe(xml_file)['duplicatas']]
+
+
+def _duplicata(dup):
     try:
-        if hasattr(xml_file, 'path'):
-            source = xml_file.path
-        else:
-            source = xml_file
-        tree = ET.parse(source)
-    except:
-        # Retry with seek 0 if it's an open file
-        if hasattr(xml_file, 'seek'):
-            xml_file.seek(0)
-        tree = ET.parse(xml_file)
-        
-    root = tree.getroot()
-    root = tree.getroot()
-    
-    # NFe namespace
-    ns = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
-    
-    # Try with and without namespace
-    cobr = root.find('.//nfe:cobr', ns)
-    if cobr is None:
-         ns = {}
-         cobr = root.find('.//cobr')
-         
-    duplicatas = []
-    
-    if cobr is not None:
-        dups = cobr.findall('nfe:dup', ns) if 'nfe' in ns else cobr.findall('dup')
-        for dup in dups:
-            nDup = dup.find('nfe:nDup', ns).text if 'nfe' in ns else dup.find('nDup').text
-            dVenc_str = dup.find('nfe:dVenc', ns).text if 'nfe' in ns else dup.find('dVenc').text
-            vDup = dup.find('nfe:vDup', ns).text if 'nfe' in ns else dup.find('vDup').text
-            
+        due_date = datetime.strptime(dup.get('dVenc', ''), '%Y-%m-%d').date()
+    except ValueError:
+        due_date = timezone.now().date()  # Fallback
+    return {'number': dup.get('nDup'), 'due_date': due_date, 'amount': dup.get('vDup')}
+
+
+def iter_xml_files(uploads):
+    """
+    Expande uploads/caminhos em (nome, bytes): arquivos .xml, .zip (membros .xml)
+    e pastas (busca recursiva). Aceita UploadedFile, caminhos ou tuplas (nome, bytes).
+    Um ZIP que não pode ser lido gera (nome, exceção) e a leitura continua.
+    """
+    for upload in uploads:
+        if isinstance(upload, tuple):
+            yield upload
+            continue
+        if isinstance(upload, (str, os.PathLike)) and os.path.isdir(upload):
+            for root, _, files in os.walk(upload):
+                for name in sorted(files):
+                    if name.lower().endswith(('.xml', '.zip')):
+                        yield from iter_xml_files([os.path.join(root, name)])
+            continue
+
+        name = os.path.basename(getattr(upload, 'name', None) or str(upload))
+        if name.lower().endswith('.zip'):
             try:
-                dVenc = datetime.strptime(dVenc_str, '%Y-%m-%d').date()
-            except ValueError:
-                dVenc = timezone.now().date() # Fallback
-                
-            duplicatas.append({
-                'number': nDup,
-                'due_date': dVenc,
-                'amount': vDup
-            })
-            
-    return duplicatas
+                with zipfile.ZipFile(upload) as archive:
+                    for member in archive.infolist():
+                        if not member.is_dir() and member.filename.lower().endswith('.xml'):
+                            yield os.path.basename(member.filename), archive.read(member)
+            except zipfile.BadZipFile as e:
+                yield name, e
+        elif isinstance(upload, (str, os.PathLike)):
+            with open(upload, 'rb') as f:
+                yield name, f.read()
+        else:
+            upload.seek(0)
+            yield name, upload.read()
+
+
+def _decimal(value, campo):
+    try:
+        return Decimal(value or '0')
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido em {campo}: {value!r}")
+
+
+def validar_nfe(nfe):
+    """Confere os campos obrigatórios e converte os valores; ValueError descreve o problema."""
+    faltando = [campo for campo, chave in (('ide/nNF', 'numero_nota'), ('ide/dhEmi', 'data_emissao'),
+                                           ('ICMSTot/vNF', 'valor_total')) if not nfe.get(chave)]
+    if not (nfe['emitente'].get('CNPJ') or nfe['emitente'].get('CPF')):
+        faltando.append('emit/CNPJ')
+    if faltando:
+        raise ValueError(f"NF-e incompleta: falta {', '.join(faltando)}.")
+    nfe['valor_total'] = _decimal(nfe['valor_total'], 'vNF')
+    for item in nfe['itens']:
+        for campo in ('qCom', 'vUnCom', 'vProd'):
+            item[campo] = _decimal(item.get(campo), campo)
+    for dup in nfe['duplicatas']:
+        dup['vDup'] = _decimal(dup.get('vDup'), 'vDup')
+    return nfe
+
+
+def _gravar_xmls(spool, pendentes):
+    """Depois do commit: copia cada XML do arquivo temporário do lote para o storage."""
+    field = NotaEntrada._meta.get_field('arquivo_xml')
+    with spool:
+        for nota, filename, offset, size in pendentes:
+            spool.seek(offset)
+            nota.arquivo_xml.name = default_storage.save(
+                field.generate_filename(nota, filename), ContentFile(spool.read(size)))
+    NotaEntrada.objects.bulk_update([nota for nota, *_ in pendentes], ['arquivo_xml'], batch_size=500)
+
+
+def _resolve_suppliers(parsed):
+    """Fornecedores por CNPJ: uma consulta para os existentes e bulk_create dos novos."""
+    emitentes = {}
+    for nfe in parsed:
+        emit = nfe['emitente']
+        document = emit.get('CNPJ') or emit.get('CPF')
+        nfe['document'] = document
+        emitentes.setdefault(document, nfe)
+
+    suppliers = {p.document: p for p in Person.objects.filter(document__in=emitentes)}
+    Person.objects.filter(document__in=emitentes, is_supplier=False).update(is_supplier=True)
+
+    new = []
+    for document, nfe in emitentes.items():
+        if document in suppliers:
+            continue
+        emit, ender = nfe['emitente'], nfe['endereco']
+        new.append(Person(
+            document=document,
+            name=emit.get('xNome'),
+            fantasy_name=emit.get('xFant') or emit.get('xNome'),
+            person_type='PJ' if emit.get('CNPJ') else 'PF',
+            is_supplier=True,
+            address=ender.get('xLgr'),
+            number=ender.get('nro'),
+            neighborhood=ender.get('xBairro'),
+            city=ender.get('xMun'),
+            state=ender.get('UF'),
+            zip_code=ender.get('CEP'),
+        ))
+    # bulk_create devolve as chaves primárias no PostgreSQL e no SQLite
+    suppliers.update({p.document: p for p in Person.objects.bulk_create(new)})
+    return suppliers
+
+
+def _product_index(parsed):
+    """Índice código -> produto_id para cEAN (SKU ou código de barras) e cProd (SKU)."""
+    codes = set()
+    for nfe in parsed:
+        for item in nfe['itens']:
+            codes.update(code for code in (item.get('cEAN'), item.get('cProd')) if code and code != SEM_GTIN)
+    if not codes:
+        return {}, {}
+    by_sku, by_barcode = {}, {}
+    for product_id, sku, barcode in Product.objects.filter(
+        Q(sku__in=codes) | Q(barcode__in=codes)
+    ).values_list('id', 'sku', 'barcode'):
+        by_sku[sku] = product_id
+        if barcode:
+            by_barcode[barcode] = product_id
+    return by_sku, by_barcode
+
+
+def _match_product(item, de_para, by_sku, by_barcode):
+    """De/para do fornecedor, depois cadastro (cEAN, cProd) e, por último, descrição já aprendida."""
+    ean = item.get('cEAN')
+    product_id = de_para.exato(item.get('cProd'), ean)
+    if product_id:
+        return product_id
+    if ean and ean != SEM_GTIN:
+        product_id = by_sku.get(ean) or by_barcode.get(ean)
+        if product_id:
+            return product_id
+    return by_sku.get(item.get('cProd')) or de_para.mesma_descricao(item.get('xProd'))
+
+
+def importar_lote_nfe(uploads):
+    """
+    Importa um lote de XMLs (arquivos, ZIPs ou pastas).
+    Retorna (notas criadas, relatório por arquivo [NFeFileResult]).
+    """
+    spool = tempfile.TemporaryFile()
+    try:
+        return _importar(uploads, spool)
+    except BaseException:
+        spool.close()
+        raise
+
+
+def _importar(uploads, spool):
+    results = []
+    parsed = []
+    for filename, content in iter_xml_files(uploads):
+        if isinstance(content, Exception):
+            results.append(NFeFileResult(filename, 'erro', message=f"Arquivo ZIP inválido: {content}"))
+            continue
+        try:
+            nfe = validar_nfe(ler_nfe(content))
+        except (etree.XMLSyntaxError, ValueError, TypeError) as e:
+            results.append(NFeFileResult(filename, 'erro', message=str(e)))
+            continue
+        nfe['filename'], nfe['xml'] = filename, (spool.tell(), len(content))
+        spool.write(content)
+        result = NFeFileResult(filename, 'importada', chave_acesso=nfe['chave_acesso'])
+        nfe['result'] = result
+        results.append(result)
+        parsed.append(nfe)
+
+    with transaction.atomic():
+        notas = _gravar_lote(parsed)
+        if notas:
+            pendentes = [(nota, nfe['filename'], *nfe['xml']) for nfe, nota in zip(parsed, notas)]
+            transaction.on_commit(partial(_gravar_xmls, spool, pendentes))
+        else:
+            spool.close()
+    return notas, results
+
+
+def _gravar_lote(parsed):
+    """Descarta as duplicadas de `parsed` (no lugar) e grava as demais; devolve as notas na mesma ordem."""
+    # Duplicidade: uma consulta IN para o lote todo (e repetidas dentro do próprio lote)
+    existing = set(
+        NotaEntrada.objects.filter(chave_acesso__in=[n['chave_acesso'] for n in parsed])
+        .values_list('chave_acesso', flat=True)
+    )
+    unique = []
+    for nfe in parsed:
+        if nfe['chave_acesso'] in existing:
+            nfe['result'].status = 'duplicada'
+            nfe['result'].message = f"Nota Fiscal com chave {nfe['chave_acesso']} já foi importada."
+            continue
+        existing.add(nfe['chave_acesso'])
+        unique.append(nfe)
+    parsed[:] = unique
+    if not unique:
+        return []
+
+    suppliers = _resolve_suppliers(unique)
+    by_sku, by_barcode = _product_index(unique)
+    de_para = carregar_indices({supplier.pk for supplier in suppliers.values()})
+
+    notas = []
+    for nfe in unique:
+        nota = NotaEntrada(
+            fornecedor=suppliers[nfe['document']],
+            chave_acesso=nfe['chave_acesso'],
+            numero_nota=nfe['numero_nota'],
+            serie=nfe['serie'],
+            data_emissao=nfe['data_emissao'],
+            valor_total=nfe['valor_total'],
+            status='IMPORTADA',
+        )
+        notas.append(nota)
+    NotaEntrada.objects.bulk_create(notas, batch_size=500)
+
+    itens = []
+    parcelas = []
+    for nfe, nota in zip(unique, notas):
+        nfe['result'].nota_id = nota.pk
+        indice = de_para[nota.fornecedor_id]
+        duplicatas = [_duplicata(dup) for dup in nfe['duplicatas']]
+        if duplicatas:
+            parcelas.extend(
+                NotaEntradaParcela(nota=nota, numero_parcela=dup['number'], data_vencimento=dup['due_date'], valor=dup['amount'])
+                for dup in duplicatas
+            )
+        else:
+            # If no duplicates, assume single parcel (create one for review)
+            parcelas.append(NotaEntradaParcela(
+                nota=nota, numero_parcela='001', data_vencimento=nfe['data_emissao'],
+                valor=nfe['valor_total'], forma_pagamento='OUTROS'
+            ))
+        for item in nfe['itens']:
+            ean = item.get('cEAN')
+            itens.append(NotaEntradaItem(
+                nota=nota,
+                produto_id=_match_product(item, indice, by_sku, by_barcode),
+                quantidade=item['qCom'],
+                valor_unitario=item['vUnCom'],
+                valor_total=item['vProd'],
+                cfop=item.get('CFOP'),
+                xProd=(item.get('xProd') or '')[:255],
+                cProd=(item.get('cProd') or '')[:60],
+                cEAN=ean[:14] if ean else None,
+            ))
+    NotaEntradaParcela.objects.bulk_create(parcelas, batch_size=1000)
+    NotaEntradaItem.objects.bulk_create(itens, batch_size=1000)
+    return notas
+
+
+def processar_xml_nfe(xml_file):
+    """Importa um único XML; ValueError se a nota já existir ou o XML for inválido."""
+    notas, results = importar_lote_nfe([xml_file])
+    if not notas:
+        raise ValueError(results[0].message if results else "Arquivo XML vazio.")
+    return notas[0]
@@ -0,0 +1,127 @@
+"""
+De/para de produtos por fornecedor (ProdutoFornecedor).
+
+Cada revisão confirmada de NF-e ensina o vínculo (fornecedor, cProd/cEAN) ->
+produto. Na importação os itens são pré-vinculados por um índice em memória
+por fornecedor: primeiro pelo código e EAN aprendidos, depois (a cargo de
+quem chama) pelo cadastro de produtos e, por último, pela descrição
+normalizada (xProd) igual a uma já aprendida. Descrição só parecida não
+vincula: 'PARAFUSO 6MM' e 'PARAFUSO 8MM' são produtos diferentes, então ela
+vira uma sugestão exibida na revisão.
+"""
+import difflib
+import re
+import unicodedata
+
+from django.db import transaction
+from django.utils import timezone
+
+from faturamento.models import ProdutoFornecedor
+
+SIMILARIDADE_MINIMA = 0.88
+
+_NAO_ALFANUMERICO = re.compile(r'[^A-Z0-9]+')
+
+
+def normalizar_descricao(texto):
+    """Maiúsculas, sem acentos e pontuação, espaços simples ('Cabo  Coaxial-RG6' -> 'CABO COAXIAL RG6')."""
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return _NAO_ALFANUMERICO.sub(' ', texto.upper()).strip()
+
+
+class IndiceDePara:
+    """Índice em memória do de/para de um fornecedor."""
+
+    def __init__(self):
+        self.por_codigo = {}
+        self.por_ean = {}
+        self.por_descricao = {}
+
+    def adicionar(self, codigo, ean, descricao, produto_id):
+        self.por_codigo[codigo] = produto_id
+        if ean and ean.isdigit():  # ignora 'SEM GTIN'
+            self.por_ean[ean] = produto_id
+        descricao = normalizar_descricao(descricao)
+        if descricao:
+            self.por_descricao[descricao] = produto_id
+
+    def exato(self, codigo, ean=None):
+        """Produto pelo código do fornecedor ou pelo EAN já aprendidos."""
+        return self.por_codigo.get(codigo) or (self.por_ean.get(ean) if ean else None)
+
+    def mesma_descricao(self, descricao):
+        """Produto cuja descrição aprendida é igual à informada, depois de normalizadas."""
+        return self.por_descricao.get(normalizar_descricao(descricao))
+
+    def sugestao(self, descricao):
+        """Produto de descrição muito parecida com a informada; só para conferência, nunca vínculo automático."""
+        descricao = normalizar_descricao(descricao)
+        if not descricao or not self.por_descricao:
+            return None
+        parecidas = difflib.get_close_matches(descricao, self.por_descricao.keys(), n=1, cutoff=SIMILARIDADE_MINIMA)
+        return self.por_descricao[parecidas[0]] if parecidas else None
+
+
+def carregar_indices(fornecedor_ids):
+    """{fornecedor_id: IndiceDePara} com uma única consulta."""
+    indices = {fornecedor_id: IndiceDePara() for fornecedor_id in fornecedor_ids}
+    for fornecedor_id, codigo, ean, descricao, produto_id in ProdutoFornecedor.objects.filter(
+        fornecedor_id__in=indices
+    ).values_list('fornecedor_id', 'codigo', 'ean', 'descricao', 'produto_id'):
+        indices[fornecedor_id].adicionar(codigo, ean, descricao, produto_id)
+    return indices
+
+
+def pre_vincular(nota):
+    """
+    Pré-vínculos dos itens ainda sem produto pelo de/para do fornecedor (útil
+    para notas importadas antes de o vínculo ser aprendido), sem gravar nada:
+    a revisão os exibe e eles só são gravados quando ela é confirmada.
+    Retorna ({item_id: produto_id}, {item_id: produto_id sugerido}).
+    """
+    itens = [item for item in nota.itens.all() if item.produto_id is None]
+    if not itens:
+        return {}, {}
+    indice = carregar_indices([nota.fornecedor_id])[nota.fornecedor_id]
+    vinculos, sugestoes = {}, {}
+    for item in itens:
+        produto_id = indice.exato(item.cProd, item.cEAN) or indice.mesma_descricao(item.xProd)
+        if produto_id:
+            vinculos[item.pk] = produto_id
+        elif produto_id := indice.sugestao(item.xProd):
+            sugestoes[item.pk] = produto_id
+    return vinculos, sugestoes
+
+
+@transaction.atomic
+def aprender_de_para(fornecedor, itens):
+    """Grava/atualiza o de/para a partir dos itens confirmados na revisão (com produto e cProd)."""
+    confirmados = {item.cProd: item for item in itens if item.produto_id and item.cProd}
+    if not confirmados:
+        return 0
+
+    existentes = {
+        mapping.codigo: mapping
+        for mapping in ProdutoFornecedor.objects.select_for_update().filter(fornecedor=fornecedor, codigo__in=confirmados)
+    }
+    now = timezone.now()
+    novos, alterados = [], []
+    for codigo, item in confirmados.items():
+        mapping = existentes.get(codigo)
+        if mapping is None:
+            novos.append(ProdutoFornecedor(
+                fornecedor=fornecedor, codigo=codigo, ean=item.cEAN, descricao=item.xProd, produto_id=item.produto_id,
+            ))
+            continue
+        mapping.confirmacoes = mapping.confirmacoes + 1 if mapping.produto_id == item.produto_id else 1
+        mapping.produto_id = item.produto_id
+        mapping.ean = item.cEAN
+        mapping.descricao = item.xProd
+        mapping.updated_at = now
+        alterados.append(mapping)
+
+    ProdutoFornecedor.objects.bulk_create(novos, batch_size=500)
+    ProdutoFornecedor.objects.bulk_update(
+        alterados, ['produto', 'ean', 'descricao', 'confirmacoes', 'updated_at'], batch_size=500
+    )
+    return len(novos) + len(alterados)
@@ -1,4 +1,7 @@
-from django.test import TestCase, Client
+import shutil
+import tempfile
+
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User, Permission
 from django.utils import timezone
@@ -11,6 +14,13 @@ from financeiro.models import AccountReceivable
 
 class ContractBillingTest(TestCase):
     def setUp(self):
+        # PDFs das faturas geradas ficam fora do MEDIA_ROOT real
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
         # Create User and Login
         self.user = User.objects.create_user(username='testuser', password='password')
         # Add permissions
@@ -0,0 +1,48 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Person
+from faturamento.models import Invoice, InvoiceItem
+from faturamento.services.invoice_writer import invoice_batch
+from financeiro.models import AccountReceivable
+
+
+class InvoiceBatchTest(TestCase):
+    def setUp(self):
+        self.person = Person.objects.create(name="Cliente", document="11122233344", is_client=True)
+
+    def _items(self, count):
+        return [InvoiceItem(description=f"Item {i}", quantity=2, unit_price=Decimal('10.00')) for i in range(count)]
+
+    def test_batch_computes_total_and_receivable_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with invoice_batch() as writer:
+                invoice = Invoice.objects.create(client=self.person, due_date=date(2025, 3, 10), amount=0)
+                writer.add_items(invoice, self._items(10))
+        self.assertLess(len(ctx.captured_queries), 15)
+
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.amount, Decimal('200.00'))
+        receivable = AccountReceivable.objects.get(invoice=invoice)
+        self.assertEqual(receivable.amount, Decimal('200.00'))
+        self.assertEqual(receivable.description, f"Fatura #{invoice.number} - Cliente")
+
+    def test_item_saves_inside_batch_are_deferred(self):
+        invoice = Invoice.objects.create(client=self.person, due_date=date(2025, 3, 10), amount=0)
+        with invoice_batch():
+            for item in self._items(3):
+                item.invoice = invoice
+                item.save()
+            self.assertEqual(Invoice.objects.get(pk=invoice.pk).amount, 0)
+            invoice.items.first().delete()
+        self.assertEqual(invoice.amount, Decimal('40.00'))
+        self.assertEqual(AccountReceivable.objects.get(invoice=invoice).amount, Decimal('40.00'))
+
+    def test_signals_still_sync_outside_batch(self):
+        invoice = Invoice.objects.create(client=self.person, due_date=date(2025, 3, 10), amount=0)
+        InvoiceItem.objects.create(invoice=invoice, description="Avulso", quantity=1, unit_price=Decimal('15.00'))
+        self.assertEqual(AccountReceivable.objects.get(invoice=invoice).amount, Decimal('15.00'))
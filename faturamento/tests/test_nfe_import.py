@@ -0,0 +1,130 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import Person
+from estoque.models import Product
+from faturamento.management.commands.benchmark_nfe import gerar_xml
+from faturamento.models import NotaEntrada, NotaEntradaItem, ProdutoFornecedor
+from faturamento.services.nfe_import import importar_lote_nfe, processar_xml_nfe
+from faturamento.services.produto_fornecedor import aprender_de_para, normalizar_descricao
+
+
+class NFeBatchImportTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.product = Product.objects.create(name="Produto 1", sku="P0001", cost_price=1, sale_price=2)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _zip(self, files):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for name, content in files:
+                archive.writestr(name, content)
+        buffer.seek(0)
+        buffer.name = 'lote.zip'
+        return buffer
+
+    def test_zip_import_with_report(self):
+        processar_xml_nfe(('existente.xml', gerar_xml(1, itens=1)))
+        upload = self._zip([
+            ('a.xml', gerar_xml(1, itens=1)),
+            ('b.xml', gerar_xml(2, itens=3)),
+            ('c.xml', gerar_xml(2, itens=3)),
+            ('d.xml', b'<nfe>quebrado'),
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertNumQueries(11):
+                notas, results = importar_lote_nfe([upload])
+            self.assertFalse(os.path.exists(os.path.join(self.media_root, 'uploads', 'nfe')))  # só após o commit
+        self.assertEqual(len(callbacks), 1)
+
+        self.assertEqual([r.status for r in results], ['duplicada', 'importada', 'duplicada', 'erro'])
+        nota = NotaEntrada.objects.get(pk=notas[0].pk)
+        self.assertEqual(nota.itens.count(), 3)
+        self.assertEqual(nota.parcelas.get().valor, nota.valor_total)
+        self.assertEqual(NotaEntradaItem.objects.get(nota=nota, cProd='P0001').produto, self.product)
+        self.assertTrue(Person.objects.get(document=nota.fornecedor.document).is_supplier)
+        self.assertTrue(nota.arquivo_xml.name.startswith('uploads/nfe/'))
+
+        with self.assertRaises(ValueError):
+            processar_xml_nfe(('b.xml', gerar_xml(2)))
+
+    def test_invalid_notes_and_archives_are_reported_per_file(self):
+        bad_zip = io.BytesIO(b'PK\x03\x04 corrompido')
+        bad_zip.name = 'quebrado.zip'
+        sem_total = gerar_xml(5).replace(b'<total><ICMSTot><vNF>50.00</vNF></ICMSTot></total>', b'')
+        sem_ide = gerar_xml(6).split(b'<ide>')[0] + gerar_xml(6).split(b'</ide>')[1]
+        qcom_invalido = gerar_xml(7, itens=1).replace(b'<qCom>2.0000</qCom>', b'<qCom>2,5</qCom>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notas, results = importar_lote_nfe([
+                bad_zip, ('total.xml', sem_total), ('ide.xml', sem_ide), ('qcom.xml', qcom_invalido),
+                ('ok.xml', gerar_xml(8, itens=2)),
+            ])
+
+        self.assertEqual([r.status for r in results], ['erro', 'erro', 'erro', 'erro', 'importada'])
+        self.assertIn('ZIP', results[0].message)
+        self.assertIn('ICMSTot/vNF', results[1].message)
+        self.assertIn('ide/nNF', results[2].message)
+        self.assertIn('qCom', results[3].message)
+        self.assertEqual(NotaEntrada.objects.get().pk, notas[0].pk)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'uploads', 'nfe')), ['ok.xml'])
+
+    def test_supplier_mapping_is_learned_and_reused(self):
+        cable = Product.objects.create(name="Cabo Coaxial", sku="CABO-RG6", cost_price=1, sale_price=2)
+        nota = processar_xml_nfe(('a.xml', gerar_xml(1, itens=2)))
+        item = nota.itens.get(cProd='P0002')
+        self.assertIsNone(item.produto)
+
+        # Revisão confirmada: P0002 -> Cabo Coaxial
+        item.produto = cable
+        item.save()
+        self.assertEqual(aprender_de_para(nota.fornecedor, nota.itens.all()), 2)
+
+        xml = gerar_xml(21, itens=2).replace(b'<cProd>P0002</cProd><cEAN>SEM GTIN</cEAN><xProd>Produto 2',
+                                             b'<cProd>X-99</cProd><cEAN>SEM GTIN</cEAN><xProd>PRODUTO  2.')
+        nota_nova = processar_xml_nfe(('b.xml', gerar_xml(41, itens=2)))
+        self.assertEqual(nota_nova.itens.get(cProd='P0002').produto, cable)
+        fuzzy = processar_xml_nfe(('c.xml', xml))
+        self.assertEqual(fuzzy.itens.get(cProd='X-99').produto, cable)
+
+        aprender_de_para(nota.fornecedor, nota_nova.itens.all())
+        self.assertEqual(ProdutoFornecedor.objects.get(codigo='P0002').confirmacoes, 2)
+        self.assertEqual(normalizar_descricao("Cabo  Coaxial-RG6 ç"), "CABO COAXIAL RG6 C")
+
+    def test_similar_description_is_only_a_suggestion(self):
+        cable = Product.objects.create(name="Cabo Coaxial", sku="CABO-RG6", cost_price=1, sale_price=2)
+        nota = processar_xml_nfe(('a.xml', gerar_xml(1, itens=2)))
+        nota.itens.filter(cProd='P0002').update(produto=cable)
+        aprender_de_para(nota.fornecedor, nota.itens.all())
+
+        # Importada antes do vínculo: mesma descrição (outro código) e descrição só parecida
+        xml = gerar_xml(21, itens=3).replace(b'<cProd>P0002</cProd>', b'<cProd>X-02</cProd>')
+        xml = xml.replace(b'<cProd>P0003</cProd><cEAN>SEM GTIN</cEAN><xProd>Produto 3',
+                          b'<cProd>X-03</cProd><cEAN>SEM GTIN</cEAN><xProd>Produto 2B')
+        nova = processar_xml_nfe(('b.xml', xml))
+        self.assertIsNone(nova.itens.get(cProd='X-03').produto)
+        nova.itens.update(produto=None)
+
+        User.objects.create_user('revisor', password='password')
+        self.client.login(username='revisor', password='password')
+        response = self.client.get(reverse('faturamento:nota_entrada_review', args=[nova.pk]))
+        forms = {form.instance.cProd: form for form in response.context['item_formset']}
+        self.assertEqual(forms['X-02'].initial['produto'], cable.pk)
+        self.assertIsNone(forms['X-03'].initial.get('produto'))
+        self.assertEqual(forms['X-03'].sugestao, cable)
+        # GET não grava os pré-vínculos
+        self.assertFalse(nova.itens.filter(produto__isnull=False).exists())
@@ -1,9 +1,12 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Invoice, NotaEntrada, NotaEntradaItem, NotaEntradaParcela, BillingBatch, InvoiceItem
+from .models import Invoice, NotaEntrada, NotaEntradaItem, NotaEntradaParcela, BillingBatch
 from .forms import InvoiceForm, NotaEntradaItemForm, NotaEntradaParcelaForm, InvoiceItemFormSet
-from .services.nfe_import import processar_xml_nfe
+from .services.nfe_import import importar_lote_nfe
+from .services.produto_fornecedor import aprender_de_para, pre_vincular
+from .services.invoice_writer import contract_invoice_items, invoice_batch
 from financeiro.models import AccountPayable, CategoriaFinanceira, CentroResultado
-from estoque.models import StockMovement, Product
+from estoque.models import Product
+from estoque.services import stock_ledger
 from comercial.models import BillingGroup
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -87,16 +90,11 @@ def invoice_create(request):
         form = InvoiceForm(request.POST)
         formset = InvoiceItemFormSet(request.POST, prefix='items')
         if form.is_valid() and formset.is_valid():
-            with transaction.atomic():
+            # Total e contas a receber calculados uma única vez ao final do lote
+            with invoice_batch():
                 invoice = form.save()
                 formset.instance = invoice
                 formset.save()
-                
-                # Recalculate amount if items exist
-                if invoice.items.exists():
-                    total_amount = sum(item.total_price for item in invoice.items.all())
-                    invoice.amount = total_amount
-                    invoice.save()
                     
                 messages.success(request, 'Fatura criada com sucesso.')
                 return redirect('faturamento:detail', pk=invoice.id)
@@ -116,7 +114,7 @@ def invoice_standalone_create(request):
         form = StandaloneInvoiceForm(request.POST)
         formset = InvoiceItemFormSet(request.POST, prefix='items')
         if form.is_valid() and formset.is_valid():
-            with transaction.atomic():
+            with invoice_batch():
                 invoice = form.save(commit=False)
                 invoice.contract = None
                 invoice.save()
@@ -124,11 +122,6 @@ def invoice_standalone_create(request):
                 formset.instance = invoice
                 formset.save()
                 
-                # Recalculate amount from items
-                if invoice.items.exists():
-                    invoice.amount = sum(item.total_price for item in invoice.items.all())
-                    invoice.save()
-                
                 messages.success(request, 'Fatura avulsa criada com sucesso.')
                 return redirect('faturamento:detail', pk=invoice.id)
     else:
@@ -145,14 +138,9 @@ def invoice_update(request, pk):
         form = InvoiceForm(request.POST, instance=invoice)
         formset = InvoiceItemFormSet(request.POST, instance=invoice, prefix='items')
         if form.is_valid() and formset.is_valid():
-            with transaction.atomic():
+            with invoice_batch():
                 form.save()
                 formset.save()
-                
-                # Recalculate amount from items if present
-                if invoice.items.exists():
-                    invoice.amount = sum(item.total_price for item in invoice.items.all())
-                    invoice.save()
                     
                 messages.success(request, 'Fatura atualizada com sucesso.')
                 return redirect('faturamento:detail', pk=invoice.id)
@@ -198,14 +186,18 @@ def create_invoice_from_contract(request, contract_id):
     
     billing_group, created = BillingGroup.objects.get_or_create(name="Contratos")
     
-    invoice = Invoice.objects.create(
-        billing_group=billing_group,
-        number=f"CTR-{contract.id}-{timezone.now().strftime('%Y%m%d%H%M')}",
-        issue_date=timezone.now(),
-        due_date=timezone.now() + timedelta(days=30),
-        amount=contract.value,
-        status='PD'
-    )
+    with invoice_batch() as writer:
+        invoice = Invoice.objects.create(
+            billing_group=billing_group,
+            client=contract.client,
+            contract=contract,
+            number=f"CTR-{contract.id}-{timezone.now().strftime('%Y%m%d%H%M')}",
+            issue_date=timezone.now(),
+            due_date=timezone.now() + timedelta(days=30),
+            amount=contract.value,
+            status='PD'
+        )
+        writer.add_items(invoice, contract_invoice_items(contract))
     
     messages.success(request, f'Fatura criada com sucesso a partir do Contrato #{contract.id}')
     return redirect('faturamento:update', pk=invoice.id)
@@ -310,7 +302,7 @@ def process_contract_billing(request):
             continue
             
         try:
-            with transaction.atomic():
+            with invoice_batch() as writer:
                 # Calculate due date: Priority 1: Billing Group, Priority 2: Contract
                 due_day = contract.due_day
                 if contract.billing_group and contract.billing_group.due_day:
@@ -340,31 +332,8 @@ def process_contract_billing(request):
                     status='PD'
                 )
 
-                # 1.1 Create InvoiceItems from Contract items if they exist
-                contract_items = contract.items.all()
-                if contract_items.exists():
-                    for item in contract_items:
-                        InvoiceItem.objects.create(
-                            invoice=invoice,
-                            item_type='SERVICE' if item.category != 'COMODATO' else 'RENT',
-                            description=item.description,
-                            quantity=item.quantity,
-                            unit_price=item.unit_price,
-                            total_price=item.total_price,
-                            financial_category=item.financial_category,
-                            notes=f"Categoria: {item.get_category_display()}"
-                        )
-                else:
-                    # Fallback for old single-value contracts
-                    InvoiceItem.objects.create(
-                        invoice=invoice,
-                        item_type='SERVICE',
-                        description=f"Serviços de {contract.billing_group.name if contract.billing_group else 'Suporte'}",
-                        quantity=1,
-                        unit_price=contract.value,
-                        total_price=contract.value,
-                        notes=f"Competência: {month:02d}/{year}"
-                    )
+                # 1.1 Create InvoiceItems from Contract items (one bulk insert)
+                writer.add_items(invoice, contract_invoice_items(contract, month, year))
                 
                 # 2. Integrate with Cora v2 (mTLS)
                 fatura_data = {
@@ -910,19 +879,25 @@ def nota_entrada_list(request):
 
 @login_required
 def nota_entrada_create(request):
-    if request.method == 'POST' and request.FILES.get('xml_file'):
-        xml_file = request.FILES['xml_file']
+    uploads = request.FILES.getlist('xml_file') if request.method == 'POST' else []
+    if uploads:
         try:
-            nota = processar_xml_nfe(xml_file)
-            messages.success(request, f'Nota {nota.numero_nota} importada. Por favor, revise os dados.')
-            return redirect('faturamento:nota_entrada_review', pk=nota.pk)
-        except ValueError as ve:
-            messages.warning(request, str(ve))
-            return redirect('faturamento:nota_entrada_create')
+            notas, results = importar_lote_nfe(uploads)
         except Exception as e:
             messages.error(request, f'Erro ao processar XML: {str(e)}')
             return redirect('faturamento:nota_entrada_create')
-            
+
+        if len(results) == 1:
+            if notas:
+                messages.success(request, f'Nota {notas[0].numero_nota} importada. Por favor, revise os dados.')
+                return redirect('faturamento:nota_entrada_review', pk=notas[0].pk)
+            messages.warning(request, results[0].message)
+            return redirect('faturamento:nota_entrada_create')
+
+        if notas:
+            messages.success(request, f'{len(notas)} nota(s) importada(s). Revise cada uma antes de lançar.')
+        return render(request, 'faturamento/nota_entrada_form.html', {'results': results})
+
     return render(request, 'faturamento/nota_entrada_form.html')
 
 @login_required
@@ -934,6 +909,7 @@ from django.forms import modelformset_factory
 from .forms import NotaEntradaItemForm, NotaEntradaParcelaForm
 
 @login_required
+@transaction.atomic
 def nota_entrada_review(request, pk):
     nota = get_object_or_404(NotaEntrada, pk=pk)
     
@@ -955,6 +931,8 @@ def nota_entrada_review(request, pk):
             items_instances = item_formset.save(commit=False) # Get instances but don't save to DB yet if generic. 
             # Actually we can save(commit=False), inspect, then save.
             
+            movements = []
+            confirmed_items = []
             for form in item_formset:
                 item = form.save(commit=False)
                 
@@ -971,19 +949,21 @@ def nota_entrada_review(request, pk):
                     )
                     item.produto = new_prod
                 else:
-                    # Update cost
+                    # Update cost (sem regravar current_stock)
                     item.produto.cost_price = item.valor_unitario
-                    item.produto.save()
+                    item.produto.save(update_fields=['cost_price', 'updated_at'])
                 
                 item.save()
+                confirmed_items.append(item)
                 
                 # Stock Movement
-                StockMovement.objects.create(
-                    product=item.produto,
-                    movement_type='IN',
-                    quantity=int(item.quantidade),
-                    reason=f"Compra NFe {nota.numero_nota} - {nota.fornecedor.name}"
-                )
+                movements.append(stock_ledger.movement(
+                    item.produto, 'IN', int(item.quantidade),
+                    reason=f"Compra NFe {nota.numero_nota} - {nota.fornecedor.name}", source=nota
+                ))
+            stock_ledger.post_movements(movements)
+            # Aprende o de/para para as próximas notas do fornecedor
+            aprender_de_para(nota.fornecedor, confirmed_items)
                 
             # 2. Save Parcelas and Create Financial
             parcelas = parcela_formset.save()
@@ -1014,7 +994,15 @@ def nota_entrada_review(request, pk):
             return redirect('faturamento:nota_entrada_detail', pk=pk)
             
     else:
+        # Pré-vínculos só preenchem o formulário; são gravados ao confirmar a revisão
+        vinculos, sugestoes = pre_vincular(nota)
         item_formset = ItemFormSet(queryset=nota.itens.all(), prefix='items')
+        produtos_sugeridos = Product.objects.in_bulk(sugestoes.values())
+        for form in item_formset:
+            if form.instance.pk in vinculos:
+                form.initial['produto'] = vinculos[form.instance.pk]
+            elif form.instance.pk in sugestoes:
+                form.sugestao = produtos_sugeridos.get(sugestoes[form.instance.pk])
         parcela_formset = ParcelaFormSet(queryset=nota.parcelas.all().order_by('data_vencimento'), prefix='parcelas')
         
     return render(request, 'faturamento/nota_entrada_review.html', {
@@ -1049,14 +1037,13 @@ def nota_entrada_revert(request, pk):
     deleted_count, _ = linked_payables.delete()
     
     # 2. Reverse Stock (Create OUT movements)
-    for item in nota.itens.all():
-        if item.produto:
-            StockMovement.objects.create(
-                product=item.produto,
-                movement_type='OUT',
-                quantity=int(item.quantidade),
-                reason=f"Estorno NFe {nota.numero_nota} - {nota.fornecedor.name}"
-            )
+    reason = f"Estorno NFe {nota.numero_nota} - {nota.fornecedor.name}"
+    if not stock_ledger.reverse_source(nota, reason=reason):
+        # Notas lançadas antes do vínculo de origem nas movimentações
+        stock_ledger.post_movements([
+            stock_ledger.movement(item.produto_id, 'OUT', int(item.quantidade), reason=reason)
+            for item in nota.itens.filter(produto__isnull=False)
+        ])
             
     # 3. Update Status
     # Returning to 'IMPORTADA' allows re-review and re-launch (Correction Flow)
@@ -2,7 +2,8 @@ from django.shortcuts import render, get_object_or_404, redirect
 from .models import Invoice, NotaEntrada, NotaEntradaItem, NotaEntradaParcela
 from .services.nfe_import import processar_xml_nfe
 from financeiro.models import AccountPayable, CategoriaFinanceira, CentroResultado
-from estoque.models import StockMovement, Product
+from estoque.models import Product
+from estoque.services import stock_ledger
 from comercial.models import BillingGroup
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -107,8 +108,8 @@ def nota_entrada_review(request, pk):
                 
                 item.save()
                 
-                StockMovement.objects.create(
-                    product=item.produto,
+                stock_ledger.post_movement(
+                    item.produto,
                     movement_type='OUT', # Nota de Entrada is stock increase but using movement_type OUT here? 
                     # Actually stock movement usually has IN/OUT. Entry note is IN.
                     # Previous code used 'IN' in comments but maybe 'OUT' in logic? 
@@ -1,9 +1,13 @@
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 from .models import (
     AccountPayable, AccountReceivable, CategoriaFinanceira, BankReconciliation, 
     CentroResultado, CashAccount, Receipt, BudgetPlan, BudgetItem, 
-    EmpresaFiscal, NotaFiscalServico, ConfiguracaoComissao
+    EmpresaFiscal, NotaFiscalServico, ConfiguracaoComissao, PayableSeries,
+    FinancialKPISnapshot
 )
+from .services.kpis import mark_stale
 
 @admin.register(CategoriaFinanceira)
 class CategoriaFinanceiraAdmin(admin.ModelAdmin):
@@ -25,9 +29,17 @@ class AccountPayableAdmin(admin.ModelAdmin):
     actions = ['mark_as_paid']
 
     def mark_as_paid(self, request, queryset):
-        queryset.update(status='PAID')
+        queryset.update(status='PAID', updated_at=timezone.now())
+        transaction.on_commit(mark_stale)  # update() não dispara os signals
     mark_as_paid.short_description = "Marcar como paga"
 
+@admin.register(PayableSeries)
+class PayableSeriesAdmin(admin.ModelAdmin):
+    list_display = ('description', 'supplier', 'amount', 'frequency', 'start_date', 'end_date', 'total_occurrences', 'materialized_count', 'active')
+    list_filter = ('frequency', 'active')
+    search_fields = ('description', 'supplier__name')
+    readonly_fields = ('materialized_count',)
+
 @admin.register(AccountReceivable)
 class AccountReceivableAdmin(admin.ModelAdmin):
     list_display = ('description', 'client', 'amount', 'due_date', 'status')
@@ -36,7 +48,8 @@ class AccountReceivableAdmin(admin.ModelAdmin):
     actions = ['mark_as_received']
 
     def mark_as_received(self, request, queryset):
-        queryset.update(status='RECEIVED')
+        queryset.update(status='RECEIVED', updated_at=timezone.now())
+        transaction.on_commit(mark_stale)
     mark_as_received.short_description = "Marcar como recebida"
 
 @admin.register(BankReconciliation)
@@ -72,3 +85,8 @@ class NotaFiscalServicoAdmin(admin.ModelAdmin):
 @admin.register(ConfiguracaoComissao)
 class ConfiguracaoComissaoAdmin(admin.ModelAdmin):
     list_display = ('tipo_venda', 'pct_vendedor', 'pct_tecnico')
+
+@admin.register(FinancialKPISnapshot)
+class FinancialKPISnapshotAdmin(admin.ModelAdmin):
+    list_display = ('reference_date', 'is_stale', 'computed_at')
+    readonly_fields = ('computed_at',)
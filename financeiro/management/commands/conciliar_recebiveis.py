@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from financeiro.services.reconciliation import reconcile_receivables
+
+
+class Command(BaseCommand):
+    help = 'Concilia faturas com contas a receber (status, categoria e transações de recebimento) em lote'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Apenas exibe as diferenças, sem gravar')
+
+    def handle(self, *args, **options):
+        report = reconcile_receivables(dry_run=options['dry_run'])
+        for line in report.lines():
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(report.summary()))
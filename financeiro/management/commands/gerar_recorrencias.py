@@ -0,0 +1,23 @@
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from financeiro.services.payable_series import horizon_date, materialize
+
+
+class Command(BaseCommand):
+    help = 'Gera as ocorrências das séries de contas a pagar recorrentes até o horizonte móvel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int,
+            help='Meses à frente (padrão: FINANCEIRO_HORIZONTE_RECORRENCIA_MESES)',
+        )
+
+    def handle(self, *args, **options):
+        if options['meses']:
+            until = timezone.now().date() + relativedelta(months=options['meses'])
+        else:
+            until = horizon_date()
+        created = materialize(until=until)
+        self.stdout.write(self.style.SUCCESS(f'{created} conta(s) a pagar gerada(s) até {until:%d/%m/%Y}.'))
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-19 15:42
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+OS_DESCRIPTION_RE = re.compile(r'^Ref\. OS #(\d+)$')
+
+
+def link_service_orders(apps, schema_editor):
+    """Vincula os recebíveis antigos de OS (identificados pela descrição) à OS de origem."""
+    AccountReceivable = apps.get_model('financeiro', 'AccountReceivable')
+    ServiceOrder = apps.get_model('operacional', 'ServiceOrder')
+
+    candidates = {}
+    for receivable in AccountReceivable.objects.filter(description__startswith='Ref. OS #').order_by('id').only('id', 'description'):
+        match = OS_DESCRIPTION_RE.match(receivable.description)
+        if match:
+            candidates.setdefault(int(match.group(1)), receivable)
+
+    existing = set(ServiceOrder.objects.filter(pk__in=candidates).values_list('pk', flat=True))
+    to_update = []
+    for os_id, receivable in candidates.items():
+        if os_id in existing:
+            receivable.service_order_id = os_id
+            to_update.append(receivable)
+    AccountReceivable.objects.bulk_update(to_update, ['service_order'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0021_configuracaocomissao'),
+        ('operacional', '0010_alter_serviceorder_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accountreceivable',
+            name='service_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receivables', to='operacional.serviceorder', verbose_name='Ordem de Serviço'),
+        ),
+        migrations.RunPython(link_service_orders, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='accountreceivable',
+            constraint=models.UniqueConstraint(condition=models.Q(('service_order__isnull', False)), fields=('service_order',), name='unique_receivable_service_order'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.5 on 2026-10-19 15:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_person_name_trgm_index'),
+        ('financeiro', '0022_accountreceivable_service_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayableSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('active', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('description', models.CharField(max_length=255, verbose_name='Descrição')),
+                ('payment_method', models.CharField(blank=True, max_length=50, null=True, verbose_name='Forma de Pagamento')),
+                ('document_number', models.CharField(blank=True, max_length=50, null=True, verbose_name='Nº Documento')),
+                ('notes', models.TextField(blank=True, null=True, verbose_name='Observações')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Valor por Ocorrência')),
+                ('frequency', models.CharField(choices=[('MONTHLY', 'Mensal'), ('WEEKLY', 'Semanal'), ('YEARLY', 'Anual')], default='MONTHLY', max_length=10, verbose_name='Periodicidade')),
+                ('start_date', models.DateField(verbose_name='Primeiro Vencimento')),
+                ('end_date', models.DateField(blank=True, null=True, verbose_name='Último Vencimento')),
+                ('total_occurrences', models.PositiveIntegerField(blank=True, help_text='Vazio para recorrência sem fim', null=True, verbose_name='Total de Parcelas')),
+                ('materialized_count', models.PositiveIntegerField(default=0, verbose_name='Ocorrências Geradas')),
+                ('account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='financeiro.cashaccount', verbose_name='Conta Caixa')),
+                ('category', models.ForeignKey(blank=True, limit_choices_to={'tipo': 'saida'}, null=True, on_delete=django.db.models.deletion.SET_NULL, to='financeiro.categoriafinanceira', verbose_name='Categoria')),
+                ('cost_center', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='financeiro.centroresultado', verbose_name='Centro de Resultado')),
+                ('supplier', models.ForeignKey(blank=True, limit_choices_to={'is_supplier': True}, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.person', verbose_name='Fornecedor')),
+            ],
+            options={
+                'verbose_name': 'Série de Contas a Pagar',
+                'verbose_name_plural': 'Séries de Contas a Pagar',
+            },
+        ),
+        migrations.AddField(
+            model_name='accountpayable',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='financeiro.payableseries', verbose_name='Série'),
+        ),
+        migrations.AddConstraint(
+            model_name='accountpayable',
+            constraint=models.UniqueConstraint(condition=models.Q(('series__isnull', False)), fields=('series', 'current_installment'), name='unique_payable_series_installment'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-19 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0023_payable_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinancialKPISnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference_date', models.DateField(unique=True, verbose_name='Data de Referência')),
+                ('data', models.JSONField(default=dict, verbose_name='Indicadores')),
+                ('is_stale', models.BooleanField(default=False, verbose_name='Desatualizado')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='Calculado em')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Indicadores Financeiros',
+                'verbose_name_plural': 'Snapshots de Indicadores Financeiros',
+            },
+        ),
+    ]
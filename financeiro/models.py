@@ -90,12 +90,45 @@ class FinancialTransaction(BaseModel):
         verbose_name_plural = "Movimentações Financeiras"
         ordering = ['-date', '-created_at']
 
+RECURRENCE_CHOICES = (
+    ('MONTHLY', 'Mensal'),
+    ('WEEKLY', 'Semanal'),
+    ('YEARLY', 'Anual'),
+)
+
+
+class PayableSeries(BaseModel):
+    """
+    Regra de uma conta parcelada ou recorrente. As ocorrências (AccountPayable)
+    são materializadas sob demanda até um horizonte móvel (comando
+    gerar_recorrencias); as demais podem ser apenas projetadas.
+    """
+    description = models.CharField(max_length=255, verbose_name="Descrição")
+    supplier = models.ForeignKey(Person, on_delete=models.SET_NULL, null=True, blank=True, limit_choices_to={'is_supplier': True}, verbose_name="Fornecedor")
+    category = models.ForeignKey(CategoriaFinanceira, on_delete=models.SET_NULL, null=True, blank=True, limit_choices_to={'tipo': 'saida'}, verbose_name="Categoria")
+    cost_center = models.ForeignKey(CentroResultado, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Centro de Resultado")
+    account = models.ForeignKey(CashAccount, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Conta Caixa")
+    payment_method = models.CharField(max_length=50, blank=True, null=True, verbose_name="Forma de Pagamento")
+    document_number = models.CharField(max_length=50, blank=True, null=True, verbose_name="Nº Documento")
+    notes = models.TextField(blank=True, null=True, verbose_name="Observações")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Valor por Ocorrência")
+
+    frequency = models.CharField(max_length=10, choices=RECURRENCE_CHOICES, default='MONTHLY', verbose_name="Periodicidade")
+    start_date = models.DateField(verbose_name="Primeiro Vencimento")
+    end_date = models.DateField(null=True, blank=True, verbose_name="Último Vencimento")
+    total_occurrences = models.PositiveIntegerField(null=True, blank=True, verbose_name="Total de Parcelas", help_text="Vazio para recorrência sem fim")
+    materialized_count = models.PositiveIntegerField(default=0, verbose_name="Ocorrências Geradas")
+
+    def __str__(self):
+        return f"{self.description} ({self.get_frequency_display()})"
+
+    class Meta:
+        verbose_name = "Série de Contas a Pagar"
+        verbose_name_plural = "Séries de Contas a Pagar"
+
+
 class AccountPayable(BaseModel):
-    RECURRENCE_CHOICES = (
-        ('MONTHLY', 'Mensal'),
-        ('WEEKLY', 'Semanal'),
-        ('YEARLY', 'Anual'),
-    )
+    RECURRENCE_CHOICES = RECURRENCE_CHOICES
 
     STATUS_CHOICES = (
         ('PENDING', 'Pendente'),
@@ -133,6 +166,7 @@ class AccountPayable(BaseModel):
     
     is_recurring = models.BooleanField(default=False, verbose_name="É Recorrente?")
     recurrence_period = models.CharField(max_length=10, choices=RECURRENCE_CHOICES, blank=True, null=True, verbose_name="Período de Recorrência")
+    series = models.ForeignKey(PayableSeries, on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrences', verbose_name="Série")
     
     notes = models.TextField(blank=True, null=True, verbose_name="Observações")
 
@@ -142,6 +176,13 @@ class AccountPayable(BaseModel):
     class Meta:
         verbose_name = "Conta a Pagar"
         verbose_name_plural = "Contas a Pagar"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['series', 'current_installment'],
+                condition=models.Q(series__isnull=False),
+                name='unique_payable_series_installment',
+            ),
+        ]
 
 class AccountReceivable(BaseModel):
     STATUS_CHOICES = (
@@ -158,6 +199,7 @@ class AccountReceivable(BaseModel):
     due_date = models.DateField(verbose_name="Data de Vencimento")
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', verbose_name="Status")
     invoice = models.ForeignKey('faturamento.Invoice', on_delete=models.SET_NULL, null=True, blank=True, related_name='receivables', verbose_name="Fatura")
+    service_order = models.ForeignKey('operacional.ServiceOrder', on_delete=models.SET_NULL, null=True, blank=True, related_name='receivables', verbose_name="Ordem de Serviço")
     
     # Cora Integration
     cora_id = models.CharField(max_length=255, blank=True, null=True, verbose_name="Cora ID")
@@ -190,6 +232,14 @@ class AccountReceivable(BaseModel):
     class Meta:
         verbose_name = "Conta a Receber"
         verbose_name_plural = "Contas a Receber"
+        constraints = [
+            # Uma OS concluída gera um único recebível
+            models.UniqueConstraint(
+                fields=['service_order'],
+                condition=models.Q(service_order__isnull=False),
+                name='unique_receivable_service_order',
+            ),
+        ]
 
 class BankReconciliation(BaseModel):
     date = models.DateField(verbose_name="Data")
@@ -304,3 +354,17 @@ class ConfiguracaoComissao(models.Model):
     class Meta:
         verbose_name = "Configuração de Comissão"
         verbose_name_plural = "Configurações de Comissão"
+
+class FinancialKPISnapshot(models.Model):
+    """Indicadores do painel financeiro calculados para um dia (ver financeiro.services.kpis)."""
+    reference_date = models.DateField(unique=True, verbose_name="Data de Referência")
+    data = models.JSONField(default=dict, verbose_name="Indicadores")
+    is_stale = models.BooleanField(default=False, verbose_name="Desatualizado")
+    computed_at = models.DateTimeField(auto_now=True, verbose_name="Calculado em")
+
+    def __str__(self):
+        return f"Indicadores de {self.reference_date:%d/%m/%Y}"
+
+    class Meta:
+        verbose_name = "Snapshot de Indicadores Financeiros"
+        verbose_name_plural = "Snapshots de Indicadores Financeiros"
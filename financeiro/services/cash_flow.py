@@ -0,0 +1,184 @@
+"""
+Previsão de fluxo de caixa por conta bancária.
+
+Combina o saldo atual de cada CashAccount com os lançamentos futuros:
+contas a receber e a pagar em aberto (vencidas entram no dia de hoje),
+ocorrências ainda não geradas das séries de contas a pagar e o faturamento
+projetado dos contratos ativos (meses já faturados são ignorados, pois já
+estão no contas a receber). O cálculo é vetorizado em pandas/NumPy: cada
+fonte vira um DataFrame (data, conta, valor) que é pivotado em uma grade
+diária e acumulado.
+
+Cada fonte é guardada no cache com uma assinatura (quantidade, maior id e
+última alteração das tabelas de origem); quando uma tabela muda, só a fonte
+correspondente é recalculada e a grade é remontada.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from comercial.models import BillingGroup, Contract
+from faturamento.models import Invoice
+from financeiro.models import AccountPayable, AccountReceivable, CashAccount, PayableSeries
+from financeiro.services.payable_series import project_occurrences
+
+HORIZONS = (90, 180)
+NO_ACCOUNT = 'Sem conta definida'
+CACHE_TIMEOUT = 60 * 60
+OPEN_STATUSES = ('PENDING', 'OVERDUE')
+FLOW_COLUMNS = ['date', 'account_id', 'amount', 'source']
+
+
+@dataclass
+class CashFlowForecast:
+    start: date
+    end: date
+    daily: pd.DataFrame    # saldo de fechamento por dia: uma coluna por conta + 'Total'
+    weekly: pd.DataFrame   # saldo no fim de cada semana (domingo)
+    flows: pd.DataFrame    # entradas/saídas por dia e origem
+
+    def lowest_balance(self):
+        """(data, saldo) do menor saldo total previsto no período."""
+        day = self.daily['Total'].idxmin()
+        return day.date(), self.daily.at[day, 'Total']
+
+
+def _signature(*querysets):
+    """Assinatura das tabelas de origem: muda quando qualquer linha é criada, alterada ou removida."""
+    parts = []
+    for queryset in querysets:
+        aggregate = queryset.aggregate(count=Count('pk'), last_id=Max('pk'), changed=Max('updated_at'))
+        parts.append(f"{aggregate['count']}-{aggregate['last_id']}-{aggregate['changed'] and aggregate['changed'].timestamp()}")
+    return ':'.join(parts)
+
+
+def _cached(name, signature, start, end, build):
+    key = f'cash_flow:{name}:{start:%Y%m%d}:{end:%Y%m%d}:{signature}'
+    frame = cache.get(key)
+    if frame is None:
+        frame = build(start, end)
+        cache.set(key, frame, CACHE_TIMEOUT)
+    return frame
+
+
+def _frame(rows, source, sign=1):
+    frame = pd.DataFrame.from_records(rows, columns=FLOW_COLUMNS[:3])
+    if frame.empty:
+        return pd.DataFrame(columns=FLOW_COLUMNS)
+    frame['date'] = pd.to_datetime(frame['date'])
+    frame['account_id'] = frame['account_id'].astype(float)  # None -> NaN (sem conta)
+    frame['amount'] = frame['amount'].astype(float) * sign
+    frame['source'] = source
+    return frame
+
+
+def _open_items(model, source, sign):
+    def build(start, end):
+        rows = model.objects.filter(status__in=OPEN_STATUSES, due_date__lte=end).values_list('account_id', 'due_date', 'amount')
+        frame = _frame([(due_date, account_id, amount) for account_id, due_date, amount in rows], source, sign)
+        # Vencidos em aberto entram como previstos para hoje
+        frame['date'] = frame['date'].clip(lower=pd.Timestamp(start))
+        return frame
+    return build
+
+
+def _series_occurrences(start, end):
+    rows = [(p.due_date, p.account_id, p.amount) for p in project_occurrences(start, end)]
+    return _frame(rows, 'Recorrências', sign=-1)
+
+
+def _contract_billing(start, end):
+    """Faturamento mensal (ou anual, no mês de aniversário) dos contratos ativos ainda não faturado."""
+    contracts = pd.DataFrame.from_records(
+        Contract.objects.filter(status='Ativo', active=True).values_list(
+            'id', 'due_day', 'billing_group__due_day', 'value', 'modality', 'start_date', 'end_date'
+        ),
+        columns=['contract_id', 'due_day', 'group_due_day', 'value', 'modality', 'start_date', 'end_date'],
+    )
+    if contracts.empty:
+        return pd.DataFrame(columns=FLOW_COLUMNS)
+
+    months = pd.period_range(start, end, freq='M')
+    grid = contracts.merge(pd.DataFrame({'period': months}), how='cross')
+    grid['year'] = grid['period'].dt.year
+    grid['month'] = grid['period'].dt.month
+
+    # Dia de vencimento: grupo de faturamento tem prioridade; limitado ao último dia do mês
+    due_day = grid['group_due_day'].astype(float).fillna(grid['due_day'].astype(float)).fillna(1).astype(int).to_numpy()
+    days_in_month = grid['period'].dt.days_in_month.to_numpy()
+    grid['date'] = pd.to_datetime({
+        'year': grid['year'], 'month': grid['month'], 'day': np.clip(due_day, 1, days_in_month),
+    })
+
+    start_dates = pd.to_datetime(grid['start_date'])
+    end_dates = pd.to_datetime(grid['end_date'])
+    keep = (
+        (grid['date'] >= pd.Timestamp(start)) & (grid['date'] <= pd.Timestamp(end))
+        & (grid['period'] >= start_dates.dt.to_period('M'))
+        & (end_dates.isna() | (grid['date'] <= end_dates))
+        & ((grid['modality'] != 'Anual') | (grid['month'] == start_dates.dt.month))
+    )
+    grid = grid[keep.to_numpy()]
+
+    invoiced = pd.DataFrame.from_records(
+        Invoice.objects.filter(contract_id__in=contracts['contract_id'].tolist(), competence_month__isnull=False)
+        .values_list('contract_id', 'competence_year', 'competence_month'),
+        columns=['contract_id', 'year', 'month'],
+    )
+    if not invoiced.empty:
+        grid = grid.merge(invoiced.drop_duplicates(), how='left', on=['contract_id', 'year', 'month'], indicator=True)
+        grid = grid[grid['_merge'] == 'left_only']
+
+    return _frame(list(zip(grid['date'], [None] * len(grid), grid['value'])), 'Contratos')
+
+
+def build_forecast(days=90, today=None):
+    """Previsão diária e semanal dos próximos `days` dias."""
+    start = today or timezone.now().date()
+    end = start + timedelta(days=days)
+
+    sources = [
+        _cached('receber', _signature(AccountReceivable.objects), start, end,
+                _open_items(AccountReceivable, 'Contas a Receber', 1)),
+        _cached('pagar', _signature(AccountPayable.objects), start, end,
+                _open_items(AccountPayable, 'Contas a Pagar', -1)),
+        _cached('series', _signature(PayableSeries.objects, AccountPayable.objects.filter(series__isnull=False)),
+                start, end, _series_occurrences),
+        _cached('contratos', _signature(Contract.objects, BillingGroup.objects, Invoice.objects.filter(contract__isnull=False)),
+                start, end, _contract_billing),
+    ]
+    flows = pd.concat([frame for frame in sources if not frame.empty] or [pd.DataFrame(columns=FLOW_COLUMNS)])
+
+    accounts = list(CashAccount.objects.order_by('name').values_list('id', 'name', 'current_balance'))
+    names = {account_id: name for account_id, name, _ in accounts}
+    opening = pd.Series({name: float(balance) for _, name, balance in accounts}, dtype=float)
+    opening[NO_ACCOUNT] = 0.0
+
+    flows['account'] = flows['account_id'].map(names).fillna(NO_ACCOUNT)
+    flows['amount'] = flows['amount'].astype(float)
+    days_index = pd.date_range(start, end, freq='D')
+    movement = pd.DataFrame(0.0, index=days_index, columns=opening.index)
+    if not flows.empty:
+        movement += (
+            flows.pivot_table(index='date', columns='account', values='amount', aggfunc='sum')
+            .reindex(index=days_index, columns=opening.index)
+            .fillna(0.0)
+        )
+    daily = movement.cumsum() + opening
+    if not flows['account'].eq(NO_ACCOUNT).any():
+        daily = daily.drop(columns=NO_ACCOUNT)
+    daily['Total'] = daily.sum(axis=1)
+    daily = daily.round(2)
+
+    return CashFlowForecast(
+        start=start,
+        end=end,
+        daily=daily,
+        weekly=daily.resample('W-SUN').last(),
+        flows=flows.groupby(['date', 'source'])['amount'].sum().unstack(fill_value=0.0).round(2),
+    )
@@ -1,10 +1,7 @@
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
-from django.template import Template, Context
-from django.utils.safestring import mark_safe
-from django.template.defaultfilters import linebreaksbr
 from django.conf import settings
-from core.models import EmailTemplate
+from core.services.email_templates import get_compiled_template, resolve_email_template
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,16 +21,7 @@ class BillingEmailService:
             return False, msg
 
         # 1. Obter Template (ou usar o padrão se não especificado)
-        template = None
-        if template_id:
-            try:
-                template = EmailTemplate.objects.get(id=template_id)
-            except EmailTemplate.DoesNotExist:
-                pass
-        
-        if not template:
-            # Fallback para template padrão de boleto
-            template = EmailTemplate.objects.filter(template_type='BOLETO_NF').first()
+        template = resolve_email_template(template_id, template_type='BOLETO_NF')
 
         if template:
             # Mês/Ano de Competência com fallback para data de emissão
@@ -51,62 +39,8 @@ class BillingEmailService:
                 'invoice': invoice,
             }
 
-            # 1. Renderizar Assunto
-            try:
-                # Pré-processar tags do usuário {tag} para {{tag}}
-                subject_text = template.subject
-                for placeholder in ['cliente', 'valor', 'vencimento', 'fatura', 'link_boleto', 'link_nf', 'competence']:
-                    subject_text = subject_text.replace(f'{{{placeholder}}}', f'{{{{{placeholder}}}}}')
-                
-                subject_template = Template(subject_text)
-                subject = subject_template.render(Context(context_dict))
-            except Exception as e:
-                logger.error(f"Erro ao renderizar assunto do template: {e}")
-                # Fallback manual para o assunto se o Template falhar
-                subject = template.subject
-                for k, v in context_dict.items():
-                    subject = subject.replace(f'{{{k}}}', str(v))
-
-            # 2. Renderizar Corpo do Usuário (aplicando linebreaksbr)
-            try:
-                # Pré-processar tags do usuário {tag} para {{tag}}
-                body_content = template.body.replace('{', '{{').replace('}', '}}')
-                
-                # Remover tags redundantes se o usuário as deixou no template
-                # Conforme solicitado: {cliente}, {vencimento}, {valor}, {link_boleto}, {fatura}
-                tags_to_strip = ['{{cliente}}', '{{vencimento}}', '{{valor}}', '{{link_boleto}}', '{{fatura}}', '{{link_nf}}']
-                for tag in tags_to_strip:
-                    body_content = body_content.replace(tag, '')
-
-                body_template = Template(body_content)
-                user_body_html = body_template.render(Context(context_dict))
-                
-                # Remover assinaturas redundantes que o usuário pode ter deixado
-                # Limpa termos comuns de encerramento se aparecerem no final
-                redundant_terms = [
-                    'obrigado', 'atenciosamente', 'equipe g7 serv', 'g7 serv', 
-                    '81 3019-5654', 'att,', 'grato'
-                ]
-                
-                # Limpeza agressiva de quebras de linha no final para tirar o "espaço extra"
-                user_body_html = user_body_html.strip()
-                
-                # Tentar remover as últimas linhas se forem apenas assinatura
-                lines = user_body_html.split('\n')
-                cleaned_lines = []
-                for line in lines:
-                    line_lower = line.lower().strip()
-                    if not any(term in line_lower for term in redundant_terms) or len(line_lower) > 50:
-                        cleaned_lines.append(line)
-                
-                user_body_html = '\n'.join(cleaned_lines).strip()
-
-                # Converter quebras de linha em <br> se não houver tags HTML detectadas
-                if '<p' not in user_body_html.lower() and '<br' not in user_body_html.lower():
-                    user_body_html = linebreaksbr(user_body_html)
-            except Exception as e:
-                logger.error(f"Erro ao renderizar corpo do template: {e}")
-                user_body_html = linebreaksbr(template.body)
+            # 2. Renderizar Assunto e Corpo a partir do template compilado (cacheado por id/updated_at)
+            subject, user_body_html = get_compiled_template(template).render(context_dict)
 
             # 3. Envolver no Layout Premium
             items_html = ""
@@ -0,0 +1,120 @@
+"""
+Indicadores financeiros dos painéis (financeiro e relatórios).
+
+compute_kpis calcula tudo no banco: totais em aberto, vencidos, recebidos/pagos
+e aging (0-30, 31-60, 61-90, 90+ dias de atraso) com uma agregação condicional
+por tabela, a série mensal com um GROUP BY por tabela e os maiores devedores
+com mais um. get_kpis guarda o resultado em FinancialKPISnapshot (um por dia);
+o snapshot é marcado como desatualizado quando contas a pagar/receber mudam
+(financeiro.signals e os caminhos em lote chamam mark_stale) e, por
+segurança, também expira após SNAPSHOT_MAX_AGE.
+"""
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from financeiro.models import AccountPayable, AccountReceivable, FinancialKPISnapshot
+
+OPEN_STATUSES = ('PENDING', 'OVERDUE')
+AGING_BUCKETS = (('0-30', 0, 30), ('31-60', 31, 60), ('61-90', 61, 90), ('90+', 91, None))
+SNAPSHOT_MAX_AGE = timedelta(minutes=15)
+CHART_MONTHS = 6
+TOP_DEBTORS = 5
+
+
+def _money(value):
+    return round(float(value or 0), 2)
+
+
+def _totals(model, done_status, today):
+    """Uma agregação condicional com os totais e o aging dos vencidos."""
+    month_start = today.replace(day=1)
+    next_month = month_start + relativedelta(months=1)
+    open_q = Q(status__in=OPEN_STATUSES)
+    in_month = Q(due_date__gte=month_start, due_date__lt=next_month)
+
+    aggregates = {
+        'pending': Sum('amount', filter=open_q),
+        'overdue': Sum('amount', filter=open_q & Q(due_date__lt=today)),
+        'overdue_count': Count('id', filter=open_q & Q(due_date__lt=today)),
+        'done': Sum('amount', filter=Q(status=done_status)),
+        'done_month': Sum('amount', filter=Q(status=done_status) & in_month),
+        'due_month': Sum('amount', filter=in_month),
+    }
+    for name, first_day, last_day in AGING_BUCKETS:
+        # Dias de atraso = hoje - vencimento
+        bucket = open_q & Q(due_date__lte=today - timedelta(days=max(first_day, 1)))
+        if last_day is not None:
+            bucket &= Q(due_date__gte=today - timedelta(days=last_day))
+        aggregates[f'aging_{name}'] = Sum('amount', filter=bucket)
+
+    row = model.objects.aggregate(**aggregates)
+    return {
+        'pending': _money(row['pending']),
+        'overdue': _money(row['overdue']),
+        'overdue_count': row['overdue_count'],
+        'done': _money(row['done']),
+        'done_month': _money(row['done_month']),
+        'due_month': _money(row['due_month']),
+        'aging': [{'bucket': name, 'total': _money(row[f'aging_{name}'])} for name, _, _ in AGING_BUCKETS],
+    }
+
+
+def _monthly(model, first_month):
+    return {
+        row['month'].strftime('%Y-%m'): _money(row['total'])
+        for row in model.objects.filter(due_date__gte=first_month)
+        .annotate(month=TruncMonth('due_date')).values('month').annotate(total=Sum('amount')).order_by()
+    }
+
+
+def compute_kpis(today=None):
+    """Indicadores calculados agora (valores em float, prontos para JSON)."""
+    today = today or timezone.now().date()
+    first_month = today.replace(day=1) - relativedelta(months=CHART_MONTHS - 1)
+
+    revenue = _monthly(AccountReceivable, first_month)
+    expenses = _monthly(AccountPayable, first_month)
+    months = [first_month + relativedelta(months=i) for i in range(CHART_MONTHS)]
+
+    debtors = (
+        AccountReceivable.objects.filter(status__in=OPEN_STATUSES, due_date__lt=today, client__isnull=False)
+        .values('client_id', 'client__name')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by('-total')[:TOP_DEBTORS]
+    )
+
+    return {
+        'reference_date': today.isoformat(),
+        'receivables': _totals(AccountReceivable, 'RECEIVED', today),
+        'payables': _totals(AccountPayable, 'PAID', today),
+        'monthly': {
+            'labels': [f"{month.month}/{month.year}" for month in months],
+            'revenue': [revenue.get(month.strftime('%Y-%m'), 0.0) for month in months],
+            'expenses': [expenses.get(month.strftime('%Y-%m'), 0.0) for month in months],
+        },
+        'top_debtors': [
+            {'client_id': row['client_id'], 'name': row['client__name'], 'total': _money(row['total']), 'count': row['count']}
+            for row in debtors
+        ],
+    }
+
+
+def get_kpis(today=None):
+    """Indicadores do snapshot do dia, recalculados se desatualizados ou expirados."""
+    today = today or timezone.now().date()
+    snapshot = FinancialKPISnapshot.objects.filter(reference_date=today).first()
+    if snapshot and not snapshot.is_stale and timezone.now() - snapshot.computed_at < SNAPSHOT_MAX_AGE:
+        return snapshot.data
+
+    data = compute_kpis(today)
+    FinancialKPISnapshot.objects.update_or_create(reference_date=today, defaults={'data': data, 'is_stale': False})
+    return data
+
+
+def mark_stale():
+    """Marca os snapshots como desatualizados (um UPDATE; nada acontece se já estiverem)."""
+    FinancialKPISnapshot.objects.filter(is_stale=False).update(is_stale=True)
@@ -0,0 +1,167 @@
+"""
+Séries de contas a pagar (parceladas e recorrentes).
+
+A série (PayableSeries) guarda a regra; as ocorrências são AccountPayable
+ligadas a ela e numeradas em current_installment. Parcelamentos são gerados
+por inteiro na criação; recorrências sem fim são materializadas apenas até o
+horizonte móvel (FINANCEIRO_HORIZONTE_RECORRENCIA_MESES) pelo comando
+gerar_recorrencias, com bulk_create. Alterações e cancelamentos das próximas
+ocorrências são feitos com um único UPDATE, e project_occurrences devolve as
+ocorrências ainda não geradas (sem gravar) para previsões de fluxo de caixa.
+"""
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from financeiro.models import AccountPayable, PayableSeries
+from financeiro.services.kpis import mark_stale
+
+STEPS = {
+    'MONTHLY': relativedelta(months=1),
+    'WEEKLY': relativedelta(weeks=1),
+    'YEARLY': relativedelta(years=1),
+}
+
+# Campos copiados da série para cada ocorrência (e editáveis em update_future)
+SERIES_FIELDS = ('description', 'supplier', 'category', 'cost_center', 'account', 'payment_method', 'notes', 'amount')
+
+OPEN_STATUSES = ('PENDING', 'OVERDUE')
+
+
+def horizon_date(today=None):
+    """Data limite da materialização das recorrências sem fim."""
+    today = today or timezone.now().date()
+    return today + relativedelta(months=settings.FINANCEIRO_HORIZONTE_RECORRENCIA_MESES)
+
+
+def occurrence_due_date(series, number):
+    """Vencimento da n-ésima ocorrência (calculado a partir do início, sem acumular ajustes de fim de mês)."""
+    return series.start_date + STEPS[series.frequency] * (number - 1)
+
+
+def _occurrences(series, first_number, until=None):
+    """(número, vencimento) a partir de first_number, respeitando total, data final e until."""
+    number = first_number
+    while not series.total_occurrences or number <= series.total_occurrences:
+        due_date = occurrence_due_date(series, number)
+        if (series.end_date and due_date > series.end_date) or (until and due_date > until):
+            break
+        yield number, due_date
+        number += 1
+
+
+def build_occurrence(series, number, due_date):
+    """AccountPayable (não gravada) da ocorrência."""
+    payable = AccountPayable(
+        series=series,
+        current_installment=number,
+        total_installments=series.total_occurrences or 1,
+        is_recurring=series.total_occurrences is None,
+        recurrence_period=series.frequency,
+        due_date=due_date,
+        occurrence_date=due_date,
+        status='PENDING',
+        document_number=f"{series.document_number}/{number}" if series.document_number else None,
+    )
+    for field in SERIES_FIELDS:
+        setattr(payable, field, getattr(series, field))
+    return payable
+
+
+@transaction.atomic
+def materialize(series=None, until=None):
+    """
+    Gera as ocorrências que faltam das séries ativas (ou das informadas) até `until`
+    (padrão: horizonte móvel). Parcelamentos são gerados por inteiro. Retorna o número de contas criadas.
+    """
+    until = until or horizon_date()
+    if series is None:
+        series = PayableSeries.objects.filter(active=True).select_for_update()
+
+    new_payables = []
+    touched = []
+    for item in series:
+        limit = None if item.total_occurrences else until
+        occurrences = [
+            build_occurrence(item, number, due_date)
+            for number, due_date in _occurrences(item, item.materialized_count + 1, limit)
+        ]
+        if occurrences:
+            new_payables.extend(occurrences)
+            item.materialized_count += len(occurrences)
+            item.updated_at = timezone.now()
+            touched.append(item)
+
+    AccountPayable.objects.bulk_create(new_payables, batch_size=500)
+    PayableSeries.objects.bulk_update(touched, ['materialized_count', 'updated_at'], batch_size=500)
+    if new_payables:
+        transaction.on_commit(mark_stale)
+    return len(new_payables)
+
+
+@transaction.atomic
+def create_series_from_payable(payable, frequency='MONTHLY', total_occurrences=None, until=None):
+    """Cria a série a partir de uma conta modelo (não gravada) e materializa as primeiras ocorrências."""
+    series = PayableSeries(
+        frequency=frequency or 'MONTHLY',
+        start_date=payable.due_date,
+        total_occurrences=total_occurrences,
+        document_number=payable.document_number,
+    )
+    for field in SERIES_FIELDS:
+        setattr(series, field, getattr(payable, field))
+    series.save()
+    materialize([series], until=until)
+    return series
+
+
+@transaction.atomic
+def update_future(series, from_date, **changes):
+    """
+    Altera a série e, em um único UPDATE, as ocorrências em aberto com vencimento
+    a partir de from_date. Retorna o número de contas alteradas.
+    """
+    invalid = set(changes) - set(SERIES_FIELDS)
+    if invalid:
+        raise ValueError(f"Campos não editáveis na série: {', '.join(sorted(invalid))}")
+
+    for field, value in changes.items():
+        setattr(series, field, value)
+    series.save(update_fields=[*changes, 'updated_at'])
+    transaction.on_commit(mark_stale)
+    return series.occurrences.filter(status__in=OPEN_STATUSES, due_date__gte=from_date).update(
+        updated_at=timezone.now(), **changes
+    )
+
+
+@transaction.atomic
+def cancel_future(series, from_date):
+    """Encerra a série antes de from_date e cancela as ocorrências em aberto a partir dessa data."""
+    series.end_date = from_date - timedelta(days=1)
+    series.active = series.end_date >= series.start_date
+    series.save(update_fields=['end_date', 'active', 'updated_at'])
+    transaction.on_commit(mark_stale)
+    return series.occurrences.filter(status__in=OPEN_STATUSES, due_date__gte=from_date).update(
+        status='CANCELLED', updated_at=timezone.now()
+    )
+
+
+def project_occurrences(start, end, series=None):
+    """
+    Ocorrências ainda não geradas com vencimento em [start, end], sem gravar.
+    Cada conta projetada tem pk None e o atributo projected = True.
+    """
+    if series is None:
+        series = PayableSeries.objects.filter(active=True).select_related('supplier', 'category')
+    projected = []
+    for item in series:
+        for number, due_date in _occurrences(item, item.materialized_count + 1, end):
+            if due_date >= start:
+                payable = build_occurrence(item, number, due_date)
+                payable.projected = True
+                projected.append(payable)
+    projected.sort(key=lambda payable: payable.due_date)
+    return projected
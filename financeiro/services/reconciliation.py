@@ -0,0 +1,191 @@
+"""
+Conciliação Faturas x Contas a Receber.
+
+Calcula, para todas as faturas, o status/categoria que o recebível vinculado
+deveria ter (fatura paga ou boleto Cora pago => RECEBIDO, cancelada =>
+CANCELADO) com poucas queries, e aplica as diferenças em lote: faturas
+pagas na Cora marcadas como PG, recebíveis criados/atualizados com
+bulk_create/bulk_update e transações de recebimento (DRE) inseridas em lote,
+com o saldo da conta caixa atualizado por F().
+"""
+import logging
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from financeiro.models import AccountReceivable, CashAccount, CategoriaFinanceira, FinancialTransaction
+from financeiro.services.kpis import mark_stale
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReconciliationReport:
+    dry_run: bool = False
+    invoices_checked: int = 0
+    invoices_marked_paid: list = field(default_factory=list)
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    transactions_created: int = 0
+    warnings: list = field(default_factory=list)
+
+    def summary(self):
+        prefix = "[SIMULAÇÃO] " if self.dry_run else ""
+        return (
+            f"{prefix}Faturas verificadas: {self.invoices_checked}, "
+            f"Recebíveis criados: {len(self.created)}, atualizados: {len(self.updated)}, "
+            f"Faturas marcadas como pagas: {len(self.invoices_marked_paid)}, "
+            f"Transações criadas: {self.transactions_created}."
+        )
+
+    def lines(self):
+        """Relatório de diferenças, uma linha por alteração."""
+        for number in self.invoices_marked_paid:
+            yield f"Fatura #{number}: status PD -> PG (boleto Cora pago)"
+        for number, status in self.created:
+            yield f"Fatura #{number}: recebível criado ({status})"
+        for number, changes in self.updated:
+            diff = ", ".join(f"{name}: {old} -> {new}" for name, (old, new) in changes.items())
+            yield f"Fatura #{number}: {diff}"
+        yield from self.warnings
+
+
+def _target_status(invoice_status, cora_paid):
+    if invoice_status == 'PG' or cora_paid:
+        return 'RECEIVED'
+    if invoice_status == 'CN':
+        return 'CANCELLED'
+    return 'PENDING'
+
+
+def _receipt_transaction(receivable, account, description):
+    return FinancialTransaction(
+        description=f"Recebimento {description}",
+        amount=receivable.amount,
+        transaction_type='IN',
+        date=receivable.receipt_date or timezone.now().date(),
+        account=account,
+        category_id=receivable.category_id,
+        related_receivable=receivable,
+    )
+
+
+def reconcile_receivables(dry_run=False):
+    """Concilia todas as faturas com seus recebíveis. Com dry_run=True apenas gera o relatório."""
+    from faturamento.models import Invoice
+    from integracao_cora.models import BoletoCora
+
+    report = ReconciliationReport(dry_run=dry_run)
+    today = timezone.now().date()
+
+    with transaction.atomic():
+        fatura_category, _ = CategoriaFinanceira.objects.get_or_create(
+            nome="Receita de Faturas",
+            defaults={'tipo': 'entrada'}
+        )
+        contrato_category, _ = CategoriaFinanceira.objects.get_or_create(
+            nome="Receita de Contratos",
+            defaults={'tipo': 'entrada'}
+        )
+
+        invoices = list(
+            Invoice.objects.select_related('client')
+            .annotate(cora_paid=Exists(BoletoCora.objects.filter(fatura=OuterRef('pk'), status='Pago')))
+            .only('id', 'number', 'status', 'amount', 'due_date', 'contract_id', 'client__name')
+        )
+        report.invoices_checked = len(invoices)
+
+        # Primeiro recebível de cada fatura (mesmo critério do .first() anterior)
+        receivables = {}
+        for receivable in (
+            AccountReceivable.objects.filter(invoice__isnull=False)
+            .annotate(has_transaction=Exists(FinancialTransaction.objects.filter(related_receivable=OuterRef('pk'))))
+            .order_by('-id')
+        ):
+            receivables[receivable.invoice_id] = receivable
+
+        paid_invoice_ids = []
+        to_create = []
+        to_update = []
+        needs_transaction = []
+
+        for inv in invoices:
+            target_status = _target_status(inv.status, inv.cora_paid)
+            if inv.cora_paid and inv.status != 'PG':
+                paid_invoice_ids.append(inv.id)
+                report.invoices_marked_paid.append(inv.number)
+            target_category = contrato_category if inv.contract_id else fatura_category
+
+            receivable = receivables.get(inv.id)
+            if receivable is None:
+                description = f"Fatura #{inv.number}"
+                if inv.client:
+                    description += f" - {inv.client.name}"
+                receivable = AccountReceivable(
+                    description=description,
+                    client_id=inv.client_id,
+                    category=target_category,
+                    amount=inv.amount,
+                    due_date=inv.due_date,
+                    status=target_status,
+                    invoice_id=inv.id,
+                    document_number=inv.number,
+                    active=True,
+                    receipt_date=today if target_status == 'RECEIVED' else None
+                )
+                receivable.has_transaction = False
+                to_create.append(receivable)
+                report.created.append((inv.number, target_status))
+            else:
+                changes = {}
+                if receivable.status != target_status:
+                    changes['status'] = (receivable.status, target_status)
+                    receivable.status = target_status
+                    if target_status == 'RECEIVED' and not receivable.receipt_date:
+                        changes['receipt_date'] = (None, today)
+                        receivable.receipt_date = today
+                if receivable.category_id != target_category.id:
+                    changes['category'] = (receivable.category_id, target_category.id)
+                    receivable.category = target_category
+                if changes:
+                    receivable.updated_at = timezone.now()
+                    to_update.append(receivable)
+                    report.updated.append((inv.number, changes))
+
+            if receivable.status == 'RECEIVED' and not receivable.has_transaction:
+                needs_transaction.append(receivable)
+
+        account = CashAccount.objects.first() if needs_transaction else None
+        if needs_transaction and account is None:
+            report.warnings.append(
+                f"Nenhuma conta caixa cadastrada: {len(needs_transaction)} transações de recebimento não foram criadas."
+            )
+            needs_transaction = []
+        report.transactions_created = len(needs_transaction)
+
+        if dry_run:
+            transaction.set_rollback(True)
+            return report
+
+        if paid_invoice_ids:
+            Invoice.objects.filter(id__in=paid_invoice_ids).update(status='PG', updated_at=timezone.now())
+        AccountReceivable.objects.bulk_create(to_create, batch_size=500)
+        AccountReceivable.objects.bulk_update(
+            to_update, ['status', 'receipt_date', 'category', 'updated_at'], batch_size=500
+        )
+        if to_create or to_update:
+            transaction.on_commit(mark_stale)
+
+        if needs_transaction:
+            FinancialTransaction.objects.bulk_create(
+                [_receipt_transaction(r, account, r.description) for r in needs_transaction],
+                batch_size=500
+            )
+            # bulk_create não passa pelo save(): atualiza o saldo da conta de uma vez
+            total = sum(r.amount for r in needs_transaction)
+            CashAccount.objects.filter(pk=account.pk).update(current_balance=F('current_balance') + total)
+
+    logger.info(report.summary())
+    return report
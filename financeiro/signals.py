@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AccountPayable, AccountReceivable
+from .services.kpis import mark_stale
+
+
+@receiver([post_save, post_delete], sender=AccountPayable)
+@receiver([post_save, post_delete], sender=AccountReceivable)
+def invalidate_kpi_snapshot(sender, instance, **kwargs):
+    """
+    Contas a pagar/receber mudaram: o painel recalcula os indicadores no
+    próximo acesso. Só depois do commit, para um acesso concorrente não
+    recalcular com os dados antigos e gravar o snapshot como atual.
+    """
+    transaction.on_commit(mark_stale)
@@ -1,3 +1,190 @@
+import io
+from datetime import date
+from decimal import Decimal
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from comercial.models import Contract, ContractTemplate
+from core.models import Person
+from faturamento.models import Invoice
+from integracao_cora.models import BoletoCora
+from .admin import AccountPayableAdmin
+from .models import AccountPayable, AccountReceivable, CashAccount, FinancialKPISnapshot, FinancialTransaction
+from .services import cash_flow, kpis, payable_series
+from .services.reconciliation import reconcile_receivables
+
+
+class ReceivableReconciliationTest(TestCase):
+    def setUp(self):
+        self.person = Person.objects.create(name="Cliente", document="11122233344", is_client=True)
+        self.account = CashAccount.objects.create(name="Caixa", current_balance=Decimal('0'))
+        self.pending = Invoice.objects.create(client=self.person, due_date=date(2025, 1, 10), amount=Decimal('100.00'))
+        self.paid_on_cora = Invoice.objects.create(client=self.person, due_date=date(2025, 1, 10), amount=Decimal('250.00'))
+        BoletoCora.objects.create(
+            fatura=self.paid_on_cora, cliente=self.person, cora_id="inv_1", valor=Decimal('250.00'),
+            status='Pago', data_vencimento=date(2025, 1, 10),
+        )
+        # Fatura sem recebível vinculado
+        AccountReceivable.objects.filter(invoice=self.pending).delete()
+
+    def test_dry_run_does_not_write(self):
+        report = reconcile_receivables(dry_run=True)
+        self.assertEqual(len(report.created), 1)
+        self.assertEqual(report.invoices_marked_paid, [self.paid_on_cora.number])
+        self.assertFalse(AccountReceivable.objects.filter(invoice=self.pending).exists())
+        self.assertFalse(FinancialTransaction.objects.exists())
+
+    def test_reconcile_applies_differences(self):
+        report = reconcile_receivables()
+        self.assertEqual(report.transactions_created, 1)
+
+        self.paid_on_cora.refresh_from_db()
+        self.assertEqual(self.paid_on_cora.status, 'PG')
+        self.assertEqual(AccountReceivable.objects.get(invoice=self.pending).status, 'PENDING')
+        received = AccountReceivable.objects.get(invoice=self.paid_on_cora)
+        self.assertEqual(received.status, 'RECEIVED')
+        self.assertTrue(FinancialTransaction.objects.filter(related_receivable=received).exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.current_balance, Decimal('250.00'))
+
+        # Segunda execução não encontra diferenças
+        out = io.StringIO()
+        call_command('conciliar_recebiveis', stdout=out)
+        self.assertIn("Recebíveis criados: 0, atualizados: 0", out.getvalue())
+        self.assertEqual(FinancialTransaction.objects.count(), 1)
+
+
+class PayableSeriesTest(TestCase):
+    def setUp(self):
+        self.supplier = Person.objects.create(name="Locadora", document="99888777000166", is_supplier=True)
+
+    def _template(self, **kwargs):
+        return AccountPayable(
+            description="Aluguel", supplier=self.supplier, amount=Decimal('1000.00'), due_date=date(2025, 1, 31), **kwargs
+        )
+
+    def test_recurring_series_rolling_horizon_and_projection(self):
+        series = payable_series.create_series_from_payable(self._template(), until=date(2025, 3, 31))
+        self.assertEqual(
+            list(series.occurrences.order_by('due_date').values_list('due_date', flat=True)),
+            [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31)],
+        )
+
+        projected = payable_series.project_occurrences(date(2025, 1, 1), date(2025, 6, 30))
+        self.assertEqual([p.due_date for p in projected], [date(2025, 4, 30), date(2025, 5, 31), date(2025, 6, 30)])
+        self.assertEqual(AccountPayable.objects.count(), 3)  # projeção não grava
+
+        self.assertEqual(payable_series.materialize(until=date(2025, 5, 31)), 2)
+        self.assertEqual(payable_series.materialize(until=date(2025, 5, 31)), 0)  # idempotente
+
+        april = series.occurrences.get(due_date=date(2025, 4, 30))
+        self.assertEqual(payable_series.update_future(series, april.due_date, amount=Decimal('1100.00')), 2)
+        self.assertEqual(payable_series.cancel_future(series, date(2025, 5, 1)), 1)
+        series.refresh_from_db()
+        self.assertEqual(series.end_date, date(2025, 4, 30))
+        self.assertEqual(payable_series.project_occurrences(date(2025, 1, 1), date(2025, 12, 31)), [])
+        self.assertEqual(
+            list(series.occurrences.order_by('due_date').values_list('amount', 'status'))[-2:],
+            [(Decimal('1100.00'), 'PENDING'), (Decimal('1100.00'), 'CANCELLED')],
+        )
+
+    def test_payable_list_projects_future_occurrences(self):
+        payable_series.create_series_from_payable(self._template(), until=date(2025, 1, 31))
+        User.objects.create_user(username='financeiro', password='password')
+        self.client.login(username='financeiro', password='password')
+        response = self.client.get(reverse('financeiro:account_payable_list'), {'projetar': 1, 'start_date': '2025-01-01', 'end_date': '2099-03-31'})
+        self.assertContains(response, "Previsto")
+
+    def test_installments_are_created_at_once(self):
+        series = payable_series.create_series_from_payable(self._template(), frequency='WEEKLY', total_occurrences=4)
+        self.assertEqual(
+            list(series.occurrences.values_list('current_installment', 'total_installments')),
+            [(1, 4), (2, 4), (3, 4), (4, 4)],
+        )
+        self.assertEqual(series.occurrences.last().due_date, date(2025, 2, 21))
+
+
+class CashFlowForecastTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = date(2025, 1, 1)
+        self.bank = CashAccount.objects.create(name="Banco", current_balance=Decimal('1000.00'))
+        client = Person.objects.create(name="Condomínio", document="11222333000144", is_client=True)
+        AccountReceivable.objects.create(description="OS", client=client, amount=Decimal('500.00'), due_date=date(2025, 1, 6), account=self.bank)
+        AccountPayable.objects.create(description="Fornecedor", amount=Decimal('200.00'), due_date=date(2024, 12, 20))
+        contract = Contract.objects.create(
+            client=client, template=ContractTemplate.objects.create(name="Modelo", content="-"),
+            value=Decimal('300.00'), due_day=31, start_date=date(2024, 6, 1),
+        )
+        # Fevereiro já faturado: entra pelo contas a receber, não pela projeção do contrato
+        Invoice.objects.create(client=client, contract=contract, competence_month=2, competence_year=2025,
+                               due_date=date(2025, 2, 28), amount=Decimal('300.00'))
+        payable_series.create_series_from_payable(
+            AccountPayable(description="Internet", amount=Decimal('100.00'), due_date=date(2025, 1, 15)),
+            until=date(2025, 1, 31),
+        )
+
+    def test_forecast_combines_sources_and_caches_each_one(self):
+        forecast = cash_flow.build_forecast(90, today=self.today)
+        self.assertEqual(forecast.daily['Banco'].iloc[-1], 1500.0)
+        self.assertEqual(forecast.daily['Total'].iloc[0], 800.0)  # vencida entra hoje
+        self.assertEqual(forecast.daily['Total'].iloc[-1], 1900.0)
+        self.assertEqual(forecast.flows['Contratos'].sum(), 600.0)
+        self.assertEqual(forecast.flows['Recorrências'].sum(), -200.0)
+        self.assertEqual(forecast.lowest_balance(), (date(2025, 1, 1), 800.0))
+
+        with self.assertNumQueries(8):  # apenas assinaturas + saldos
+            cash_flow.build_forecast(90, today=self.today)
+
+        AccountPayable.objects.create(description="Extra", amount=Decimal('50.00'), due_date=date(2025, 3, 1))
+        with self.assertNumQueries(9):  # só o contas a pagar é recalculado
+            forecast = cash_flow.build_forecast(90, today=self.today)
+        self.assertEqual(forecast.daily['Total'].iloc[-1], 1850.0)
+
+        # Ação em lote do admin (update sem save) também muda a assinatura
+        AccountPayableAdmin(AccountPayable, admin.site).mark_as_paid(None, AccountPayable.objects.filter(description="Extra"))
+        self.assertEqual(cash_flow.build_forecast(90, today=self.today).daily['Total'].iloc[-1], 1900.0)
+
+        User.objects.create_user(username='financeiro', password='password')
+        self.client.login(username='financeiro', password='password')
+        response = self.client.get(reverse('financeiro:cash_flow_forecast'), {'dias': 180, 'agrupar': 'dia'})
+        self.assertContains(response, "Menor saldo previsto")
+
+
+class FinancialKPITest(TestCase):
+    def setUp(self):
+        self.today = date(2025, 3, 31)
+        self.client_person = Person.objects.create(name="Condomínio", document="11222333000144", is_client=True)
+        for due_date, amount in ((date(2025, 3, 20), '100.00'), (date(2025, 2, 14), '200.00'), (date(2024, 11, 1), '400.00')):
+            AccountReceivable.objects.create(description="OS", client=self.client_person, amount=Decimal(amount), due_date=due_date)
+        AccountReceivable.objects.create(description="Recebida", amount=Decimal('50.00'), due_date=date(2025, 3, 5), status='RECEIVED')
+        AccountPayable.objects.create(description="Fornecedor", amount=Decimal('80.00'), due_date=date(2025, 3, 10))
+
+    def test_aging_and_snapshot_invalidation(self):
+        data = kpis.get_kpis(self.today)
+        receivables = data['receivables']
+        self.assertEqual(receivables['pending'], 700.0)
+        self.assertEqual(receivables['done_month'], 50.0)
+        self.assertEqual([bucket['total'] for bucket in receivables['aging']], [100.0, 200.0, 0.0, 400.0])
+        self.assertEqual(data['payables']['due_month'], 80.0)
+        self.assertEqual(data['top_debtors'][0]['total'], 700.0)
+        self.assertEqual(data['monthly']['revenue'][-1], 150.0)
+
+        with self.assertNumQueries(1):  # snapshot reaproveitado
+            kpis.get_kpis(self.today)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AccountPayable.objects.create(description="Extra", amount=Decimal('20.00'), due_date=date(2025, 3, 15))
+        self.assertTrue(FinancialKPISnapshot.objects.get().is_stale)
+        self.assertEqual(kpis.get_kpis(self.today)['payables']['pending'], 100.0)
 
-# Create your tests here.
+        # Ação em lote do admin (update sem signals) também invalida o snapshot
+        with self.captureOnCommitCallbacks(execute=True):
+            AccountPayableAdmin(AccountPayable, admin.site).mark_as_paid(None, AccountPayable.objects.all())
+        self.assertTrue(FinancialKPISnapshot.objects.get().is_stale)
+        self.assertEqual(kpis.get_kpis(self.today)['payables']['pending'], 0.0)
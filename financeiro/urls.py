@@ -12,6 +12,8 @@ urlpatterns = [
     path('contas-a-pagar/<int:pk>/', views.account_payable_detail, name='account_payable_detail'),
     path('contas-a-pagar/<int:pk>/pagar/', views.baixa_conta_pagar, name='account_payable_pay'),
     path('contas-a-pagar/<int:pk>/cancelar/', views.cancelar_conta_pagar, name='account_payable_cancel'),
+    path('contas-a-pagar/<int:pk>/serie/alterar/', views.account_payable_series_update, name='account_payable_series_update'),
+    path('contas-a-pagar/<int:pk>/serie/cancelar/', views.account_payable_series_cancel, name='account_payable_series_cancel'),
     path('realizar_baixa_conta/<int:pk>/', views.realizar_baixa_conta, name='realizar_baixa_conta'),
     path('estornar_conta_pagar/<int:pk>/', views.estornar_conta_pagar, name='estornar_conta_pagar'),
 
@@ -55,6 +57,7 @@ urlpatterns = [
     
     # Extrato e Conciliação
     path('extrato/', views.financial_statement, name='financial_statement'),
+    path('fluxo-de-caixa/', views.cash_flow_forecast, name='cash_flow_forecast'),
     path('extrato/sync-cora/', views.sync_cora_statement, name='sync_cora_statement'),
     path('api/suggest-category/', views.api_suggest_category, name='api_suggest_category'),
 
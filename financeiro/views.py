@@ -37,10 +37,13 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.db.models import Q
 from django.utils import timezone
-from dateutil.relativedelta import relativedelta
-from importador.services.ai_service import suggest_category
+from importador.services.matching import suggest_category
 from django.db import models, transaction
+from django.utils.dateparse import parse_date
 from decimal import Decimal
+from .services import payable_series
+from .services.kpis import get_kpis
+from core.services.permissions import get_snapshot
 
 @login_required(login_url='/accounts/login/')
 def account_payable_list(request):
@@ -63,6 +66,17 @@ def account_payable_list(request):
         payables = payables.order_by('due_date')
     else:
         payables = payables.order_by('-due_date')
+
+    # Previsão: inclui as ocorrências ainda não geradas das séries recorrentes (sem gravar)
+    project = bool(request.GET.get('projetar')) and status in (None, '', 'PENDING')
+    if project and end_date:
+        today = timezone.now().date()
+        payables = sorted(
+            list(payables.select_related('supplier')) + payable_series.project_occurrences(
+                max(today, parse_date(start_date) or today), parse_date(end_date)
+            ),
+            key=lambda payable: payable.due_date,
+        )
         
     suppliers = Person.objects.filter(is_supplier=True).order_by('name')
     payment_form = PaymentPayableForm()
@@ -75,7 +89,8 @@ def account_payable_list(request):
         'payment_form': payment_form,
         'status_filter': status,
         'start_date': start_date,
-        'end_date': end_date
+        'end_date': end_date,
+        'project': project,
     })
 
 @login_required(login_url='/accounts/login/')
@@ -84,33 +99,22 @@ def account_payable_create(request):
         form = AccountPayableForm(request.POST)
         if form.is_valid():
             payable = form.save(commit=False)
-            total_installments = form.cleaned_data.get('total_installments', 1)
+            total_installments = form.cleaned_data.get('total_installments') or 1
             is_recurring = form.cleaned_data.get('is_recurring', False)
             
-            # Se for recorrente sem parcelas explícitas, geramos para os próximos 12 meses
-            num_instances = total_installments
-            if is_recurring and total_installments == 1:
-                num_instances = 12
-            
             try:
-                with transaction.atomic():
-                    original_due_date = payable.due_date
-                    for i in range(1, num_instances + 1):
-                        # Na primeira iteração usamos o objeto do form, nas demais criamos cópias
-                        if i == 1:
-                            new_payable = payable
-                        else:
-                            new_payable = AccountPayable()
-                            # Copia todos os campos relevantes
-                            for field in form.fields:
-                                if hasattr(payable, field):
-                                    setattr(new_payable, field, getattr(payable, field))
-                        
-                        new_payable.current_installment = i
-                        new_payable.total_installments = num_instances
-                        # Incrementa o mês para as parcelas subsequentes
-                        new_payable.due_date = original_due_date + relativedelta(months=i-1)
-                        new_payable.save()
+                if is_recurring or total_installments > 1:
+                    # Parcelas: série com total definido. Recorrente sem parcelas: série sem fim,
+                    # materializada até o horizonte (e depois pelo comando gerar_recorrencias)
+                    series = payable_series.create_series_from_payable(
+                        payable,
+                        frequency=payable.recurrence_period,
+                        total_occurrences=None if is_recurring and total_installments == 1 else total_installments,
+                    )
+                    num_instances = series.materialized_count
+                else:
+                    payable.save()
+                    num_instances = 1
                 
                 messages.success(request, f'Conta a pagar e {num_instances} lançamentos criados com sucesso.')
                 return redirect('financeiro:account_payable_list')
@@ -297,6 +301,43 @@ def cancelar_conta_pagar(request, pk):
         return redirect('financeiro:account_payable_list')
     return redirect('financeiro:account_payable_list')
 
+@login_required(login_url='/accounts/login/')
+@require_POST
+def account_payable_series_update(request, pk):
+    """Altera valor/descrição desta e das próximas ocorrências em aberto da série."""
+    payable = get_object_or_404(AccountPayable.objects.select_related('series'), pk=pk)
+    if not payable.series:
+        messages.error(request, 'Esta conta não pertence a uma série.')
+        return redirect('financeiro:account_payable_detail', pk=pk)
+
+    changes = {}
+    if request.POST.get('description'):
+        changes['description'] = request.POST['description']
+    if request.POST.get('amount'):
+        try:
+            changes['amount'] = Decimal(request.POST['amount'].replace(',', '.'))
+        except (ArithmeticError, ValueError):
+            messages.error(request, 'Valor inválido.')
+            return redirect('financeiro:account_payable_detail', pk=pk)
+
+    if changes:
+        updated = payable_series.update_future(payable.series, payable.due_date, **changes)
+        messages.success(request, f'{updated} conta(s) da série atualizada(s).')
+    return redirect('financeiro:account_payable_detail', pk=pk)
+
+@login_required(login_url='/accounts/login/')
+@require_POST
+def account_payable_series_cancel(request, pk):
+    """Cancela esta e as próximas ocorrências em aberto e encerra a série."""
+    payable = get_object_or_404(AccountPayable.objects.select_related('series'), pk=pk)
+    if not payable.series:
+        messages.error(request, 'Esta conta não pertence a uma série.')
+        return redirect('financeiro:account_payable_detail', pk=pk)
+
+    cancelled = payable_series.cancel_future(payable.series, payable.due_date)
+    messages.success(request, f'Série encerrada: {cancelled} conta(s) cancelada(s).')
+    return redirect('financeiro:account_payable_list')
+
 @login_required(login_url='/accounts/login/')
 def account_receivable_list(request):
     receivables = AccountReceivable.objects.all().order_by('due_date')
@@ -347,124 +388,13 @@ def sync_receables_view(request):
         messages.error(request, "Acesso negado.")
         return redirect('financeiro:account_receivable_list')
         
-    from faturamento.models import Invoice
-    from .models import AccountReceivable, CategoriaFinanceira
-    
-    # Busca todas as faturas, forçando active=True para garantir visibilidade
-    invoices = Invoice.objects.all()
-    created_count = 0
-    skipped_count = 0
-    
-    # Categoria padrão usada no Faturamento de Contratos
-    category, _ = CategoriaFinanceira.objects.get_or_create(
-        nome="Receita de Contratos",
-        defaults={'tipo': 'entrada'}
-    )
-    
-    from integracao_cora.models import BoletoCora
-    
-    # Ajuste temporário para o ELDON se solicitado
-    eldon_inv = Invoice.objects.filter(client__name__icontains='ELDON', amount=5.00).first()
-    if eldon_inv:
-        eldon_inv.status = 'PG'
-        eldon_inv.save()
-
-    # Categorias
-    fatura_category, _ = CategoriaFinanceira.objects.get_or_create(
-        nome="Receita de Faturas",
-        defaults={'tipo': 'entrada'}
-    )
-    contrato_category, _ = CategoriaFinanceira.objects.get_or_create(
-        nome="Receita de Contratos",
-        defaults={'tipo': 'entrada'}
-    )
-    
-    for inv in invoices:
-        receivable = AccountReceivable.objects.filter(invoice=inv).first()
-        
-        # Determine correct status
-        target_status = 'PENDING'
-        # Check internal status OR Cora payment
-        cora_paid = BoletoCora.objects.filter(fatura=inv, status='Pago').exists()
-        if inv.status == 'PG' or cora_paid:
-            target_status = 'RECEIVED'
-            if cora_paid and inv.status != 'PG':
-                inv.status = 'PG'
-                inv.save()
-        elif inv.status == 'CN':
-            target_status = 'CANCELLED'
-
-        # Determine correct category
-        target_category = contrato_category if inv.contract else fatura_category
-
-        if not receivable:
-            description = f"Fatura #{inv.number}"
-            if inv.client:
-                description += f" - {inv.client.name}"
-            
-            receivable = AccountReceivable.objects.create(
-                description=description,
-                client=inv.client,
-                category=target_category,
-                amount=inv.amount,
-                due_date=inv.due_date,
-                status=target_status,
-                invoice=inv,
-                document_number=inv.number,
-                active=True,
-                receipt_date=timezone.now().date() if target_status == 'RECEIVED' else None
-            )
-            
-            # SE RECEBIDO, CRIA A TRANSAÇÃO (DRE)
-            if target_status == 'RECEIVED':
-                from .models import CashAccount, FinancialTransaction
-                account = CashAccount.objects.first()
-                FinancialTransaction.objects.get_or_create(
-                    related_receivable=receivable,
-                    defaults={
-                        'description': f"Recebimento {description}",
-                        'amount': receivable.amount,
-                        'transaction_type': 'IN',
-                        'date': receivable.receipt_date or timezone.now().date(),
-                        'account': account,
-                        'category': receivable.category,
-                    }
-                )
-            created_count += 1
-        else:
-            # Sync status and category if different
-            changed = False
-            if receivable.status != target_status:
-                receivable.status = target_status
-                if target_status == 'RECEIVED' and not receivable.receipt_date:
-                    receivable.receipt_date = timezone.now().date()
-                changed = True
-            
-            if receivable.category != target_category:
-                receivable.category = target_category
-                changed = True
-                
-            if changed:
-                receivable.save()
-            
-            # SE RECEBIDO, CRIA A TRANSAÇÃO SE NÃO EXISTIR (DRE)
-            if receivable.status == 'RECEIVED':
-                from .models import CashAccount, FinancialTransaction
-                account = CashAccount.objects.first()
-                FinancialTransaction.objects.get_or_create(
-                    related_receivable=receivable,
-                    defaults={
-                        'description': f"Recebimento {receivable.description}",
-                        'amount': receivable.amount,
-                        'transaction_type': 'IN',
-                        'date': receivable.receipt_date or timezone.now().date(),
-                        'account': account,
-                        'category': receivable.category,
-                    }
-                )
-            skipped_count += 1
-            
-    messages.success(request, f"Sincronização concluída! Criados: {created_count}, Atualizados/Existentes: {skipped_count}.")
+    from .services.reconciliation import reconcile_receivables
+
+    dry_run = bool(request.GET.get('dry_run'))
+    report = reconcile_receivables(dry_run=dry_run)
+    for line in list(report.lines())[:20]:
+        messages.info(request, line)
+    messages.success(request, f"Sincronização concluída! {report.summary()}")
     return redirect('financeiro:account_receivable_list')
 
 @login_required
@@ -724,9 +654,10 @@ def account_receivable_cancel(request, pk):
 
 @login_required(login_url='/accounts/login/')
 def financial_dashboard(request):
-    total_payables = sum(p.amount for p in AccountPayable.objects.filter(status='PENDING'))
-    total_receivables = sum(r.amount for r in AccountReceivable.objects.filter(status='PENDING'))
-    balance = total_receivables - total_payables
+    kpis = get_kpis()
+    total_payables = kpis['payables']['pending']
+    total_receivables = kpis['receivables']['pending']
+    balance = round(total_receivables - total_payables, 2)
     
     recent_payables = AccountPayable.objects.order_by('due_date')[:5]
     recent_receivables = AccountReceivable.objects.order_by('due_date')[:5]
@@ -735,6 +666,7 @@ def financial_dashboard(request):
         'total_payables': total_payables,
         'total_receivables': total_receivables,
         'balance': balance,
+        'kpis': kpis,
         'recent_payables': recent_payables,
         'recent_receivables': recent_receivables,
     }
@@ -1075,7 +1007,7 @@ from .forms import CashAccountForm
 def admin_only(view_func):
     @login_required
     def _wrapped_view(request, *args, **kwargs):
-        if request.user.is_superuser or request.user.groups.filter(name='Administrativo').exists() or request.user.has_perm('auth.view_user'):
+        if get_snapshot(request.user).is_administrativo:
             return view_func(request, *args, **kwargs)
         messages.error(request, "Acesso restrito ao Administrativo.")
         return redirect('financeiro:dashboard')
@@ -1141,6 +1073,34 @@ def financial_statement(request):
         'end_date': end_date
     })
 
+@login_required(login_url='/accounts/login/')
+def cash_flow_forecast(request):
+    """Previsão de saldo por conta bancária (90 ou 180 dias, por dia ou por semana)."""
+    from .services.cash_flow import HORIZONS, build_forecast
+
+    try:
+        days = int(request.GET.get('dias', HORIZONS[0]))
+    except ValueError:
+        days = HORIZONS[0]
+    days = days if days in HORIZONS else HORIZONS[0]
+    group = 'dia' if request.GET.get('agrupar') == 'dia' else 'semana'
+
+    forecast = build_forecast(days)
+    table = forecast.daily if group == 'dia' else forecast.weekly
+    lowest_date, lowest_balance = forecast.lowest_balance()
+
+    return render(request, 'financeiro/cash_flow_forecast.html', {
+        'forecast': forecast,
+        'columns': list(table.columns),
+        'rows': [(day.date(), list(values)) for day, values in zip(table.index, table.to_numpy())],
+        'source_totals': forecast.flows.sum().round(2).to_dict(),
+        'lowest_date': lowest_date,
+        'lowest_balance': lowest_balance,
+        'days': days,
+        'group': group,
+        'horizons': HORIZONS,
+    })
+
 @admin_only
 def sync_cora_statement(request):
     """
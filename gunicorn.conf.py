@@ -0,0 +1,34 @@
+"""
+Configuração do gunicorn (carregada automaticamente a partir da raiz do projeto).
+
+A aplicação é pré-carregada no processo mestre (preload_app): o Django e os
+módulos são importados uma vez e os workers nascem por fork já prontos. O
+tempo de subida a frio (início do mestre até o servidor aceitar conexões) e
+o de cada worker vão para o log.
+"""
+import os
+import time
+
+_started = time.perf_counter()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+timeout = 120
+preload_app = True
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    # Conexões abertas durante o carregamento no mestre não podem ser herdadas pelos workers
+    from django.db import connections
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        if hasattr(connection, 'close_pool'):  # PostgreSQL com pool
+            connection.close_pool()
+    server.log.info("Cold start: aplicação carregada e servidor pronto em %.2fs", time.perf_counter() - _started)
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker %s pronto em %.2fs desde o início do mestre", worker.pid, time.perf_counter() - _started)
@@ -1,32 +1,33 @@
 """
 Services package
+
+Os nomes são carregados sob demanda (PEP 562): ai_service, file_service e
+import_service importam pandas, que só deve ser carregado quando uma
+importação de fato roda, e não na subida do servidor.
 """
-from .ai_service import (
-    detect_and_convert_date,
-    detect_and_convert_currency,
-    detect_and_convert_cnpj,
-    detect_and_convert_cpf,
-    suggest_category,
-    detect_data_type,
-    clean_dataframe,
-    find_similar_columns,
-    DataCleaningService
-)
-from .file_service import FileService
-from .template_service import TemplateService
-from .import_service import ImportService
+from importlib import import_module
+
+_EXPORTS = {
+    'detect_and_convert_date': 'ai_service',
+    'detect_and_convert_currency': 'ai_service',
+    'detect_and_convert_cnpj': 'ai_service',
+    'detect_and_convert_cpf': 'ai_service',
+    'suggest_category': 'matching',
+    'detect_data_type': 'ai_service',
+    'clean_dataframe': 'ai_service',
+    'find_similar_columns': 'matching',
+    'DataCleaningService': 'ai_service',
+    'FileService': 'file_service',
+    'TemplateService': 'template_service',
+    'ImportService': 'import_service',
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    'detect_and_convert_date',
-    'detect_and_convert_currency',
-    'detect_and_convert_cnpj',
-    'detect_and_convert_cpf',
-    'suggest_category',
-    'detect_data_type',
-    'clean_dataframe',
-    'find_similar_columns',
-    'DataCleaningService',
-    'FileService',
-    'TemplateService',
-    'ImportService',
-]
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
@@ -5,19 +5,13 @@ import re
 import logging
 from typing import Any, List, Dict, Optional, Tuple, Union
 from datetime import datetime
-from difflib import SequenceMatcher
 
 import pandas as pd
 import numpy as np
 
-logger = logging.getLogger(__name__)
-
+from .matching import calculate_similarity, find_similar_columns, suggest_category  # noqa: F401 (reexportados)
 
-def calculate_similarity(str1: str, str2: str) -> float:
-    """Calcula similaridade entre duas strings (0-1)"""
-    if not str1 or not str2:
-        return 0.0
-    return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
+logger = logging.getLogger(__name__)
 
 
 def detect_and_convert_date(value: Any) -> Optional[str]:
@@ -227,42 +221,6 @@ def detect_and_convert_cpf(value: Any) -> Optional[str]:
     return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
 
 
-def suggest_category(description: str, categories: List[str]) -> Dict[str, Any]:
-    """
-    Sugere categoria baseada na descrição usando similaridade de texto
-    """
-    if not description or not categories:
-        return {"category": None, "confidence": 0.0}
-    
-    best_match = None
-    best_score = 0.0
-    
-    for category in categories:
-        score = calculate_similarity(description, category)
-        if score > best_score:
-            best_score = score
-            best_match = category
-    
-    # Calcular nível de confiança
-    if best_score >= 0.7:
-        confidence_level = "high"
-    elif best_score >= 0.4:
-        confidence_level = "medium"
-    else:
-        confidence_level = "low"
-    
-    return {
-        "category": best_match,
-        "similarity": best_score,
-        "confidence": confidence_level,
-        "alternatives": [
-            {"category": cat, "score": calculate_similarity(description, cat)}
-            for cat in categories
-            if cat != best_match
-        ][:3]  # Top 3 alternativas
-    }
-
-
 def detect_data_type(column_values: pd.Series) -> Dict[str, Any]:
     """
     Analisa uma coluna e detecta o tipo de dado
@@ -413,28 +371,6 @@ def clean_dataframe(df: pd.DataFrame, column_types: Optional[Dict[str, str]] = N
     return df_clean, report
 
 
-def find_similar_columns(source_columns: List[str], target_columns: List[str], threshold: float = 0.6) -> Dict[str, str]:
-    """
-    Encontra correspondências entre colunas baseado em similaridade de nomes
-    """
-    mappings = {}
-    
-    for source in source_columns:
-        best_match = None
-        best_score = 0.0
-        
-        for target in target_columns:
-            score = calculate_similarity(source, target)
-            if score > best_score and score >= threshold:
-                best_score = score
-                best_match = target
-        
-        if best_match:
-            mappings[source] = best_match
-    
-    return mappings
-
-
 class DataCleaningService:
     """Serviço unificado de limpeza de dados"""
     
@@ -0,0 +1,73 @@
+"""
+Similaridade de textos para sugestões de categoria e de mapeamento de colunas.
+
+Só usa difflib: pode ser importado por views e serviços sem carregar pandas
+(ai_service reexporta estas funções para o importador).
+"""
+from difflib import SequenceMatcher
+from typing import Any, Dict, List
+
+
+def calculate_similarity(str1: str, str2: str) -> float:
+    """Calcula similaridade entre duas strings (0-1)"""
+    if not str1 or not str2:
+        return 0.0
+    return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
+
+
+def suggest_category(description: str, categories: List[str]) -> Dict[str, Any]:
+    """
+    Sugere categoria baseada na descrição usando similaridade de texto
+    """
+    if not description or not categories:
+        return {"category": None, "confidence": 0.0}
+    
+    best_match = None
+    best_score = 0.0
+    
+    for category in categories:
+        score = calculate_similarity(description, category)
+        if score > best_score:
+            best_score = score
+            best_match = category
+    
+    # Calcular nível de confiança
+    if best_score >= 0.7:
+        confidence_level = "high"
+    elif best_score >= 0.4:
+        confidence_level = "medium"
+    else:
+        confidence_level = "low"
+    
+    return {
+        "category": best_match,
+        "similarity": best_score,
+        "confidence": confidence_level,
+        "alternatives": [
+            {"category": cat, "score": calculate_similarity(description, cat)}
+            for cat in categories
+            if cat != best_match
+        ][:3]  # Top 3 alternativas
+    }
+
+
+def find_similar_columns(source_columns: List[str], target_columns: List[str], threshold: float = 0.6) -> Dict[str, str]:
+    """
+    Encontra correspondências entre colunas baseado em similaridade de nomes
+    """
+    mappings = {}
+    
+    for source in source_columns:
+        best_match = None
+        best_score = 0.0
+        
+        for target in target_columns:
+            score = calculate_similarity(source, target)
+            if score > best_score and score >= threshold:
+                best_score = score
+                best_match = target
+        
+        if best_match:
+            mappings[source] = best_match
+    
+    return mappings
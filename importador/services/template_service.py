@@ -6,7 +6,7 @@ import logging
 from typing import List, Optional, Dict, Any
 from django.utils import timezone
 from ..models import ImportTemplate, ModuleField
-from .ai_service import find_similar_columns
+from .matching import find_similar_columns
 
 logger = logging.getLogger(__name__)
 
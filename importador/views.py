@@ -1,6 +1,5 @@
 import json
 import logging
-import pandas as pd
 from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse, HttpResponse
 from django.views.generic import TemplateView, ListView, DetailView, View
@@ -10,7 +9,7 @@ from django.utils.decorators import method_decorator
 from django.core.files.storage import default_storage
 
 from .models import ImportTemplate, ImportJob, ImportStatus, ModuleField
-from .services import FileService, TemplateService, ImportService
+from .services.template_service import TemplateService
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +66,11 @@ def api_upload_file(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'detail': 'Método não permitido'}, status=405)
     
+    # pandas é carregado só aqui, e não na subida do servidor
+    import pandas as pd
+    from .services.file_service import FileService
+    from .services.import_service import ImportService
+
     try:
         file = request.FILES.get('file')
         module_type = request.POST.get('module_type')
@@ -260,6 +264,8 @@ def api_execute_import(request):
     if request.method != 'POST':
         return JsonResponse({'status': 'error', 'message': 'Invalid method'}, status=405)
     
+    from .services.import_service import ImportService
+
     try:
         data = json.loads(request.body)
         template_id = data.get('template_id')
@@ -305,6 +311,8 @@ def api_import_preview(request):
     if request.method != 'POST':
         return JsonResponse({'status': 'error', 'message': 'Invalid method'}, status=405)
     
+    from .services.import_service import ImportService
+
     try:
         data = json.loads(request.body)
         template_id = data.get('template_id')
@@ -6,7 +6,6 @@ import subprocess
 import tempfile
 from pathlib import Path
 from lxml import etree
-from signxml import XMLSigner, methods
 from cryptography.hazmat.primitives.serialization import pkcs12, Encoding, PrivateFormat, NoEncryption
 from cryptography.hazmat.primitives import serialization
 from cryptography.exceptions import UnsupportedAlgorithm
@@ -254,6 +253,8 @@ def assinar_xml(xml_string, caminho_ou_bytes_pfx, senha, usar_sha256=True):
     """Assina o XML usando o certificado PFX."""
     import os
     import sys
+    # signxml só é importado ao assinar: carregar_certificado (usado pela Cora) não precisa dele
+    from signxml import XMLSigner, methods
     from cryptography.hazmat.primitives import hashes
     from cryptography.hazmat.backends.openssl.backend import backend as ossl
 
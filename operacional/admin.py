@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import mark_safe
-from .models import ServiceOrder, OSAnexo, ServiceOrderItem
+from .models import ServiceOrder, OSAnexo, OSAnexoUpload, ServiceOrderItem, GeocodeCache
 
 class OSAnexoInline(admin.TabularInline):
     model = OSAnexo
@@ -36,3 +36,19 @@ class ServiceOrderAdmin(admin.ModelAdmin):
             return mark_safe(f'<a href="{url}" target="_blank">Ver no Mapa</a>')
         return "-"
     checkin_map_link.short_description = "Local do Check-in"
+
+
+@admin.register(OSAnexoUpload)
+class OSAnexoUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'os', 'user', 'status', 'received', 'size', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('filename', 'sha256', 'os__id')
+    readonly_fields = ('id', 'sha256', 'received', 'parts', 'anexo')
+
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ('address', 'lat', 'lng', 'source', 'updated_at')
+    list_filter = ('source',)
+    search_fields = ('address',)
+    readonly_fields = ('address_key',)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from operacional.services.scheduling import import_csv, learn_from_checkins
+
+
+class Command(BaseCommand):
+    help = ('Alimenta a tabela de coordenadas usada pela agenda: endereços com check-in de OS '
+            'e, opcionalmente, um CSV endereco;lat;lng.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--csv', default=None, help='Arquivo CSV (separado por ";", com cabeçalho endereco;lat;lng)')
+
+    def handle(self, *args, **options):
+        learned = learn_from_checkins()
+        self.stdout.write(self.style.SUCCESS(f'{learned} endereço(s) a partir de check-ins.'))
+        if options['csv']:
+            try:
+                with open(options['csv'], newline='', encoding='utf-8-sig') as file:
+                    saved, errors = import_csv(file)
+            except OSError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(self.style.SUCCESS(f'{saved} endereço(s) importado(s) do CSV.'))
+            if errors:
+                self.stdout.write(self.style.WARNING(f"Linhas ignoradas: {', '.join(map(str, errors))}"))
@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from operacional.services.photo_upload import discard_stale
+
+
+class Command(BaseCommand):
+    help = 'Remove envios de fotos em partes (app do técnico) abandonados ou já concluídos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=7, help='Envios sem atividade há mais de N dias')
+
+    def handle(self, *args, **options):
+        removed = discard_stale(timezone.now() - timedelta(days=options['dias']))
+        self.stdout.write(self.style.SUCCESS(f'{removed} envio(s) removido(s).'))
@@ -0,0 +1,71 @@
+"""
+Agenda otimizada do dia: distribui as OS pendentes entre os técnicos e
+ordena as visitas de cada um (ver operacional.services.scheduling).
+
+Uso:
+    python manage.py planejar_agenda --data 2025-02-10
+    python manage.py planejar_agenda --data 2025-02-10 --tecnicos ana joao --incluir-sem-data --aplicar
+"""
+from datetime import date, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from operacional.services.scheduling import (
+    AVERAGE_SPEED, SchedulingError, apply_plan, available_technicians, order_address, plan_day,
+)
+
+
+def _time(value):
+    return time.fromisoformat(value)
+
+
+class Command(BaseCommand):
+    help = 'Monta a agenda do dia por técnico (atribuição e ordem de visita) com base nas coordenadas em cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', type=date.fromisoformat, default=None, help='Dia (AAAA-MM-DD); padrão: amanhã')
+        parser.add_argument('--tecnicos', nargs='+', default=None, help='Usernames dos técnicos disponíveis')
+        parser.add_argument('--inicio', type=_time, default=time(8), help='Início da jornada (HH:MM)')
+        parser.add_argument('--fim', type=_time, default=time(18), help='Fim da jornada (HH:MM)')
+        parser.add_argument('--velocidade', type=float, default=AVERAGE_SPEED, help='Velocidade média (km/h)')
+        parser.add_argument('--incluir-sem-data', action='store_true', help='Inclui OS pendentes sem previsão')
+        parser.add_argument('--reatribuir', action='store_true',
+                            help='Redistribui também as OS de técnicos fora da lista (padrão: ficam como estão)')
+        parser.add_argument('--aplicar', action='store_true', help='Grava técnico e horário previsto nas OS')
+
+    def handle(self, *args, **options):
+        day = options['data'] or timezone.localdate() + timedelta(days=1)
+        try:
+            plan = plan_day(
+                day, technicians=available_technicians(options['tecnicos']), start=options['inicio'],
+                end=options['fim'], speed=options['velocidade'], include_unscheduled=options['incluir_sem_data'],
+                reassign=options['reatribuir'],
+            )
+        except SchedulingError as exc:
+            raise CommandError(str(exc))
+
+        for entry in plan['agenda']:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{entry['tecnico']} — {len(entry['paradas'])} OS, {entry['km']} km"
+            ))
+            for stop in entry['paradas']:
+                order = stop['os']
+                flag = ' (após a jornada)' if stop['excede_jornada'] else ''
+                self.stdout.write(
+                    f"  {timezone.localtime(stop['chegada']):%H:%M}-{timezone.localtime(stop['saida']):%H:%M}"
+                    f"  OS #{order.id}  {order.client.name}  (+{stop['km']} km){flag}"
+                )
+        for order in plan['nao_alocadas']:
+            self.stdout.write(self.style.WARNING(f'Não coube na jornada: OS #{order.id} {order.client.name}'))
+        for order in plan['sem_coordenadas']:
+            self.stdout.write(self.style.WARNING(
+                f'Sem coordenadas: OS #{order.id} {order.client.name} ({order_address(order) or "sem endereço"})'
+            ))
+        for order in plan['outros_tecnicos']:
+            self.stdout.write(f'Mantida com {order.technician.username}: OS #{order.id} {order.client.name}')
+        self.stdout.write(f"Calculado em {plan['segundos']:.2f}s")
+
+        if options['aplicar']:
+            changed = apply_plan(plan)
+            self.stdout.write(self.style.SUCCESS(f'{changed} OS atualizada(s) para {day:%d/%m/%Y}.'))
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:22
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operacional', '0010_alter_serviceorder_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='osanexo',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.CreateModel(
+            name='OSAnexoUpload',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('active', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Arquivo')),
+                ('type', models.CharField(choices=[('Antes', 'Antes do Serviço'), ('Depois', 'Depois do Serviço'), ('Diagnostico', 'Diagnóstico/Laudo')], default='Diagnostico', max_length=20, verbose_name='Tipo')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Tamanho (bytes)')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('received', models.PositiveBigIntegerField(default=0, verbose_name='Recebido (bytes)')),
+                ('parts', models.PositiveIntegerField(default=0, verbose_name='Partes recebidas')),
+                ('status', models.CharField(choices=[('RECEBENDO', 'Recebendo'), ('CONCLUIDO', 'Concluído')], default='RECEBENDO', max_length=20)),
+                ('anexo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='operacional.osanexo', verbose_name='Anexo')),
+                ('os', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anexo_uploads', to='operacional.serviceorder', verbose_name='Ordem de Serviço')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Envio de Anexo (App)',
+                'verbose_name_plural': 'Envios de Anexos (App)',
+                'unique_together': {('os', 'sha256')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operacional', '0011_mobile_sync_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('active', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('address_key', models.CharField(max_length=40, unique=True, verbose_name='Chave do Endereço')),
+                ('address', models.CharField(max_length=500, verbose_name='Endereço')),
+                ('lat', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='Latitude')),
+                ('lng', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='Longitude')),
+                ('source', models.CharField(choices=[('CHECKIN', 'Check-in de OS'), ('IMPORTADO', 'Importado'), ('MANUAL', 'Manual')], default='MANUAL', max_length=20, verbose_name='Origem')),
+            ],
+            options={
+                'verbose_name': 'Endereço Geocodificado',
+                'verbose_name_plural': 'Endereços Geocodificados',
+            },
+        ),
+    ]
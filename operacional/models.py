@@ -1,3 +1,8 @@
+import hashlib
+import re
+import unicodedata
+import uuid
+
 from django.db import models
 from core.models import BaseModel, Person
 from django.contrib.auth.models import User
@@ -71,6 +76,7 @@ class OSAnexo(BaseModel):
     os = models.ForeignKey(ServiceOrder, on_delete=models.CASCADE, related_name='anexos', verbose_name="Ordem de Serviço")
     file = models.ImageField(upload_to='uploads/os_fotos/%Y/%m/', verbose_name="Foto/Anexo")
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, default='Diagnostico', verbose_name="Tipo")
+    sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True, verbose_name="SHA-256")
 
     def __str__(self):
         return f"Anexo {self.id} - {self.type}"
@@ -79,6 +85,63 @@ class OSAnexo(BaseModel):
         verbose_name = "Anexo de OS"
         verbose_name_plural = "Anexos de OS"
 
+class OSAnexoUpload(BaseModel):
+    """Envio de foto em partes pelo app do técnico; as partes ficam no storage até a remontagem."""
+    STATUS_CHOICES = (
+        ('RECEBENDO', 'Recebendo'),
+        ('CONCLUIDO', 'Concluído'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    os = models.ForeignKey(ServiceOrder, on_delete=models.CASCADE, related_name='anexo_uploads', verbose_name="Ordem de Serviço")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Usuário")
+    filename = models.CharField(max_length=255, verbose_name="Arquivo")
+    type = models.CharField(max_length=20, choices=OSAnexo.TYPE_CHOICES, default='Diagnostico', verbose_name="Tipo")
+    size = models.PositiveBigIntegerField(verbose_name="Tamanho (bytes)")
+    sha256 = models.CharField(max_length=64, verbose_name="SHA-256")
+    received = models.PositiveBigIntegerField(default=0, verbose_name="Recebido (bytes)")
+    parts = models.PositiveIntegerField(default=0, verbose_name="Partes recebidas")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='RECEBENDO')
+    anexo = models.ForeignKey(OSAnexo, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Anexo")
+
+    def __str__(self):
+        return f"Upload {self.filename} ({self.received}/{self.size})"
+
+    class Meta:
+        verbose_name = "Envio de Anexo (App)"
+        verbose_name_plural = "Envios de Anexos (App)"
+        unique_together = ('os', 'sha256')
+
+def address_key(address):
+    """Chave do endereço sem acentos, pontuação e diferenças de caixa ou espaços."""
+    text = unicodedata.normalize('NFKD', address or '').encode('ascii', 'ignore').decode().lower()
+    return hashlib.sha1(' '.join(re.findall(r'[a-z0-9]+', text)).encode()).hexdigest()
+
+class GeocodeCache(BaseModel):
+    """Coordenadas de endereços de clientes, para a agenda funcionar sem serviço de geocodificação."""
+    SOURCE_CHOICES = (
+        ('CHECKIN', 'Check-in de OS'),
+        ('IMPORTADO', 'Importado'),
+        ('MANUAL', 'Manual'),
+    )
+
+    address_key = models.CharField(max_length=40, unique=True, verbose_name="Chave do Endereço")
+    address = models.CharField(max_length=500, verbose_name="Endereço")
+    lat = models.DecimalField(max_digits=9, decimal_places=6, verbose_name="Latitude")
+    lng = models.DecimalField(max_digits=9, decimal_places=6, verbose_name="Longitude")
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='MANUAL', verbose_name="Origem")
+
+    def save(self, *args, **kwargs):
+        self.address_key = address_key(self.address)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.address} ({self.lat}, {self.lng})"
+
+    class Meta:
+        verbose_name = "Endereço Geocodificado"
+        verbose_name_plural = "Endereços Geocodificados"
+
 class ServiceOrderItem(BaseModel):
     service_order = models.ForeignKey(ServiceOrder, on_delete=models.CASCADE, related_name='items', verbose_name="Ordem de Serviço")
     product = models.ForeignKey('estoque.Product', on_delete=models.CASCADE, verbose_name="Produto")
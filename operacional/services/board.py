@@ -0,0 +1,110 @@
+"""
+Quadro do andamento operacional.
+
+get_board monta o quadro inteiro com duas consultas: os orçamentos ganhos,
+classificados por subconsultas EXISTS anotadas (sem os JOINs com DISTINCT
+sobre serviços, produtos, contratos e OS), e as OS das colunas do kanban,
+com cliente e técnico no mesmo SELECT. Cada coluna vira uma lista de dicts
+só com o que os cards exibem; o quadro fica no cache por alguns segundos
+e é invalidado quando uma OS ou orçamento muda (operacional.signals).
+"""
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from comercial.models import Budget, BudgetProduct, BudgetService, Contract
+from operacional.models import ServiceOrder
+
+CACHE_KEY = 'operacional:quadro:{date}'
+CACHE_TIMEOUT = 30
+
+# Coluna do kanban -> status da OS (concluidas: só as com check-out hoje)
+COLUMNS = {
+    'instalacao': 'INSTALLATION_PENDING',
+    'pendentes': 'PENDING',
+    'execucao': 'IN_PROGRESS',
+    'material': 'WAITING_MATERIAL',
+    'concluidas': 'COMPLETED',
+}
+ORDER_FIELDS = (
+    'id', 'status', 'value', 'budget_id', 'order_type', 'product', 'scheduled_date', 'checkout_time', 'created_at',
+    'client__name', 'technician__username', 'technician__first_name', 'technician__last_name',
+)
+
+
+def _key(day):
+    return CACHE_KEY.format(date=day.isoformat())
+
+
+def invalidate():
+    cache.delete(_key(timezone.localdate()))
+
+
+def _budgets():
+    """Orçamentos ganhos por etapa: liberação, pendentes de contrato e pendentes de OS."""
+    budgets = Budget.objects.filter(status='Ganho').annotate(
+        has_services=Exists(BudgetService.objects.filter(budget=OuterRef('pk'))),
+        has_products=Exists(BudgetProduct.objects.filter(budget=OuterRef('pk'))),
+        has_contract=Exists(Contract.objects.filter(budget=OuterRef('pk'))),
+        has_os=Exists(ServiceOrder.objects.filter(budget=OuterRef('pk'))),
+    ).order_by('id').values(
+        'id', 'title', 'total_value', 'client__name', 'approved_by_operations',
+        'has_services', 'has_products', 'has_contract', 'has_os',
+    )
+    result = {'liberacao': [], 'pendentes_contrato': [], 'pendentes_os': []}
+    for budget in budgets:
+        item = {'id': budget['id'], 'title': budget['title'], 'total_value': budget['total_value'],
+                'client_name': budget['client__name']}
+        if not budget['approved_by_operations']:
+            result['liberacao'].append(item)
+            continue
+        if budget['has_services'] and not budget['has_contract']:
+            result['pendentes_contrato'].append(item)
+        if (budget['has_services'] or budget['has_products']) and not budget['has_os']:
+            result['pendentes_os'].append(item)
+    return result
+
+
+def _card(row):
+    full_name = f"{row['technician__first_name']} {row['technician__last_name']}".strip()
+    return {
+        'id': row['id'],
+        'client_name': row['client__name'],
+        'value': row['value'],
+        'budget_id': row['budget_id'],
+        'order_type': row['order_type'],
+        'product': row['product'],
+        'scheduled_date': row['scheduled_date'],
+        'checkout_time': row['checkout_time'],
+        'created_at': row['created_at'],
+        'technician_name': (full_name or row['technician__username']) if row['technician__username'] else None,
+    }
+
+
+def _columns(day):
+    open_statuses = [status for key, status in COLUMNS.items() if key != 'concluidas']
+    rows = ServiceOrder.objects.filter(
+        Q(status__in=open_statuses) | Q(status='COMPLETED', checkout_time__date=day)
+    ).order_by().values(*ORDER_FIELDS)
+
+    by_status = {status: [] for status in COLUMNS.values()}
+    for row in rows:
+        by_status[row['status']].append(_card(row))
+
+    columns = {key: by_status[status] for key, status in COLUMNS.items()}
+    columns['instalacao'].sort(key=lambda card: card['created_at'])
+    for key in ('pendentes', 'execucao', 'material'):
+        # Sem previsão vão para o fim, como no ORDER BY do PostgreSQL
+        columns[key].sort(key=lambda card: (card['scheduled_date'] is None, card['scheduled_date'] or 0))
+    columns['concluidas'].sort(key=lambda card: card['checkout_time'], reverse=True)
+    return {key: {'key': key, 'items': items, 'count': len(items)} for key, items in columns.items()}
+
+
+def get_board():
+    """Colunas do kanban e orçamentos por etapa, do cache quando possível."""
+    day = timezone.localdate()
+    board = cache.get(_key(day))
+    if board is None:
+        board = {'columns': _columns(day), 'budgets': _budgets(), 'generated_at': timezone.now()}
+        cache.set(_key(day), board, CACHE_TIMEOUT)
+    return board
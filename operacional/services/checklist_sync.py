@@ -0,0 +1,166 @@
+"""
+Sincronização do checklist com o app do técnico.
+
+definition() devolve as categorias e perguntas ativas em um payload com
+versão (hash do conteúdo), guardado no cache até alguma delas mudar
+(operacional.signals). O app baixa o payload uma vez e trabalha offline;
+a versão serve de ETag.
+
+apply_changes recebe um lote de alterações de respostas (valor, comentário
+e referência de foto) e grava tudo com um INSERT ... ON CONFLICT por
+conjunto de campos alterados, usando a restrição única (os, pergunta).
+O token de versão das respostas é o maior updated_at da OS (em µs):
+answers_since(order, token) devolve só o que mudou depois dele.
+"""
+import hashlib
+import json
+import posixpath
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max, Prefetch
+
+from operacional.models import ChecklistCategoria, ChecklistPergunta, ChecklistResposta, checklist_photo_path
+
+DEFINITION_CACHE_KEY = 'checklist:definicao'
+CACHE_TIMEOUT = 60 * 60 * 24
+LOCAL_CACHE_TIMEOUT = 60  # cache por processo: os demais workers não recebem a invalidação
+MAX_CHANGES = 500
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Chave no payload do app -> campo de ChecklistResposta
+CHANGE_FIELDS = {'valor': 'resposta_valor', 'comentario': 'comentario', 'foto': 'foto'}
+
+
+class SyncError(ValueError):
+    pass
+
+
+def definition():
+    """Categorias e perguntas ativas, com a versão do conteúdo."""
+    payload = cache.get(DEFINITION_CACHE_KEY)
+    if payload is None:
+        perguntas = ChecklistPergunta.objects.filter(active=True).order_by('order', 'id')
+        categorias = [
+            {
+                'id': categoria.id,
+                'name': categoria.name,
+                'order': categoria.order,
+                'perguntas': [
+                    {'id': pergunta.id, 'texto': pergunta.texto, 'tipo': pergunta.tipo, 'order': pergunta.order}
+                    for pergunta in categoria.perguntas.all()
+                ],
+            }
+            for categoria in ChecklistCategoria.objects.filter(active=True).prefetch_related(
+                Prefetch('perguntas', queryset=perguntas)
+            )
+        ]
+        version = hashlib.sha1(json.dumps(categorias, sort_keys=True).encode()).hexdigest()[:16]
+        payload = {'version': version, 'categorias': categorias}
+        timeout = LOCAL_CACHE_TIMEOUT if isinstance(caches['default'], LocMemCache) else CACHE_TIMEOUT
+        cache.set(DEFINITION_CACHE_KEY, payload, timeout)
+    return payload
+
+
+def invalidate_definition():
+    cache.delete(DEFINITION_CACHE_KEY)
+
+
+def version_token(moment):
+    return str((moment - EPOCH) // timedelta(microseconds=1)) if moment else '0'
+
+
+def parse_token(token):
+    try:
+        return EPOCH + timedelta(microseconds=int(token))
+    except (TypeError, ValueError, OverflowError):
+        raise SyncError(f'Token de versão inválido: {token!r}')
+
+
+def answers_version(order):
+    return version_token(order.checklist_respostas.aggregate(last=Max('updated_at'))['last'])
+
+
+def serialize(resposta):
+    return {
+        'pergunta_id': resposta.pergunta_id,
+        'valor': resposta.resposta_valor,
+        'comentario': resposta.comentario,
+        'foto': resposta.foto.url if resposta.foto else None,
+        'atualizado_em': resposta.updated_at.isoformat(),
+    }
+
+
+def answers_since(order, token=None):
+    """Respostas da OS alteradas depois do token (todas, sem token)."""
+    respostas = order.checklist_respostas.order_by('updated_at')
+    if token and token != '0':
+        respostas = respostas.filter(updated_at__gt=parse_token(token))
+    return [serialize(resposta) for resposta in respostas]
+
+
+def _photo(order, reference, files):
+    """Caminho da foto: arquivo enviado no mesmo request ou já gravado na pasta da OS."""
+    if reference is None or reference == '':
+        return ''
+    if reference in files:
+        upload = files[reference]
+        return default_storage.save(checklist_photo_path(ChecklistResposta(os=order), upload.name), upload)
+    prefix = checklist_photo_path(ChecklistResposta(os=order), '')
+    # Normaliza antes de comparar: 'uploads/checklist/1/../2/x.jpg' é foto de outra OS
+    path = posixpath.normpath(reference) if isinstance(reference, str) else ''
+    if path.startswith(prefix) and default_storage.exists(path):
+        return path
+    raise SyncError(f'Foto não encontrada: {reference}')
+
+
+def apply_changes(order, changes, files=None):
+    """
+    Aplica um lote de alterações [{pergunta_id, valor?, comentario?, foto?}] à OS.
+    Só os campos presentes são alterados; alterações repetidas da mesma pergunta
+    são mescladas na ordem recebida. Devolve (aplicadas, rejeitadas, fotos).
+    """
+    files = files or {}
+    if not isinstance(changes, list):
+        raise SyncError('"respostas" deve ser uma lista.')
+    if len(changes) > MAX_CHANGES:
+        raise SyncError(f'No máximo {MAX_CHANGES} respostas por lote.')
+
+    ids = {change.get('pergunta_id') for change in changes if isinstance(change, dict)}
+    valid = set(ChecklistPergunta.objects.filter(pk__in=[i for i in ids if isinstance(i, int)], active=True)
+                .order_by().values_list('pk', flat=True))
+
+    merged, rejected, photos = {}, [], {}
+    for change in changes:
+        pergunta_id = change.get('pergunta_id') if isinstance(change, dict) else None
+        if pergunta_id not in valid:
+            rejected.append({'pergunta_id': pergunta_id, 'erro': 'Pergunta inexistente ou inativa'})
+            continue
+        values = {field: change[key] for key, field in CHANGE_FIELDS.items() if key in change}
+        for field in ('resposta_valor', 'comentario'):
+            if values.get(field) is not None:
+                values[field] = str(values[field])
+        if 'foto' in values:
+            try:
+                values['foto'] = _photo(order, values['foto'], files)
+            except SyncError as exc:
+                rejected.append({'pergunta_id': pergunta_id, 'erro': str(exc)})
+                continue
+            photos[pergunta_id] = default_storage.url(values['foto']) if values['foto'] else None
+        if values:
+            merged.setdefault(pergunta_id, {}).update(values)
+
+    groups = {}
+    for pergunta_id, values in merged.items():
+        groups.setdefault(frozenset(values), []).append(ChecklistResposta(os=order, pergunta_id=pergunta_id, **values))
+
+    with transaction.atomic():
+        for fields, rows in groups.items():
+            ChecklistResposta.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['os', 'pergunta'],
+                update_fields=[*sorted(fields), 'updated_at'],
+            )
+    return len(merged), rejected, photos
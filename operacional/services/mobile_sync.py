@@ -0,0 +1,199 @@
+"""
+Pacote offline do app do técnico.
+
+snapshot monta, com um número fixo de consultas, as OS atribuídas ao
+técnico (a mesma regra da lista mobile) com cliente, endereço, fotos e o
+estado do checklist. Com o token da sincronização anterior, só vêm as OS
+alteradas depois dele (a OS, o cliente, respostas do checklist ou anexos),
+junto com a lista completa de ids atribuídos, para o app descartar as que
+saíram. apply grava o que foi feito offline (check-ins e respostas do
+checklist) antes do delta, para o dia inteiro sincronizar em uma ida.
+"""
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from operacional.models import ChecklistResposta, OSAnexo, ServiceOrder
+from operacional.services import checklist_sync
+
+VISIBLE_STATUSES = ['PENDING', 'IN_PROGRESS', 'WAITING_MATERIAL', 'OPEN', 'SCHEDULED']
+CLOSED_STATUSES = ['COMPLETED', 'CANCELED']
+# Margem do delta: alterações gravadas durante a montagem do snapshot anterior
+# vêm de novo (o app mescla por id) em vez de se perderem
+SYNC_OVERLAP = timedelta(seconds=5)
+COORDINATE_PLACES = Decimal('1e-15')  # casas decimais de checkin_lat/checkin_long
+
+
+class SyncError(ValueError):
+    pass
+
+
+def technician_orders(user):
+    """Todas as OS do técnico (qualquer status); todas, para superusuários."""
+    if user.is_superuser:
+        return ServiceOrder.objects.all()
+    # Case-insensitive para capturar AndreBezerra vs andrebezerra
+    return ServiceOrder.objects.filter(technician__username__iexact=user.username)
+
+
+def assigned_orders(user):
+    """OS em aberto exibidas ao técnico no app."""
+    if user.is_superuser:
+        return ServiceOrder.objects.exclude(status__in=CLOSED_STATUSES)
+    return technician_orders(user).filter(status__in=VISIBLE_STATUSES)
+
+
+def _client(person):
+    return {
+        'id': person.id,
+        'nome': person.fantasy_name or person.name,
+        'razao_social': person.name,
+        'documento': person.document,
+        'telefone': person.phone,
+        'email': person.email,
+        'endereco': {
+            'logradouro': person.address,
+            'numero': person.number,
+            'complemento': person.complement,
+            'bairro': person.neighborhood,
+            'cidade': person.city,
+            'uf': person.state,
+            'cep': person.zip_code,
+        },
+    }
+
+
+def serialize_order(order):
+    return {
+        'id': order.id,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'tipo': order.order_type,
+        'motivo': order.reason,
+        'descricao': order.description,
+        'agendada': order.scheduled_date.isoformat() if order.scheduled_date else None,
+        'duracao': order.duration,
+        'endereco': order.address,
+        'contato': order.contact,
+        'checkin': order.checkin_time.isoformat() if order.checkin_time else None,
+        'atualizado_em': order.updated_at.isoformat(),
+        'cliente': _client(order.client),
+        'checklist': [checklist_sync.serialize(resposta) for resposta in order.checklist_respostas.all()],
+        'anexos': [
+            {'id': anexo.id, 'tipo': anexo.type, 'url': anexo.file.url, 'sha256': anexo.sha256}
+            for anexo in order.anexos.all()
+        ],
+    }
+
+
+def snapshot(user, since=None):
+    """OS atribuídas (todas, ou só as alteradas depois do token `since`) e o novo token."""
+    now = timezone.now()
+    orders = assigned_orders(user)
+    changed = orders
+    if since:
+        moment = checklist_sync.parse_token(since) - SYNC_OVERLAP
+        changed = orders.filter(
+            Q(updated_at__gt=moment)
+            | Q(client__updated_at__gt=moment)
+            | Exists(ChecklistResposta.objects.filter(os=OuterRef('pk'), updated_at__gt=moment))
+            | Exists(OSAnexo.objects.filter(os=OuterRef('pk'), updated_at__gt=moment))
+        )
+    changed = changed.select_related('client').prefetch_related(
+        Prefetch('checklist_respostas', queryset=ChecklistResposta.objects.order_by('pergunta_id')),
+        Prefetch('anexos', queryset=OSAnexo.objects.order_by('id')),
+    ).order_by('-scheduled_date', '-id')
+
+    return {
+        'version': checklist_sync.version_token(now),
+        'checklist_definicao': checklist_sync.definition()['version'],
+        'ids': list(orders.order_by('-scheduled_date', '-id').values_list('id', flat=True)),
+        'ordens': [serialize_order(order) for order in changed],
+    }
+
+
+def _coordinate(value, limit):
+    if value is None or value == '':
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise SyncError(f'Coordenada inválida: {value!r}')
+    if not number.is_finite() or abs(number) > limit:
+        raise SyncError(f'Coordenada inválida: {value!r}')
+    return number.quantize(COORDINATE_PLACES)
+
+
+def _moment(value):
+    """Hora do check-in (ISO 8601); sem fuso, vale o fuso do servidor."""
+    if not value:
+        return timezone.now()
+    try:
+        moment = parse_datetime(str(value))
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise SyncError(f'Hora inválida: {value!r}')
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def _os_id(value):
+    return int(value) if str(value).isdigit() else None
+
+
+def _checkin(order, data):
+    lat, long, moment = _coordinate(data.get('lat'), 90), _coordinate(data.get('long'), 180), _moment(data.get('hora'))
+    order.checkin_lat = lat
+    order.checkin_long = long
+    order.checkin_time = moment
+    fields = ['checkin_lat', 'checkin_long', 'checkin_time', 'updated_at']
+    if order.status in ('PENDING', 'OPEN', 'SCHEDULED'):
+        order.status = 'IN_PROGRESS'
+        fields.append('status')
+    order.save(update_fields=fields)
+
+
+@transaction.atomic
+def apply(user, payload, files=None):
+    """
+    Aplica o trabalho offline: {"checkins": [{os_id, lat, long, hora}],
+    "checklist": {"<os_id>": [alterações do checklist_sync.apply_changes]}}.
+    Só OS do técnico são alteradas; as demais, e check-ins com coordenadas ou
+    hora inválidas, voltam em "rejeitadas". Tudo ou nada: um erro no lote
+    (SyncError) desfaz o que já tinha sido gravado, e o app reenvia o lote.
+    """
+    checkins = payload.get('checkins') or []
+    checklist = payload.get('checklist') or {}
+    if not isinstance(checkins, list) or not isinstance(checklist, dict):
+        raise SyncError('"checkins" deve ser uma lista e "checklist" um objeto.')
+
+    ids = {_os_id(item.get('os_id')) for item in checkins if isinstance(item, dict)}
+    ids.update(_os_id(os_id) for os_id in checklist)
+    orders = technician_orders(user).in_bulk([os_id for os_id in ids if os_id is not None])
+
+    result = {'checkins': 0, 'checklist': {}, 'rejeitadas': []}
+    for item in checkins:
+        os_id = item.get('os_id') if isinstance(item, dict) else None
+        order = orders.get(_os_id(os_id))
+        if order is None:
+            result['rejeitadas'].append({'os_id': os_id, 'erro': 'OS não encontrada'})
+            continue
+        try:
+            _checkin(order, item)
+        except SyncError as exc:
+            result['rejeitadas'].append({'os_id': os_id, 'erro': str(exc)})
+            continue
+        result['checkins'] += 1
+
+    for os_id, changes in checklist.items():
+        order = orders.get(_os_id(os_id))
+        if order is None:
+            result['rejeitadas'].append({'os_id': os_id, 'erro': 'OS não encontrada'})
+            continue
+        applied, rejected, photos = checklist_sync.apply_changes(order, changes, files)
+        result['checklist'][str(order.id)] = {'aplicadas': applied, 'rejeitadas': rejected, 'fotos': photos}
+    return result
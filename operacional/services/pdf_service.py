@@ -1,5 +1,5 @@
 from django.template.loader import get_template
-from xhtml2pdf import pisa
+from core.services.pdf import create_pdf
 from django.http import HttpResponse
 from django.conf import settings
 from core.models import CompanySettings
@@ -59,7 +59,7 @@ def generate_preventive_pdf_bytes(order, categories, responses):
     
     html = template.render(context)
     result = io.BytesIO()
-    pisa_status = pisa.CreatePDF(io.BytesIO(html.encode("utf-8")), dest=result, encoding='utf-8')
+    pisa_status = create_pdf(io.BytesIO(html.encode("utf-8")), dest=result, encoding='utf-8')
     
     if pisa_status.err:
         return None
@@ -0,0 +1,160 @@
+"""
+Envio de fotos em partes (resumível) pelo app do técnico.
+
+start abre ou retoma o envio identificado pelo SHA-256 do arquivo; se a OS
+já tem um anexo com o mesmo conteúdo, nada precisa ser enviado. Cada parte
+é gravada no storage na ordem: o cliente informa o offset e, fora de
+sequência (por exemplo, depois de perder a resposta da parte anterior),
+recebe 409 com o offset correto para continuar dali. Na última parte o
+arquivo é remontado em um arquivo temporário, conferido pelo hash e vira um
+OSAnexo; as partes são apagadas.
+"""
+import hashlib
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from operacional.models import OSAnexo, OSAnexoUpload
+
+CHUNK_SIZE = 512 * 1024
+MAX_CHUNK_SIZE = 2 * 1024 * 1024  # abaixo do DATA_UPLOAD_MAX_MEMORY_SIZE padrão
+MAX_FILE_SIZE = 25 * 1024 * 1024
+PARTS_PREFIX = 'uploads/parciais'
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(ValueError):
+    status = 400
+
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+    def __init__(self, offset):
+        super().__init__(f'Offset fora de sequência; continue a partir de {offset}.')
+        self.offset = offset
+
+
+class ChecksumMismatch(UploadError):
+    status = 422
+
+
+def part_name(upload, index):
+    return f'{PARTS_PREFIX}/{upload.id}/{index:05d}'
+
+
+def _delete_parts(upload):
+    for index in range(upload.parts):
+        default_storage.delete(part_name(upload, index))
+
+
+def _restart(upload, **fields):
+    _delete_parts(upload)
+    for field, value in fields.items():
+        setattr(upload, field, value)
+    upload.received = 0
+    upload.parts = 0
+    upload.status = 'RECEBENDO'
+    upload.anexo = None
+    upload.save()
+
+
+def start(order, user, filename, size, sha256, type='Diagnostico'):
+    """Devolve (upload, anexo): anexo já existente com o mesmo conteúdo, ou o envio a continuar."""
+    sha256 = str(sha256 or '').lower()
+    if not SHA256_RE.match(sha256):
+        raise UploadError('sha256 inválido.')
+    if not isinstance(size, int) or not 0 < size <= MAX_FILE_SIZE:
+        raise UploadError(f'Tamanho inválido (máximo {MAX_FILE_SIZE // (1024 * 1024)} MB).')
+    if type not in dict(OSAnexo.TYPE_CHOICES):
+        raise UploadError(f'Tipo de anexo inválido: {type}')
+
+    anexo = OSAnexo.objects.filter(os=order, sha256=sha256).first()
+    if anexo:
+        return None, anexo
+
+    fields = {'filename': filename or f'{sha256[:16]}.jpg', 'size': size, 'type': type, 'user': user}
+    upload, created = OSAnexoUpload.objects.get_or_create(os=order, sha256=sha256, defaults=fields)
+    if not created and (upload.status == 'CONCLUIDO' or upload.size != size):
+        # O anexo foi apagado depois do envio, ou o cliente mudou o arquivo: recomeça
+        _restart(upload, **fields)
+    return upload, None
+
+
+def _assemble(upload):
+    """Remonta as partes em um arquivo temporário; devolve o OSAnexo ou None se o hash não confere."""
+    digest = hashlib.sha256()
+    with tempfile.TemporaryFile() as assembled:
+        for index in range(upload.parts):
+            with default_storage.open(part_name(upload, index), 'rb') as part:
+                for chunk in part.chunks():
+                    digest.update(chunk)
+                    assembled.write(chunk)
+        if digest.hexdigest() != upload.sha256:
+            return None
+        assembled.seek(0)
+        anexo = OSAnexo(os=upload.os, type=upload.type, sha256=upload.sha256)
+        anexo.file.save(upload.filename, File(assembled), save=True)
+    _delete_parts(upload)
+    return anexo
+
+
+def receive_chunk(upload, offset, data):
+    """Grava a parte que começa em `offset`; na última, cria o anexo. Devolve o envio atualizado."""
+    with transaction.atomic():
+        upload = OSAnexoUpload.objects.select_for_update().select_related('os').get(pk=upload.pk)
+        if upload.status == 'CONCLUIDO':
+            return upload  # reenvio da última parte depois de uma resposta perdida
+        if offset != upload.received:
+            raise OffsetMismatch(upload.received)
+        if not data or len(data) > MAX_CHUNK_SIZE or upload.received + len(data) > upload.size:
+            raise UploadError(f'Parte inválida (até {MAX_CHUNK_SIZE} bytes, sem ultrapassar o tamanho do arquivo).')
+
+        name = part_name(upload, upload.parts)
+        if default_storage.exists(name):  # resto de uma tentativa interrompida
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(data))
+        upload.received += len(data)
+        upload.parts += 1
+
+        if upload.received == upload.size:
+            upload.anexo = _assemble(upload)
+            if upload.anexo is None:
+                _restart(upload)
+                corrupted = True
+            else:
+                upload.status = 'CONCLUIDO'
+                upload.save()
+                corrupted = False
+        else:
+            upload.save(update_fields=['received', 'parts', 'updated_at'])
+            corrupted = False
+    if corrupted:
+        raise ChecksumMismatch('O arquivo remontado não confere com o sha256; envie novamente desde o início.')
+    return upload
+
+
+def discard_stale(older_than):
+    """Apaga envios incompletos parados desde `older_than` (e suas partes) e os concluídos. Devolve quantos."""
+    stale = list(OSAnexoUpload.objects.filter(updated_at__lt=older_than))
+    for upload in stale:
+        if upload.status != 'CONCLUIDO':
+            _delete_parts(upload)
+    OSAnexoUpload.objects.filter(pk__in=[upload.pk for upload in stale]).delete()
+    return len(stale)
+
+
+def status(upload=None, anexo=None):
+    anexo = anexo or (upload.anexo if upload else None)
+    return {
+        'upload_id': str(upload.id) if upload else None,
+        'recebido': upload.received if upload else None,
+        'tamanho': upload.size if upload else None,
+        'chunk_size': CHUNK_SIZE,
+        'concluido': anexo is not None,
+        'anexo': {'id': anexo.id, 'tipo': anexo.type, 'url': anexo.file.url, 'sha256': anexo.sha256} if anexo else None,
+    }
@@ -0,0 +1,294 @@
+"""
+Agenda e roteiro dos técnicos para um dia de OS.
+
+plan_day junta as OS pendentes e de instalação pendente do dia, as
+coordenadas dos endereços (tabela GeocodeCache, sem chamadas externas) e
+os técnicos disponíveis, e devolve a agenda de cada um: ordem de visita,
+chegada e saída previstas e deslocamento. O cálculo é feito por solve, que
+não depende do banco: matriz de tempos de deslocamento (haversine com
+fator de via e velocidade média), distribuição pelo vizinho mais próximo
+(o técnico com o relógio mais atrasado escolhe a próxima OS mais próxima
+que ainda cabe na jornada) e melhoria de cada rota por 2-opt, com prazo
+máximo de processamento. OS já atribuídas a um técnico disponível ficam
+com ele; as atribuídas a técnicos fora da lista ficam fora da agenda
+("outros_tecnicos"), salvo com reassign=True. As que não cabem na jornada
+vão para "nao_alocadas".
+
+A tabela de coordenadas é alimentada pelos check-ins das OS e por
+importação (comando atualizar_geocodigos). A base de saída dos técnicos
+vem de settings.AGENDA_BASE_COORDS (lat, lng); sem ela, o centro das OS.
+"""
+import csv
+import math
+import re
+import time as clock
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Technician
+from operacional.models import GeocodeCache, ServiceOrder, address_key
+from operacional.services import board
+
+PLAN_STATUSES = ['PENDING', 'INSTALLATION_PENDING']
+DEFAULT_DURATION = 60  # minutos, quando a OS não informa a duração
+AVERAGE_SPEED = 30  # km/h no trânsito urbano
+ROAD_FACTOR = 1.3  # distância pela via / distância em linha reta
+TIME_LIMIT = 0.8  # segundos para a melhoria por 2-opt
+EARTH_RADIUS = 6371.0
+
+
+class SchedulingError(ValueError):
+    pass
+
+
+# --- Endereços e coordenadas -------------------------------------------------
+
+def client_address(person):
+    street = ', '.join(part for part in (person.address, person.number) if part)
+    city = '/'.join(part for part in (person.city, person.state) if part)
+    return ' - '.join(part for part in (street, person.neighborhood, city, person.zip_code) if part)
+
+
+def order_address(order):
+    """Endereço da visita: o da OS, se preenchido, senão o do cliente."""
+    return (order.address or '').strip() or client_address(order.client)
+
+
+def coordinates(keys):
+    """{chave do endereço (address_key): (lat, lng)} das chaves que estão na tabela, em uma consulta."""
+    found = GeocodeCache.objects.filter(address_key__in=set(keys)).values_list('address_key', 'lat', 'lng')
+    return {key: (float(lat), float(lng)) for key, lat, lng in found}
+
+
+def learn_from_checkins():
+    """Grava as coordenadas do check-in mais recente de cada endereço ainda sem coordenadas. Devolve quantas."""
+    orders = ServiceOrder.objects.filter(
+        checkin_lat__isnull=False, checkin_long__isnull=False,
+    ).select_related('client').order_by('-checkin_time')
+    known = set(GeocodeCache.objects.values_list('address_key', flat=True))
+    new = {}
+    for order in orders:
+        address = order_address(order)
+        key = address_key(address)
+        if address and key not in known and key not in new:
+            new[key] = GeocodeCache(address_key=key, address=address[:500], source='CHECKIN',
+                                    lat=round(order.checkin_lat, 6), lng=round(order.checkin_long, 6))
+    GeocodeCache.objects.bulk_create(new.values(), ignore_conflicts=True)
+    return len(new)
+
+
+def import_csv(file, delimiter=';'):
+    """Importa linhas endereco;lat;lng (com cabeçalho), substituindo coordenadas existentes. Devolve (gravadas, erros)."""
+    saved, errors = 0, []
+    for line, row in enumerate(csv.DictReader(file, delimiter=delimiter), start=2):
+        try:
+            lat, lng = Decimal(row['lat'].replace(',', '.')), Decimal(row['lng'].replace(',', '.'))
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not row['endereco'].strip():
+                raise InvalidOperation
+        except (KeyError, AttributeError, InvalidOperation):
+            errors.append(line)
+            continue
+        address = row['endereco'].strip()[:500]
+        GeocodeCache.objects.update_or_create(
+            address_key=address_key(address),
+            defaults={'address': address, 'lat': round(lat, 6), 'lng': round(lng, 6), 'source': 'IMPORTADO'},
+        )
+        saved += 1
+    return saved, errors
+
+
+# --- Cálculo da rota (sem banco) ------------------------------------------------
+
+def parse_duration(text, default=DEFAULT_DURATION):
+    """Minutos a partir do texto livre da OS: "2h", "1h30", "1:30", "90 min", "1,5 h"."""
+    text = (text or '').strip().lower().replace(',', '.')
+    match = re.fullmatch(r'(\d+):(\d{1,2})', text) or re.fullmatch(r'(\d+(?:\.\d+)?)\s*h[a-z]*\s*(\d+)?\s*(?:m[a-z]*)?', text)
+    if match:
+        return round(float(match.group(1)) * 60 + int(match.group(2) or 0))
+    match = re.fullmatch(r'(\d+)\s*m[a-z]*', text)
+    if match:
+        return int(match.group(1))
+    return default
+
+
+def haversine(a, b):
+    lat1, lng1, lat2, lng2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(h))
+
+
+def distance_matrix(points):
+    """Matriz simétrica de distâncias pela via (km)."""
+    size = len(points)
+    matrix = [[0.0] * size for _ in range(size)]
+    for i in range(size):
+        row = matrix[i]
+        for j in range(i + 1, size):
+            row[j] = matrix[j][i] = haversine(points[i], points[j]) * ROAD_FACTOR
+    return matrix
+
+
+def route_cost(route, travel):
+    return sum(travel[route[i]][route[i + 1]] for i in range(len(route) - 1))
+
+
+def two_opt(route, travel, deadline):
+    """Melhora a rota aberta (route[0] é a base, fixa) invertendo trechos enquanto houver ganho."""
+    route = list(route)
+    last = len(route) - 1
+    improved = True
+    while improved and clock.perf_counter() < deadline:
+        improved = False
+        for i in range(1, last):
+            a, b = route[i - 1], route[i]
+            row_a, row_b = travel[a], travel[b]
+            for k in range(i + 1, last + 1):
+                c = route[k]
+                if k == last:
+                    delta = row_a[c] - row_a[b]
+                else:
+                    d = route[k + 1]
+                    delta = row_a[c] + row_b[d] - row_a[b] - travel[c][d]
+                if delta < -1e-9:
+                    route[i:k + 1] = reversed(route[i:k + 1])
+                    b = route[i]
+                    row_b = travel[b]
+                    improved = True
+    return route
+
+
+def solve(travel, durations, technicians, time_limit=TIME_LIMIT):
+    """
+    travel: matriz de minutos entre pontos (0 é a base); durations[i]: minutos de
+    serviço do ponto i; technicians: [{'capacity': minutos, 'fixed': {pontos}}].
+    Devolve (rotas sem a base, na ordem dos técnicos, e pontos não alocados).
+    """
+    deadline = clock.perf_counter() + time_limit
+    fixed = [set(tech['fixed']) for tech in technicians]
+    taken = set().union(*fixed) if fixed else set()
+    free = set(range(1, len(travel))) - taken
+    routes = [[0] for _ in technicians]
+    elapsed = [0.0] * len(technicians)
+    open_ = set(range(len(technicians)))
+
+    while open_:
+        t = min(open_, key=lambda index: (elapsed[index], index))
+        here = travel[routes[t][-1]]
+        best, best_time = None, None
+        for point in free | fixed[t]:
+            if elapsed[t] + here[point] + durations[point] <= technicians[t]['capacity']:
+                if best_time is None or here[point] < best_time:
+                    best, best_time = point, here[point]
+        if best is None:
+            open_.discard(t)
+            continue
+        routes[t].append(best)
+        elapsed[t] += best_time + durations[best]
+        free.discard(best)
+        fixed[t].discard(best)
+
+    # OS atribuídas pelo despachante ficam com o técnico mesmo passando da jornada
+    for t, remaining in enumerate(fixed):
+        routes[t].extend(sorted(remaining))
+    routes = [two_opt(route, travel, deadline) for route in routes]
+    return [route[1:] for route in routes], sorted(free)
+
+
+# --- Agenda do dia ------------------------------------------------------------
+
+def day_orders(day, include_unscheduled=False):
+    when = Q(scheduled_date__date=day)
+    if include_unscheduled:
+        when |= Q(scheduled_date__isnull=True)
+    return ServiceOrder.objects.filter(when, status__in=PLAN_STATUSES).select_related('client', 'technician').order_by('id')
+
+
+def available_technicians(usernames=None):
+    technicians = Technician.objects.filter(active=True, user__is_active=True).select_related('user')
+    if usernames:
+        technicians = technicians.filter(user__username__in=usernames)
+    return list(technicians.order_by('user__first_name', 'user__username'))
+
+
+def plan_day(day, technicians=None, start=time(8), end=time(18), base=None, speed=AVERAGE_SPEED,
+             include_unscheduled=False, reassign=False, time_limit=TIME_LIMIT):
+    """Agenda otimizada do dia por técnico, mais as OS não alocadas e as sem coordenadas."""
+    started = clock.perf_counter()
+    technicians = available_technicians() if technicians is None else list(technicians)
+    if not technicians:
+        raise SchedulingError('Nenhum técnico disponível.')
+    if end <= start:
+        raise SchedulingError('O fim da jornada deve ser depois do início.')
+
+    index = {tech.user_id: position for position, tech in enumerate(technicians)}
+    orders, others = [], []
+    for order in day_orders(day, include_unscheduled):
+        if order.technician_id and order.technician_id not in index and not reassign:
+            others.append(order)  # de um técnico fora desta agenda: não é redistribuída
+        else:
+            orders.append(order)
+    keys = {order.id: address_key(order_address(order)) for order in orders}
+    found = coordinates(keys.values())
+    located = [order for order in orders if keys[order.id] in found]
+    missing = [order for order in orders if keys[order.id] not in found]
+
+    points = [found[keys[order.id]] for order in located]
+    base = base or getattr(settings, 'AGENDA_BASE_COORDS', None)
+    if not base and points:
+        base = (sum(lat for lat, _ in points) / len(points), sum(lng for _, lng in points) / len(points))
+    km = distance_matrix([tuple(base)] + points) if points else [[0.0]]
+    travel = [[distance / speed * 60 for distance in row] for row in km]
+    durations = [0] + [parse_duration(order.duration) for order in located]
+
+    capacity = (datetime.combine(day, end) - datetime.combine(day, start)).total_seconds() / 60
+    fixed = [set() for _ in technicians]
+    for point, order in enumerate(located, start=1):
+        if order.technician_id in index:
+            fixed[index[order.technician_id]].add(point)
+    routes, unassigned = solve(travel, durations,
+                               [{'capacity': capacity, 'fixed': points_} for points_ in fixed], time_limit)
+
+    day_start = timezone.make_aware(datetime.combine(day, start))
+    day_end = timezone.make_aware(datetime.combine(day, end))
+    agenda = []
+    for tech, route in zip(technicians, routes):
+        moment, previous, stops, total_km = day_start, 0, [], 0.0
+        for point in route:
+            arrival = moment + timedelta(minutes=travel[previous][point])
+            moment = arrival + timedelta(minutes=durations[point])
+            stops.append({
+                'os': located[point - 1], 'chegada': arrival, 'saida': moment,
+                'km': round(km[previous][point], 1), 'excede_jornada': moment > day_end,
+            })
+            total_km += km[previous][point]
+            previous = point
+        agenda.append({'tecnico': tech, 'cor': tech.calendar_color, 'paradas': stops,
+                       'km': round(total_km, 1), 'fim': moment if stops else None})
+
+    return {
+        'data': day,
+        'agenda': agenda,
+        'nao_alocadas': [located[point - 1] for point in unassigned],
+        'sem_coordenadas': missing,
+        'outros_tecnicos': others,
+        'segundos': clock.perf_counter() - started,
+    }
+
+
+def apply_plan(plan):
+    """Grava técnico e horário previsto de cada OS da agenda. Devolve quantas OS foram alteradas."""
+    now, changed = timezone.now(), []
+    for entry in plan['agenda']:
+        for stop in entry['paradas']:
+            order = stop['os']
+            order.technician_id = entry['tecnico'].user_id
+            order.scheduled_date = stop['chegada']
+            order.updated_at = now  # o app do técnico recebe a OS no próximo delta
+            changed.append(order)
+    ServiceOrder.objects.bulk_update(changed, ['technician', 'scheduled_date', 'updated_at'])
+    board.invalidate()  # bulk_update não dispara os signals
+    return len(changed)
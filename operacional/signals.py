@@ -1,49 +1,84 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import ServiceOrder, ServiceOrderItem
-from financeiro.models import AccountReceivable, CategoriaFinanceira
-from estoque.models import StockMovement
 from django.utils import timezone
-from django.db.models.signals import pre_save
+
+from .models import ChecklistCategoria, ChecklistPergunta, ServiceOrder
+from .services import board
+from .services.checklist_sync import invalidate_definition
+from comercial.models import Budget, BudgetProduct, BudgetService, Contract
+from financeiro.models import AccountReceivable, CategoriaFinanceira
+from estoque.services import stock_ledger
+
+
+@receiver(pre_save, sender=ServiceOrder)
+def check_status_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Guarda o status anterior para que os efeitos de conclusão rodem só na transição.
+    Saves parciais que não tocam o status (check-in, fotos) não consultam o banco.
+    """
+    if instance.pk is None:
+        instance._previous_status = None
+    elif update_fields is not None and 'status' not in update_fields:
+        instance._previous_status = instance.status
+    else:
+        instance._previous_status = (
+            ServiceOrder.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+
+def _completed_now(instance):
+    return instance.status == 'COMPLETED' and getattr(instance, '_previous_status', None) != 'COMPLETED'
+
 
 @receiver(post_save, sender=ServiceOrder)
 def create_receivable_on_complete(sender, instance, created, **kwargs):
     """
     Creates an AccountReceivable when a ServiceOrder is marked as COMPLETED.
+    O recebível fica vinculado à OS (FK única), o que torna a criação idempotente.
     """
-    if instance.status == 'COMPLETED':
-        description = f"Ref. OS #{instance.id}"
-        
-        if not AccountReceivable.objects.filter(description=description).exists():
-            
+    if not _completed_now(instance):
+        return
+
+    today = timezone.now().date()
+    AccountReceivable.objects.get_or_create(
+        service_order=instance,
+        defaults={
+            'description': f"Ref. OS #{instance.id}",
+            'client': instance.client,
+            'amount': instance.value,
+            'due_date': today,
+            'status': 'PENDING',
             # Try to find a default category for Services/Sales
-            category = CategoriaFinanceira.objects.filter(tipo='entrada').first()
-            
-            AccountReceivable.objects.create(
-                description=description,
-                client=instance.client,
-                amount=instance.value,
-                due_date=timezone.now().date(),
-                status='PENDING',
-                category=category,
-                occurrence_date=timezone.now().date()
-            )
+            'category': CategoriaFinanceira.objects.filter(tipo='entrada').first(),
+            'occurrence_date': today,
+        }
+    )
 
-@receiver(pre_save, sender=ServiceOrder)
-def check_status_change(sender, instance, **kwargs):
-    pass
 
 @receiver(post_save, sender=ServiceOrder)
 def deduct_stock_on_complete(sender, instance, created, **kwargs):
-    if instance.status == 'COMPLETED':
-        reason_pattern = f"Ordem de Serviço #{instance.id} - Conclusão"
-        
-        if not StockMovement.objects.filter(reason=reason_pattern).exists():
-            items = instance.items.all()
-            for item in items:
-                StockMovement.objects.create(
-                    product=item.product,
-                    movement_type='OUT',
-                    quantity=item.quantity,
-                    reason=reason_pattern
-                )
+    if not _completed_now(instance):
+        return
+    reason = f"Ordem de Serviço #{instance.id} - Conclusão"
+    # Lote único no razão; produtos que esta OS já baixou são ignorados (origem única por produto)
+    stock_ledger.post_movements([
+        stock_ledger.movement(item.product_id, 'OUT', item.quantity, reason=reason, source=instance)
+        for item in instance.items.all()
+    ])
+
+
+@receiver([post_save, post_delete], sender=ChecklistCategoria)
+@receiver([post_save, post_delete], sender=ChecklistPergunta)
+def invalidate_checklist_definition(sender, **kwargs):
+    """Nova versão do payload do checklist quando categorias ou perguntas mudam."""
+    invalidate_definition()
+
+
+@receiver([post_save, post_delete], sender=ServiceOrder)
+@receiver([post_save, post_delete], sender=Budget)
+@receiver([post_save, post_delete], sender=BudgetProduct)
+@receiver([post_save, post_delete], sender=BudgetService)
+@receiver([post_save, post_delete], sender=Contract)
+def invalidate_operational_board(sender, **kwargs):
+    """O quadro do andamento operacional é remontado na próxima visita."""
+    board.invalidate()
@@ -1,3 +1,401 @@
-from django.test import TestCase
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from comercial.models import Budget, BudgetProduct
+from core.models import Person, Technician
+from estoque.models import Product, StockMovement
+from financeiro.models import AccountReceivable
+from .models import (
+    ChecklistCategoria, ChecklistPergunta, ChecklistResposta, GeocodeCache, OSAnexo, OSAnexoUpload, ServiceOrder,
+    ServiceOrderItem,
+)
+from .services import checklist_sync, scheduling
+
+
+class ServiceOrderCompletionTest(TestCase):
+    def setUp(self):
+        self.client_person = Person.objects.create(name="Cliente", document="11122233344", is_client=True)
+        self.product = Product.objects.create(name="Cabo", sku="CABO", cost_price=1, sale_price=2, current_stock=10)
+        self.order = ServiceOrder.objects.create(client=self.client_person, value=Decimal('150.00'), description="Teste")
+        ServiceOrderItem.objects.create(service_order=self.order, product=self.product, quantity=2, unit_price=2)
+        ServiceOrderItem.objects.create(service_order=self.order, product=self.product, quantity=1, unit_price=2)
+
+    def test_completion_runs_once_per_transition(self):
+        self.order.status = 'COMPLETED'
+        self.order.save()
+
+        receivable = AccountReceivable.objects.get(service_order=self.order)
+        self.assertEqual(receivable.amount, Decimal('150.00'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 7)
+        self.assertEqual(StockMovement.objects.get().quantity, 3)
+
+        # Edições posteriores da OS concluída não repetem os efeitos nem consultam o status
+        with self.assertNumQueries(1):
+            self.order.save(update_fields=['description'])
+        self.order.save()
+        self.assertEqual(AccountReceivable.objects.filter(service_order=self.order).count(), 1)
+        self.assertEqual(StockMovement.objects.count(), 1)
+
+
+class ChecklistSyncTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('tecnico', password='password')
+        self.client.login(username='tecnico', password='password')
+        client_person = Person.objects.create(name="Cliente", document="11122233344", is_client=True)
+        self.order = ServiceOrder.objects.create(client=client_person, description="Preventiva", order_type='Preventiva')
+        categoria = ChecklistCategoria.objects.create(name="Elétrica", order=1)
+        self.perguntas = [
+            ChecklistPergunta.objects.create(categoria=categoria, texto=f"Item {i}", order=i) for i in range(60)
+        ]
+        self.sync_url = reverse('operacional:checklist_sync_api', args=[self.order.pk])
+
+    def post(self, payload):
+        return self.client.post(self.sync_url, json.dumps(payload), content_type='application/json')
+
+    def test_definition_is_versioned_and_cached(self):
+        url = reverse('operacional:checklist_definition_api')
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(len(data['categorias'][0]['perguntas']), 60)
+        self.assertEqual(response['ETag'], f'"{data["version"]}"')
+
+        with self.assertNumQueries(2):  # apenas sessão e usuário
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.perguntas[0].texto = "Item alterado"
+        self.perguntas[0].save()
+        self.assertNotEqual(self.client.get(url).json()['version'], data['version'])
+
+    def test_batch_upserts_answers_in_constant_queries(self):
+        ChecklistResposta.objects.create(os=self.order, pergunta=self.perguntas[0], resposta_valor='NÃO', comentario='Antigo')
+        changes = [{'pergunta_id': p.id, 'valor': 'SIM'} for p in self.perguntas]
+        changes.append({'pergunta_id': self.perguntas[1].id, 'comentario': 'Cabo solto'})
+        changes.append({'pergunta_id': 999999, 'valor': 'SIM'})
+
+        checklist_sync.definition()
+        # sessão, usuário, OS, perguntas válidas, savepoint, 2 upserts (um por conjunto de campos) e o token
+        with self.assertNumQueries(9):
+            response = self.post({'respostas': changes})
+        data = response.json()
+        self.assertEqual(data['aplicadas'], 60)
+        self.assertEqual(data['rejeitadas'], [{'pergunta_id': 999999, 'erro': 'Pergunta inexistente ou inativa'}])
+
+        self.assertEqual(ChecklistResposta.objects.filter(os=self.order, resposta_valor='SIM').count(), 60)
+        first = ChecklistResposta.objects.get(os=self.order, pergunta=self.perguntas[0])
+        self.assertEqual(first.comentario, 'Antigo')  # campo ausente no lote não é alterado
+        self.assertEqual(ChecklistResposta.objects.get(pergunta=self.perguntas[1]).comentario, 'Cabo solto')
+
+        # Delta: só o que mudou depois do token
+        token = data['version']
+        self.post({'respostas': [{'pergunta_id': self.perguntas[5].id, 'valor': 'N/D'}]})
+        delta = self.client.get(self.sync_url, {'desde': token}).json()
+        self.assertEqual([(r['pergunta_id'], r['valor']) for r in delta['respostas']], [(self.perguntas[5].id, 'N/D')])
+
+    def test_photo_is_sent_in_the_batch(self):
+        photo = SimpleUploadedFile('foto.jpg', b'jpeg', content_type='image/jpeg')
+        payload = {'respostas': [{'pergunta_id': self.perguntas[0].id, 'foto': 'foto-1'}]}
+        response = self.client.post(self.sync_url, {'payload': json.dumps(payload), 'foto-1': photo})
+        resposta = ChecklistResposta.objects.get(os=self.order)
+        self.assertTrue(resposta.foto.name.startswith(f'uploads/checklist/{self.order.pk}/'))
+        self.assertEqual(response.json()['fotos'], {str(self.perguntas[0].id): resposta.foto.url})
+
+        page = self.client.get(reverse('operacional:checklist_mobile', args=[self.order.pk]))
+        self.assertContains(page, 'Foto OK')
+        self.assertContains(page, 'data-pergunta-id', count=60)
+
+        # Foto já gravada só vale dentro da pasta da própria OS
+        default_storage.save('uploads/checklist/999/alheia.jpg', io.BytesIO(b'jpeg'))
+        reference = f'uploads/checklist/{self.order.pk}/../999/alheia.jpg'
+        data = self.post({'respostas': [{'pergunta_id': self.perguntas[1].id, 'foto': reference}]}).json()
+        self.assertEqual(data['rejeitadas'], [{'pergunta_id': self.perguntas[1].id, 'erro': f'Foto não encontrada: {reference}'}])
+
+    def test_sync_requires_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='tecnico', password='password')
+        payload = json.dumps({'respostas': [{'pergunta_id': self.perguntas[0].id, 'valor': 'SIM'}]})
+        self.assertEqual(client.post(self.sync_url, payload, content_type='application/json').status_code, 403)
+
+
+class MobileSyncTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('Tecnico', password='password')
+        other = User.objects.create_user('outro', password='password')
+        self.client.login(username='Tecnico', password='password')
+        self.pergunta = ChecklistPergunta.objects.create(
+            categoria=ChecklistCategoria.objects.create(name="Geral"), texto="Alarme ok?"
+        )
+        self.orders = []
+        for i in range(5):
+            person = Person.objects.create(name=f"Cliente {i}", document=f"0000000000{i}", is_client=True, city="Recife")
+            self.orders.append(ServiceOrder.objects.create(client=person, description=f"OS {i}", technician=self.user))
+        ServiceOrder.objects.create(client=person, description="De outro técnico", technician=other)
+        ServiceOrder.objects.create(client=person, description="Concluída", technician=self.user, status='COMPLETED')
+        self.url = reverse('operacional:api_mobile_sync')
+
+    def test_snapshot_and_delta_in_constant_queries(self):
+        checklist_sync.definition()
+        with self.assertNumQueries(6):  # sessão, usuário, ids, OS + checklist + anexos
+            data = self.client.get(self.url).json()
+        self.assertEqual(len(data['ordens']), 5)
+        self.assertEqual(sorted(data['ids']), sorted(order.pk for order in self.orders))
+        self.assertEqual(data['ordens'][0]['cliente']['endereco']['cidade'], 'Recife')
+
+        # Trabalho offline enviado em uma ida: check-in e checklist
+        # Tudo o que já estava no snapshot é anterior à margem do delta
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        ServiceOrder.objects.update(updated_at=an_hour_ago)
+        Person.objects.update(updated_at=an_hour_ago)
+        payload = {
+            'desde': data['version'],
+            'checkins': [{'os_id': self.orders[1].pk, 'lat': '-8.05', 'long': '-34.9'}],
+            'checklist': {str(self.orders[2].pk): [{'pergunta_id': self.pergunta.pk, 'valor': 'SIM'}]},
+        }
+        response = self.client.post(self.url, json.dumps(payload), content_type='application/json').json()
+        self.assertEqual(response['resultado']['checkins'], 1)
+        self.assertEqual(response['resultado']['checklist'][str(self.orders[2].pk)]['aplicadas'], 1)
+        self.assertEqual({order['id'] for order in response['ordens']}, {self.orders[1].pk, self.orders[2].pk})
+        self.orders[1].refresh_from_db()
+        self.assertEqual(self.orders[1].status, 'IN_PROGRESS')
+
+    def test_invalid_checkins_are_rejected_and_batch_is_atomic(self):
+        payload = {'checkins': [
+            {'os_id': str(self.orders[0].pk), 'lat': '-8.05', 'long': '-34.9', 'hora': '2025-03-10T08:30:00'},
+            {'os_id': self.orders[1].pk, 'lat': 'abc', 'long': '-34.9'},
+            {'os_id': self.orders[2].pk, 'lat': '-8.05', 'long': '-34.9', 'hora': 'ontem'},
+        ]}
+        response = self.client.post(self.url, json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        result = response.json()['resultado']
+        self.assertEqual(result['checkins'], 1)
+        self.assertEqual([item['os_id'] for item in result['rejeitadas']], [self.orders[1].pk, self.orders[2].pk])
+        self.orders[0].refresh_from_db()
+        self.assertTrue(timezone.is_aware(self.orders[0].checkin_time))
+        self.assertEqual(self.orders[0].checkin_lat, Decimal('-8.05'))
+
+        # Checklist inválido no mesmo lote: o check-in já gravado é desfeito
+        payload = {'checkins': [{'os_id': self.orders[3].pk, 'lat': '-8.05', 'long': '-34.9'}],
+                   'checklist': {str(self.orders[4].pk): 'SIM'}}
+        response = self.client.post(self.url, json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.orders[3].refresh_from_db()
+        self.assertIsNone(self.orders[3].checkin_time)
+        self.assertEqual(self.orders[3].status, 'PENDING')
+
+    def test_sync_and_uploads_require_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='Tecnico', password='password')
+        payload = json.dumps({'checkins': [{'os_id': self.orders[0].pk, 'lat': '-8.05', 'long': '-34.9'}]})
+        self.assertEqual(client.post(self.url, payload, content_type='application/json').status_code, 403)
+        start_url = reverse('operacional:api_mobile_upload_start')
+        self.assertEqual(client.post(start_url, '{}', content_type='application/json').status_code, 403)
+        chunk_url = reverse('operacional:api_mobile_upload_chunk', args=['00000000-0000-0000-0000-000000000000'])
+        self.assertEqual(client.put(chunk_url, b'x', content_type='application/octet-stream').status_code, 403)
+
+        # O GET da sincronização entrega o cookie; com o header o POST passa
+        token = client.get(self.url).cookies['csrftoken'].value
+        response = client.post(self.url, payload, content_type='application/json', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.json()['resultado']['checkins'], 1)
+
+    def test_mobile_list_has_no_debug_log(self):
+        with tempfile.TemporaryDirectory() as cwd, contextlib.chdir(cwd), \
+                contextlib.redirect_stdout(io.StringIO()) as output:
+            response = self.client.get(reverse('operacional:mobile_os_list'))
+            self.assertEqual(os.listdir(cwd), [])
+        self.assertEqual(output.getvalue(), '')
+        self.assertEqual(len(response.context['os_list']), 5)
+
+    def test_chunked_upload_resumes_and_dedupes(self):
+        content = bytes(range(256)) * 5000  # ~1,2 MB
+        digest = hashlib.sha256(content).hexdigest()
+        start_url = reverse('operacional:api_mobile_upload_start')
+        start = {'os_id': self.orders[0].pk, 'filename': 'foto.jpg', 'size': len(content), 'sha256': digest, 'tipo': 'Antes'}
+        upload = self.client.post(start_url, json.dumps(start), content_type='application/json').json()
+        chunk_url = reverse('operacional:api_mobile_upload_chunk', args=[upload['upload_id']])
+        size = upload['chunk_size']
+
+        def send(offset):
+            return self.client.put(chunk_url, content[offset:offset + size], content_type='application/octet-stream',
+                                   HTTP_UPLOAD_OFFSET=str(offset))
+
+        self.assertEqual(send(0).json()['recebido'], size)
+        # Resposta perdida: o app reenvia a mesma parte e é informado do offset correto
+        response = send(0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['recebido'], size)
+        # Retomada depois de reconectar
+        resumed = self.client.post(start_url, json.dumps(start), content_type='application/json').json()
+        self.assertEqual(resumed['recebido'], size)
+
+        offset = size
+        while offset < len(content):
+            data = send(offset).json()
+            offset += size
+        self.assertTrue(data['concluido'])
+        anexo = OSAnexo.objects.get(os=self.orders[0])
+        self.assertEqual((anexo.type, anexo.sha256), ('Antes', digest))
+        with anexo.file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+
+        # Mesmo conteúdo de novo: nada a enviar
+        again = self.client.post(start_url, json.dumps(start), content_type='application/json').json()
+        self.assertTrue(again['concluido'])
+        self.assertEqual(again['anexo']['id'], anexo.pk)
+        self.assertEqual(OSAnexoUpload.objects.get().parts, 3)
+
+
+class OperationalBoardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('gestor', password='password')
+        self.client.login(username='gestor', password='password')
+        self.technician = User.objects.create_user('tec', first_name='Ana', last_name='Lima')
+        person = Person.objects.create(name="Cliente", document="11122233344", is_client=True)
+        product = Product.objects.create(name="Cabo", sku="CABO", cost_price=1, sale_price=2, current_stock=10)
+
+        today = timezone.now()
+        self.aprovar = Budget.objects.create(client=person, status='Ganho', date=today.date())
+        self.sem_os = Budget.objects.create(client=person, status='Ganho', date=today.date(), approved_by_operations=True)
+        self.com_os = Budget.objects.create(client=person, status='Ganho', date=today.date(), approved_by_operations=True)
+        for budget in (self.sem_os, self.com_os):
+            BudgetProduct.objects.create(budget=budget, product=product, quantity=2, unit_price=5)
+
+        self.later = ServiceOrder.objects.create(client=person, description="b", scheduled_date=today + timedelta(days=2))
+        self.sooner = ServiceOrder.objects.create(client=person, description="a", scheduled_date=today + timedelta(days=1),
+                                                  technician=self.technician, budget=self.com_os)
+        ServiceOrder.objects.create(client=person, description="c", status='IN_PROGRESS')
+        ServiceOrder.objects.create(client=person, description="d", status='COMPLETED', checkout_time=today)
+        ServiceOrder.objects.create(client=person, description="e", status='COMPLETED',
+                                    checkout_time=today - timedelta(days=3))
+        cache.clear()
+
+    def test_board_in_two_queries_and_cached(self):
+        url = reverse('operacional:operational_progress')
+        with self.assertNumQueries(7):  # sessão, usuário, OS, orçamentos + 3 de permissões do menu
+            response = self.client.get(url)
+        columns = response.context['columns']
+        self.assertEqual([card['id'] for card in columns['pendentes']['items']], [self.sooner.pk, self.later.pk])
+        self.assertEqual(columns['pendentes']['items'][0]['technician_name'], 'Ana Lima')
+        self.assertEqual(columns['execucao']['count'], 1)
+        self.assertEqual(columns['concluidas']['count'], 1)
+        budgets = response.context['budgets']
+        self.assertEqual([b['id'] for b in budgets['liberacao']], [self.aprovar.pk])
+        self.assertEqual([b['id'] for b in budgets['pendentes_os']], [self.sem_os.pk])
+        self.assertEqual(budgets['pendentes_contrato'], [])
+
+        with self.assertNumQueries(2):  # quadro e menu vêm do cache
+            self.client.get(url)
+
+        # Uma OS alterada invalida o quadro; a coluna volta com o contador do KPI (out-of-band)
+        self.later.status = 'WAITING_MATERIAL'
+        self.later.save()
+        response = self.client.get(reverse('operacional:operational_progress_column', args=['material']),
+                                   HTTP_HX_REQUEST='true')
+        self.assertContains(response, f'id="os-{self.later.pk}"')
+        self.assertContains(response, 'id="kpi-material" class="h5 mb-0 fw-bold text-gray-800" hx-swap-oob="true">1<')
+        self.assertEqual(self.client.get(reverse('operacional:operational_progress_column', args=['x'])).status_code, 404)
+
+
+class SchedulingTest(TestCase):
+    def test_solver_handles_200_orders_under_a_second(self):
+        rng = random.Random(7)
+        points = [(-8.05 + rng.uniform(-0.15, 0.15), -34.9 + rng.uniform(-0.15, 0.15)) for _ in range(201)]
+        durations = [0] + [rng.choice([30, 60, 90]) for _ in range(200)]
+        technicians = [{'capacity': 600, 'fixed': set()} for _ in range(4)] + [{'capacity': 10 ** 5, 'fixed': {5, 9}}]
+
+        started = time.perf_counter()
+        travel = [[km / scheduling.AVERAGE_SPEED * 60 for km in row] for row in scheduling.distance_matrix(points)]
+        routes, unassigned = scheduling.solve(travel, durations, technicians)
+        self.assertLess(time.perf_counter() - started, 1)
+
+        visited = [point for route in routes for point in route]
+        self.assertEqual(sorted(visited + unassigned), list(range(1, 201)))
+        self.assertEqual(unassigned, [])
+        self.assertTrue({5, 9} <= set(routes[4]))
+        greedy, _ = scheduling.solve(travel, durations, technicians, time_limit=0)
+        self.assertLess(sum(scheduling.route_cost([0] + route, travel) for route in routes),
+                        sum(scheduling.route_cost([0] + route, travel) for route in greedy))
+
+    def test_plan_day_from_geocode_cache(self):
+        day = timezone.localdate() + timedelta(days=1)
+        scheduled = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=9)
+        ana, joao = (Technician.objects.create(user=User.objects.create_user(name)) for name in ('ana', 'joao'))
+        orders = []
+        for i in range(4):
+            person = Person.objects.create(name=f"Cliente {i}", document=f"2000000000{i}", is_client=True,
+                                           address=f"Rua {i}", number=str(i), city="Recife", state="PE")
+            orders.append(ServiceOrder.objects.create(client=person, description=f"OS {i}", scheduled_date=scheduled,
+                                                      duration="1h30"))
+        orders[3].technician = joao.user
+        orders[3].save()
+        for i, order in enumerate(orders[:2]):
+            GeocodeCache.objects.create(address=f"rua {i},  {i} - RECIFE/PE", lat=Decimal('-8.05') - Decimal(i) / 100, lng=-34.9)
+        # Coordenadas do check-in de uma visita anterior ao mesmo endereço
+        ServiceOrder.objects.create(client=orders[3].client, description="Anterior", status='COMPLETED',
+                                    checkin_lat=Decimal('-8.1'), checkin_long=Decimal('-34.95'), checkin_time=scheduled)
+        self.assertEqual(scheduling.learn_from_checkins(), 1)
+        # Mesmo endereço do cliente 0 com outra grafia: mesma chave, mesmas coordenadas
+        orders.append(ServiceOrder.objects.create(client=orders[2].client, description="OS 4", scheduled_date=scheduled,
+                                                  address="RUA 0,  0 - recife/pe"))
+
+        plan = scheduling.plan_day(day, technicians=[ana, joao], base=(-8.04, -34.9))
+        self.assertEqual(plan['sem_coordenadas'], [orders[2]])
+        self.assertEqual(plan['outros_tecnicos'], [])
+        self.assertEqual([stop['os'] for stop in plan['agenda'][1]['paradas']][-1], orders[3])
+        for entry in plan['agenda']:
+            arrivals = [stop['chegada'] for stop in entry['paradas']]
+            self.assertEqual(arrivals, sorted(arrivals))
+            for stop in entry['paradas']:
+                self.assertEqual(stop['saida'] - stop['chegada'], timedelta(minutes=90 if stop['os'] != orders[4] else 60))
+
+        # Agenda só da Ana: a OS do João fica com ele, a não ser que se peça a redistribuição
+        only_ana = scheduling.plan_day(day, technicians=[ana], base=(-8.04, -34.9))
+        self.assertEqual(only_ana['outros_tecnicos'], [orders[3]])
+        self.assertNotIn(orders[3], [stop['os'] for stop in only_ana['agenda'][0]['paradas']])
+        reassigned = scheduling.plan_day(day, technicians=[ana], base=(-8.04, -34.9), reassign=True)
+        self.assertIn(orders[3], [stop['os'] for stop in reassigned['agenda'][0]['paradas']])
+
+        out = io.StringIO()
+        call_command('planejar_agenda', '--data', day.isoformat(), '--aplicar', stdout=out)
+        self.assertIn('4 OS atualizada(s)', out.getvalue())
+        orders[3].refresh_from_db()
+        self.assertEqual(orders[3].technician, joao.user)
+        self.assertEqual(ServiceOrder.objects.filter(technician__isnull=False, scheduled_date__date=day).count(), 4)
+
+        out = io.StringIO()
+        call_command('planejar_agenda', '--data', day.isoformat(), '--tecnicos', 'ana', '--aplicar', stdout=out)
+        self.assertIn('Mantida com joao', out.getvalue())
+        orders[3].refresh_from_db()
+        self.assertEqual(orders[3].technician, joao.user)
@@ -9,6 +9,7 @@ urlpatterns = [
     path('os/<int:pk>/editar/', views.service_order_update, name='service_order_update'),
     path('os/<int:pk>/cancelar/', views.service_order_cancel, name='service_order_cancel'),
     path('andamento/', views.operational_progress, name='operational_progress'),
+    path('andamento/coluna/<slug:column>/', views.operational_progress_column, name='operational_progress_column'),
     path('orcamentos/<int:pk>/liberar/', views.approve_budget, name='approve_budget'),
     path('orcamentos/<int:pk>/recusar/', views.refuse_budget, name='refuse_budget'),
     path('orcamentos/<int:pk>/gerar-os/', views.create_os_from_budget, name='create_os_from_budget'),
@@ -20,8 +21,13 @@ urlpatterns = [
     path('mobile/os/<int:pk>/', views.mobile_os_detail, name='mobile_os_detail'),
     path('api/os/<int:pk>/checkin/', views.api_checkin, name='api_checkin'),
     path('api/os/<int:pk>/upload/', views.api_upload_photo, name='api_upload_photo'),
+    path('api/mobile/sync/', views.api_mobile_sync, name='api_mobile_sync'),
+    path('api/mobile/uploads/', views.api_mobile_upload_start, name='api_mobile_upload_start'),
+    path('api/mobile/uploads/<uuid:upload_id>/', views.api_mobile_upload_chunk, name='api_mobile_upload_chunk'),
     path('os/<int:pk>/mobile/checklist/', views.checklist_mobile_view, name='checklist_mobile'),
     path('api/os/<int:pk>/checklist/save/', views.save_checklist_api, name='save_checklist_api'),
+    path('api/os/<int:pk>/checklist/sync/', views.checklist_sync_api, name='checklist_sync_api'),
+    path('api/checklist/definicao/', views.checklist_definition_api, name='checklist_definition_api'),
     path('api/os/<int:pk>/checklist/finalize/', views.finalize_checklist_api, name='finalize_checklist_api'),
     path('os/<int:pk>/checklist/pdf/', views.service_order_checklist_pdf, name='service_order_checklist_pdf'),
     path('os/<int:pk>/checklist/email/', views.service_order_checklist_email, name='checklist_enviar_email'),
@@ -1,19 +1,21 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.template.loader import get_template
 from django.core.files.base import ContentFile
 import base64
 from django.db.models import Q
 from django.utils import timezone
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods, require_POST
 import json
 
 from .services.pdf_service import render_preventive_pdf
 from .services.email_service import send_checklist_email
-from .models import ServiceOrder, ServiceOrderItem, OSAnexo, ChecklistCategoria, ChecklistPergunta, ChecklistResposta
+from .services import board, checklist_sync, mobile_sync, photo_upload
+from .models import ServiceOrder, ServiceOrderItem, OSAnexo, OSAnexoUpload, ChecklistCategoria, ChecklistPergunta, ChecklistResposta
 from .forms import ServiceOrderItemFormSet, ServiceOrderForm, ServiceOrderItemForm
 from core.models import Person, CompanySettings
 from django.core.paginator import Paginator
@@ -21,7 +23,7 @@ from estoque.models import Product, StockMovement
 from comercial.models import Budget, Contract
 from django.contrib.auth.models import User
 import io
-from xhtml2pdf import pisa
+from core.services.pdf import create_pdf
 
 @login_required
 def service_order_checklist_pdf(request, pk):
@@ -210,83 +212,35 @@ def service_order_update(request, pk):
 
 @login_required
 def operational_progress(request):
-    # Column 1: Liberação de Orçamento
-    # Budgets that are 'Ganho' but NOT yet approved by operations
-    budgets_to_approve = Budget.objects.filter(status='Ganho', approved_by_operations=False)
-
-    # Column 2: Orçamentos Pendentes de Contrato
-    # Budgets 'Ganho', Approved, have Services, but NO Contract linked
-    # We check if budget has services (BudgetService exists)
-    budgets_pending_contract = Budget.objects.filter(
-        status='Ganho', 
-        approved_by_operations=True, 
-        services__isnull=False, 
-        contract__isnull=True
-    ).distinct()
-
-    # Column 3: Orçamentos Pendentes de OS
-    # Budgets 'Ganho', Approved, have Products OR Services, but NO ServiceOrder linked
-    # (Note: A budget might need BOTH Contract and OS if it has services. 
-    #  Or maybe OS is for one-time services/products and Contract for recurring?
-    #  For now, let's assume if it has products/services and no OS, it needs one.)
-    # Column 3: Orçamentos Pendentes de OS
-    budgets_pending_os = Budget.objects.filter(
-        status='Ganho', 
-        approved_by_operations=True, 
-        service_orders__isnull=True
-    ).filter(
-        Q(products__isnull=False) | Q(services__isnull=False)
-    ).distinct()
-
-    # --- NEW DASHBOARD COLUMNS AS REQUESTED ---
-    
-    # 0. Instalações Pendentes (INSTALLATION_PENDING)
-    instalacoes_pendentes = ServiceOrder.objects.filter(
-        status='INSTALLATION_PENDING'
-    ).select_related('client', 'technician', 'budget').order_by('created_at')
-
-    # 1. Pendentes OS (Aberto ou Agendado -> PENDING)
-    # The user asked for 'OPEN' or 'SCHEDULED'. Our model has 'PENDING'.
-    # We will treat PENDING as the bucket for these.
-    # If we had a separate SCHEDULED status, we would use Q(status='PENDING') | Q(status='SCHEDULED')
-    pendentes_os = ServiceOrder.objects.filter(status='PENDING').select_related('client', 'technician').order_by('scheduled_date')
-
-    # 2. Em Execução (IN_PROGRESS)
-    em_execucao = ServiceOrder.objects.filter(status='IN_PROGRESS').select_related('client', 'technician').order_by('scheduled_date')
-
-    # 3. Aguardando Material (WAITING_MATERIAL)
-    aguardando_material = ServiceOrder.objects.filter(status='WAITING_MATERIAL').select_related('client', 'technician').order_by('scheduled_date')
-
-    # 4. Concluídas Hoje (COMPLETED with checkout_today)
-    today = timezone.now().date()
-    concluidas_hoje = ServiceOrder.objects.filter(
-        status='COMPLETED', 
-        checkout_time__date=today
-    ).select_related('client', 'technician').order_by('-checkout_time')
+    # Quadro montado em duas consultas e guardado no cache por alguns segundos (services/board.py)
+    quadro = board.get_board()
 
     # Selected OS highlighting logic
     selected_os_id = request.GET.get('os_id')
     selected_os = None
     if selected_os_id:
-        selected_os = ServiceOrder.objects.filter(pk=selected_os_id).first()
+        selected_os = ServiceOrder.objects.filter(pk=selected_os_id).select_related('client').first()
 
     return render(request, 'operacional/operational_dashboard.html', {
-        'budgets_to_approve': budgets_to_approve,
-        'budgets_pending_contract': budgets_pending_contract,
-        'budgets_pending_os': budgets_pending_os,
-        
-        # New Context Variables
-        'instalacoes_pendentes': instalacoes_pendentes,
-        'pendentes_os': pendentes_os,
-        'em_execucao': em_execucao,
-        'aguardando_material': aguardando_material,
-        'concluidas_hoje': concluidas_hoje,
-        
-        # Legacy/Extra context if needed (removed os_in_progress duplicate)
-        'now': timezone.now(), 
+        'columns': quadro['columns'],
+        'budgets': quadro['budgets'],
+        'now': timezone.now(),
         'selected_os': selected_os,
     })
 
+@login_required
+def operational_progress_column(request, column):
+    """Uma coluna do quadro, para o refresh via HTMX; atualiza também o contador do KPI."""
+    quadro = board.get_board()
+    if column not in quadro['columns']:
+        raise Http404('Coluna inexistente')
+    selected_os_id = request.GET.get('os_id')
+    return render(request, f'operacional/partials/board_{column}.html', {
+        'column': quadro['columns'][column],
+        'selected_os': {'id': int(selected_os_id)} if selected_os_id and selected_os_id.isdigit() else None,
+        'oob': request.htmx,
+    })
+
 @login_required
 def approve_budget(request, pk):
     budget = get_object_or_404(Budget, pk=pk)
@@ -449,7 +403,7 @@ def service_order_pdf(request, pk):
     template = get_template('operacional/service_order_pdf.html')
     html = template.render(context)
     
-    pisa_status = pisa.CreatePDF(html, dest=response)
+    pisa_status = create_pdf(html, dest=response)
     
     if pisa_status.err:
        return HttpResponse('Erro ao gerar PDF <pre>' + html + '</pre>')
@@ -466,31 +420,7 @@ def mobile_os_list(request):
     List active OS for the logged-in technician. 
     Shows all if superuser.
     """
-    from django.db.models import Q # Ensure Q is imported locally if not global
-
-    tecnico_user = request.user
-    # Status que devem aparecer (TODOS os pendentes/ativos)
-    # Mapping 'OPEN', 'SCHEDULED' -> 'PENDING'
-    status_visiveis = ['PENDING', 'IN_PROGRESS', 'WAITING_MATERIAL', 'OPEN', 'SCHEDULED']
-
-    if request.user.is_superuser:
-        os_list = ServiceOrder.objects.exclude(status__in=['COMPLETED', 'CANCELED']).order_by('-scheduled_date', '-id')
-    else:
-        # Busca abrangente (Case-insensitive para capturar AndreBezerra vs andrebezerra)
-        os_list = ServiceOrder.objects.filter(
-            technician__username__iexact=tecnico_user.username,
-            status__in=status_visiveis
-        ).order_by('-scheduled_date', '-id')
-
-    # Debug Print to Terminal
-    debug_msg = f"Usuário: {request.user} (ID: {request.user.id}, Super: {request.user.is_superuser}) - OSs encontradas: {os_list.count()}"
-    print(debug_msg)
-    
-    # Write to a file we can read
-    import os as py_os
-    with open("debug_view_mobile.log", "a") as f:
-        from django.utils import timezone
-        f.write(f"[{timezone.now()}] {debug_msg}\n")
+    os_list = mobile_sync.assigned_orders(request.user).select_related('client').order_by('-scheduled_date', '-id')
 
     return render(request, 'operacional/mobile_os_list.html', {'os_list': os_list})
 
@@ -554,20 +484,139 @@ def api_upload_photo(request, pk):
         })
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@ensure_csrf_cookie
+@login_required
+@require_http_methods(['GET', 'POST'])
+def api_mobile_sync(request):
+    """
+    Pacote offline do técnico. GET ?desde=<token>: OS atribuídas (todas, ou as
+    alteradas depois do token). POST {"desde", "checkins", "checklist"} (JSON, ou
+    no campo "payload" de um multipart com fotos do checklist): aplica o trabalho
+    offline e devolve o delta no mesmo formato, com o resultado em "resultado".
+    O GET grava o cookie csrftoken; os POST/PUT da sincronização e do envio de
+    fotos devolvem o valor dele no header X-CSRFToken.
+    """
+    try:
+        if request.method == 'GET':
+            return JsonResponse(mobile_sync.snapshot(request.user, request.GET.get('desde')))
+
+        payload = json.loads(request.POST['payload'] if request.FILES or 'payload' in request.POST else request.body)
+        if not isinstance(payload, dict):
+            raise mobile_sync.SyncError('Payload inválido.')
+        result = mobile_sync.apply(request.user, payload, request.FILES)
+        return JsonResponse({**mobile_sync.snapshot(request.user, payload.get('desde')), 'resultado': result})
+    except (ValueError, checklist_sync.SyncError, mobile_sync.SyncError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_POST
+def api_mobile_upload_start(request):
+    """
+    Inicia ou retoma o envio de uma foto em partes:
+    {"os_id", "filename", "size", "sha256", "tipo"} -> offset a partir do qual enviar,
+    ou o anexo pronto se a OS já tem uma foto com o mesmo conteúdo.
+    """
+    try:
+        data = json.loads(request.body)
+        order = get_object_or_404(mobile_sync.technician_orders(request.user), pk=data.get('os_id'))
+        upload, anexo = photo_upload.start(
+            order, request.user, data.get('filename'), data.get('size'), data.get('sha256'),
+            data.get('tipo', 'Diagnostico'),
+        )
+        return JsonResponse(photo_upload.status(upload, anexo))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_http_methods(['GET', 'PUT', 'POST'])
+def api_mobile_upload_chunk(request, upload_id):
+    """
+    GET: situação do envio (offset para retomar).
+    PUT/POST com o header Upload-Offset e os bytes da parte no corpo.
+    """
+    upload = get_object_or_404(
+        OSAnexoUpload, pk=upload_id, os__in=mobile_sync.technician_orders(request.user).values('pk')
+    )
+    if request.method == 'GET':
+        return JsonResponse(photo_upload.status(upload))
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        upload = photo_upload.receive_chunk(upload, offset, request.body)
+        return JsonResponse(photo_upload.status(upload))
+    except photo_upload.OffsetMismatch as e:
+        return JsonResponse({**photo_upload.status(upload), 'recebido': e.offset, 'error': str(e)}, status=e.status)
+    except photo_upload.UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Header Upload-Offset ausente ou inválido.'}, status=400)
+
+
 @login_required
 def checklist_mobile_view(request, pk):
     order = get_object_or_404(ServiceOrder, pk=pk)
-    categories = ChecklistCategoria.objects.prefetch_related('perguntas').all()
-    
+    definition = checklist_sync.definition()
+
     # Pre-load existing responses
     responses = {r.pergunta_id: r for r in ChecklistResposta.objects.filter(os=order)}
-    
+
     return render(request, 'operacional/checklist_mobile.html', {
         'order': order,
-        'categories': categories,
+        'categories': definition['categorias'],
+        'definition_version': definition['version'],
+        'answers_version': checklist_sync.answers_version(order),
         'responses': responses
     })
 
+
+@login_required
+@cache_control(private=True, max_age=300)
+@condition(etag_func=lambda request: checklist_sync.definition()['version'])
+def checklist_definition_api(request):
+    """Categorias e perguntas do checklist, com versão (ETag) para o app trabalhar offline."""
+    return JsonResponse(checklist_sync.definition())
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def checklist_sync_api(request, pk):
+    """
+    GET ?desde=<token>: respostas alteradas depois do token.
+    POST {"respostas": [{"pergunta_id", "valor", "comentario", "foto"}], "desde": <token>}:
+    aplica o lote (JSON no corpo, ou no campo "payload" de um multipart com as fotos,
+    referenciadas pelo nome do campo do arquivo) e devolve o novo token.
+    """
+    order = get_object_or_404(ServiceOrder, pk=pk)
+    try:
+        if request.method == 'GET':
+            since = request.GET.get('desde')
+            return JsonResponse({
+                'version': checklist_sync.answers_version(order),
+                'definicao': checklist_sync.definition()['version'],
+                'respostas': checklist_sync.answers_since(order, since),
+            })
+
+        payload = json.loads(request.POST['payload'] if request.FILES or 'payload' in request.POST else request.body)
+        if not isinstance(payload, dict):
+            raise checklist_sync.SyncError('Payload inválido.')
+        applied, rejected, photos = checklist_sync.apply_changes(order, payload.get('respostas', []), request.FILES)
+        response = {
+            'success': True,
+            'aplicadas': applied,
+            'rejeitadas': rejected,
+            'fotos': photos,
+            'version': checklist_sync.answers_version(order),
+            'definicao': checklist_sync.definition()['version'],
+        }
+        if payload.get('desde'):
+            response['respostas'] = checklist_sync.answers_since(order, payload['desde'])
+        return JsonResponse(response)
+    except (ValueError, checklist_sync.SyncError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
 @csrf_exempt
 @login_required
 @require_POST
@@ -1,20 +1,10 @@
 #!/bin/sh
 set -eu
 
-echo "Running database migrations..."
-python manage.py migrate --noinput
+# Release (migrate, collectstatic e seeds) seguido do servidor web, para
+# ambientes sem fase de release separada. Cada etapa é pulada quando nada
+# mudou desde o último deploy, então a subida normal não migra nem coleta.
+echo "Running release steps..."
+python manage.py release
 
-echo "Collecting static files..."
-python manage.py collectstatic --noinput
-
-echo "Migrations and static files completed successfully!"
-echo "Starting Gunicorn on port ${PORT:-8000}..."
-
-# Use exec to replace the shell process with Gunicorn (PID 1)
-exec gunicorn erp.wsgi:application \
-  --bind "0.0.0.0:${PORT:-8000}" \
-  --workers 2 \
-  --threads 4 \
-  --timeout 120 \
-  --access-logfile - \
-  --error-logfile -
+exec sh /app/start-web.sh
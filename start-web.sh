@@ -0,0 +1,18 @@
+#!/bin/sh
+set -eu
+
+# Entrypoint web: sobe o gunicorn direto, sem migrate/collectstatic/seed
+# (que ficam na fase de release: python manage.py release).
+
+# Cada worker do gunicorn é um processo com o seu próprio pool de conexões
+# (erp/settings.py): no máximo uma conexão por thread. O total aberto no
+# Postgres fica em GUNICORN_WORKERS x DB_POOL_MAX_SIZE.
+export GUNICORN_WORKERS="${GUNICORN_WORKERS:-2}"
+export GUNICORN_THREADS="${GUNICORN_THREADS:-4}"
+export DB_POOL_MAX_SIZE="${DB_POOL_MAX_SIZE:-$GUNICORN_THREADS}"
+echo "DB pool: ${GUNICORN_WORKERS} workers x ${DB_POOL_MAX_SIZE} connections = $((GUNICORN_WORKERS * DB_POOL_MAX_SIZE)) max"
+
+echo "Starting Gunicorn on port ${PORT:-8000}..."
+
+# Use exec to replace the shell process with Gunicorn (PID 1); ver gunicorn.conf.py
+exec gunicorn erp.wsgi:application --config gunicorn.conf.py